@@ -151,7 +151,7 @@ async def get_gex_data(ticker: str, dte_filter: str = "all") -> dict:
         prev_strike = s["strike"]
         prev_cum = cumulative
 
-    return {
+    result = {
         "ticker": ticker,
         "spot": spot,
         "totalGex": total_gex,
@@ -163,3 +163,12 @@ async def get_gex_data(ticker: str, dte_filter: str = "all") -> dict:
         "strikes": strikes_list,
         "dteFilter": dte_filter,
     }
+
+    # GEX level alert rules are defined against the full chain
+    if dte_filter == "all":
+        try:
+            from api.services.alert_rules import on_gex
+            on_gex(ticker, result)
+        except Exception as e:
+            logger.warning(f"[gex] Alert rule evaluation failed: {e}")
+    return result
@@ -18,6 +18,7 @@ from api.routers import breadth_monitor as breadth_monitor_router
 from api.routers import theme_performance as theme_performance_router
 from api.services import cot_service as _cot_service
 from api.top_flow_router import router as top_flow_router
+from api.uw_flow_router import router as uw_flow_router
 from api import top_flow_tracker as _top_flow_tracker
 from api.schwab_router import router as schwab_router
 from api.routers import correlation as correlation_router
@@ -34,9 +35,23 @@ from api.routers import sector_flow as sector_flow_router
 from api.routers import intelligence as intelligence_router
 from api.routers import transcripts as transcripts_router
 from api.services.auth_db import init_db as _init_auth_db
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse as StarletteJSONResponse
 from api.gex_router import router as gex_router
+from api.middleware.compression import CompressionETagMiddleware
+from api.middleware.profiling import ProfilingMiddleware
+from api.routers import profiling as profiling_router
+from api.routers import outbox as outbox_router
+from api.routers import stripe_events as stripe_events_router
+from api.services import profiler as _profiler
+from api.services import outbox as _outbox
+from api.services import stripe_events as _stripe_events
+from api.services import journal_ai as _journal_ai
+
+try:
+    import orjson  # noqa: F401 — fast serializer for every route's JSON
+    from fastapi.responses import ORJSONResponse as _DefaultJSONResponse
+except ImportError:
+    _DefaultJSONResponse = JSONResponse
 
 _SENTRY_DSN = os.environ.get("SENTRY_DSN")
 
@@ -44,15 +59,26 @@ _SENTRY_DSN = os.environ.get("SENTRY_DSN")
 _MAINTENANCE_MODE = False
 
 
-class MaintenanceMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        global _MAINTENANCE_MODE
-        if _MAINTENANCE_MODE and not request.url.path.startswith("/api/auth") and request.url.path != "/api/maintenance":
-            return StarletteJSONResponse(
+class MaintenanceMiddleware:
+    # Pure ASGI rather than BaseHTTPMiddleware: the latter re-streams every response,
+    # which hides one-piece bodies from CompressionETagMiddleware
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if (
+            scope["type"] == "http" and _MAINTENANCE_MODE
+            and not path.startswith("/api/auth") and path != "/api/maintenance"
+        ):
+            response = StarletteJSONResponse(
                 status_code=503,
                 content={"detail": "Under maintenance", "maintenance": True},
             )
-        return await call_next(request)
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
 if _SENTRY_DSN:
     sentry_sdk.init(
         dsn=_SENTRY_DSN,
@@ -93,12 +119,23 @@ def _seed_cache_from_volume():
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Outbound call spans for sampled requests (PROFILE_SAMPLE_RATE=0 leaves libraries unpatched)
+    if _profiler.SAMPLE_RATE > 0:
+        _profiler.install()
+
     # Auth DB — separate from all other databases, safe to init
     try:
         _init_auth_db()
     except Exception as e:
         print(f"[startup] Auth DB init error (non-fatal): {e}")
 
+    # Discord/email outbox dispatcher (needs the auth DB schema)
+    _outbox.start_dispatcher()
+    # Stripe webhook events are recorded by the endpoint and applied here
+    _stripe_events.start_worker()
+    # AI trade summaries and weekly digests, generated off the request path
+    _journal_ai.start_worker()
+
     _seed_cache_from_volume()
     from api.services.theme_performance import load_persisted_on_startup
     load_persisted_on_startup()
@@ -137,7 +174,11 @@ async def lifespan(app: FastAPI):
 
     from apscheduler.schedulers.background import BackgroundScheduler
     from apscheduler.triggers.cron import CronTrigger
-    from api.services.auth_service import cleanup_expired_sessions, cleanup_expired_tokens, record_mrr_snapshot
+    from apscheduler.triggers.interval import IntervalTrigger
+    from api.services.auth_service import (
+        cleanup_expired_sessions, cleanup_expired_tokens, record_mrr_snapshot,
+        flush_pending_writes, WRITE_BEHIND_INTERVAL,
+    )
     _scheduler = BackgroundScheduler(timezone=ZoneInfo("America/New_York"))
     # COT refresh: primary at 3:50 PM ET, retries at 4:15 PM and 4:45 PM if stale
     _scheduler.add_job(
@@ -168,6 +209,113 @@ async def lifespan(app: FastAPI):
         max_instances=1,
         replace_existing=True,
     )
+    # Write-behind flush — last_login_at touches + page views, batched
+    _scheduler.add_job(
+        flush_pending_writes,
+        trigger=IntervalTrigger(seconds=WRITE_BEHIND_INTERVAL),
+        id="auth_write_behind",
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
+    # Journal insights — recompute users whose trades changed (debounced)
+    from api.services import journal_insights
+    _scheduler.add_job(
+        journal_insights.refresh_due,
+        trigger=IntervalTrigger(seconds=journal_insights.REFRESH_INTERVAL),
+        id="journal_insights_refresh",
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
+    # Weekly AI digests — queue last week's for active users, Mondays 6:00 AM ET
+    _scheduler.add_job(
+        _journal_ai.enqueue_weekly_digests,
+        trigger=CronTrigger(day_of_week="mon", hour=6, minute=0),
+        id="journal_ai_weekly_digests",
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
+    # Chart prerender — popular names after the close, weekdays 4:30 PM ET
+    from api.services import chart_render
+    _scheduler.add_job(
+        chart_render.prerender,
+        trigger=CronTrigger(day_of_week="mon-fri", hour=16, minute=30),
+        id="chart_prerender",
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
+    # Alert rules — prices (and GEX, every 5 min) for tickers that have rules, market hours
+    from api.services import alert_rules, alerts as alerts_service, portfolio_risk
+    _scheduler.add_job(
+        alert_rules.evaluate_market_rules,
+        trigger=CronTrigger(day_of_week="mon-fri", hour="9-16", second="*/30"),
+        id="alert_rules_market",
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
+    # Live marks for every open journal position (deduped across users) + stop breaches
+    _scheduler.add_job(
+        portfolio_risk.tick,
+        trigger=CronTrigger(day_of_week="mon-fri", hour="9-16", second="*/30"),
+        id="portfolio_marks",
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
+    # Paper trades — stop/target exits against the same live marks
+    from api.services import paper_trades
+    _scheduler.add_job(
+        paper_trades.tick,
+        trigger=CronTrigger(day_of_week="mon-fri", hour="9-16", second="*/30"),
+        id="paper_trade_levels",
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
+    # Alert retention — nightly
+    _scheduler.add_job(
+        alerts_service.prune,
+        trigger=CronTrigger(hour=3, minute=15),
+        id="alerts_prune",
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
+    # Delivered outbox messages — nightly
+    _scheduler.add_job(
+        _outbox.prune,
+        trigger=CronTrigger(hour=3, minute=20),
+        id="outbox_prune",
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
+    # UW flow ingest — poll new alerts into the archive/ring (only with a UW key)
+    if os.environ.get("UW_API_KEY"):
+        from api import uw_flow_ingest
+        _scheduler.add_job(
+            uw_flow_ingest.poll_once,
+            trigger=IntervalTrigger(seconds=uw_flow_ingest.POLL_SECONDS),
+            id="uw_flow_ingest",
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True,
+        )
+        print(f"[startup] UW flow ingest scheduled — every {uw_flow_ingest.POLL_SECONDS}s")
+    # Form 4 insider filings — new filings for cap_universe names from EDGAR's latest feed
+    from api.services import insider_filings
+    _scheduler.add_job(
+        insider_filings.update_from_feed,
+        trigger=IntervalTrigger(minutes=insider_filings.POLL_MINUTES),
+        id="insider_form4_ingest",
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
     # Churn risk check — daily at 9 AM ET, alerts on users inactive 7+ days
     def _check_churn_risk():
         try:
@@ -218,13 +366,23 @@ async def lifespan(app: FastAPI):
     print("[startup] Session cleanup scheduled — daily at 3:00 AM ET")
     print("[startup] Churn risk check scheduled — daily at 9:00 AM ET")
     print("[startup] MRR snapshot scheduled — daily at 11:59 PM ET")
+    print("[startup] Chart prerender scheduled — weekdays at 4:30 PM ET")
 
     yield
     _scheduler.shutdown(wait=False)
+    _journal_ai.stop_worker()
+    _stripe_events.stop_worker()
+    _outbox.stop_dispatcher()
+    chart_render.shutdown()
     stop_snapshot_scheduler()
+    flush_pending_writes()
+    from api.services.auth_db import close_pool
+    close_pool()
 
-app = FastAPI(title="UCT Dashboard", lifespan=lifespan)
+app = FastAPI(title="UCT Dashboard", lifespan=lifespan, default_response_class=_DefaultJSONResponse)
 app.add_middleware(MaintenanceMiddleware)
+app.add_middleware(CompressionETagMiddleware)
+app.add_middleware(ProfilingMiddleware)  # outermost — times everything above
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -255,6 +413,7 @@ app.include_router(cot_router.router)
 app.include_router(breadth_monitor_router.router)
 app.include_router(theme_performance_router.router)
 app.include_router(top_flow_router)
+app.include_router(uw_flow_router)
 app.include_router(schwab_router)
 app.include_router(calendar_router.router)
 app.include_router(insider_router.router)
@@ -272,6 +431,9 @@ app.include_router(correlation_router.router)
 app.include_router(intelligence_router.router)
 app.include_router(transcripts_router.router)
 app.include_router(gex_router)
+app.include_router(profiling_router.router)
+app.include_router(outbox_router.router)
+app.include_router(stripe_events_router.router)
 
 # ─── CSV routes: serve from app/public/ directly (bypasses Vite build cache) ──
 PUBLIC = os.path.join(os.path.dirname(__file__), "..", "app", "public")
@@ -0,0 +1,169 @@
+"""
+api/middleware/compression.py — Conditional, compressed responses.
+
+CompressionETagMiddleware wraps every GET response whose body arrives in one piece
+(JSON and other buffered responses; streams such as SSE and FileResponse pass
+through untouched):
+
+  - a 200 without an ETag gets a strong one: a hash of the body. Handlers that
+    know a cheaper validator (a data version, a content key) can set ETag themselves
+    and it is used as is.
+  - If-None-Match matching the ETag turns the response into an empty 304, so a
+    dashboard polling an unchanged document gets headers only. Responses carrying an
+    ETag but no Cache-Control get "no-cache", which makes browsers revalidate with
+    If-None-Match instead of refetching. When the request carries a session cookie
+    or Authorization header the body may be user-specific, so it gets
+    "private, no-cache" and shared caches (CDN, proxies) never store it.
+  - compressible bodies of at least MIN_SIZE bytes are brotli- (when the brotli
+    package is installed) or gzip-encoded per Accept-Encoding. The ETag of an encoded
+    body gets a "-br" / "-gz" suffix so each representation has its own strong tag;
+    If-None-Match ignores the suffix.
+"""
+
+import gzip
+import hashlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional — gzip only
+    brotli = None
+
+MIN_SIZE = 1024
+SESSION_COOKIE = "uct_session"
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4  # good ratio for JSON at a fraction of the CPU of the default 11
+
+_COMPRESSIBLE = ("application/json", "text/", "application/javascript", "application/xml", "image/svg+xml")
+_SUFFIXES = {"br": "-br", "gzip": "-gz"}
+
+
+def _compressible(content_type: str) -> bool:
+    return content_type.startswith(_COMPRESSIBLE)
+
+
+def _choose_encoding(accept_encoding: str) -> str | None:
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name] = q
+    for name in (("br", "gzip") if brotli is not None else ("gzip",)):
+        if accepted.get(name, accepted.get("*", 0)) > 0:
+            return name
+    return None
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _user_specific(request_headers: Headers) -> bool:
+    if "authorization" in request_headers:
+        return True
+    return any(
+        c.strip().startswith(f"{SESSION_COOKIE}=")
+        for c in request_headers.get("cookie", "").split(";")
+    )
+
+
+def _opaque(tag: str) -> str:
+    """Comparable form of an entity tag: no weak prefix, no encoding suffix."""
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    for suffix in _SUFFIXES.values():
+        if tag.endswith(f'{suffix}"'):
+            return tag[: -len(suffix) - 1] + '"'
+    return tag
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    target = _opaque(etag)
+    return any(_opaque(t) == target for t in if_none_match.split(","))
+
+
+class CompressionETagMiddleware:
+    def __init__(self, app, minimum_size: int = MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        start = None
+
+        async def send_wrapper(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+            held, start = start, None
+            if message.get("more_body", False):
+                # Streaming response: headers are decided before the body is known
+                await send(held)
+                await send(message)
+                return
+            await self._finish(request_headers, held, message.get("body", b""), send)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _finish(self, request_headers: Headers, start: dict, body: bytes, send) -> None:
+        headers = MutableHeaders(raw=list(start["headers"]))
+        if start["status"] != 200 or "no-store" in headers.get("cache-control", ""):
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        content_type = headers.get("content-type", "")
+        etag = headers.get("etag")
+        if etag is None and body:
+            etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+            headers["ETag"] = etag
+        if etag is not None and "cache-control" not in headers:
+            headers["Cache-Control"] = "private, no-cache" if _user_specific(request_headers) else "no-cache"
+
+        compress = (
+            _compressible(content_type)
+            and len(body) >= self.minimum_size
+            and "content-encoding" not in headers
+        )
+        if compress:
+            headers.add_vary_header("Accept-Encoding")
+
+        if etag is not None and etag_matches(request_headers.get("if-none-match", ""), etag):
+            for name in ("content-length", "content-type", "content-encoding"):
+                if name in headers:
+                    del headers[name]
+            await send({"type": "http.response.start", "status": 304, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        encoding = _choose_encoding(request_headers.get("accept-encoding", "")) if compress else None
+        if encoding is not None:
+            body = _compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            if etag is not None and etag.endswith('"') and not etag.startswith("W/"):
+                headers["ETag"] = f'{etag[:-1]}{_SUFFIXES[encoding]}"'
+
+        await send({**start, "headers": headers.raw})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,50 @@
+"""
+api/middleware/profiling.py — Per-route latency and sampled dependency traces.
+
+Records every HTTP request's duration against its route template (api.services.profiler)
+and, for sampled requests, opens a Trace so outbound calls made while handling it are
+attributed to their dependency. Event streams are timed to their first byte, not for
+as long as the client stays connected.
+"""
+
+import time
+
+from api.services import profiler
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+        status = 500
+        headers_at = None
+        streaming = False
+
+        async def send_wrapper(message):
+            nonlocal status, headers_at, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers_at = time.perf_counter()
+                streaming = any(
+                    k.lower() == b"content-type" and v.startswith(b"text/event-stream")
+                    for k, v in message.get("headers", [])
+                )
+            await send(message)
+
+        token = profiler.start_trace(scope["method"], scope["path"])
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end = headers_at if streaming and headers_at is not None else time.perf_counter()
+            route = scope.get("route")
+            profiler.end_trace(
+                token,
+                f"{scope['method']} {getattr(route, 'path', None) or 'unmatched'}",
+                status,
+                (end - t0) * 1000,
+            )
@@ -1,25 +1,108 @@
 # api/routers/alerts.py — Alert REST endpoints
-from fastapi import APIRouter, Query
-from api.services.alerts import get_alerts, mark_read, mark_all_read
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+
+from api.middleware.auth_middleware import get_current_user, get_current_user_optional
+from api.services import alert_rules
+from api.services.alerts import (
+    get_alerts, get_subscriptions, mark_all_read, mark_read, set_subscriptions, unread_count,
+)
 
 router = APIRouter()
 
 
+class RuleCreate(BaseModel):
+    kind: str
+    ticker: Optional[str] = None
+    params: dict = {}
+    name: str = ""
+    cooldown_seconds: Optional[int] = None
+
+
+class RuleUpdate(BaseModel):
+    ticker: Optional[str] = None
+    params: Optional[dict] = None
+    name: Optional[str] = None
+    cooldown_seconds: Optional[int] = None
+    enabled: Optional[bool] = None
+
+
 @router.get("/api/alerts")
-def list_alerts(limit: int = Query(50, ge=1, le=100)):
-    """Return recent alerts, newest first."""
-    return get_alerts(limit)
+def list_alerts(
+    limit: int = Query(50, ge=1, le=100),
+    user: Optional[dict] = Depends(get_current_user_optional),
+):
+    """Return recent alerts, newest first — broadcast plus the user's own, with their read state."""
+    return get_alerts(limit, user_id=user["id"] if user else None)
 
 
-@router.post("/api/alerts/{alert_id}/read")
-def read_alert(alert_id: str):
-    """Mark a single alert as read."""
-    ok = mark_read(alert_id)
-    return {"ok": ok}
+@router.get("/api/alerts/unread-count")
+def alerts_unread_count(user: dict = Depends(get_current_user)):
+    return {"unread": unread_count(user["id"])}
 
 
 @router.post("/api/alerts/read-all")
-def read_all():
+def read_all(user: dict = Depends(get_current_user)):
     """Mark all alerts as read."""
-    count = mark_all_read()
+    count = mark_all_read(user["id"])
     return {"ok": True, "marked": count}
+
+
+@router.post("/api/alerts/{alert_id}/read")
+def read_alert(alert_id: str, user: dict = Depends(get_current_user)):
+    """Mark a single alert as read."""
+    ok = mark_read(alert_id, user["id"])
+    return {"ok": ok}
+
+
+# ── Subscriptions ─────────────────────────────────────────────────────────────
+
+@router.get("/api/alerts/subscriptions")
+def list_subscriptions(user: dict = Depends(get_current_user)):
+    return get_subscriptions(user["id"])
+
+
+@router.put("/api/alerts/subscriptions")
+def update_subscriptions(prefs: dict, user: dict = Depends(get_current_user)):
+    """Body: {alert_type: {"enabled": bool, "channels": ["in_app", "email"]}}."""
+    try:
+        return set_subscriptions(user["id"], prefs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# ── Rules ─────────────────────────────────────────────────────────────────────
+
+@router.get("/api/alerts/rules")
+def list_rules(user: dict = Depends(get_current_user)):
+    return {"rules": alert_rules.list_rules(user["id"]), "kinds": list(alert_rules.RULE_KINDS)}
+
+
+@router.post("/api/alerts/rules")
+def create_rule(req: RuleCreate, user: dict = Depends(get_current_user)):
+    try:
+        return alert_rules.create_rule(
+            user["id"], req.kind, req.ticker, req.params, req.name, req.cooldown_seconds,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.patch("/api/alerts/rules/{rule_id}")
+def update_rule(rule_id: str, req: RuleUpdate, user: dict = Depends(get_current_user)):
+    try:
+        rule = alert_rules.update_rule(user["id"], rule_id, req.model_dump(exclude_none=True))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if rule is None:
+        raise HTTPException(status_code=404, detail="Rule not found")
+    return rule
+
+
+@router.delete("/api/alerts/rules/{rule_id}")
+def delete_rule(rule_id: str, user: dict = Depends(get_current_user)):
+    if not alert_rules.delete_rule(user["id"], rule_id):
+        raise HTTPException(status_code=404, detail="Rule not found")
+    return {"ok": True}
@@ -56,6 +56,7 @@ from api.services.auth_service import (
     get_user_preferences,
     set_user_preference,
     delete_user_preference,
+    invalidate_user_cache,
 )
 from api.services.email_service import (
     send_verification_email,
@@ -157,6 +158,7 @@ def login(request: Request, req: LoginRequest, response: Response):
             user["role"] = "admin"
         finally:
             _conn.close()
+        invalidate_user_cache(user["id"])
 
     log_activity(user["id"], "login", ip_address=request.client.host)
 
@@ -216,6 +218,7 @@ def update_profile(req: UpdateProfileRequest, user: dict = Depends(get_current_u
         conn.commit()
     finally:
         conn.close()
+    invalidate_user_cache(user["id"])
     return {"ok": True, **updates}
 
 
@@ -235,15 +238,13 @@ def export_user_data(user: dict = Depends(get_current_user)):
     finally:
         conn.close()
 
-    # Load trades/watchlists from JSON files if they exist
-    trades = []
+    from api.services import paper_trades
+    trades = [paper_trades.get_trade(user["id"], t["id"]) for t in paper_trades.list_trades(user["id"])]
+
+    # Load watchlists from the JSON file if it exists
     watchlists = []
     try:
         import pathlib
-        trades_file = pathlib.Path("/data/trades.json")
-        if trades_file.exists():
-            all_trades = _json.loads(trades_file.read_text())
-            trades = [t for t in all_trades if t.get("user_id") == user["id"]]
         wl_file = pathlib.Path("/data/watchlists.json")
         if wl_file.exists():
             all_wl = _json.loads(wl_file.read_text())
@@ -440,6 +441,7 @@ def admin_reset_password(req: AdminResetRequest, user: dict = Depends(get_curren
         new_hash = _bcrypt.hashpw(req.new_password.encode("utf-8"), _bcrypt.gensalt()).decode("utf-8")
         conn.execute("UPDATE users SET password_hash = ? WHERE id = ?", (new_hash, row["id"]))
         conn.commit()
+        invalidate_user_cache(row["id"])
         return {"ok": True, "email": req.email}
     finally:
         conn.close()
@@ -459,6 +461,7 @@ def admin_verify_email(req: dict, user: dict = Depends(get_current_user)):
             raise HTTPException(status_code=404, detail="User not found")
         conn.execute("UPDATE users SET email_verified = 1 WHERE id = ?", (row["id"],))
         conn.commit()
+        invalidate_user_cache(row["id"])
         return {"ok": True, "email": email, "verified": True}
     finally:
         conn.close()
@@ -542,6 +545,37 @@ def admin_page_analytics(user: dict = Depends(get_current_user), days: int = 7):
     return get_page_analytics(days=days)
 
 
+@router.get("/admin/event-pipeline")
+def admin_event_pipeline(user: dict = Depends(get_current_user)):
+    """Admin-only: buffered/flushed/dropped counters for page-view and activity logging."""
+    _require_admin(user)
+    from api.services import event_buffer
+    return event_buffer.get_stats()
+
+
+@router.get("/admin/users/{target_id}/journal-rollups")
+def admin_check_journal_rollups(target_id: str, user: dict = Depends(get_current_user)):
+    """Admin-only: diff a user's journal rollups against a recomputation from raw trades."""
+    _require_admin(user)
+    from api.services.journal_rollups import check_user
+    return check_user(target_id)
+
+
+@router.post("/admin/users/{target_id}/journal-rollups/rebuild")
+def admin_rebuild_journal_rollups(target_id: str, user: dict = Depends(get_current_user)):
+    """Admin-only: rebuild a user's journal rollups from raw trades."""
+    _require_admin(user)
+    from api.services.auth_db import get_connection
+    from api.services.journal_rollups import rebuild_user
+    conn = get_connection()
+    try:
+        n = rebuild_user(conn, target_id)
+        conn.commit()
+    finally:
+        conn.close()
+    return {"ok": True, "trades": n}
+
+
 @router.post("/track")
 def track_page_view(req: dict, user: dict = Depends(get_current_user)):
     """Log a page view for the authenticated user (fire-and-forget from frontend)."""
@@ -574,6 +608,7 @@ def admin_verify_user_by_id(user_id: str, user: dict = Depends(get_current_user)
             raise HTTPException(status_code=404, detail="User not found")
         conn.execute("UPDATE users SET email_verified = 1 WHERE id = ?", (user_id,))
         conn.commit()
+        invalidate_user_cache(user_id)
         log_activity(user_id, "force_verified", details=f"by admin {user['email']}")
         return {"ok": True, "user_id": user_id, "verified": True}
     finally:
@@ -608,6 +643,8 @@ def admin_delete_user_by_id(user_id: str, user: dict = Depends(get_current_user)
     if user_id == user["id"]:
         raise HTTPException(status_code=400, detail="Cannot delete your own account")
     from api.services.auth_db import get_connection
+    from api.services.journal_rollups import delete_user as delete_user_rollups
+    from api.services.alert_rules import rules_changed
     conn = get_connection()
     try:
         row = conn.execute("SELECT id, email FROM users WHERE id = ?", (user_id,)).fetchone()
@@ -619,8 +656,19 @@ def admin_delete_user_by_id(user_id: str, user: dict = Depends(get_current_user)
         conn.execute("DELETE FROM email_verifications WHERE user_id = ?", (user_id,))
         conn.execute("DELETE FROM password_resets WHERE user_id = ?", (user_id,))
         conn.execute("DELETE FROM journal_entries WHERE user_id = ?", (user_id,))
+        # Rollups, equity and the user's share of the community aggregates
+        delete_user_rollups(conn, user_id)
+        conn.execute("DELETE FROM paper_fills WHERE user_id = ?", (user_id,))
+        conn.execute("DELETE FROM paper_trades WHERE user_id = ?", (user_id,))
+        conn.execute("DELETE FROM alert_rules WHERE user_id = ?", (user_id,))
+        conn.execute("DELETE FROM alert_subscriptions WHERE user_id = ?", (user_id,))
+        conn.execute("DELETE FROM alert_reads WHERE user_id = ?", (user_id,))
+        conn.execute("DELETE FROM alert_read_marks WHERE user_id = ?", (user_id,))
+        conn.execute("DELETE FROM alerts WHERE user_id = ?", (user_id,))
+        conn.execute("DELETE FROM journal_insights_state WHERE user_id = ?", (user_id,))
         conn.execute("DELETE FROM admin_notes WHERE user_id = ?", (user_id,))
         conn.execute("DELETE FROM page_views WHERE user_id = ?", (user_id,))
+        conn.execute("DELETE FROM page_view_daily WHERE user_id = ?", (user_id,))
         conn.execute("DELETE FROM referrals WHERE referrer_user_id = ?", (user_id,))
         # Support tickets + messages (cascade via FK, but explicit for safety)
         tk_ids = [r["id"] for r in conn.execute("SELECT id FROM support_tickets WHERE user_id = ?", (user_id,)).fetchall()]
@@ -633,6 +681,8 @@ def admin_delete_user_by_id(user_id: str, user: dict = Depends(get_current_user)
         conn.execute("DELETE FROM watchlists WHERE user_id = ?", (user_id,))
         conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
         conn.commit()
+        invalidate_user_cache(user_id)
+        rules_changed()   # drop the user's rules from every worker's in-memory index
         return {"ok": True, "user_id": user_id, "deleted": True}
     finally:
         conn.close()
@@ -654,6 +704,7 @@ def admin_force_verify(req: ForceVerifyRequest, user: dict = Depends(get_current
             raise HTTPException(status_code=404, detail="User not found")
         conn.execute("UPDATE users SET email_verified = 1 WHERE id = ?", (row["id"],))
         conn.commit()
+        invalidate_user_cache(row["id"])
         log_activity(row["id"], "force_verified", details=f"by admin {user['email']}")
         return {"ok": True, "email": req.email, "verified": True}
     finally:
@@ -669,6 +720,8 @@ def admin_delete_user(req: DeleteUserRequest, user: dict = Depends(get_current_u
     """Admin-only: delete a user and all their data (cascade)."""
     _require_admin(user)
     from api.services.auth_db import get_connection
+    from api.services.journal_rollups import delete_user as delete_user_rollups
+    from api.services.alert_rules import rules_changed
     conn = get_connection()
     try:
         row = conn.execute("SELECT id FROM users WHERE email = ?", (req.email.lower().strip(),)).fetchone()
@@ -685,8 +738,19 @@ def admin_delete_user(req: DeleteUserRequest, user: dict = Depends(get_current_u
         conn.execute("DELETE FROM email_verifications WHERE user_id = ?", (target_id,))
         conn.execute("DELETE FROM password_resets WHERE user_id = ?", (target_id,))
         conn.execute("DELETE FROM journal_entries WHERE user_id = ?", (target_id,))
+        # Rollups, equity and the user's share of the community aggregates
+        delete_user_rollups(conn, target_id)
+        conn.execute("DELETE FROM paper_fills WHERE user_id = ?", (target_id,))
+        conn.execute("DELETE FROM paper_trades WHERE user_id = ?", (target_id,))
+        conn.execute("DELETE FROM alert_rules WHERE user_id = ?", (target_id,))
+        conn.execute("DELETE FROM alert_subscriptions WHERE user_id = ?", (target_id,))
+        conn.execute("DELETE FROM alert_reads WHERE user_id = ?", (target_id,))
+        conn.execute("DELETE FROM alert_read_marks WHERE user_id = ?", (target_id,))
+        conn.execute("DELETE FROM alerts WHERE user_id = ?", (target_id,))
+        conn.execute("DELETE FROM journal_insights_state WHERE user_id = ?", (target_id,))
         conn.execute("DELETE FROM admin_notes WHERE user_id = ?", (target_id,))
         conn.execute("DELETE FROM page_views WHERE user_id = ?", (target_id,))
+        conn.execute("DELETE FROM page_view_daily WHERE user_id = ?", (target_id,))
         conn.execute("DELETE FROM referrals WHERE referrer_user_id = ?", (target_id,))
         # Support tickets + messages
         tk_ids = [r["id"] for r in conn.execute("SELECT id FROM support_tickets WHERE user_id = ?", (target_id,)).fetchall()]
@@ -700,6 +764,8 @@ def admin_delete_user(req: DeleteUserRequest, user: dict = Depends(get_current_u
         conn.execute("DELETE FROM watchlists WHERE user_id = ?", (target_id,))
         conn.execute("DELETE FROM users WHERE id = ?", (target_id,))
         conn.commit()
+        invalidate_user_cache(target_id)
+        rules_changed()   # drop the user's rules from every worker's in-memory index
         return {"ok": True, "email": req.email, "deleted": True}
     finally:
         conn.close()
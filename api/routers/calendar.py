@@ -342,34 +342,27 @@ def _patch_today_actuals(days: dict, today_str: str) -> None:
 
     Catches BMO reporters that file between 7:35 AM (wire run) and 9:30 AM
     (market open), and AMC reporters that filed last night but weren't in wire.
-    Silent no-op if Finnhub key is absent or the call fails.
+    Silent no-op if Finnhub key is absent or the call fails. Patched symbols have their
+    cached Finnhub EPS history invalidated.
     """
     day = days.get(today_str)
     if not day:
         return
 
-    fh_key = os.environ.get("FINNHUB_API_KEY")
-    if not fh_key:
-        return
-
     all_entries = day.get("bmo", []) + day.get("amc", [])
     pending = [e for e in all_entries if e.get("eps_act") is None and e.get("sym")]
     if not pending:
         return
 
+    from api.services import finnhub
     pending_syms = {e["sym"] for e in pending}
     try:
-        import requests
-        r = requests.get(
-            "https://finnhub.io/api/v1/calendar/earnings",
-            params={"from": today_str, "to": today_str, "token": fh_key},
-            timeout=10,
-        )
-        if not r.ok:
+        data = finnhub.get("/calendar/earnings", {"from": today_str, "to": today_str})
+        if data is None:
             return
         fh_map = {
             e["symbol"]: e
-            for e in r.json().get("earningsCalendar", [])
+            for e in data.get("earningsCalendar", [])
             if e.get("symbol") in pending_syms and e.get("epsActual") is not None
         }
         patched = 0
@@ -386,6 +379,8 @@ def _patch_today_actuals(days: dict, today_str: str) -> None:
                 entry["rev_act"] = rev_a / 1_000_000
             if rev_e and entry.get("rev_est") is None:
                 entry["rev_est"] = rev_e / 1_000_000
+            # The company just reported — its cached EPS history is out of date
+            finnhub.invalidate("/stock/earnings", entry["sym"])
             patched += 1
         if patched:
             _logger.info("Calendar: Finnhub patched %d actuals for %s", patched, today_str)
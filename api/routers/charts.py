@@ -1,88 +1,60 @@
-"""Chart image endpoint — serves dark-themed candlestick PNGs via yfinance + mplfinance."""
-import matplotlib
-matplotlib.use('Agg')  # non-interactive backend, must be set before pyplot import
+"""Chart image endpoints — dark-themed candlestick PNGs via yfinance + mplfinance.
 
-from fastapi import APIRouter, Query
-from fastapi.responses import StreamingResponse, Response
-from io import BytesIO
+Rendering and caching live in api.services.chart_render. /api/chart/{ticker} resolves
+the current chart (rendering it on a miss) and answers with its ETag; the content
+address /api/chart/img/{key}.png is immutable.
+"""
+import re
 
-router = APIRouter()
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import FileResponse, Response
 
-# Timeframe → yfinance period/interval
-TF_CONFIG = {
-    '5':  {'period': '2d',  'interval': '5m'},
-    '30': {'period': '5d',  'interval': '30m'},
-    '60': {'period': '1mo', 'interval': '60m'},
-    'D':  {'period': '6mo', 'interval': '1d'},
-    'W':  {'period': '2y',  'interval': '1wk'},
-}
+from api.services import chart_render
 
-# Internal yfinance ticker overrides
-YF_TICKERS = {
-    'VIX': '^VIX',
-    'BTC': 'BTC-USD',
-}
+router = APIRouter()
 
-def _make_style():
-    import mplfinance as mpf
-    mc = mpf.make_marketcolors(
-        up='#3cb868', down='#e74c3c',
-        edge='inherit', wick='inherit',
-    )
-    return mpf.make_mpf_style(
-        base_mpf_style='nightclouds',
-        marketcolors=mc,
-        facecolor='#0f1117',
-        figcolor='#0f1117',
-        gridcolor='#2a2d3a',
-        gridstyle='--',
-        gridaxis='both',
-        rc={
-            'axes.labelcolor': '#8a8fa8',
-            'xtick.color': '#8a8fa8',
-            'ytick.color': '#8a8fa8',
-            'font.family': 'monospace',
-        },
-    )
+_KEY_RE = re.compile(r"^[0-9a-f]{32}$")
+_IMMUTABLE = "public, max-age=31536000, immutable"
 
-_STYLE = None  # lazy-init on first request
 
-@router.get("/api/chart/{ticker}")
-def chart_image(ticker: str, tf: str = Query(default='D')):
-    """Return a dark-themed candlestick chart PNG for the given ticker and timeframe."""
-    global _STYLE
-    try:
-        import yfinance as yf
-        import mplfinance as mpf
+def _not_modified(request: Request, etag: str) -> bool:
+    return etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]
 
-        if _STYLE is None:
-            _STYLE = _make_style()
 
-        yf_sym = YF_TICKERS.get(ticker.upper(), ticker.upper())
-        config = TF_CONFIG.get(tf, TF_CONFIG['D'])
+@router.get("/api/chart/img/{key}.png")
+def chart_image_by_key(key: str, request: Request):
+    """Serve a rendered chart by content key. Never changes, so clients may cache forever."""
+    if not _KEY_RE.match(key):
+        return Response(status_code=404)
+    etag = f'"{key}"'
+    headers = {"ETag": etag, "Cache-Control": _IMMUTABLE}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    path = chart_render.cached_image(key)
+    if path is None:
+        return Response(status_code=404)
+    return FileResponse(path, media_type="image/png", headers=headers)
 
-        df = yf.Ticker(yf_sym).history(period=config['period'], interval=config['interval'])
-        if df.empty:
-            return Response(status_code=204)
 
-        # Strip timezone for mplfinance compatibility
-        if df.index.tzinfo is not None:
-            df.index = df.index.tz_localize(None)
-
-        buf = BytesIO()
-        mpf.plot(
-            df,
-            type='candle',
-            style=_STYLE,
-            figsize=(9, 4),
-            savefig=dict(fname=buf, dpi=110, bbox_inches='tight'),
-            volume=False,
-        )
-        buf.seek(0)
-        return StreamingResponse(
-            buf,
-            media_type='image/png',
-            headers={'Cache-Control': 'public, max-age=300'},
-        )
+@router.get("/api/chart/{ticker}")
+def chart_image(ticker: str, request: Request, tf: str = Query(default='D')):
+    """Return a dark-themed candlestick chart PNG for the given ticker and timeframe."""
+    try:
+        key = chart_render.get_chart(ticker, tf)
+    except chart_render.ChartBusy:
+        return Response(status_code=503, headers={"Retry-After": "2"}, content="Chart renderer busy")
     except Exception as e:
         return Response(status_code=500, content=str(e))
+    if key is None:
+        return Response(status_code=204)
+
+    etag = f'"{key}"'
+    headers = {
+        "ETag": etag,
+        # The chart behind this URL moves with the last bar; revalidate after the bars TTL.
+        "Cache-Control": f"public, max-age={chart_render.BARS_TTL.get(tf, 300)}",
+        "Content-Location": f"/api/chart/img/{key}.png",
+    }
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(chart_render.image_path(key), media_type="image/png", headers=headers)
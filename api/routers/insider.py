@@ -1,13 +1,15 @@
 """Insider activity endpoints.
 
 GET /api/insider/feed         — notable insider buys across the market (last 7 days)
+GET /api/insider/clusters     — cap_universe names ranked by cluster buying (Form 4 store)
 GET /api/insider/{ticker}     — insider transactions for a single stock
 GET /api/insider/{ticker}/has-buy — quick boolean check for recent insider buy
 """
 
 from __future__ import annotations
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
+from api.services import insider_filings
 from api.services.insider import get_insider_activity, get_recent_insider_buys, has_recent_insider_buy
 
 router = APIRouter(prefix="/api/insider", tags=["insider"])
@@ -19,6 +21,16 @@ def insider_feed():
     return get_recent_insider_buys()
 
 
+@router.get("/clusters")
+def insider_clusters(
+    days: int = Query(30, ge=1, le=365),
+    cluster_days: int = Query(insider_filings.CLUSTER_DAYS, ge=1, le=90),
+    min_insiders: int = Query(insider_filings.MIN_CLUSTER_INSIDERS, ge=2, le=20),
+):
+    """Names ranked by insider buying: cluster buys first, then size vs market cap."""
+    return insider_filings.scan(days, cluster_days, min_insiders)
+
+
 @router.get("/{ticker}")
 def insider_for_ticker(ticker: str):
     """All insider transactions for a single stock."""
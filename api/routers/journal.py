@@ -3,6 +3,7 @@ insights, CSV import, and AI summaries."""
 
 import csv
 import io
+import sqlite3
 
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form
 from fastapi.responses import FileResponse
@@ -22,7 +23,7 @@ from api.services.daily_journal_service import (
 )
 from api.services.journal_analytics import get_analytics, VALID_GROUP_BY
 from api.services import playbook_service, resource_service
-from api.services import journal_insights, journal_import, journal_ai
+from api.services import journal_insights, journal_import, journal_ai, journal_search
 from api.services import trading_accounts
 
 router = APIRouter()
@@ -144,6 +145,8 @@ def list_journal(
     date_to: Optional[str] = None,
     tag: Optional[str] = None,
     mistake_tag: Optional[str] = None,
+    emotion_tag: Optional[str] = None,
+    q: Optional[str] = None,
     has_screenshots: Optional[str] = None,
     has_notes: Optional[str] = None,
     has_process_score: Optional[str] = None,
@@ -162,7 +165,8 @@ def list_journal(
         "setup": setup, "direction": direction, "asset_class": asset_class,
         "playbook_id": playbook_id, "session": session, "day_of_week": day_of_week,
         "account": account, "date_from": date_from, "date_to": date_to,
-        "tag": tag, "mistake_tag": mistake_tag, "has_screenshots": has_screenshots,
+        "tag": tag, "mistake_tag": mistake_tag, "emotion_tag": emotion_tag, "q": q,
+        "has_screenshots": has_screenshots,
         "has_notes": has_notes, "has_process_score": has_process_score,
         "min_r": min_r, "max_r": max_r, "min_pnl": min_pnl, "max_pnl": max_pnl,
         "sort_by": sort_by, "sort_dir": sort_dir,
@@ -181,6 +185,48 @@ def journal_stats(
     return journal_service.get_stats(user["id"], date_from=date_from, date_to=date_to)
 
 
+@router.get("/api/journal/search")
+def journal_search_endpoint(
+    q: str = Query(..., min_length=1),
+    kinds: Optional[str] = Query(None, description="Comma-separated: trade,daily,playbook"),
+    status: Optional[str] = None,
+    symbol: Optional[str] = None,
+    setup: Optional[str] = None,
+    direction: Optional[str] = None,
+    playbook_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    tag: Optional[str] = None,
+    mistake_tag: Optional[str] = None,
+    emotion_tag: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+    user: dict = Depends(get_current_user),
+):
+    """Ranked full-text search across trades, daily journals and playbooks."""
+    filters = {
+        "status": status, "symbol": symbol, "setup": setup, "direction": direction,
+        "playbook_id": playbook_id, "date_from": date_from, "date_to": date_to,
+        "tag": tag, "mistake_tag": mistake_tag, "emotion_tag": emotion_tag,
+    }
+    kind_list = [k.strip() for k in kinds.split(",")] if kinds else None
+    try:
+        return journal_search.search(user["id"], q, kinds=kind_list, filters=filters, limit=limit, offset=offset)
+    except sqlite3.OperationalError as e:
+        print(f"[journal] Search failed: {e}")
+        raise HTTPException(status_code=503, detail="Search is unavailable")
+
+
+@router.get("/api/journal/tags")
+def journal_tags(
+    kind: str = Query("tag", description="tag, mistake or emotion"),
+    user: dict = Depends(get_current_user),
+):
+    if kind not in journal_search.TAG_KINDS:
+        raise HTTPException(status_code=400, detail="kind must be one of: tag, mistake, emotion")
+    return journal_search.list_tags(user["id"], kind)
+
+
 @router.get("/api/journal/taxonomy")
 def journal_taxonomy():
     """Return mistake library, emotion tags, setup groups, screenshot slots."""
@@ -431,7 +477,7 @@ async def import_csv_preview(
 
     # Parse with auto-mapping for preview
     rows, warnings = journal_import.parse_csv(content, mapping)
-    dupes = journal_import.find_duplicates(user["id"], rows)
+    diff = journal_import.diff_import(user["id"], rows)
 
     return {
         "headers": headers,
@@ -439,7 +485,8 @@ async def import_csv_preview(
         "auto_mapping": mapping,
         "preview_rows": rows[:10],
         "total_rows": len(rows),
-        "duplicate_indices": dupes,
+        "duplicate_indices": [d["index"] for d in diff["duplicate"]],
+        "conflicting_indices": [c["index"] for c in diff["conflicting"]],
         "warnings": warnings[:20],
         "filename": file.filename,
     }
@@ -449,6 +496,8 @@ class ImportConfirmBody(BaseModel):
     csv_content: str
     field_mapping: dict
     skip_duplicates: bool = True
+    skip_conflicts: bool = False
+    dry_run: bool = False
     filename: Optional[str] = None
     broker_format: Optional[str] = None
 
@@ -458,11 +507,25 @@ def confirm_import(
     body: ImportConfirmBody,
     user: dict = Depends(get_current_user),
 ):
-    """Step 2: Confirm import with final field mapping."""
+    """Step 2: Confirm import with final field mapping.
+    With dry_run, returns the new/duplicate/conflicting diff and writes nothing."""
     rows, warnings = journal_import.parse_csv(body.csv_content, body.field_mapping)
+    diff = journal_import.diff_import(user["id"], rows)
+    if body.dry_run:
+        return {
+            "dry_run": True,
+            "total": len(rows),
+            "new": diff["new"],
+            "duplicate": diff["duplicate"],
+            "conflicting": diff["conflicting"],
+            "warnings": warnings,
+        }
+
     skip_indices = set()
     if body.skip_duplicates:
-        skip_indices = set(journal_import.find_duplicates(user["id"], rows))
+        skip_indices |= {d["index"] for d in diff["duplicate"]}
+    if body.skip_conflicts:
+        skip_indices |= {c["index"] for c in diff["conflicting"]}
 
     result = journal_import.import_trades(
         user["id"], rows, skip_indices,
@@ -486,8 +549,8 @@ def get_ai_digest(
     week: str = Query(..., description="Week start date YYYY-MM-DD"),
     user: dict = Depends(get_current_user),
 ):
-    """Generate weekly AI digest for the given week."""
-    return journal_ai.generate_weekly_digest(user["id"], week)
+    """Weekly AI digest for the given week; queued in the background if missing or stale."""
+    return journal_ai.get_weekly_digest(user["id"], week)
 
 
 # ── Trading Accounts ─────────────────────────────────────────────────────────
@@ -558,6 +621,13 @@ def get_portfolio(user: dict = Depends(get_current_user)):
     return get_portfolio(user["id"])
 
 
+@router.get("/api/journal/portfolio/live")
+def get_live_portfolio_risk(correlation: bool = True, user: dict = Depends(get_current_user)):
+    """Open positions marked to market: P&L, R, distance to stop, heat, concentration."""
+    from api.services.portfolio_risk import get_live_risk
+    return get_live_risk(user["id"], with_correlation=correlation)
+
+
 # ── Single Trade Fetch (MUST be after all /api/journal/{specific} routes) ────
 
 @router.get("/api/journal/{entry_id}")
@@ -592,13 +662,22 @@ def remove_execution(trade_id: str, exec_id: str, user: dict = Depends(get_curre
 
 # ── AI Summary (per-trade) ───────────────────────────────────────────────────
 
+@router.get("/api/journal/{trade_id}/ai-summary")
+def get_ai_summary(trade_id: str, user: dict = Depends(get_current_user)):
+    """Stored AI summary and its generation status (for polling)."""
+    result = journal_ai.get_trade_summary(user["id"], trade_id)
+    if result.get("error") == "Trade not found":
+        raise HTTPException(status_code=404, detail="Trade not found")
+    return result
+
+
 @router.post("/api/journal/{trade_id}/ai-summary")
 def generate_ai_summary(
     trade_id: str,
     force: bool = False,
     user: dict = Depends(get_current_user),
 ):
-    """Generate or retrieve AI summary for a trade. User-triggered only."""
+    """Return the AI summary if current, otherwise queue it for the background worker."""
     result = journal_ai.generate_trade_summary(user["id"], trade_id, force=force)
     if result.get("error") == "Trade not found":
         raise HTTPException(status_code=404, detail="Trade not found")
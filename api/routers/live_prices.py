@@ -1,18 +1,32 @@
-"""Live batch pricing endpoint — returns real-time price data for up to 50 tickers.
+"""Live pricing endpoints — real-time price data for watchlist-sized ticker sets.
 
 Uses Massive.com batch snapshot API (Polygon-compatible).
-Cache: 15s TTL keyed by sorted ticker hash.
+
+GET /api/live-prices          one-shot batch (max 50). Cached 15s per ticker, so
+                              overlapping sets share entries and only misses go upstream.
+GET /api/live-prices/stream   Server-Sent Events. Pushes only changed prices; send
+                              Last-Event-ID (browsers do on reconnect) to replay what was missed.
+                              channels=snapshot,movers adds the market snapshot and movers
+                              (what /api/snapshot and /api/movers return) to the pushes.
+WS  /api/live-prices/ws       Same stream over WebSocket, with subscribe/unsubscribe messages.
+
+Both streams share one upstream poll of the union of subscribed tickers (price_stream.hub).
 """
-import hashlib
-from fastapi import APIRouter, Query
-from fastapi.responses import JSONResponse
+import asyncio
+import json
+import time
+
+from fastapi import APIRouter, Header, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
 from api.services.cache import cache
-from api.services.massive import _get_client
+from api.services import price_stream
 
 router = APIRouter()
 
 _MAX_TICKERS = 50
 _CACHE_TTL = 15  # seconds
+_MAX_CONTROL_MESSAGES = 20  # per WebSocket per _CONTROL_WINDOW
+_CONTROL_WINDOW = 10  # seconds
 
 
 @router.get("/api/live-prices")
@@ -23,60 +37,144 @@ def get_live_prices(
 
     Response: {AAPL: {price, change_pct, change, volume}, ...}
     """
-    raw_list = [t.strip().upper() for t in tickers.split(",") if t.strip()]
-    if not raw_list:
+    unique_tickers = price_stream.normalize_tickers(tickers)
+    if not unique_tickers:
         return JSONResponse(status_code=400, content={"error": "No tickers provided"})
-    if len(raw_list) > _MAX_TICKERS:
+    if len(unique_tickers) > _MAX_TICKERS:
         return JSONResponse(
             status_code=400,
             content={"error": f"Maximum {_MAX_TICKERS} tickers per request"},
         )
 
-    # Deterministic cache key from sorted tickers
-    sorted_key = ",".join(sorted(set(raw_list)))
-    cache_key = f"live_prices_{hashlib.md5(sorted_key.encode()).hexdigest()}"
-
-    cached = cache.get(cache_key)
-    if cached is not None:
-        return cached
+    result = {}
+    missing = []
+    for t in unique_tickers:
+        cached = cache.get(f"live_price_{t}")
+        if cached is None:
+            missing.append(t)
+        elif cached:  # {} marks a ticker upstream returned nothing for
+            result[t] = cached
+    if not missing:
+        return result
 
     try:
-        client = _get_client()
+        fresh = price_stream.fetch_quotes(missing)
     except Exception:
         return JSONResponse(status_code=503, content={"error": "Pricing service unavailable"})
 
-    # Use the batch snapshot endpoint (same as get_batch_rich_snapshots but we
-    # need the full ticker blob to extract change as well)
-    unique_tickers = list(dict.fromkeys(raw_list))  # dedupe, preserve order
-    tickers_param = ",".join(unique_tickers)
-    url = (
-        f"https://api.massive.com/v2/snapshot/locale/us/markets/stocks/tickers"
-        f"?tickers={tickers_param}&apiKey={client._api_key}"
+    for t in missing:
+        quote = fresh.get(t, {})
+        cache.set(f"live_price_{t}", quote, ttl=_CACHE_TTL)
+        if quote:
+            result[t] = quote
+    return result
+
+
+def _sse(msg: dict) -> str:
+    if msg["type"] == "heartbeat":
+        return ": heartbeat\n\n"
+    return f"id: {msg['id']}\nevent: {msg['type']}\ndata: {json.dumps(msg, separators=(',', ':'))}\n\n"
+
+
+@router.get("/api/live-prices/stream")
+async def stream_live_prices(
+    tickers: str = Query("", description="Comma-separated ticker symbols (max 50)"),
+    channels: str = Query("", description="Comma-separated market channels: snapshot, movers"),
+    last_event_id: str | None = Header(None, alias="Last-Event-ID"),
+):
+    """Server-Sent Events stream of changed prices for a ticker set and/or market channels."""
+    unique_tickers = price_stream.normalize_tickers(tickers)
+    try:
+        wanted_channels = price_stream.normalize_channels(channels)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    if not unique_tickers and not wanted_channels:
+        return JSONResponse(status_code=400, content={"error": "No tickers provided"})
+    if len(unique_tickers) > price_stream.MAX_TICKERS:
+        return JSONResponse(
+            status_code=400,
+            content={"error": f"Maximum {price_stream.MAX_TICKERS} tickers per connection"},
+        )
+
+    async def events():
+        # Subscribe inside the generator: if the response never starts (client gone
+        # first), there is no subscription to leak
+        sub = None
+        try:
+            sub = price_stream.hub.subscribe(
+                unique_tickers, channels=wanted_channels, last_event_id=last_event_id
+            )
+            yield "retry: 3000\n\n"
+            async for msg in sub.messages():
+                yield _sse(msg)
+        finally:
+            if sub is not None:
+                sub.close()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
+
+
+@router.websocket("/api/live-prices/ws")
+async def live_prices_ws(
+    websocket: WebSocket,
+    tickers: str = "",
+    channels: str = "",
+    last_event_id: str | None = None,
+):
+    """WebSocket stream of changed prices.
+
+    Client messages: {"action": "subscribe"|"unsubscribe", "tickers": [...]}.
+    Server messages: {"type": "prices", "id", "prices", "snapshot"?, "movers"?},
+    {"type": "heartbeat"}, {"type": "error", "error"}.
+    """
+    await websocket.accept()
     try:
-        data = client._get(url)
-    except Exception:
-        return JSONResponse(status_code=503, content={"error": "Pricing service unavailable"})
+        sub = price_stream.hub.subscribe(tickers, channels=channels, last_event_id=last_event_id)
+    except ValueError as e:
+        await websocket.send_json({"type": "error", "error": str(e)})
+        await websocket.close(code=1008)
+        return
 
-    result = {}
-    for t in data.get("tickers", []):
-        ticker = t.get("ticker", "")
-        if not ticker:
-            continue
-        day = t.get("day", {})
-        prev_day = t.get("prevDay", {})
-        last_trade = t.get("lastTrade", {})
-
-        # Price: day close → last trade → prev day close
-        price = day.get("c") or last_trade.get("p") or prev_day.get("c") or 0.0
-        volume = int(day.get("v") or 0)
-
-        result[ticker] = {
-            "price": round(float(price), 2),
-            "change_pct": round(float(t.get("todaysChangePerc", 0.0)), 4),
-            "change": round(float(t.get("todaysChange", 0.0)), 4),
-            "volume": volume,
-        }
-
-    cache.set(cache_key, result, ttl=_CACHE_TTL)
-    return result
+    async def receive():
+        window_start, count = time.monotonic(), 0
+        while True:
+            data = await websocket.receive_json()
+            now = time.monotonic()
+            if now - window_start > _CONTROL_WINDOW:
+                window_start, count = now, 0
+            count += 1
+            if count > _MAX_CONTROL_MESSAGES:
+                await websocket.send_json({"type": "error", "error": "Too many messages"})
+                await websocket.close(code=1008)
+                return
+            action = data.get("action") if isinstance(data, dict) else None
+            try:
+                if action == "subscribe":
+                    sub.add(data.get("tickers") or [])
+                elif action == "unsubscribe":
+                    sub.remove(data.get("tickers") or [])
+                else:
+                    await websocket.send_json({"type": "error", "error": "Unknown action"})
+                    continue
+            except ValueError as e:
+                await websocket.send_json({"type": "error", "error": str(e)})
+            price_stream.hub.ensure_running()
+
+    async def send():
+        async for msg in sub.messages():
+            await websocket.send_json(msg)
+
+    tasks = [asyncio.create_task(receive()), asyncio.create_task(send())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sub.close()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,32 @@
+"""Admin endpoints for the outbound notification queue (api.services.outbox)."""
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from api.middleware.auth_middleware import require_admin
+from api.services import outbox
+
+router = APIRouter(prefix="/api/admin/outbox", tags=["admin"])
+
+
+@router.get("")
+def list_outbox(status: str = "dead", limit: int = 50, user: dict = Depends(require_admin)):
+    """Queue counts plus the most recent messages in one status — the dead-letter view by default."""
+    try:
+        messages = outbox.list_messages(status, min(limit, 500))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {**outbox.stats(), "messages": messages}
+
+
+@router.post("/{outbox_id}/retry")
+def retry_message(outbox_id: int, user: dict = Depends(require_admin)):
+    if not outbox.retry(outbox_id):
+        raise HTTPException(status_code=404, detail="No dead-lettered message with that id")
+    return {"ok": True}
+
+
+@router.delete("/{outbox_id}")
+def discard_message(outbox_id: int, user: dict = Depends(require_admin)):
+    if not outbox.discard(outbox_id):
+        raise HTTPException(status_code=404, detail="No dead-lettered message with that id")
+    return {"ok": True}
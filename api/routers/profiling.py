@@ -0,0 +1,37 @@
+"""Admin endpoints for request profiling (api.services.profiler)."""
+
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel
+
+from api.middleware.auth_middleware import require_admin
+from api.services import profiler
+
+router = APIRouter(prefix="/api/admin/profile", tags=["admin"])
+
+
+class SampleRateRequest(BaseModel):
+    rate: float
+
+
+@router.get("/routes")
+def route_latency(sort: str = "p99", limit: int = 100, user: dict = Depends(require_admin)):
+    """Per-route latency percentiles over each route's recent requests."""
+    return {"sample_rate": profiler.SAMPLE_RATE, "routes": profiler.get_route_stats(sort)[:limit]}
+
+
+@router.get("/slow")
+def slowest_requests(limit: int = 20, user: dict = Depends(require_admin)):
+    """Slowest sampled requests with time broken down by dependency."""
+    return {"sample_rate": profiler.SAMPLE_RATE, "traces": profiler.get_slowest(limit)}
+
+
+@router.post("/sample-rate")
+def set_sample_rate(req: SampleRateRequest, user: dict = Depends(require_admin)):
+    """Change the trace sampling rate (0 – 1) for this worker until restart."""
+    return {"sample_rate": profiler.set_sample_rate(req.rate)}
+
+
+@router.post("/reset")
+def reset_profile(user: dict = Depends(require_admin)):
+    profiler.reset()
+    return {"ok": True}
@@ -1,66 +1,99 @@
 # api/routers/push.py
 import os
-import json
 from fastapi import APIRouter, HTTPException, Header
 from typing import Optional
 from api.services.cache import cache
+from api.services import wire_store
 
 router = APIRouter()
 
-INVALIDATE_KEYS = [
-    "wire_data", "breadth", "themes_1W", "themes_1M", "themes_3M", "themes_Today",
-    "leadership", "rundown", "earnings", "screener", "movers", "uct20_portfolio", "analyst_actions",
-]
+def _check_secret(authorization: Optional[str]) -> None:
+    secret = os.environ.get("PUSH_SECRET", "")
+    if not secret or authorization != f"Bearer {secret}":
+        raise HTTPException(status_code=401, detail="Unauthorized")
 
-PERSISTENT_WIRE_DATA_FILE = "/data/wire_data.json"
+
+def _commit(fn, *args, **kwargs) -> dict:
+    """Run a wire_store write, mapping its errors to HTTP responses."""
+    try:
+        return fn(*args, **kwargs)
+    except wire_store.VersionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid update: {e}")
 
 
 @router.post("/api/push")
 def push_wire_data(
     payload: dict,
     authorization: Optional[str] = Header(None),
+    base_version: Optional[int] = None,
 ):
     """Receive wire_data from the local morning wire engine.
 
-    Secured with PUSH_SECRET env var. Invalidates all derived caches
-    then stores the full payload so engine_data endpoints serve fresh data.
+    Secured with PUSH_SECRET env var. Stores the payload as a new wire_data version;
+    only cache keys and recomputes that depend on sections which actually changed are
+    invalidated / triggered (see wire_store.SECTION_CACHE_KEYS).
     Persists to /data/wire_data.json (Railway volume) so cache survives redeploys.
     """
-    secret = os.environ.get("PUSH_SECRET", "")
-    if not secret or authorization != f"Bearer {secret}":
-        raise HTTPException(status_code=401, detail="Unauthorized")
+    _check_secret(authorization)
+    result = _commit(wire_store.put, payload, base_version=base_version)
+    return {"ok": True, "date": payload.get("date", ""), **result}
 
-    for key in INVALIDATE_KEYS:
-        cache.invalidate(key)
 
-    cache.set("wire_data", payload, ttl=82800)  # 23 hours
+@router.post("/api/push/sections")
+def push_wire_sections(
+    payload: dict,
+    authorization: Optional[str] = Header(None),
+):
+    """Replace individual wire_data sections.
 
-    # Persist to Railway volume so data survives redeploys
-    try:
-        os.makedirs(os.path.dirname(PERSISTENT_WIRE_DATA_FILE), exist_ok=True)
-        with open(PERSISTENT_WIRE_DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump(payload, f)
-    except OSError:
-        pass  # Volume not mounted in local dev — safe to ignore
+    Body: { sections: {name: value, ...}, remove: [name, ...], base_version: int? }
+    """
+    _check_secret(authorization)
+    sections = payload.get("sections") or {}
+    remove = payload.get("remove") or []
+    if not isinstance(sections, dict) or not isinstance(remove, list):
+        raise HTTPException(status_code=422, detail="sections must be an object and remove a list")
+    result = _commit(wire_store.update_sections, sections, remove,
+                     base_version=payload.get("base_version"))
+    return {"ok": True, **result}
+
+
+@router.post("/api/push/patch")
+def push_wire_patch(
+    payload: dict,
+    authorization: Optional[str] = Header(None),
+):
+    """Apply an RFC 6902 JSON Patch to wire_data.
 
-    # Record UCT20 composition snapshot (for portfolio NAV tracking)
-    try:
-        from api.services.uct20_nav import record_composition
-        leadership = payload.get("leadership", [])
-        holdings = [e["sym"] for e in leadership if isinstance(e, dict) and "sym" in e]
-        if holdings:
-            record_composition(holdings)
-    except Exception:
-        pass
+    Body: { patch: [ {op, path, value?, from?}, ... ], base_version: int? }
+    The patch is all-or-nothing; a failing op (including "test") rejects it with 422.
+    """
+    _check_secret(authorization)
+    result = _commit(wire_store.apply_patch, payload.get("patch"),
+                     base_version=payload.get("base_version"))
+    return {"ok": True, **result}
 
-    # Trigger theme performance recompute in background (UCT20 holdings may have changed)
-    try:
-        from api.services.theme_performance import trigger_recompute
-        trigger_recompute()
-    except Exception:
-        pass
 
-    return {"ok": True, "date": payload.get("date", "")}
+@router.get("/api/push/versions")
+def list_wire_versions(authorization: Optional[str] = Header(None)):
+    """Recent wire_data versions, newest first."""
+    _check_secret(authorization)
+    return {"current": wire_store.get_version(), "versions": wire_store.list_versions()}
+
+
+@router.post("/api/push/rollback/{version}")
+def rollback_wire_data(
+    version: int,
+    authorization: Optional[str] = Header(None),
+):
+    """Restore an earlier wire_data version (recorded as a new version)."""
+    _check_secret(authorization)
+    result = _commit(wire_store.rollback, version)
+    return {"ok": True, "restored": version, **result}
 
 
 @router.post("/api/push/intraday")
@@ -77,26 +110,24 @@ def push_intraday(
         ep_updates: [ { symbol, status, current_price, pct_from_entry, note } ]
         session_notes: str (Claude's session commentary)
     """
-    secret = os.environ.get("PUSH_SECRET", "")
-    if not secret or authorization != f"Bearer {secret}":
-        raise HTTPException(status_code=401, detail="Unauthorized")
+    _check_secret(authorization)
 
     # Store as separate cache key — never overwrites wire_data
     cache.set("intraday_update", payload, ttl=14400)  # 4 hours
 
-    # If regime has exposure update, patch the wire_data exposure in cache
+    # If regime has exposure update, patch the wire_data exposure section
+    # (a new wire_data version; invalidates breadth only)
     regime = payload.get("regime")
     if regime and "exposure_pct" in regime:
-        wire = cache.get("wire_data")
-        if wire and isinstance(wire, dict):
-            exposure = wire.get("exposure", {})
-            if isinstance(exposure, dict):
-                exposure["score"] = regime["exposure_pct"]
-                exposure["exposure"] = min(regime["exposure_pct"], 100)
-                wire["exposure"] = exposure
-                cache.set("wire_data", wire, ttl=82800)
-                # Invalidate breadth cache so next request picks up new exposure
-                cache.invalidate("breadth")
+        from api.services.engine import _load_wire_data
+        wire = _load_wire_data()
+        if wire and isinstance(wire.get("exposure", {}), dict):
+            exposure = {
+                **wire.get("exposure", {}),
+                "score": regime["exposure_pct"],
+                "exposure": min(regime["exposure_pct"], 100),
+            }
+            wire_store.update_sections({"exposure": exposure})
 
     # Fire alerts for regime changes and exposure shifts
     try:
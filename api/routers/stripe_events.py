@@ -0,0 +1,36 @@
+"""Admin endpoints for the Stripe webhook event ledger (api.services.stripe_events)."""
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from api.middleware.auth_middleware import require_admin
+from api.services import stripe_events
+
+router = APIRouter(prefix="/api/admin/stripe-events", tags=["admin"])
+
+
+@router.get("")
+def list_events(
+    status: Optional[str] = None,
+    customer: Optional[str] = None,
+    limit: int = 50,
+    user: dict = Depends(require_admin),
+):
+    """Ledger counts plus recent events — filter by status (e.g. failed) and/or Stripe customer."""
+    try:
+        events = stripe_events.list_events(status, customer, min(limit, 500))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"counts": stripe_events.stats(), "events": events}
+
+
+@router.post("/{event_id}/replay")
+def replay_event(event_id: str, fetch: bool = False, user: dict = Depends(require_admin)):
+    """Requeue an event. fetch=true pulls an event we never received from the Stripe API."""
+    try:
+        return stripe_events.replay(event_id, fetch=fetch)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Event not found")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
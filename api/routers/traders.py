@@ -1,35 +1,105 @@
-from fastapi import APIRouter
+"""Trader watchlists — registry and performance.
+
+GET    /api/traders                       — traders with their current tickers
+GET    /api/traders/performance           — NAV / RS / hit-rate summary for every list
+GET    /api/traders/{id}                  — one trader with ticker add/remove history
+GET    /api/traders/{id}/performance      — full performance incl. NAV vs SPY/UCT20 series
+POST   /api/traders                       — admin: create a trader
+PATCH  /api/traders/{id}                  — admin: rename/recolor/reorder or replace tickers
+POST   /api/traders/{id}/tickers          — admin: add a ticker
+DELETE /api/traders/{id}/tickers/{ticker} — admin: remove a ticker
+DELETE /api/traders/{id}                  — admin: retire a trader
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+
+from api.middleware.auth_middleware import require_admin
+from api.services import trader_watchlists
 
 router = APIRouter()
 
-TRADERS = [
-    {
-        "id": "tsdr",
-        "name": "TSDR",
-        "color": "#3cb868",
-        "tickers": ["NVDA", "META", "GOOGL", "AMZN", "MSFT", "AAPL", "AMD", "TSM", "AVGO", "ARM"],
-    },
-    {
-        "id": "bracco",
-        "name": "Bracco",
-        "color": "#e74c3c",
-        "tickers": ["SMCI", "PLTR", "IONQ", "RGTI", "ACHR", "JOBY", "RKLB", "LUNR", "TDW", "PRFX"],
-    },
-    {
-        "id": "qullamaggie",
-        "name": "Qullamaggie",
-        "color": "#6ba3be",
-        "tickers": ["CELH", "AXON", "ANET", "TTD", "MNDY", "DUOL", "IOT", "SMAR", "GTLB", "DDOG"],
-    },
-    {
-        "id": "manrav",
-        "name": "Manrav",
-        "color": "#c9a84c",
-        "tickers": ["CRS", "FIX", "EQIX", "MCK", "TOL", "GLW", "STX", "MU", "SNDK", "LITE"],
-    },
-]
+
+class TraderCreate(BaseModel):
+    id: str
+    name: str
+    color: str = "#888888"
+    tickers: list[str] = []
+
+
+class TraderUpdate(BaseModel):
+    name: Optional[str] = None
+    color: Optional[str] = None
+    sort_order: Optional[int] = None
+    tickers: Optional[list[str]] = None
+
+
+class TickerAdd(BaseModel):
+    ticker: str
+
+
+def _found(trader: Optional[dict]) -> dict:
+    if trader is None:
+        raise HTTPException(status_code=404, detail="Trader not found")
+    return trader
 
 
 @router.get("/api/traders")
 def get_traders():
-    return TRADERS
+    return trader_watchlists.list_traders()
+
+
+@router.get("/api/traders/performance")
+def get_traders_performance():
+    return trader_watchlists.get_all_performance()
+
+
+@router.get("/api/traders/{trader_id}")
+def get_trader(trader_id: str):
+    return _found(trader_watchlists.get_trader(trader_id))
+
+
+@router.get("/api/traders/{trader_id}/performance")
+def get_trader_performance(trader_id: str):
+    return _found(trader_watchlists.get_performance(trader_id))
+
+
+@router.post("/api/traders")
+def create_trader(req: TraderCreate, _admin: dict = Depends(require_admin)):
+    try:
+        return trader_watchlists.create_trader(req.id, req.name, req.color, req.tickers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.patch("/api/traders/{trader_id}")
+def update_trader(trader_id: str, req: TraderUpdate, _admin: dict = Depends(require_admin)):
+    try:
+        return _found(trader_watchlists.update_trader(trader_id, req.model_dump(exclude_none=True)))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/api/traders/{trader_id}/tickers")
+def add_ticker(trader_id: str, req: TickerAdd, _admin: dict = Depends(require_admin)):
+    try:
+        return _found(trader_watchlists.add_ticker(trader_id, req.ticker))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.delete("/api/traders/{trader_id}/tickers/{ticker}")
+def remove_ticker(trader_id: str, ticker: str, _admin: dict = Depends(require_admin)):
+    try:
+        return _found(trader_watchlists.remove_ticker(trader_id, ticker))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.delete("/api/traders/{trader_id}")
+def delete_trader(trader_id: str, _admin: dict = Depends(require_admin)):
+    if not trader_watchlists.delete_trader(trader_id):
+        raise HTTPException(status_code=404, detail="Trader not found")
+    return {"ok": True}
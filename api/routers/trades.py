@@ -1,30 +1,25 @@
-import json
-import os
-import uuid
-from datetime import date as date_type
-from fastapi import APIRouter
-from pydantic import BaseModel
-from typing import Optional
-
-router = APIRouter()
+"""Model book paper trades — per-user positions, fills and performance.
 
-# Resolves to <worktree>/data/trades.json — "data/" is gitignored (runtime data)
-TRADES_FILE = os.path.join(
-    os.path.dirname(__file__), "..", "..", "data", "trades.json"
-)
+GET    /api/trades                 — the user's trades (signed out: the shared model book)
+POST   /api/trades                 — open a trade
+GET    /api/trades/open            — open trades marked to the live snapshot
+GET    /api/trades/stats           — closed-trade performance
+GET    /api/trades/{id}            — one trade with its fills
+PATCH  /api/trades/{id}            — move stop/target, edit notes/setup
+POST   /api/trades/{id}/fills      — add to or reduce the position
+POST   /api/trades/{id}/close      — close the remaining position
+DELETE /api/trades/{id}
+"""
 
+from typing import Literal, Optional
 
-def _load() -> list:
-    if not os.path.exists(TRADES_FILE):
-        return []
-    with open(TRADES_FILE) as f:
-        return json.load(f)
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
 
+from api.middleware.auth_middleware import get_current_user, get_current_user_optional
+from api.services import paper_trades
 
-def _save(trades: list) -> None:
-    os.makedirs(os.path.dirname(TRADES_FILE), exist_ok=True)
-    with open(TRADES_FILE, "w") as f:
-        json.dump(trades, f, indent=2)
+router = APIRouter()
 
 
 class Trade(BaseModel):
@@ -36,22 +31,96 @@ class Trade(BaseModel):
     notes: Optional[str] = ""
     setup: Optional[str] = ""
     date: Optional[str] = ""  # ISO date string e.g. "2026-03-19"
+    direction: Literal["long", "short"] = "long"
+
+
+class TradeUpdate(BaseModel):
+    stop: Optional[float] = None
+    target: Optional[float] = None
+    notes: Optional[str] = None
+    setup: Optional[str] = None
+
+
+class Fill(BaseModel):
+    action: Literal["add", "reduce"]
+    price: float
+    qty_pct: Optional[float] = None   # reduce: defaults to the whole open size
+
+
+class Close(BaseModel):
+    price: float
 
 
 @router.get("/api/trades")
-def get_trades():
-    return _load()
+def get_trades(
+    status: Optional[Literal["open", "closed"]] = Query(None),
+    user: Optional[dict] = Depends(get_current_user_optional),
+):
+    return paper_trades.list_trades(user["id"] if user else paper_trades.MODEL_BOOK, status)
 
 
 @router.post("/api/trades")
-def add_trade(trade: Trade):
-    trades = _load()
-    new_trade = {
-        **trade.model_dump(),
-        "id": str(uuid.uuid4())[:8],
-        "status": "open",
-        "date": trade.date or str(date_type.today()),
-    }
-    trades.append(new_trade)
-    _save(trades)
-    return new_trade
+def add_trade(trade: Trade, user: dict = Depends(get_current_user)):
+    try:
+        return paper_trades.open_trade(
+            user["id"], trade.sym, trade.entry, trade.stop, trade.target, trade.size_pct,
+            trade.notes, trade.setup, trade.date, trade.direction,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/api/trades/open")
+def open_trades(user: dict = Depends(get_current_user)):
+    return paper_trades.open_positions(user["id"])
+
+
+@router.get("/api/trades/stats")
+def trade_stats(user: Optional[dict] = Depends(get_current_user_optional)):
+    return paper_trades.get_stats(user["id"] if user else paper_trades.MODEL_BOOK)
+
+
+@router.get("/api/trades/{trade_id}")
+def get_trade(trade_id: str, user: dict = Depends(get_current_user)):
+    trade = paper_trades.get_trade(user["id"], trade_id)
+    if trade is None:
+        raise HTTPException(status_code=404, detail="Trade not found")
+    return trade
+
+
+@router.patch("/api/trades/{trade_id}")
+def update_trade(trade_id: str, req: TradeUpdate, user: dict = Depends(get_current_user)):
+    try:
+        trade = paper_trades.update_levels(user["id"], trade_id, req.model_dump(exclude_none=True))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if trade is None:
+        raise HTTPException(status_code=404, detail="Trade not found")
+    return trade
+
+
+def _fill(user_id: str, trade_id: str, action: str, price: float, qty_pct: float | None) -> dict:
+    try:
+        trade = paper_trades.apply_fill(user_id, trade_id, action, price, qty_pct)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if trade is None:
+        raise HTTPException(status_code=404, detail="Trade not found")
+    return trade
+
+
+@router.post("/api/trades/{trade_id}/fills")
+def add_fill(trade_id: str, req: Fill, user: dict = Depends(get_current_user)):
+    return _fill(user["id"], trade_id, req.action, req.price, req.qty_pct)
+
+
+@router.post("/api/trades/{trade_id}/close")
+def close_trade(trade_id: str, req: Close, user: dict = Depends(get_current_user)):
+    return _fill(user["id"], trade_id, "close", req.price, None)
+
+
+@router.delete("/api/trades/{trade_id}")
+def delete_trade(trade_id: str, user: dict = Depends(get_current_user)):
+    if not paper_trades.delete_trade(user["id"], trade_id):
+        raise HTTPException(status_code=404, detail="Trade not found")
+    return {"ok": True}
@@ -6,7 +6,8 @@ and we need to skip any auth middleware.
 
 from fastapi import APIRouter, Request, HTTPException
 
-from api.services.stripe_service import handle_webhook_event
+from api.services import stripe_events
+from api.services.stripe_service import verify_webhook
 
 router = APIRouter(prefix="/api/webhooks", tags=["webhooks"])
 
@@ -14,7 +15,8 @@ router = APIRouter(prefix="/api/webhooks", tags=["webhooks"])
 @router.post("/stripe")
 async def stripe_webhook(request: Request):
     """
-    Stripe sends webhook events here. We verify the signature and process.
+    Stripe sends webhook events here. We verify the signature, record the event in
+    the ledger and acknowledge — api.services.stripe_events applies it in the background.
     This endpoint has NO auth — Stripe can't send our session cookie.
     Security is via the webhook signature (STRIPE_WEBHOOK_SECRET).
     """
@@ -25,14 +27,17 @@ async def stripe_webhook(request: Request):
         raise HTTPException(status_code=400, detail="Missing stripe-signature header")
 
     try:
-        result = handle_webhook_event(payload, sig_header)
-        print(f"[stripe-webhook] OK: {result}")
-        return {"received": True, **result}
-    except ValueError as e:
-        print(f"[stripe-webhook] ValueError: {e}")
+        event = verify_webhook(payload, sig_header)
+    except Exception as e:
+        print(f"[stripe-webhook] Rejected ({type(e).__name__}): {e}")
         raise HTTPException(status_code=400, detail=f"Invalid payload: {e}")
+
+    try:
+        queued = stripe_events.record(event)
     except Exception as e:
-        import traceback
-        print(f"[stripe-webhook] FAILED ({type(e).__name__}): {e}")
-        traceback.print_exc()
-        raise HTTPException(status_code=400, detail=f"Webhook processing failed: {type(e).__name__}: {e}")
+        # Not durably recorded — a 5xx makes Stripe redeliver it later
+        print(f"[stripe-webhook] Could not record {event.get('id')}: {e}")
+        raise HTTPException(status_code=503, detail="Event could not be recorded")
+
+    print(f"[stripe-webhook] {event['id']} {event.get('type')} {'queued' if queued else 'duplicate'}")
+    return {"received": True, "event_id": event["id"], "duplicate": not queued}
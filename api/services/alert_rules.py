@@ -0,0 +1,494 @@
+"""
+Alert rule engine — per-user declarative conditions evaluated as data refreshes.
+
+A rule is a row in alert_rules: {kind, ticker, params}. For example:
+    {"kind": "price_cross", "ticker": "NVDA", "params": {"level": 150, "direction": "above"}}
+    {"kind": "rs_rank", "ticker": "ANET", "params": {"threshold": 90, "direction": "above"}}
+    {"kind": "breadth_change", "params": {"min_change": 10}}
+    {"kind": "gex_level", "ticker": "SPY", "params": {"level": "zero_gamma", "direction": "below"}}
+    {"kind": "earnings_surprise", "ticker": null, "params": {"min_surprise_pct": 15, "direction": "beat"}}
+
+Evaluation is push-based and incremental. Each data source reports only what it
+observed (prices from the rules job, RS ranks after a recompute, breadth on a wire
+push of the breadth section, GEX whenever a chain is computed, earnings on refresh).
+observe(kind, {subject: value}) then:
+  - skips subjects whose value is unchanged since the last observation
+  - looks up only the rules indexed under (kind, subject) and (kind, "*")
+  - compares previous and current values ("crosses above 150" needs both)
+Cost scales with changed subjects, not with rules × tickers.
+
+The index is rebuilt from SQLite when any worker edits a rule (a version key in the
+shared cache). Last-seen values live in memory, so a restart needs one observation
+to re-baseline before crosses fire. Firing claims the rule's cooldown with a
+conditional UPDATE, so when several workers see the same cross only one alerts.
+Earnings alerts carry a dedupe key per report instead.
+"""
+
+import json
+import threading
+import time
+import uuid
+
+from api.services import alerts
+from api.services.auth_db import get_connection
+from api.services.cache import cache
+
+MAX_RULES_PER_USER = 100
+GEX_REFRESH_SECONDS = 300
+_VERSION_KEY = "alert_rules_version"
+
+DIRECTIONS = ("above", "below", "either")
+GEX_LEVELS = ("call_wall", "put_wall", "zero_gamma")
+
+# kind → ticker requirement ("required" / "optional" / "none"), default cooldown, severity
+RULE_KINDS = {
+    "price_cross":       {"ticker": "required", "cooldown": 3600,  "severity": alerts.SEVERITY_WARNING},
+    "rs_rank":           {"ticker": "required", "cooldown": 86400, "severity": alerts.SEVERITY_INFO},
+    "breadth_change":    {"ticker": "none",     "cooldown": 0,     "severity": alerts.SEVERITY_WARNING},
+    "gex_level":         {"ticker": "required", "cooldown": 3600,  "severity": alerts.SEVERITY_WARNING},
+    "earnings_surprise": {"ticker": "optional", "cooldown": 0,     "severity": alerts.SEVERITY_INFO},
+}
+
+
+# ── Schema ───────────────────────────────────────────────────────────────────
+
+def install(conn) -> None:
+    """Create the rules table. Caller commits."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS alert_rules (
+            id                TEXT PRIMARY KEY,
+            user_id           TEXT NOT NULL,
+            name              TEXT NOT NULL DEFAULT '',
+            kind              TEXT NOT NULL,
+            ticker            TEXT,                   -- NULL = any ticker / market-wide
+            params            TEXT NOT NULL DEFAULT '{}',
+            cooldown_seconds  INTEGER NOT NULL DEFAULT 0,
+            enabled           INTEGER NOT NULL DEFAULT 1,
+            last_fired_at     REAL,
+            created_at        TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alert_rules_user ON alert_rules(user_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alert_rules_kind ON alert_rules(kind, ticker) WHERE enabled = 1")
+
+
+# ── Validation ───────────────────────────────────────────────────────────────
+
+def _number(params: dict, key: str, minimum: float | None = None) -> float:
+    try:
+        value = float(params[key])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"params.{key} must be a number")
+    if minimum is not None and value < minimum:
+        raise ValueError(f"params.{key} must be at least {minimum}")
+    return value
+
+
+def _choice(params: dict, key: str, choices: tuple, default: str | None = None) -> str:
+    value = params.get(key, default)
+    if value not in choices:
+        raise ValueError(f"params.{key} must be one of {', '.join(choices)}")
+    return value
+
+
+def validate(kind: str, ticker: str | None, params: dict) -> tuple[str | None, dict]:
+    """Normalize a rule definition. Raises ValueError with a user-facing message."""
+    spec = RULE_KINDS.get(kind)
+    if spec is None:
+        raise ValueError(f"Unknown rule kind: {kind}")
+    ticker = (ticker or "").strip().upper() or None
+    if spec["ticker"] == "required" and not ticker:
+        raise ValueError(f"{kind} rules need a ticker")
+    if spec["ticker"] == "none":
+        ticker = None
+    params = dict(params or {})
+
+    if kind == "price_cross":
+        clean = {"level": _number(params, "level", 0), "direction": _choice(params, "direction", DIRECTIONS, "either")}
+    elif kind == "rs_rank":
+        clean = {"threshold": _number(params, "threshold", 1), "direction": _choice(params, "direction", DIRECTIONS, "above")}
+    elif kind == "breadth_change":
+        if "threshold" in params:
+            clean = {"threshold": _number(params, "threshold"), "direction": _choice(params, "direction", DIRECTIONS, "either")}
+        else:
+            clean = {"min_change": _number(params, "min_change", 0.1)}
+    elif kind == "gex_level":
+        clean = {"level": _choice(params, "level", GEX_LEVELS), "direction": _choice(params, "direction", DIRECTIONS, "either")}
+    else:  # earnings_surprise
+        clean = {
+            "min_surprise_pct": _number(params, "min_surprise_pct", 0),
+            "direction": _choice(params, "direction", ("beat", "miss", "either"), "either"),
+        }
+    return ticker, clean
+
+
+# ── Conditions: (rule params, previous value, current value) → message or None ──
+
+def _crossed(prev, cur, level, direction: str) -> str | None:
+    if prev is None or cur is None or level is None:
+        return None
+    if direction in ("above", "either") and prev < level <= cur:
+        return "above"
+    if direction in ("below", "either") and prev > level >= cur:
+        return "below"
+    return None
+
+
+def _price_cross(subject, params, prev, cur):
+    side = _crossed(prev, cur, params["level"], params["direction"])
+    if side:
+        return f"{subject} crossed {side} ${params['level']:,.2f} (now ${cur:,.2f})"
+
+
+def _rs_rank(subject, params, prev, cur):
+    side = _crossed(prev, cur, params["threshold"], params["direction"])
+    if side:
+        return f"{subject} RS rank moved {side} {params['threshold']:g} (now {cur:g})"
+
+
+def _breadth_change(subject, params, prev, cur):
+    if prev is None or cur is None:
+        return None
+    if "threshold" in params:
+        side = _crossed(prev, cur, params["threshold"], params["direction"])
+        if side:
+            return f"Breadth score crossed {side} {params['threshold']:g} ({prev:g} → {cur:g})"
+    elif abs(cur - prev) >= params["min_change"]:
+        return f"Breadth score moved {cur - prev:+g} ({prev:g} → {cur:g})"
+
+
+def _gex_level(subject, params, prev, cur):
+    if not prev:
+        return None
+    level = cur.get(params["level"])
+    side = _crossed(prev.get("spot"), cur.get("spot"), level, params["direction"])
+    if side:
+        name = params["level"].replace("_", " ")
+        return f"{subject} crossed {side} its {name} at {level:,.2f} (spot {cur['spot']:,.2f})"
+
+
+def _earnings_surprise(subject, params, prev, cur):
+    pct = cur.get("surprise_pct")
+    if pct is None or abs(pct) < params["min_surprise_pct"]:
+        return None
+    if params["direction"] == "beat" and pct < 0 or params["direction"] == "miss" and pct >= 0:
+        return None
+    return f"{subject} reported an EPS {'beat' if pct >= 0 else 'miss'} of {pct:+.1f}%"
+
+
+_CONDITIONS = {
+    "price_cross": _price_cross,
+    "rs_rank": _rs_rank,
+    "breadth_change": _breadth_change,
+    "gex_level": _gex_level,
+    "earnings_surprise": _earnings_surprise,
+}
+
+_TITLES = {
+    "price_cross": "Price alert: {subject}",
+    "rs_rank": "RS rank: {subject}",
+    "breadth_change": "Breadth shift",
+    "gex_level": "GEX level: {subject}",
+    "earnings_surprise": "Earnings surprise: {subject}",
+}
+
+
+# ── Index and observation state ──────────────────────────────────────────────
+
+_lock = threading.Lock()
+_index: dict[tuple[str, str], list[dict]] = {}
+_index_version = object()  # forces the first load
+_last: dict[tuple[str, str], object] = {}
+_gex_checked: dict[str, float] = {}
+
+
+def _bump_version() -> None:
+    cache.set(_VERSION_KEY, uuid.uuid4().hex, ttl=30 * 86400)
+
+
+def rules_changed() -> None:
+    """Make every worker reload its rule index, after rules are written outside this module."""
+    _bump_version()
+
+
+def _load_index() -> dict:
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            "SELECT id, user_id, name, kind, ticker, params, cooldown_seconds FROM alert_rules WHERE enabled = 1"
+        ).fetchall()
+    finally:
+        conn.close()
+    index: dict[tuple[str, str], list[dict]] = {}
+    for r in rows:
+        rule = {**dict(r), "params": json.loads(r["params"] or "{}")}
+        index.setdefault((r["kind"], r["ticker"] or "*"), []).append(rule)
+    return index
+
+
+def _rules_for(kind: str, subject: str) -> list[dict]:
+    global _index, _index_version
+    version = cache.get(_VERSION_KEY)
+    if version != _index_version:
+        index = _load_index()
+        with _lock:
+            _index, _index_version = index, version
+    return _index.get((kind, subject), []) + (_index.get((kind, "*"), []) if subject != "*" else [])
+
+
+def subjects(kind: str) -> list[str]:
+    """Tickers that have enabled rules of this kind (the rules job fetches only these)."""
+    _rules_for(kind, "*")
+    return sorted({subject for (k, subject) in _index if k == kind and subject != "*"})
+
+
+def observe(kind: str, values: dict) -> int:
+    """Feed fresh observations {subject: value}; evaluate rules on the changed ones.
+
+    Returns the number of alerts fired.
+    """
+    fired = 0
+    for subject, value in values.items():
+        if value is None:
+            continue
+        key = (kind, subject)
+        with _lock:
+            prev = _last.get(key)
+            if prev == value:
+                continue
+            _last[key] = value
+        for rule in _rules_for(kind, subject):
+            try:
+                message = _CONDITIONS[kind](subject, rule["params"], prev, value)
+            except (TypeError, KeyError, ValueError):
+                continue
+            if message and _fire(rule, subject, message, value):
+                fired += 1
+    return fired
+
+
+def _fire(rule: dict, subject: str, message: str, value) -> bool:
+    now = time.time()
+    dedupe = None
+    if rule["kind"] == "earnings_surprise":
+        dedupe = f"rule_{rule['id']}_{subject}_{value.get('date', '')}"
+
+    conn = get_connection()
+    try:
+        # A muted kind doesn't fire, so it doesn't start the cooldown either
+        if not alerts.is_subscribed(conn, rule["user_id"], rule["kind"]):
+            return False
+        # Claim the cooldown — only one worker wins a given firing
+        cur = conn.execute(
+            "UPDATE alert_rules SET last_fired_at = ? WHERE id = ? AND enabled = 1 "
+            "AND (last_fired_at IS NULL OR last_fired_at <= ?)",
+            (now, rule["id"], now - rule["cooldown_seconds"]),
+        )
+        conn.commit()
+        if cur.rowcount == 0:
+            return False
+    finally:
+        conn.close()
+
+    alert = alerts.add_alert(
+        rule["kind"],
+        rule["name"] or _TITLES[rule["kind"]].format(subject=subject),
+        message,
+        severity=RULE_KINDS[rule["kind"]]["severity"],
+        data={"subject": subject, "rule_id": rule["id"], "value": value},
+        user_id=rule["user_id"],
+        rule_id=rule["id"],
+        dedupe_key=dedupe,
+    )
+    return alert is not None
+
+
+def reset_state() -> None:
+    """Forget last-seen values and the loaded index (tests)."""
+    global _index_version
+    with _lock:
+        _last.clear()
+        _gex_checked.clear()
+        _index.clear()
+        _index_version = object()
+
+
+# ── Data source hooks ────────────────────────────────────────────────────────
+
+def on_prices(prices: dict[str, float]) -> int:
+    return observe("price_cross", {t.upper(): p for t, p in prices.items() if p})
+
+
+def on_rs_ranks(ranks: dict[str, float]) -> int:
+    return observe("rs_rank", ranks)
+
+
+def on_breadth(score) -> int:
+    if score is None:
+        return 0
+    return observe("breadth_change", {"*": float(score)})
+
+
+def on_gex(ticker: str, gex: dict) -> int:
+    if not gex or gex.get("error") or gex.get("spot") is None:
+        return 0
+    value = {
+        "spot": float(gex["spot"]),
+        "call_wall": (gex.get("callWall") or {}).get("strike"),
+        "put_wall": (gex.get("putWall") or {}).get("strike"),
+        "zero_gamma": gex.get("zeroGamma"),
+    }
+    return observe("gex_level", {ticker.upper(): value})
+
+
+def _parse_pct(value) -> float | None:
+    if value is None:
+        return None
+    try:
+        return float(str(value).rstrip("%"))
+    except ValueError:
+        return None
+
+
+def on_earnings(data: dict) -> int:
+    """Evaluate earnings rules against a normalized earnings payload (bmo/amc lists)."""
+    from datetime import date
+
+    today = date.today().isoformat()
+    values = {}
+    for entries in data.values():
+        if not isinstance(entries, list):
+            continue
+        for e in entries:
+            pct = _parse_pct(e.get("surprise_pct")) if isinstance(e, dict) else None
+            if pct is not None and e.get("sym"):
+                values[e["sym"].upper()] = {"surprise_pct": pct, "date": e.get("date") or today}
+    return observe("earnings_surprise", values)
+
+
+def evaluate_market_rules() -> int:
+    """Scheduler job: fetch prices (and, less often, GEX) for tickers that have rules.
+    Only during the regular session — the cron window also covers pre- and post-market."""
+    from api.services.massive import is_regular_session
+
+    if not is_regular_session():
+        return 0
+    fired = 0
+    tickers = subjects("price_cross")
+    if tickers:
+        from api.services.price_stream import fetch_quotes
+        try:
+            quotes = fetch_quotes(tickers)
+            fired += on_prices({t: q.get("price") for t, q in quotes.items()})
+        except Exception as e:
+            print(f"[alert_rules] Price fetch failed: {e}")
+
+    now = time.time()
+    due = [t for t in subjects("gex_level") if now - _gex_checked.get(t, 0) >= GEX_REFRESH_SECONDS]
+    if due:
+        import asyncio
+        from api.gex_service import get_gex_data
+
+        for ticker in due:
+            _gex_checked[ticker] = now
+            try:
+                # get_gex_data reports to on_gex itself
+                asyncio.run(get_gex_data(ticker))
+            except Exception as e:
+                print(f"[alert_rules] GEX fetch failed for {ticker}: {e}")
+    return fired
+
+
+# ── CRUD ─────────────────────────────────────────────────────────────────────
+
+def _row_to_rule(row) -> dict:
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "kind": row["kind"],
+        "ticker": row["ticker"],
+        "params": json.loads(row["params"] or "{}"),
+        "cooldown_seconds": row["cooldown_seconds"],
+        "enabled": bool(row["enabled"]),
+        "last_fired_at": row["last_fired_at"],
+        "created_at": row["created_at"],
+    }
+
+
+def list_rules(user_id: str) -> list[dict]:
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            "SELECT * FROM alert_rules WHERE user_id = ? ORDER BY created_at, id", (user_id,)
+        ).fetchall()
+        return [_row_to_rule(r) for r in rows]
+    finally:
+        conn.close()
+
+
+def create_rule(user_id: str, kind: str, ticker: str | None = None, params: dict | None = None,
+                name: str = "", cooldown_seconds: int | None = None) -> dict:
+    ticker, params = validate(kind, ticker, params or {})
+    cooldown = RULE_KINDS[kind]["cooldown"] if cooldown_seconds is None else max(int(cooldown_seconds), 0)
+    rule_id = str(uuid.uuid4())
+    conn = get_connection()
+    try:
+        count = conn.execute("SELECT COUNT(*) FROM alert_rules WHERE user_id = ?", (user_id,)).fetchone()[0]
+        if count >= MAX_RULES_PER_USER:
+            raise ValueError(f"Rule limit reached ({MAX_RULES_PER_USER})")
+        conn.execute(
+            "INSERT INTO alert_rules (id, user_id, name, kind, ticker, params, cooldown_seconds) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (rule_id, user_id, (name or "").strip()[:100], kind, ticker, json.dumps(params), cooldown),
+        )
+        conn.commit()
+        row = conn.execute("SELECT * FROM alert_rules WHERE id = ?", (rule_id,)).fetchone()
+    finally:
+        conn.close()
+    _bump_version()
+    return _row_to_rule(row)
+
+
+def update_rule(user_id: str, rule_id: str, updates: dict) -> dict | None:
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            "SELECT * FROM alert_rules WHERE id = ? AND user_id = ?", (rule_id, user_id)
+        ).fetchone()
+        if row is None:
+            return None
+        current = _row_to_rule(row)
+        ticker, params = validate(
+            current["kind"], updates.get("ticker", current["ticker"]), updates.get("params", current["params"]),
+        )
+        conn.execute(
+            "UPDATE alert_rules SET name = ?, ticker = ?, params = ?, cooldown_seconds = ?, enabled = ? "
+            "WHERE id = ? AND user_id = ?",
+            (
+                (updates.get("name", current["name"]) or "").strip()[:100],
+                ticker,
+                json.dumps(params),
+                max(int(updates.get("cooldown_seconds", current["cooldown_seconds"])), 0),
+                int(bool(updates.get("enabled", current["enabled"]))),
+                rule_id,
+                user_id,
+            ),
+        )
+        conn.commit()
+        row = conn.execute("SELECT * FROM alert_rules WHERE id = ?", (rule_id,)).fetchone()
+    finally:
+        conn.close()
+    _bump_version()
+    return _row_to_rule(row)
+
+
+def delete_rule(user_id: str, rule_id: str) -> bool:
+    conn = get_connection()
+    try:
+        cur = conn.execute("DELETE FROM alert_rules WHERE id = ? AND user_id = ?", (rule_id, user_id))
+        conn.commit()
+    finally:
+        conn.close()
+    if cur.rowcount:
+        _bump_version()
+    return bool(cur.rowcount)
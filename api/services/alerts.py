@@ -1,21 +1,36 @@
 # api/services/alerts.py — Alert management service
 """
-Stores alerts in memory (TTLCache) and optionally fires Discord webhooks.
+Stores alerts in auth.db and optionally queues Discord webhooks (api.services.outbox).
+
+Each user's subscription picks the channels per alert type: "in_app" shows it in the
+feed, "email" also queues an email (through the outbox) to users who opted in. The
+Discord webhook is server-wide, for broadcast warning/critical alerts only.
+
+Alerts are either broadcast (user_id NULL — market events every member sees, subject
+to their subscription preferences) or personal (user_id set — fired by that user's
+rules in api.services.alert_rules). Read state is per user: a read_through watermark
+per user makes "mark all read" one row write, and alert_reads holds reads above it.
 
 Alert types:
-    regime_change  — market phase transition (e.g. Markup → Distribution)
-    stop_hit       — UCT20 position hit -6% hard stop
-    scanner_match  — new high-conviction scanner candidate (score >= 80)
-    ep_resolved    — entry point candidate stopped or hit target
-    exposure_shift — exposure rating moved 20+ points
+    regime_change      — market phase transition (e.g. Markup → Distribution)
+    stop_hit           — UCT20 position hit -6% hard stop
+    scanner_match      — new high-conviction scanner candidate (score >= 80)
+    ep_resolved        — entry point candidate stopped or hit target
+    exposure_shift     — exposure rating moved 20+ points
+    price_cross, rs_rank, breadth_change, gex_level, earnings_surprise
+                       — personal rule alerts (see alert_rules.RULE_KINDS)
+    stop_breach        — live mark through an open journal position's stop (portfolio_risk)
+    paper_exit         — paper trade closed at its stop or target (paper_trades)
 """
 
 import os
+import json
 import time
 import logging
+import sqlite3
 from datetime import datetime
 from zoneinfo import ZoneInfo
-from api.services.cache import cache
+from api.services.auth_db import get_connection
 
 _logger = logging.getLogger(__name__)
 _ET = ZoneInfo("America/New_York")
@@ -23,6 +38,8 @@ _ET = ZoneInfo("America/New_York")
 # Discord webhook (optional — only fires if env var is set)
 _DISCORD_WEBHOOK = os.environ.get("DISCORD_ALERT_WEBHOOK", "")
 
+RETENTION_DAYS = 30
+
 # Alert severity levels
 SEVERITY_INFO = "info"
 SEVERITY_WARNING = "warning"
@@ -37,27 +54,164 @@ _TYPE_SEVERITY = {
     "exposure_shift": SEVERITY_WARNING,
 }
 
+BROADCAST_TYPES = tuple(_TYPE_SEVERITY)
+POSITION_TYPES = ("stop_breach", "paper_exit")
+CHANNELS = ("in_app", "email")
+
+
+# ── Schema ───────────────────────────────────────────────────────────────────
+
+def install(conn) -> None:
+    """Create the alert tables. Caller commits."""
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS alerts (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            alert_key   TEXT NOT NULL UNIQUE,       -- public id; also the dedupe key
+            user_id     TEXT,                       -- NULL = broadcast
+            rule_id     TEXT,
+            type        TEXT NOT NULL,
+            severity    TEXT NOT NULL,
+            title       TEXT NOT NULL,
+            message     TEXT NOT NULL,
+            data        TEXT NOT NULL DEFAULT '{}',
+            created_at  TEXT NOT NULL,
+            created_ts  REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_alerts_user ON alerts(user_id, id);
+        CREATE INDEX IF NOT EXISTS idx_alerts_created ON alerts(created_ts);
+
+        CREATE TABLE IF NOT EXISTS alert_reads (
+            user_id     TEXT NOT NULL,
+            alert_id    INTEGER NOT NULL,
+            PRIMARY KEY (user_id, alert_id)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS alert_read_marks (
+            user_id       TEXT PRIMARY KEY,
+            read_through  INTEGER NOT NULL DEFAULT 0
+        );
+
+        CREATE TABLE IF NOT EXISTS alert_subscriptions (
+            user_id     TEXT NOT NULL,
+            alert_type  TEXT NOT NULL,
+            enabled     INTEGER NOT NULL DEFAULT 1,
+            channels    TEXT NOT NULL DEFAULT 'in_app',
+            PRIMARY KEY (user_id, alert_type)
+        ) WITHOUT ROWID;
+    """)
+
 
 def _now_et() -> str:
     return datetime.now(_ET).isoformat()
 
 
-def get_alerts(limit: int = 50) -> list:
-    """Return recent alerts, newest first."""
-    alerts = cache.get("alerts") or []
-    return alerts[:limit]
+def _row_to_alert(row, read: bool = False) -> dict:
+    return {
+        "id": row["alert_key"],
+        "type": row["type"],
+        "severity": row["severity"],
+        "title": row["title"],
+        "message": row["message"],
+        "timestamp": row["created_at"],
+        "read": read,
+        "data": json.loads(row["data"] or "{}"),
+        "personal": row["user_id"] is not None,
+    }
+
+
+# ── Reads ────────────────────────────────────────────────────────────────────
+
+def _muted_types(conn, user_id: str) -> list[str]:
+    """Types kept out of the user's feed: disabled, or subscribed without in_app."""
+    rows = conn.execute(
+        "SELECT alert_type FROM alert_subscriptions WHERE user_id = ? "
+        "AND (enabled = 0 OR ',' || channels || ',' NOT LIKE '%,in_app,%')",
+        (user_id,),
+    ).fetchall()
+    return [r["alert_type"] for r in rows]
+
+
+def _feed_where(conn, user_id: str | None) -> tuple[str, list]:
+    if user_id is None:
+        return "user_id IS NULL", []
+    muted = _muted_types(conn, user_id)
+    where = "(user_id IS NULL OR user_id = ?)"
+    params: list = [user_id]
+    if muted:
+        where += f" AND type NOT IN ({','.join('?' * len(muted))})"
+        params += muted
+    return where, params
 
 
+def get_alerts(limit: int = 50, user_id: str | None = None) -> list:
+    """Return recent alerts for a user (broadcast + their own), newest first.
+
+    Without a user, only broadcast alerts are returned and none are read.
+    """
+    conn = get_connection()
+    try:
+        where, params = _feed_where(conn, user_id)
+        rows = conn.execute(
+            f"SELECT * FROM alerts WHERE {where} ORDER BY id DESC LIMIT ?", (*params, limit)
+        ).fetchall()
+        if user_id is None or not rows:
+            return [_row_to_alert(r) for r in rows]
+        mark = conn.execute(
+            "SELECT read_through FROM alert_read_marks WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        read_through = mark["read_through"] if mark else 0
+        above = [r["id"] for r in rows if r["id"] > read_through]
+        read_ids = set()
+        if above:
+            read_ids = {
+                r["alert_id"] for r in conn.execute(
+                    f"SELECT alert_id FROM alert_reads WHERE user_id = ? AND alert_id IN ({','.join('?' * len(above))})",
+                    (user_id, *above),
+                ).fetchall()
+            }
+        return [_row_to_alert(r, r["id"] <= read_through or r["id"] in read_ids) for r in rows]
+    finally:
+        conn.close()
+
+
+def unread_count(user_id: str) -> int:
+    conn = get_connection()
+    try:
+        where, params = _feed_where(conn, user_id)
+        mark = conn.execute(
+            "SELECT read_through FROM alert_read_marks WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        read_through = mark["read_through"] if mark else 0
+        return conn.execute(
+            f"SELECT COUNT(*) FROM alerts WHERE {where} AND id > ? "
+            "AND id NOT IN (SELECT alert_id FROM alert_reads WHERE user_id = ?)",
+            (*params, read_through, user_id),
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+
+# ── Writes ───────────────────────────────────────────────────────────────────
+
 def add_alert(
     alert_type: str,
     title: str,
     message: str,
     severity: str | None = None,
     data: dict | None = None,
-) -> dict:
-    """Add an alert and optionally fire Discord webhook."""
+    user_id: str | None = None,
+    rule_id: str | None = None,
+    dedupe_key: str | None = None,
+) -> dict | None:
+    """Add an alert, email the users subscribed to it by email, and optionally fire Discord webhook.
+
+    dedupe_key makes the insert idempotent: a second alert with the same key (e.g. the
+    same rule firing on the same earnings report in another worker) is dropped and
+    None is returned.
+    """
+    now = time.time()
     alert = {
-        "id": f"{alert_type}_{int(time.time() * 1000)}",
+        "id": dedupe_key or f"{alert_type}_{int(now * 1000)}_{os.urandom(3).hex()}",
         "type": alert_type,
         "severity": severity or _TYPE_SEVERITY.get(alert_type, SEVERITY_INFO),
         "title": title,
@@ -65,56 +219,179 @@ def add_alert(
         "timestamp": _now_et(),
         "read": False,
         "data": data or {},
+        "personal": user_id is not None,
     }
 
-    # Prepend to list (newest first), cap at 100
-    alerts = cache.get("alerts") or []
-    alerts.insert(0, alert)
-    alerts = alerts[:100]
-    cache.set("alerts", alerts, ttl=86400)  # 24hr
+    conn = get_connection()
+    try:
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO alerts (alert_key, user_id, rule_id, type, severity, title, message, "
+            "data, created_at, created_ts) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (alert["id"], user_id, rule_id, alert_type, alert["severity"], title, message,
+             json.dumps(alert["data"]), alert["timestamp"], now),
+        )
+        conn.commit()
+        if cur.rowcount == 0:
+            return None
+        recipients = _email_recipients(conn, alert_type, user_id)
+    finally:
+        conn.close()
+
+    if recipients:
+        from api.services.email_service import send_alert_email
 
-    # Fire Discord webhook for warning/critical
-    if _DISCORD_WEBHOOK and alert["severity"] in (SEVERITY_WARNING, SEVERITY_CRITICAL):
+        for uid, email in recipients:
+            send_alert_email(email, title, message, dedup_key=f"alert:{alert['id']}:{uid}")
+
+    # Fire Discord webhook for broadcast warning/critical
+    if _DISCORD_WEBHOOK and user_id is None and alert["severity"] in (SEVERITY_WARNING, SEVERITY_CRITICAL):
         _fire_discord(alert)
 
     return alert
 
 
-def mark_read(alert_id: str) -> bool:
-    """Mark a single alert as read."""
-    alerts = cache.get("alerts") or []
-    for a in alerts:
-        if a["id"] == alert_id:
-            a["read"] = True
-            cache.set("alerts", alerts, ttl=86400)
-            return True
-    return False
+def _email_recipients(conn, alert_type: str, user_id: str | None) -> list[tuple[str, str]]:
+    """(user_id, email) of users who get this alert by email — the owner only, for a personal one."""
+    sql = (
+        "SELECT s.user_id, u.email FROM alert_subscriptions s JOIN users u ON u.id = s.user_id "
+        "WHERE s.alert_type = ? AND s.enabled = 1 AND ',' || s.channels || ',' LIKE '%,email,%'"
+    )
+    params: tuple = (alert_type,)
+    if user_id is not None:
+        sql += " AND s.user_id = ?"
+        params += (user_id,)
+    return [(r["user_id"], r["email"]) for r in conn.execute(sql, params).fetchall() if r["email"]]
+
 
+def _internal_id(conn, alert_key: str, user_id: str) -> int | None:
+    row = conn.execute(
+        "SELECT id FROM alerts WHERE alert_key = ? AND (user_id IS NULL OR user_id = ?)",
+        (alert_key, user_id),
+    ).fetchone()
+    return row["id"] if row else None
 
-def mark_all_read() -> int:
-    """Mark all alerts as read. Returns count marked."""
-    alerts = cache.get("alerts") or []
-    count = 0
-    for a in alerts:
-        if not a["read"]:
-            a["read"] = True
-            count += 1
-    cache.set("alerts", alerts, ttl=86400)
-    return count
+
+def mark_read(alert_id: str, user_id: str) -> bool:
+    """Mark a single alert as read for a user."""
+    conn = get_connection()
+    try:
+        internal = _internal_id(conn, alert_id, user_id)
+        if internal is None:
+            return False
+        conn.execute(
+            "INSERT OR IGNORE INTO alert_reads (user_id, alert_id) VALUES (?, ?)", (user_id, internal)
+        )
+        conn.commit()
+        return True
+    finally:
+        conn.close()
+
+
+def mark_all_read(user_id: str) -> int:
+    """Mark everything in the user's feed as read. Returns count marked."""
+    count = unread_count(user_id)
+    conn = get_connection()
+    try:
+        latest = conn.execute("SELECT COALESCE(MAX(id), 0) FROM alerts").fetchone()[0]
+        conn.execute(
+            "INSERT INTO alert_read_marks (user_id, read_through) VALUES (?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET read_through = MAX(read_through, excluded.read_through)",
+            (user_id, latest),
+        )
+        conn.execute("DELETE FROM alert_reads WHERE user_id = ? AND alert_id <= ?", (user_id, latest))
+        conn.commit()
+        return count
+    finally:
+        conn.close()
 
 
 def clear_alerts() -> int:
-    """Remove all alerts. Returns count removed."""
-    alerts = cache.get("alerts") or []
-    count = len(alerts)
-    cache.set("alerts", [], ttl=86400)
-    return count
+    """Remove all broadcast alerts. Returns count removed."""
+    conn = get_connection()
+    try:
+        cur = conn.execute("DELETE FROM alerts WHERE user_id IS NULL")
+        conn.commit()
+        return cur.rowcount
+    finally:
+        conn.close()
+
+
+def prune(days: int = RETENTION_DAYS) -> int:
+    """Delete alerts (and their read rows) older than `days`. Scheduler job."""
+    cutoff = time.time() - days * 86400
+    conn = get_connection()
+    try:
+        conn.execute(
+            "DELETE FROM alert_reads WHERE alert_id IN (SELECT id FROM alerts WHERE created_ts < ?)", (cutoff,)
+        )
+        cur = conn.execute("DELETE FROM alerts WHERE created_ts < ?", (cutoff,))
+        conn.commit()
+        if cur.rowcount:
+            print(f"[alerts] Pruned {cur.rowcount} alerts older than {days} days")
+        return cur.rowcount
+    finally:
+        conn.close()
+
+
+# ── Subscriptions ────────────────────────────────────────────────────────────
+
+def get_subscriptions(user_id: str) -> dict:
+    """Per-type preferences; types without a row are enabled, in-app only."""
+    from api.services.alert_rules import RULE_KINDS
+
+    prefs = {t: {"enabled": True, "channels": ["in_app"]} for t in (*BROADCAST_TYPES, *POSITION_TYPES, *RULE_KINDS)}
+    conn = get_connection()
+    try:
+        for r in conn.execute(
+            "SELECT alert_type, enabled, channels FROM alert_subscriptions WHERE user_id = ?", (user_id,)
+        ).fetchall():
+            prefs[r["alert_type"]] = {
+                "enabled": bool(r["enabled"]),
+                "channels": [c for c in r["channels"].split(",") if c],
+            }
+    finally:
+        conn.close()
+    return prefs
+
+
+def set_subscriptions(user_id: str, prefs: dict) -> dict:
+    """Upsert preferences: {alert_type: {"enabled": bool, "channels": [...]}}."""
+    from api.services.alert_rules import RULE_KINDS
+
+    known = set(BROADCAST_TYPES) | set(RULE_KINDS) | set(POSITION_TYPES)
+    for alert_type, pref in prefs.items():
+        if alert_type not in known:
+            raise ValueError(f"Unknown alert type: {alert_type}")
+        if not isinstance(pref, dict):
+            raise ValueError(f"Preference for {alert_type} must be an object")
+        if not isinstance(pref.get("channels", []), list):
+            raise ValueError(f"channels for {alert_type} must be a list")
+    conn = get_connection()
+    try:
+        for alert_type, pref in prefs.items():
+            channels = [c for c in pref.get("channels", ["in_app"]) if c in CHANNELS]
+            conn.execute(
+                "INSERT INTO alert_subscriptions (user_id, alert_type, enabled, channels) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(user_id, alert_type) DO UPDATE SET enabled = excluded.enabled, channels = excluded.channels",
+                (user_id, alert_type, int(bool(pref.get("enabled", True))), ",".join(channels)),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+    return get_subscriptions(user_id)
+
+
+def is_subscribed(conn: sqlite3.Connection, user_id: str, alert_type: str) -> bool:
+    row = conn.execute(
+        "SELECT enabled FROM alert_subscriptions WHERE user_id = ? AND alert_type = ?", (user_id, alert_type)
+    ).fetchone()
+    return row is None or bool(row["enabled"])
 
 
 def _fire_discord(alert: dict) -> None:
-    """Send alert to Discord webhook. Non-fatal."""
+    """Queue the alert for the Discord webhook (delivered by api.services.outbox). Non-fatal."""
     try:
-        import requests
+        from api.services.outbox import enqueue_discord
 
         color = 0xE74C3C if alert["severity"] == SEVERITY_CRITICAL else 0xF0AD4E
         embed = {
@@ -123,13 +400,9 @@ def _fire_discord(alert: dict) -> None:
             "color": color,
             "footer": {"text": f"UCT Alert · {alert['type']} · {alert['timestamp'][:16]}"},
         }
-        requests.post(
-            _DISCORD_WEBHOOK,
-            json={"embeds": [embed]},
-            timeout=5,
-        )
+        enqueue_discord(_DISCORD_WEBHOOK, embed, dedup_key=f"alert:{alert['id']}")
     except Exception as e:
-        _logger.warning("Discord alert webhook failed: %s", e)
+        _logger.warning("Discord alert webhook could not be queued: %s", e)
 
 
 # ── Convenience functions for common alert patterns ───────────────────────
@@ -5,6 +5,7 @@ Uses /data/auth.db on Railway (persistent volume) or local ./data/auth.db.
 
 import os
 import sqlite3
+import threading
 
 _DB_PATH = os.environ.get("AUTH_DB_PATH", "/data/auth.db")
 
@@ -86,6 +87,7 @@ CREATE INDEX IF NOT EXISTS idx_subscriptions_user ON subscriptions(user_id);
 CREATE INDEX IF NOT EXISTS idx_subscriptions_stripe_cust ON subscriptions(stripe_customer_id);
 CREATE INDEX IF NOT EXISTS idx_journal_user ON journal_entries(user_id);
 CREATE INDEX IF NOT EXISTS idx_journal_status ON journal_entries(status);
+CREATE INDEX IF NOT EXISTS idx_journal_user_sym_date ON journal_entries(user_id, sym, entry_date);
 CREATE INDEX IF NOT EXISTS idx_watchlists_user ON watchlists(user_id);
 CREATE INDEX IF NOT EXISTS idx_watchlists_public ON watchlists(is_public);
 CREATE INDEX IF NOT EXISTS idx_watchlist_items_list ON watchlist_items(watchlist_id);
@@ -152,6 +154,54 @@ CREATE INDEX IF NOT EXISTS idx_page_views_user ON page_views(user_id);
 CREATE INDEX IF NOT EXISTS idx_page_views_page ON page_views(page);
 CREATE INDEX IF NOT EXISTS idx_page_views_created ON page_views(created_at);
 
+CREATE TABLE IF NOT EXISTS page_view_daily (
+    day         TEXT NOT NULL,
+    user_id     TEXT NOT NULL,
+    page        TEXT NOT NULL,
+    views       INTEGER NOT NULL DEFAULT 0,
+    last_at     TIMESTAMP,
+    PRIMARY KEY (day, user_id, page)
+);
+CREATE INDEX IF NOT EXISTS idx_page_view_daily_user ON page_view_daily(user_id);
+
+CREATE TABLE IF NOT EXISTS journal_rollups (
+    user_id     TEXT NOT NULL,
+    dimension   TEXT NOT NULL,
+    bucket      TEXT NOT NULL,
+    day         TEXT NOT NULL,
+    trade_count INTEGER NOT NULL DEFAULT 0,
+    pnl_count   INTEGER NOT NULL DEFAULT 0,
+    wins        INTEGER NOT NULL DEFAULT 0,
+    win_sum     REAL NOT NULL DEFAULT 0,
+    loss_sum    REAL NOT NULL DEFAULT 0,
+    pnl_sum     REAL NOT NULL DEFAULT 0,
+    r_count     INTEGER NOT NULL DEFAULT 0,
+    r_sum       REAL NOT NULL DEFAULT 0,
+    ps_count    INTEGER NOT NULL DEFAULT 0,
+    ps_sum      REAL NOT NULL DEFAULT 0,
+    hold_count  INTEGER NOT NULL DEFAULT 0,
+    hold_sum    REAL NOT NULL DEFAULT 0,
+    best_id     TEXT,
+    best_sym    TEXT,
+    best_pnl    REAL,
+    worst_id    TEXT,
+    worst_sym   TEXT,
+    worst_pnl   REAL,
+    PRIMARY KEY (user_id, dimension, bucket, day)
+);
+CREATE INDEX IF NOT EXISTS idx_journal_rollups_day ON journal_rollups(user_id, dimension, day);
+
+CREATE TABLE IF NOT EXISTS journal_equity (
+    user_id     TEXT NOT NULL,
+    trade_id    TEXT NOT NULL,
+    entry_date  TEXT NOT NULL,
+    sym         TEXT,
+    pnl_pct     REAL NOT NULL,
+    cum_pnl     REAL NOT NULL,
+    PRIMARY KEY (user_id, trade_id)
+);
+CREATE INDEX IF NOT EXISTS idx_journal_equity_order ON journal_equity(user_id, entry_date, trade_id);
+
 CREATE TABLE IF NOT EXISTS feedback (
     id TEXT PRIMARY KEY,
     user_id TEXT,
@@ -219,14 +269,128 @@ CREATE INDEX IF NOT EXISTS idx_user_preferences_user ON user_preferences(user_id
 """
 
 
-def get_connection() -> sqlite3.Connection:
-    conn = sqlite3.connect(_DB_PATH, timeout=10)
+# ── Connection pool ──────────────────────────────────────────────────────────
+# Every service follows `conn = get_connection() ... finally: conn.close()`.
+# Pooled connections keep that contract: close() hands the connection back to
+# the pool instead of tearing it down, so pragmas run once per connection and
+# sqlite3's per-connection statement cache keeps prepared statements warm.
+# AUTH_DB_POOL_SIZE=0 disables pooling (every close() really closes).
+
+_POOL_SIZE = int(os.environ.get("AUTH_DB_POOL_SIZE", "8"))
+_STATEMENT_CACHE_SIZE = 256
+
+
+class _PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() returns it to the pool."""
+
+    _pool_path = None
+    _checked_out = False
+
+    def close(self):
+        if not self._checked_out:
+            return
+        self._checked_out = False
+        _pool.release(self)
+
+    def _really_close(self):
+        super().close()
+
+
+class _ConnectionPool:
+    """Thread-safe LIFO pool of auth.db connections.
+
+    LIFO keeps the most recently used connection hot, so the several
+    get_connection() calls made while serving one request (session check,
+    plan lookup, service query) all land on the same connection.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._idle: list[_PooledConnection] = []
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, path: str) -> _PooledConnection:
+        conn = None
+        with self._lock:
+            while self._idle:
+                candidate = self._idle.pop()
+                if candidate._pool_path == path:
+                    conn = candidate
+                    self.reused += 1
+                    break
+                candidate._really_close()  # DB path changed (tests) — drop it
+        if conn is None:
+            conn = _open_connection(path)
+            with self._lock:
+                self.created += 1
+        conn._checked_out = True
+        return conn
+
+    def release(self, conn: _PooledConnection) -> None:
+        try:
+            if conn.in_transaction:
+                conn.rollback()  # never hand out a connection mid-transaction
+        except sqlite3.Error:
+            conn._really_close()
+            return
+        with self._lock:
+            if len(self._idle) < self.size and conn._pool_path == _DB_PATH:
+                self._idle.append(conn)
+                return
+        conn._really_close()
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            try:
+                conn._really_close()
+            except sqlite3.Error:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                "created": self.created,
+                "reused": self.reused,
+            }
+
+
+def _open_connection(path: str) -> _PooledConnection:
+    conn = sqlite3.connect(
+        path,
+        timeout=10,
+        factory=_PooledConnection,
+        check_same_thread=False,  # pooled across the threadpool, one thread at a time
+        cached_statements=_STATEMENT_CACHE_SIZE,
+    )
+    conn._pool_path = path
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA journal_mode=WAL")
     conn.execute("PRAGMA foreign_keys=ON")
     return conn
 
 
+_pool = _ConnectionPool(_POOL_SIZE)
+
+
+def get_connection() -> sqlite3.Connection:
+    return _pool.acquire(_DB_PATH)
+
+
+def close_pool() -> None:
+    """Close every idle pooled connection (shutdown / tests)."""
+    _pool.close_all()
+
+
+def pool_stats() -> dict:
+    return _pool.stats()
+
+
 def init_db():
     conn = get_connection()
     try:
@@ -280,9 +444,77 @@ def init_db():
         conn.execute("CREATE INDEX IF NOT EXISTS idx_trading_accounts_user ON trading_accounts(user_id)")
         conn.commit()
 
+        # Page-view rollup backfill (first start after the table was added)
+        has_rollup = conn.execute("SELECT 1 FROM page_view_daily LIMIT 1").fetchone()
+        has_views = conn.execute("SELECT 1 FROM page_views LIMIT 1").fetchone()
+        if has_views and not has_rollup:
+            from api.services.event_buffer import rebuild_page_view_rollup
+            n = rebuild_page_view_rollup(conn)
+            conn.commit()
+            print(f"[auth] Migrated: backfilled page_view_daily ({n} rows)")
+
         # Journal v2 migration
         _migrate_journal_v2(conn)
 
+        # Precomputed insights state + dirty-marking triggers
+        from api.services.journal_insights import install as install_journal_insights
+        install_journal_insights(conn)
+        conn.commit()
+
+        # Background AI summaries/digests: jobs, outputs, token usage + summary triggers
+        from api.services import journal_ai
+        journal_ai.install(conn)
+        conn.commit()
+
+        # Durable alerts, per-user read state, subscriptions and rules
+        from api.services import alerts, alert_rules
+        alerts.install(conn)
+        alert_rules.install(conn)
+        conn.commit()
+
+        # Outbound notification queue (Discord webhooks, email)
+        from api.services import outbox
+        outbox.install(conn)
+        conn.commit()
+
+        # Stripe webhook event ledger
+        from api.services import stripe_events
+        stripe_events.install(conn)
+        conn.commit()
+
+        # Per-user paper trades + fills (imports the legacy data/trades.json once)
+        from api.services import paper_trades
+        paper_trades.install(conn)
+        conn.commit()
+
+        # Trader watchlist registry (seeded from the former hardcoded list)
+        from api.services import trader_watchlists
+        trader_watchlists.install(conn)
+        conn.commit()
+
+        # Full-text search index + normalized tags (triggers keep them in sync)
+        try:
+            from api.services.journal_search import install as install_journal_search
+            install_journal_search(conn)
+            conn.commit()
+        except sqlite3.OperationalError as e:
+            conn.rollback()
+            print(f"[auth] Journal search unavailable (SQLite built without FTS5?): {e}")
+
+        # Cross-user community aggregates (backfills from journal_rollups when they exist)
+        from api.services import community_stats
+        community_stats.install(conn)
+        conn.commit()
+
+        # Journal rollup backfill (first start after the tables were added); also fills community_stats
+        has_rollups = conn.execute("SELECT 1 FROM journal_rollups LIMIT 1").fetchone()
+        has_closed = conn.execute("SELECT 1 FROM journal_entries WHERE status = 'closed' LIMIT 1").fetchone()
+        if has_closed and not has_rollups:
+            from api.services.journal_rollups import rebuild_all
+            n = rebuild_all(conn)
+            conn.commit()
+            print(f"[auth] Migrated: backfilled journal_rollups for {n} users")
+
         print(f"[auth] Database ready at {_DB_PATH}")
     finally:
         conn.close()
@@ -5,10 +5,13 @@ Pure business logic, no HTTP concerns.
 
 import uuid
 import secrets
+import threading
+import time
 from datetime import datetime, timedelta, timezone
 
 import bcrypt
 
+from api.services import event_buffer
 from api.services.auth_db import get_connection
 
 
@@ -87,46 +90,55 @@ def create_session(user_id: str) -> str:
 
 
 def validate_session(token: str) -> dict | None:
+    """Resolve a session token to its user.
+
+    Served from a short-TTL in-process cache; the sessions/users JOIN only runs on a
+    miss. The last-seen touch goes to the write-behind queue, so an authenticated
+    GET never writes to SQLite. Expired rows are left for cleanup_expired_sessions().
+    """
     if not token:
         return None
-    conn = get_connection()
-    try:
-        row = conn.execute(
-            "SELECT s.user_id, s.expires_at, u.email, u.display_name, u.role, u.email_verified "
-            "FROM sessions s JOIN users u ON s.user_id = u.id "
-            "WHERE s.token = ?",
-            (token,),
-        ).fetchone()
+    now = time.time()
+    with _cache_lock:
+        hit = _session_cache.get(token)
+    if hit and hit[1] > now and hit[2] > datetime.now(timezone.utc):
+        user = hit[0]
+    else:
+        conn = get_connection()
+        try:
+            row = conn.execute(
+                "SELECT s.user_id, s.expires_at, u.email, u.display_name, u.role, u.email_verified "
+                "FROM sessions s JOIN users u ON s.user_id = u.id "
+                "WHERE s.token = ?",
+                (token,),
+            ).fetchone()
+        finally:
+            conn.close()
         if not row:
+            _forget_session(token)
             return None
         expires = datetime.fromisoformat(row["expires_at"])
         if expires.tzinfo is None:
             expires = expires.replace(tzinfo=timezone.utc)
         if expires < datetime.now(timezone.utc):
-            conn.execute("DELETE FROM sessions WHERE token = ?", (token,))
-            conn.commit()
+            _forget_session(token)
             return None
-        user_id = row["user_id"]
-
-        # Update last login timestamp (fire-and-forget, don't block)
-        try:
-            conn.execute("UPDATE users SET last_login_at = CURRENT_TIMESTAMP WHERE id = ?", (user_id,))
-            conn.commit()
-        except:
-            pass
-
-        return {
-            "id": user_id,
+        user = {
+            "id": row["user_id"],
             "email": row["email"],
             "display_name": row["display_name"],
             "role": row["role"],
             "email_verified": bool(row["email_verified"]),
         }
-    finally:
-        conn.close()
+        with _cache_lock:
+            _session_cache[token] = (user, now + SESSION_CACHE_TTL, expires)
+
+    queue_last_login(user["id"])
+    return dict(user)  # callers decorate the dict (e.g. user["plan"]) — never hand out the cached one
 
 
 def delete_session(token: str):
+    _forget_session(token)
     conn = get_connection()
     try:
         conn.execute("DELETE FROM sessions WHERE token = ?", (token,))
@@ -146,6 +158,89 @@ def cleanup_expired_sessions():
         conn.close()
 
 
+# ── Session cache & write-behind ─────────────────────────────────────────────
+# Sessions and plans are cached per process for a few seconds. Anything that
+# changes who a session belongs to (logout, password change, plan/role change,
+# user deletion) must call _forget_session() / invalidate_user_cache().
+#
+# last_login_at touches, page views and activity-log rows are queued in memory
+# (the latter two in event_buffer) and flushed in one transaction by
+# flush_pending_writes(), scheduled every WRITE_BEHIND_INTERVAL seconds from
+# main.py and once more on shutdown.
+
+SESSION_CACHE_TTL = 30       # seconds
+PLAN_CACHE_TTL = 30          # seconds
+WRITE_BEHIND_INTERVAL = 5    # seconds
+
+_session_cache: dict[str, tuple[dict, float, datetime]] = {}  # token → (user, cached_until, expires_at)
+_plan_cache: dict[str, tuple[str, float]] = {}                # user_id → (plan, cached_until)
+_cache_lock = threading.Lock()
+
+_pending_logins: dict[str, str] = {}  # user_id → last seen (SQLite timestamp)
+_pending_lock = threading.Lock()
+
+
+def _sqlite_now() -> str:
+    """UTC timestamp in the same format as SQLite's CURRENT_TIMESTAMP."""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _forget_session(token: str) -> None:
+    with _cache_lock:
+        _session_cache.pop(token, None)
+
+
+def invalidate_user_cache(user_id: str) -> None:
+    """Drop every cached session and the cached plan for a user."""
+    with _cache_lock:
+        for token in [t for t, (u, _, _) in _session_cache.items() if u["id"] == user_id]:
+            del _session_cache[token]
+        _plan_cache.pop(user_id, None)
+
+
+def clear_auth_caches() -> None:
+    with _cache_lock:
+        _session_cache.clear()
+        _plan_cache.clear()
+
+
+def queue_last_login(user_id: str) -> None:
+    with _pending_lock:
+        _pending_logins[user_id] = _sqlite_now()
+
+
+def flush_pending_writes() -> int:
+    """Write queued last-login touches, page views and activity rows in a single
+    transaction. Returns the number of rows written. On failure the batch is re-queued."""
+    conn = get_connection()
+    try:
+        with _pending_lock:
+            logins = _pending_logins.copy()
+            _pending_logins.clear()
+        views, activity = event_buffer.drain()
+        if not logins and not views and not activity:
+            return 0
+        try:
+            conn.executemany(
+                "UPDATE users SET last_login_at = ? WHERE id = ?",
+                [(ts, uid) for uid, ts in logins.items()],
+            )
+            event_buffer.write(conn, views, activity)
+            conn.commit()
+        except Exception as e:
+            print(f"[write-behind] Flush failed, re-queued {len(logins)} logins / "
+                  f"{len(views)} views / {len(activity)} activity rows: {e}")
+            with _pending_lock:
+                for uid, ts in logins.items():
+                    _pending_logins.setdefault(uid, ts)
+            event_buffer.requeue(views, activity)
+            return 0
+        event_buffer.mark_flushed(views, activity)
+        return len(logins) + len(views) + len(activity)
+    finally:
+        conn.close()
+
+
 # ── Subscription helpers ─────────────────────────────────────────────────────
 
 def get_subscription(user_id: str) -> dict | None:
@@ -178,6 +273,7 @@ def upsert_subscription(user_id: str, stripe_customer_id: str, stripe_subscripti
         conn.commit()
     finally:
         conn.close()
+    invalidate_user_cache(user_id)
 
 
 def get_subscription_by_stripe_customer(stripe_customer_id: str) -> dict | None:
@@ -190,12 +286,21 @@ def get_subscription_by_stripe_customer(stripe_customer_id: str) -> dict | None:
 
 
 def get_user_plan(user_id: str) -> str:
+    now = time.time()
+    with _cache_lock:
+        hit = _plan_cache.get(user_id)
+    if hit and hit[1] > now:
+        return hit[0]
     sub = get_subscription(user_id)
     if not sub:
-        return "free"
-    if sub["status"] in ("active", "trialing"):
-        return sub["plan"]
-    return "free"
+        plan = "free"
+    elif sub["status"] in ("active", "trialing"):
+        plan = sub["plan"]
+    else:
+        plan = "free"
+    with _cache_lock:
+        _plan_cache[user_id] = (plan, now + PLAN_CACHE_TTL)
+    return plan
 
 
 def change_password(user_id: str, current_password: str, new_password: str) -> bool:
@@ -210,6 +315,7 @@ def change_password(user_id: str, current_password: str, new_password: str) -> b
         new_hash = bcrypt.hashpw(new_password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
         conn.execute("UPDATE users SET password_hash = ? WHERE id = ?", (new_hash, user_id))
         conn.commit()
+        invalidate_user_cache(user_id)
         return True
     finally:
         conn.close()
@@ -377,6 +483,7 @@ def comp_user_access(email: str, grant: bool = True) -> dict:
                     (sub_id, user_id),
                 )
             conn.commit()
+            invalidate_user_cache(user_id)
             return {"ok": True, "email": email, "action": "granted"}
         else:
             conn.execute(
@@ -384,6 +491,7 @@ def comp_user_access(email: str, grant: bool = True) -> dict:
                 (user_id,),
             )
             conn.commit()
+            invalidate_user_cache(user_id)
             return {"ok": True, "email": email, "action": "revoked"}
     finally:
         conn.close()
@@ -443,6 +551,7 @@ def verify_email_token(token: str) -> str | None:
         conn.execute("UPDATE users SET email_verified = 1 WHERE id = ?", (row["user_id"],))
         conn.execute("DELETE FROM email_verifications WHERE token = ?", (token,))
         conn.commit()
+        invalidate_user_cache(row["user_id"])
         return row["user_id"]
     finally:
         conn.close()
@@ -491,6 +600,7 @@ def execute_password_reset(token: str, new_password: str) -> bool:
         conn.execute("UPDATE users SET password_hash = ? WHERE id = ?", (new_hash, row["user_id"]))
         conn.execute("UPDATE password_resets SET used = 1 WHERE id = ?", (row["id"],))
         conn.commit()
+        invalidate_user_cache(row["user_id"])
         return True
     finally:
         conn.close()
@@ -512,19 +622,9 @@ def cleanup_expired_tokens():
 # ── Activity logging ──────────────────────────────────────────────────────
 
 def log_activity(user_id: str, action: str, details: str = "", ip_address: str = ""):
-    """Insert an activity log entry."""
-    entry_id = str(uuid.uuid4())
-    conn = get_connection()
-    try:
-        conn.execute(
-            "INSERT INTO activity_log (id, user_id, action, details, ip_address) VALUES (?, ?, ?, ?, ?)",
-            (entry_id, user_id, action, details, ip_address),
-        )
-        conn.commit()
-    except Exception as e:
-        print(f"[activity] Failed to log {action} for {user_id}: {e}")
-    finally:
-        conn.close()
+    """Queue an activity log entry (written by flush_pending_writes)."""
+    if not event_buffer.add_activity(user_id, action, details, ip_address):
+        print(f"[activity] Buffer full, dropped {action} for {user_id}")
 
 
 def get_recent_activity(limit: int = 50) -> list[dict]:
@@ -708,37 +808,19 @@ def get_admin_notes(user_id: str) -> list[dict]:
 
 
 def log_page_view(user_id: str, page: str):
-    """Insert a page view with 60-second dedup per user+page."""
-    conn = get_connection()
-    try:
-        # Check if same page was logged within last 60 seconds
-        cutoff = (datetime.now(timezone.utc) - timedelta(seconds=60)).isoformat()
-        existing = conn.execute(
-            "SELECT id FROM page_views WHERE user_id = ? AND page = ? AND created_at > ?",
-            (user_id, page, cutoff),
-        ).fetchone()
-        if existing:
-            return
-        view_id = str(uuid.uuid4())
-        conn.execute(
-            "INSERT INTO page_views (id, user_id, page) VALUES (?, ?, ?)",
-            (view_id, user_id, page),
-        )
-        conn.commit()
-    except Exception as e:
-        print(f"[pageview] Failed to log: {e}")
-    finally:
-        conn.close()
+    """Queue a page view with 60-second dedup per user+page (written by flush_pending_writes)."""
+    if event_buffer.add_page_view(user_id, page):
+        queue_last_login(user_id)
 
 
 def get_page_analytics(days: int = 7) -> list[dict]:
-    """Return top pages by view count with unique user counts."""
+    """Return top pages by view count with unique user counts, from the daily rollup."""
     conn = get_connection()
     try:
-        cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d")
         rows = conn.execute(
-            "SELECT page, COUNT(*) as views, COUNT(DISTINCT user_id) as unique_users "
-            "FROM page_views WHERE created_at > ? "
+            "SELECT page, SUM(views) as views, COUNT(DISTINCT user_id) as unique_users "
+            "FROM page_view_daily WHERE day >= ? "
             "GROUP BY page ORDER BY views DESC LIMIT 20",
             (cutoff,),
         ).fetchall()
@@ -747,25 +829,28 @@ def get_page_analytics(days: int = 7) -> list[dict]:
         conn.close()
 
 
+def _engagement(conn, user_id: str) -> dict:
+    row = conn.execute(
+        "SELECT COALESCE(SUM(views), 0) as total, COUNT(DISTINCT page) as unique_pages "
+        "FROM page_view_daily WHERE user_id = ?",
+        (user_id,),
+    ).fetchone()
+    last_row = conn.execute(
+        "SELECT page FROM page_view_daily WHERE user_id = ? ORDER BY last_at DESC LIMIT 1",
+        (user_id,),
+    ).fetchone()
+    return {
+        "total_page_views": row["total"],
+        "unique_pages": row["unique_pages"],
+        "last_active_page": last_row["page"] if last_row else None,
+    }
+
+
 def get_user_engagement(user_id: str) -> dict:
-    """Return page view stats for a user."""
+    """Return page view stats for a user, from the daily rollup."""
     conn = get_connection()
     try:
-        total = conn.execute(
-            "SELECT COUNT(*) FROM page_views WHERE user_id = ?", (user_id,)
-        ).fetchone()[0]
-        unique = conn.execute(
-            "SELECT COUNT(DISTINCT page) FROM page_views WHERE user_id = ?", (user_id,)
-        ).fetchone()[0]
-        last_row = conn.execute(
-            "SELECT page FROM page_views WHERE user_id = ? ORDER BY created_at DESC LIMIT 1",
-            (user_id,),
-        ).fetchone()
-        return {
-            "total_page_views": total,
-            "unique_pages": unique,
-            "last_active_page": last_row["page"] if last_row else None,
-        }
+        return _engagement(conn, user_id)
     finally:
         conn.close()
 
@@ -823,21 +908,7 @@ def get_user_detail(user_id: str) -> dict | None:
         user["notes"] = [dict(r) for r in note_rows]
 
         # Engagement stats
-        total_pv = conn.execute(
-            "SELECT COUNT(*) FROM page_views WHERE user_id = ?", (user_id,)
-        ).fetchone()[0]
-        unique_pv = conn.execute(
-            "SELECT COUNT(DISTINCT page) FROM page_views WHERE user_id = ?", (user_id,)
-        ).fetchone()[0]
-        last_pv = conn.execute(
-            "SELECT page FROM page_views WHERE user_id = ? ORDER BY created_at DESC LIMIT 1",
-            (user_id,),
-        ).fetchone()
-        user["engagement"] = {
-            "total_page_views": total_pv,
-            "unique_pages": unique_pv,
-            "last_active_page": last_pv["page"] if last_pv else None,
-        }
+        user["engagement"] = _engagement(conn, user_id)
 
         # Tags
         tag_rows = conn.execute(
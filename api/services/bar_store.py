@@ -0,0 +1,348 @@
+"""
+Bar store — one canonical OHLCV series per (ticker, timeframe), sliced on demand.
+
+Every /api/bars request for a ticker/timeframe reads the same in-memory series,
+whatever `bars` count it asks for. The series is fetched once at the deepest depth
+requested so far (at least DEFAULT_DEPTH); after its TTL only the tail is refetched
+(the last day or two) and merged over the old tail, so a still-forming bar is replaced
+and new bars are appended. Weekly bars are resampled from the canonical daily series.
+An empty upstream result is cached too, for at most NEGATIVE_TTL, then fetched in full.
+
+Series are stored columnar: {"t": [...], "o": [...], "h": [...], "l": [...], "c": [...],
+"v": [...]}. Daily/weekly `t` is "YYYY-MM-DD" (LW Charts BusinessDay); intraday `t` is
+unix seconds.
+
+Daily/Weekly: Massive API (Polygon-compatible) via get_agg_bars()
+Intraday (5/30/60 min): Massive API agg endpoint (yfinance fallback)
+"""
+import struct
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+
+from api.services.massive import _get_client, _REST_BASE
+
+COLUMNS = ("t", "o", "h", "l", "c", "v")
+INTRADAY = ("5", "30", "60")
+MAX_SERIES = 500  # LRU bound on canonical series held in memory
+
+# Cache TTLs by timeframe (seconds) — after this the tail is refreshed
+TTL = {'5': 15, '30': 15, '60': 15, 'D': 300, 'W': 900}
+# An empty result (unknown ticker, upstream hiccup) is cached this long at most, so
+# repeated requests for it don't each go upstream
+NEGATIVE_TTL = 60
+
+# Minimum bars fetched for a canonical series, so small and large requests share it
+DEFAULT_DEPTH = {'5': 5000, '30': 5000, '60': 5000, 'D': 1000}
+
+# yfinance period/interval config (same as charts.py)
+_YF_CONFIG = {
+    '5':  {'period': '5d',  'interval': '5m'},
+    '30': {'period': '1mo', 'interval': '30m'},
+    '60': {'period': '1mo', 'interval': '60m'},
+}
+
+# Ticker overrides for yfinance
+_YF_TICKERS = {'VIX': '^VIX', 'BTC': 'BTC-USD'}
+
+_lock = threading.Lock()
+_series: "OrderedDict[tuple[str, str], dict]" = OrderedDict()
+_fetch_locks: dict[tuple[str, str], threading.Lock] = {}
+_weekly: dict[str, tuple[int, dict]] = {}  # ticker → (daily version, resampled columns)
+_stats = {"full_fetches": 0, "tail_fetches": 0, "hits": 0}
+
+
+# ─── Upstream fetchers (row dicts) ────────────────────────────────────────────
+
+def _fetch_intraday_massive(ticker: str, tf: str, max_bars: int, lookback_days: int | None = None) -> list[dict]:
+    """Fetch intraday bars from Massive API agg endpoint.
+
+    tf='5':  5-min bars, last 5 trading days
+    tf='30': 30-min bars, last 30 trading days
+    tf='60': 60-min bars, last 30 trading days
+    """
+    multiplier = int(tf)  # 5, 30, or 60
+    if lookback_days is None:
+        lookback_days = 5 if tf == '5' else 30
+    to_date = datetime.utcnow().strftime("%Y-%m-%d")
+    from_date = (datetime.utcnow() - timedelta(days=lookback_days + 3)).strftime("%Y-%m-%d")
+
+    try:
+        client = _get_client()
+        url = (
+            f"{_REST_BASE}/v2/aggs/ticker/{ticker.upper()}/range/{multiplier}/minute"
+            f"/{from_date}/{to_date}"
+            f"?adjusted=true&sort=asc&limit=5000&apiKey={client._api_key}"
+        )
+        data = client._get(url)
+        results = data.get("results") or []
+        if not results:
+            return []
+        bars = []
+        for bar in results:
+            bars.append({
+                "t": int(bar["t"] / 1000),  # ms → unix seconds for LW Charts UTCTimestamp
+                "o": round(bar["o"], 2),
+                "h": round(bar["h"], 2),
+                "l": round(bar["l"], 2),
+                "c": round(bar["c"], 2),
+                "v": int(bar.get("v", 0)),
+            })
+        return bars[-max_bars:]
+    except Exception:
+        return []
+
+
+def _fetch_intraday_yfinance(ticker: str, tf: str, max_bars: int) -> list[dict]:
+    """Fetch intraday bars from yfinance (fallback)."""
+    import yfinance as yf
+    config = _YF_CONFIG.get(tf)
+    if not config:
+        return []
+    yf_sym = _YF_TICKERS.get(ticker.upper(), ticker.upper())
+    try:
+        df = yf.Ticker(yf_sym).history(period=config["period"], interval=config["interval"])
+        if df.empty:
+            return []
+        # Strip timezone
+        if df.index.tzinfo is not None:
+            df.index = df.index.tz_localize(None)
+        bars = []
+        for ts, row in df.iterrows():
+            bars.append({
+                "t": int(ts.timestamp()),  # unix seconds for LW Charts UTCTimestamp
+                "o": round(row["Open"], 2),
+                "h": round(row["High"], 2),
+                "l": round(row["Low"], 2),
+                "c": round(row["Close"], 2),
+                "v": int(row.get("Volume", 0)),
+            })
+        return bars[-max_bars:]
+    except Exception:
+        return []
+
+
+def _fetch_intraday(ticker: str, tf: str, max_bars: int, lookback_days: int | None = None) -> list[dict]:
+    """Fetch intraday bars — Massive API primary, yfinance fallback."""
+    bars = _fetch_intraday_massive(ticker, tf, max_bars, lookback_days)
+    if bars:
+        return bars
+    return _fetch_intraday_yfinance(ticker, tf, max_bars)
+
+
+def _fetch_daily(ticker: str, max_bars: int) -> list[dict]:
+    """Fetch daily bars from Massive API."""
+    from api.services.massive import get_agg_bars
+    to_date = datetime.utcnow().strftime("%Y-%m-%d")
+    # ~1.5 calendar days per trading day to cover full history
+    from_date = (datetime.utcnow() - timedelta(days=int(max_bars * 1.5) + 30)).strftime("%Y-%m-%d")
+    raw = get_agg_bars(ticker.upper(), from_date, to_date)
+    bars = []
+    for bar in raw[-max_bars:]:
+        dt = datetime.utcfromtimestamp(bar["t"] / 1000)
+        bars.append({
+            "t": dt.strftime("%Y-%m-%d"),  # BusinessDay format for LW Charts
+            "o": round(bar["o"], 2),
+            "h": round(bar["h"], 2),
+            "l": round(bar["l"], 2),
+            "c": round(bar["c"], 2),
+            "v": int(bar.get("v", 0)),
+        })
+    return bars
+
+
+def _fetch(ticker: str, tf: str, depth: int) -> list[dict]:
+    if tf in INTRADAY:
+        return _fetch_intraday(ticker, tf, depth)
+    return _fetch_daily(ticker, depth)
+
+
+def _fetch_tail(ticker: str, tf: str) -> list[dict]:
+    """The last few bars — enough to replace a forming bar and pick up new ones."""
+    if tf in INTRADAY:
+        return _fetch_intraday(ticker, tf, 5000, lookback_days=0)  # today + 3-day weekend cushion
+    return _fetch_daily(ticker, 10)
+
+
+# ─── Columnar helpers ─────────────────────────────────────────────────────────
+
+def _to_columns(rows: list[dict]) -> dict:
+    return {k: [r.get(k, 0) for r in rows] for k in COLUMNS}
+
+
+def to_rows(cols: dict) -> list[dict]:
+    return [dict(zip(COLUMNS, vals)) for vals in zip(*(cols[k] for k in COLUMNS))]
+
+
+def _slice(cols: dict, start: int, end: int | None = None) -> dict:
+    return {k: cols[k][start:end] for k in COLUMNS}
+
+
+def _merge_tail(cols: dict, tail: list[dict]) -> dict:
+    """Replace every bar from the tail's first timestamp onward with the tail."""
+    if not tail:
+        return cols
+    first = tail[0]["t"]
+    t = cols["t"]
+    # Walk back from the end; the tail only ever overlaps the last few bars.
+    cut = len(t)
+    while cut > 0 and t[cut - 1] >= first:
+        cut -= 1
+    merged = _slice(cols, 0, cut)
+    for k in COLUMNS:
+        merged[k].extend(r.get(k, 0) for r in tail)
+    return merged
+
+
+def resample_weekly(daily: dict) -> dict:
+    """Resample columnar daily bars to weekly (ISO week grouping); t is the week's first day."""
+    out = {k: [] for k in COLUMNS}
+    last_week = None
+    for t, o, h, l, c, v in zip(*(daily[k] for k in COLUMNS)):
+        week = date.fromisoformat(t).isocalendar()[:2]  # (year, week)
+        if week != last_week:
+            last_week = week
+            for k, val in zip(COLUMNS, (t, o, h, l, c, v)):
+                out[k].append(val)
+        else:
+            out["h"][-1] = max(out["h"][-1], h)
+            out["l"][-1] = min(out["l"][-1], l)
+            out["c"][-1] = c
+            out["v"][-1] += v
+    return out
+
+
+# ─── Canonical series ─────────────────────────────────────────────────────────
+
+def _canonical(ticker: str, tf: str, want: int) -> dict:
+    """The canonical series for ticker/tf holding at least `want` bars if upstream has them."""
+    key = (ticker, tf)
+    with _lock:
+        s = _series.get(key)
+        if s is not None:
+            _series.move_to_end(key)
+        fetch_lock = _fetch_locks.setdefault(key, threading.Lock())
+    if s is not None and time.time() < s["fresh_until"] and (want <= s["depth"] or s["exhausted"]):
+        _stats["hits"] += 1
+        return s
+    with fetch_lock:  # one upstream fetch per series; concurrent callers reuse its result
+        return _refresh(key, want)
+
+
+def _refresh(key: tuple[str, str], want: int) -> dict:
+    ticker, tf = key
+    now = time.time()
+    with _lock:
+        s = _series.get(key)
+    empty = s is not None and not s["cols"]["t"]
+    if s is None or (empty and now >= s["fresh_until"]) or (want > s["depth"] and not s["exhausted"]):
+        depth = max(want, DEFAULT_DEPTH[tf], s["depth"] if s else 0)
+        rows = _fetch(ticker, tf, depth)
+        ttl = TTL[tf] if rows else min(NEGATIVE_TTL, TTL[tf])
+        s = {
+            "cols": _to_columns(rows), "depth": depth, "exhausted": len(rows) < depth,
+            "fresh_until": now + ttl, "version": (s["version"] + 1) if s else 1,
+        }
+        _stats["full_fetches"] += 1
+    elif now >= s["fresh_until"]:
+        tail = _fetch_tail(ticker, tf)
+        cols = _merge_tail(s["cols"], tail)
+        if not s["exhausted"] and len(cols["t"]) > s["depth"]:
+            cols = _slice(cols, len(cols["t"]) - s["depth"])
+        s = dict(s, cols=cols, fresh_until=now + TTL[tf], version=s["version"] + (1 if tail else 0))
+        _stats["tail_fetches"] += 1
+    else:
+        _stats["hits"] += 1  # another caller refreshed it while we waited
+        return s
+    with _lock:
+        _series[key] = s
+        _series.move_to_end(key)
+        while len(_series) > MAX_SERIES:
+            old, _ = _series.popitem(last=False)
+            _fetch_locks.pop(old, None)
+    return s
+
+
+def get_series(ticker: str, tf: str, bars: int) -> dict:
+    """Columnar bars for ticker/tf: the last `bars` of the canonical series."""
+    ticker = ticker.upper()
+    if tf == "W":
+        daily = _canonical(ticker, "D", bars * 5 + 5)
+        with _lock:
+            cached = _weekly.get(ticker)
+        if cached and cached[0] == daily["version"]:
+            weekly = cached[1]
+        else:
+            weekly = resample_weekly(daily["cols"])
+            with _lock:
+                _weekly[ticker] = (daily["version"], weekly)
+        cols = weekly
+    else:
+        if tf not in TTL:
+            tf = "D"
+        cols = _canonical(ticker, tf, bars)["cols"]
+    n = len(cols["t"])
+    return _slice(cols, max(0, n - bars))
+
+
+def since(cols: dict, since_t) -> dict:
+    """Bars at or after since_t — the client's last bar (it may have changed) plus new ones."""
+    t = cols["t"]
+    i = len(t)
+    while i > 0 and t[i - 1] >= since_t:
+        i -= 1
+    return _slice(cols, i)
+
+
+# ─── Binary encoding ──────────────────────────────────────────────────────────
+
+BINARY_MAGIC = b"UCTB"
+BINARY_VERSION = 1
+
+
+def encode_binary(cols: dict, tf: str) -> bytes:
+    """Pack columnar bars little-endian, column-major.
+
+    Header: b"UCTB", u8 version, u8 time kind (0 = unix seconds, 1 = UTC day → "YYYY-MM-DD"),
+    u32 count. Then t as int64 seconds, and o, h, l, c, v as float64 — count values each.
+    """
+    n = len(cols["t"])
+    if tf in INTRADAY:
+        kind, times = 0, cols["t"]
+    else:
+        kind = 1
+        times = [int(datetime.fromisoformat(t).replace(tzinfo=timezone.utc).timestamp()) for t in cols["t"]]
+    parts = [BINARY_MAGIC, struct.pack("<BBI", BINARY_VERSION, kind, n), struct.pack(f"<{n}q", *times)]
+    for k in COLUMNS[1:]:
+        parts.append(struct.pack(f"<{n}d", *cols[k]))
+    return b"".join(parts)
+
+
+def decode_binary(data: bytes) -> dict:
+    """Inverse of encode_binary (tests and Python clients)."""
+    if data[:4] != BINARY_MAGIC:
+        raise ValueError("not a UCTB payload")
+    _, kind, n = struct.unpack_from("<BBI", data, 4)
+    offset = 10
+    times = list(struct.unpack_from(f"<{n}q", data, offset))
+    offset += 8 * n
+    if kind == 1:
+        times = [datetime.fromtimestamp(t, tz=timezone.utc).strftime("%Y-%m-%d") for t in times]
+    cols = {"t": times}
+    for k in COLUMNS[1:]:
+        cols[k] = list(struct.unpack_from(f"<{n}d", data, offset))
+        offset += 8 * n
+    return cols
+
+
+def get_stats() -> dict:
+    with _lock:
+        return {**_stats, "series": len(_series)}
+
+
+def clear() -> None:
+    with _lock:
+        _series.clear()
+        _fetch_locks.clear()
+        _weekly.clear()
@@ -1,10 +1,34 @@
+"""
+Shared cache used across all services: get / set(ttl) / invalidate / update.
+
+Two backends with the same interface, picked by CACHE_BACKEND:
+  memory  TTLCache — a dict in this process. Default for a single worker.
+  sqlite  SQLiteCache — a WAL SQLite file on local disk (CACHE_DB_PATH) shared by every
+          worker on the host, so workers fetch upstream data once between them and an
+          invalidate in one worker (e.g. /api/push) is seen by all. Default when
+          WEB_CONCURRENCY > 1.
+
+SQLiteCache keeps unpickled values in a per-process memo. Every row carries a random
+version; a memo entry is trusted while the database is unchanged (PRAGMA data_version)
+and otherwise revalidated against its row's version, so a hit on a large value such as
+wire_data costs one small query rather than an unpickle.
+
+update(key, fn, ttl) is an atomic read-modify-write for values several writers append
+to (alerts).
+"""
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
 import time
-from typing import Any
+from typing import Any, Callable
 
 
 class TTLCache:
     def __init__(self):
         self._store: dict[str, tuple[Any, float]] = {}
+        self._lock = threading.Lock()
 
     def get(self, key: str) -> Any:
         if key not in self._store:
@@ -22,6 +46,154 @@ class TTLCache:
         """Remove a key from the cache immediately."""
         self._store.pop(key, None)
 
+    def update(self, key: str, fn: Callable[[Any], Any], ttl: float) -> Any:
+        """Atomically replace key's value with fn(current value or None). Returns the new value."""
+        with self._lock:
+            value = fn(self.get(key))
+            self.set(key, value, ttl)
+            return value
+
+    def clear(self) -> None:
+        self._store.clear()
+
+
+class SQLiteCache:
+    """Cross-process cache on a local WAL SQLite file."""
+
+    PURGE_EVERY = 500  # sets between sweeps of expired rows
+
+    def __init__(self, path: str):
+        self._path = path
+        self._lock = threading.RLock()
+        self._conn: sqlite3.Connection | None = None
+        self._memo: dict[str, tuple[Any, float, int, Any]] = {}  # key → (value, expires_at, version, data_version seen)
+        self._local: dict[str, tuple[Any, float]] = {}  # values that cannot be pickled stay per-process
+        self._sets = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self._path)), exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=10, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL,"
+                " expires_at REAL NOT NULL, version INTEGER NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _current_data_version(self, conn: sqlite3.Connection):
+        return conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def get(self, key: str) -> Any:
+        now = time.time()
+        with self._lock:
+            local = self._local.get(key)
+            if local is not None:
+                if now <= local[1]:
+                    return local[0]
+                del self._local[key]
+            conn = self._db()
+            dv = self._current_data_version(conn)
+            memo = self._memo.get(key)
+            if memo is not None and memo[3] == dv:
+                if now <= memo[1]:
+                    return memo[0]
+                self._memo.pop(key, None)
+                return None
+            if memo is not None:
+                row = conn.execute("SELECT version, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[0] == memo[2] and now <= row[1]:
+                    self._memo[key] = (memo[0], row[1], memo[2], dv)
+                    return memo[0]
+                self._memo.pop(key, None)
+            row = conn.execute(
+                "SELECT value, expires_at, version FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now > row[1]:
+                return None
+            value = pickle.loads(row[0])
+            self._memo[key] = (value, row[1], row[2], dv)
+            return value
+
+    def _write(self, conn: sqlite3.Connection, key: str, value: Any, ttl: float) -> bool:
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            print(f"[cache] {key} is not picklable, keeping it in this worker only: {e}")
+            self._local[key] = (value, time.time() + ttl)
+            return False
+        expires_at = time.time() + ttl
+        version = int.from_bytes(os.urandom(7), "big")
+        conn.execute(
+            "INSERT INTO cache (key, value, expires_at, version) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, "
+            "expires_at = excluded.expires_at, version = excluded.version",
+            (key, blob, expires_at, version),
+        )
+        self._memo[key] = (value, expires_at, version, None)
+        return True
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            conn = self._db()
+            self._write(conn, key, value, ttl)
+            self._sets += 1
+            if self._sets % self.PURGE_EVERY == 0:
+                conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+
+    def invalidate(self, key: str) -> None:
+        """Remove a key from the cache immediately, in every worker."""
+        with self._lock:
+            self._memo.pop(key, None)
+            self._local.pop(key, None)
+            self._db().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def update(self, key: str, fn: Callable[[Any], Any], ttl: float) -> Any:
+        """Atomically replace key's value with fn(current value or None), across workers."""
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+                ).fetchone()
+                current = pickle.loads(row[0]) if row is not None and time.time() <= row[1] else None
+                value = fn(current)
+                self._write(conn, key, value, ttl)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                self._memo.pop(key, None)
+                raise
+            return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memo.clear()
+            self._local.clear()
+            self._db().execute("DELETE FROM cache")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._memo.clear()
+
+
+def _make_cache():
+    backend = os.environ.get("CACHE_BACKEND", "").lower()
+    if not backend:
+        backend = "sqlite" if int(os.environ.get("WEB_CONCURRENCY", "1") or 1) > 1 else "memory"
+    if backend == "sqlite":
+        path = os.environ.get("CACHE_DB_PATH", os.path.join(tempfile.gettempdir(), "uct_cache.db"))
+        print(f"[cache] Shared SQLite cache at {path}")
+        return SQLiteCache(path)
+    return TTLCache()
+
 
 # Singleton used across all services
-cache = TTLCache()
+cache = _make_cache()
@@ -0,0 +1,349 @@
+"""
+Chart rendering service — content-addressed, disk-cached candlestick PNGs.
+
+A chart's key is a hash of ticker, timeframe, style version and the last bar (timestamp
+plus OHLCV, so a still-forming bar re-renders when it moves). Identical charts are
+rendered once and served to every viewer from CHART_CACHE_DIR; the PNG at
+/api/chart/img/{key}.png never changes, so it is served immutable.
+
+Bars come from yfinance and are held in the TTL cache per (ticker, timeframe) for
+BARS_TTL seconds, so a cache hit costs a dict lookup and a stat. Rendering runs in a
+spawn-context process pool (matplotlib is CPU-bound and not thread-safe); concurrent
+requests for the same key share one render, and at most MAX_QUEUE distinct renders
+may be pending before new ones are refused with ChartBusy.
+
+The disk cache is bounded by MAX_CACHE_BYTES: hits touch the file's mtime and the
+least recently used files are evicted down to 90% once the bound is crossed.
+prerender() warms the popular names (UCT20 leaders, today's earnings, index ETFs)
+after the close.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from api.services.cache import cache
+
+_DEFAULT_DIR = (
+    "/data/chart_cache"
+    if os.path.isdir("/data")
+    else os.path.join(os.path.dirname(__file__), "..", "..", "data", "chart_cache")
+)
+CACHE_DIR: str = os.environ.get("CHART_CACHE_DIR", _DEFAULT_DIR)
+MAX_CACHE_BYTES = int(os.environ.get("CHART_CACHE_MAX_MB", "256")) * 1024 * 1024
+RENDER_WORKERS = int(os.environ.get("CHART_RENDER_WORKERS", "2"))
+MAX_QUEUE = 32
+RENDER_TIMEOUT = 30  # seconds a request waits for its render
+STYLE_VERSION = "dark-v1"  # bump when _make_style or plot arguments change
+PRERENDER_TIMEFRAMES = ("D",)
+PRERENDER_ALWAYS = ("SPY", "QQQ", "IWM", "DIA")
+
+# Timeframe → yfinance period/interval
+TF_CONFIG = {
+    '5':  {'period': '2d',  'interval': '5m'},
+    '30': {'period': '5d',  'interval': '30m'},
+    '60': {'period': '1mo', 'interval': '60m'},
+    'D':  {'period': '6mo', 'interval': '1d'},
+    'W':  {'period': '2y',  'interval': '1wk'},
+}
+
+# How long fetched bars are trusted before we look for a newer last bar
+BARS_TTL = {'5': 60, '30': 120, '60': 300, 'D': 300, 'W': 900}
+
+# Internal yfinance ticker overrides
+YF_TICKERS = {
+    'VIX': '^VIX',
+    'BTC': 'BTC-USD',
+}
+
+
+class ChartBusy(Exception):
+    """Render queue is full — caller should retry shortly."""
+
+
+_lock = threading.Lock()
+_inflight: dict[str, Future] = {}
+_executor = None
+_disk = {"scanned": False, "bytes": 0}
+_stats = {"hits": 0, "renders": 0, "evicted": 0, "busy": 0}
+
+
+# ─── Rendering (runs in the worker processes) ─────────────────────────────────
+
+def _make_style():
+    import mplfinance as mpf
+    mc = mpf.make_marketcolors(
+        up='#3cb868', down='#e74c3c',
+        edge='inherit', wick='inherit',
+    )
+    return mpf.make_mpf_style(
+        base_mpf_style='nightclouds',
+        marketcolors=mc,
+        facecolor='#0f1117',
+        figcolor='#0f1117',
+        gridcolor='#2a2d3a',
+        gridstyle='--',
+        gridaxis='both',
+        rc={
+            'axes.labelcolor': '#8a8fa8',
+            'xtick.color': '#8a8fa8',
+            'ytick.color': '#8a8fa8',
+            'font.family': 'monospace',
+        },
+    )
+
+
+_STYLE = None  # per worker process, built on first render
+
+
+def _render_png(df) -> bytes:
+    global _STYLE
+    import matplotlib
+    matplotlib.use('Agg')  # non-interactive backend, must be set before pyplot import
+    import mplfinance as mpf
+
+    if _STYLE is None:
+        _STYLE = _make_style()
+    buf = BytesIO()
+    mpf.plot(
+        df,
+        type='candle',
+        style=_STYLE,
+        figsize=(9, 4),
+        savefig=dict(fname=buf, dpi=110, bbox_inches='tight'),
+        volume=False,
+        closefig=True,
+    )
+    return buf.getvalue()
+
+
+# ─── Bars and keys ────────────────────────────────────────────────────────────
+
+def _fetch_bars(ticker: str, tf: str):
+    import yfinance as yf
+
+    config = TF_CONFIG[tf]
+    df = yf.Ticker(YF_TICKERS.get(ticker, ticker)).history(
+        period=config['period'], interval=config['interval'],
+    )
+    # Strip timezone for mplfinance compatibility
+    if not df.empty and df.index.tzinfo is not None:
+        df.index = df.index.tz_localize(None)
+    return df
+
+
+def _load_bars(ticker: str, tf: str):
+    cache_key = f"chart_bars_{ticker}_{tf}"
+    df = cache.get(cache_key)
+    if df is None:
+        df = _fetch_bars(ticker, tf)
+        cache.set(cache_key, df, ttl=BARS_TTL[tf])
+    return df
+
+
+def chart_key(ticker: str, tf: str, df) -> str:
+    last = df.iloc[-1]
+    parts = [
+        ticker, tf, STYLE_VERSION, str(len(df)), df.index[-1].isoformat(),
+        *(f"{float(last[c]):.6g}" for c in ("Open", "High", "Low", "Close", "Volume") if c in df.columns),
+    ]
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()[:32]
+
+
+def image_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, f"{key}.png")
+
+
+# ─── Disk cache ───────────────────────────────────────────────────────────────
+
+def _scan_disk() -> None:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    total = 0
+    for entry in os.scandir(CACHE_DIR):
+        if entry.name.endswith(".png"):
+            total += entry.stat().st_size
+    _disk.update(scanned=True, bytes=total)
+
+
+def _store(key: str, png: bytes) -> None:
+    path = image_path(key)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(png)
+    try:
+        replaced = os.path.getsize(path)   # re-render of the same key: count only the difference
+    except OSError:
+        replaced = 0
+    os.replace(tmp, path)
+    with _lock:
+        _disk["bytes"] += len(png) - replaced
+        over = _disk["bytes"] > MAX_CACHE_BYTES
+    if over:
+        _evict()
+
+
+def _evict() -> None:
+    """Delete least recently used images until the cache is at 90% of its bound."""
+    files = []
+    for entry in os.scandir(CACHE_DIR):
+        if entry.name.endswith(".png"):
+            st = entry.stat()
+            files.append((st.st_mtime, st.st_size, entry.path))
+    files.sort()
+    total = sum(size for _, size, _ in files)
+    target = MAX_CACHE_BYTES * 0.9
+    removed = 0
+    for _, size, path in files:
+        if total <= target:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    with _lock:
+        _disk["bytes"] = total
+        _stats["evicted"] += removed
+    if removed:
+        print(f"[charts] Evicted {removed} cached charts ({total / 1048576:.1f} MB kept)")
+
+
+def cached_image(key: str) -> str | None:
+    """Path of a cached image, touched so LRU eviction keeps it, or None."""
+    path = image_path(key)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+# ─── Render queue ─────────────────────────────────────────────────────────────
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=max(RENDER_WORKERS, 1), mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def _reset_executor() -> None:
+    global _executor
+    with _lock:
+        broken, _executor = _executor, None
+    if broken is not None:
+        broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit(key: str, df) -> Future:
+    """Queue a render for key, or join the one already running.
+
+    The returned future resolves once the PNG is on disk.
+    """
+    with _lock:
+        fut = _inflight.get(key)
+        if fut is not None:
+            return fut
+        if len(_inflight) >= MAX_QUEUE:
+            _stats["busy"] += 1
+            raise ChartBusy()
+        fut = Future()
+        _inflight[key] = fut
+        _stats["renders"] += 1
+
+    def _done(render: Future) -> None:
+        try:
+            _store(key, render.result())
+            fut.set_result(key)
+        except Exception as e:
+            print(f"[charts] Render failed for {key}: {e}")
+            if isinstance(e, BrokenProcessPool):
+                _reset_executor()  # a worker died; start a fresh pool on the next render
+            fut.set_exception(e)
+        finally:
+            with _lock:
+                _inflight.pop(key, None)
+
+    try:
+        _get_executor().submit(_render_png, df).add_done_callback(_done)
+    except Exception:
+        with _lock:
+            _inflight.pop(key, None)
+        raise
+    return fut
+
+
+def get_chart(ticker: str, tf: str) -> str | None:
+    """Key of the current chart for ticker/tf, rendering it if needed. None if no bars.
+
+    Raises ChartBusy when the render queue is full.
+    """
+    ticker = ticker.upper()
+    tf = tf if tf in TF_CONFIG else 'D'
+    if not _disk["scanned"]:
+        _scan_disk()
+    df = _load_bars(ticker, tf)
+    if df is None or df.empty:
+        return None
+    key = chart_key(ticker, tf, df)
+    if cached_image(key):
+        _stats["hits"] += 1
+        return key
+    return _submit(key, df).result(timeout=RENDER_TIMEOUT)
+
+
+# ─── Prerender ────────────────────────────────────────────────────────────────
+
+def popular_tickers() -> list[str]:
+    """UCT20 leaders, today's earnings names and the index ETFs, deduped."""
+    from api.services.engine import get_earnings, get_leadership
+
+    tickers = list(PRERENDER_ALWAYS)
+    try:
+        tickers += [item.get("ticker") or item.get("sym") or item.get("symbol") or ""
+                    for item in get_leadership()[:20]]
+    except Exception as e:
+        print(f"[charts] Leadership unavailable for prerender: {e}")
+    try:
+        earnings = get_earnings()
+        for side in ("bmo", "amc"):
+            tickers += [e.get("symbol") or e.get("sym") or "" for e in earnings.get(side, [])]
+    except Exception as e:
+        print(f"[charts] Earnings unavailable for prerender: {e}")
+    return list(dict.fromkeys(t.upper() for t in tickers if t))
+
+
+def prerender(tickers: list[str] | None = None, timeframes=PRERENDER_TIMEFRAMES) -> int:
+    """Render the popular charts ahead of demand. Returns how many were newly rendered."""
+    tickers = popular_tickers() if tickers is None else tickers
+    rendered = 0
+    for ticker in tickers:
+        for tf in timeframes:
+            before = _stats["renders"]
+            try:
+                get_chart(ticker, tf)
+            except ChartBusy:
+                print("[charts] Prerender stopped: render queue full")
+                return rendered
+            except Exception as e:
+                print(f"[charts] Prerender failed for {ticker} {tf}: {e}")
+                continue
+            rendered += _stats["renders"] - before
+    print(f"[charts] Prerendered {rendered} charts for {len(tickers)} tickers")
+    return rendered
+
+
+def get_stats() -> dict:
+    with _lock:
+        return {**_stats, "inflight": len(_inflight), "cache_bytes": _disk["bytes"]}
+
+
+def shutdown() -> None:
+    _reset_executor()
@@ -0,0 +1,308 @@
+"""
+Community stats — cross-user journal aggregates, maintained incrementally with privacy thresholds.
+
+community_rollups holds additive sums per (dimension, bucket, day) over every user's
+closed trades for the dimensions the community page shows (ALL, setup, direction).
+community_traders records, per (dimension, bucket, user), how many trades the user
+contributes and the latest day they did; counting its rows with last_day in a window
+gives the distinct traders behind a bucket without touching journal_entries.
+
+Both tables move in step with journal_rollups: its add/remove paths call add() and
+remove() in the same transaction, so a trade closing, being edited, reopened or
+deleted updates the community view immediately. Days are entry days, as in
+journal_rollups, so the 7d/30d windows cover closed trades entered in that window.
+
+k-anonymity is applied per breakdown: the totals, every setup and every direction
+are shown only when at least MIN_TRADERS distinct traders contribute to that bucket
+in the requested window. Rates (win rate, averages) additionally need
+MIN_BUCKET_TRADES trades. Suppression is complementary: the total is shown, so a
+breakdown never leaves exactly one bucket hidden (it would be the total minus the
+rest) — the next-smallest bucket is hidden with it. The 7-day recent activity count
+needs MIN_TRADERS traders in its own window.
+"""
+
+import os
+from datetime import date, timedelta
+
+from api.services.auth_db import get_connection
+
+MIN_TRADERS = int(os.environ.get("COMMUNITY_MIN_TRADERS", "3"))
+MIN_BUCKET_TRADES = 3
+DIMENSIONS = ("ALL", "setup", "direction")
+WINDOWS = {"7d": 7, "30d": 30, "all": None}
+
+_SUM_COLS = ("trade_count", "pnl_count", "wins", "win_sum", "loss_sum", "pnl_sum", "r_count", "r_sum")
+
+
+# ── Schema ───────────────────────────────────────────────────────────────────
+
+def install(conn) -> None:
+    """Create the tables; backfill them from journal_rollups on first start. Caller commits."""
+    conn.executescript(f"""
+        CREATE TABLE IF NOT EXISTS community_rollups (
+            dimension TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            day TEXT NOT NULL,
+            {', '.join(f'{c} REAL NOT NULL DEFAULT 0' for c in _SUM_COLS)},
+            PRIMARY KEY (dimension, bucket, day)
+        );
+        CREATE TABLE IF NOT EXISTS community_traders (
+            dimension TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            trades INTEGER NOT NULL DEFAULT 0,
+            last_day TEXT NOT NULL,
+            PRIMARY KEY (dimension, bucket, user_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_community_traders_window ON community_traders(dimension, bucket, last_day);
+    """)
+    if conn.execute("SELECT 1 FROM community_rollups LIMIT 1").fetchone():
+        return
+    if not conn.execute("SELECT 1 FROM journal_rollups LIMIT 1").fetchone():
+        return
+    dims = ",".join("?" * len(DIMENSIONS))
+    conn.execute(
+        f"INSERT INTO community_rollups (dimension, bucket, day, {', '.join(_SUM_COLS)}) "
+        f"SELECT dimension, bucket, day, {', '.join(f'SUM({c})' for c in _SUM_COLS)} FROM journal_rollups "
+        f"WHERE dimension IN ({dims}) GROUP BY dimension, bucket, day",
+        DIMENSIONS,
+    )
+    conn.execute(
+        "INSERT INTO community_traders (dimension, bucket, user_id, trades, last_day) "
+        "SELECT dimension, bucket, user_id, SUM(trade_count), MAX(day) FROM journal_rollups "
+        f"WHERE dimension IN ({dims}) AND trade_count > 0 GROUP BY dimension, bucket, user_id",
+        DIMENSIONS,
+    )
+    print("[community] Backfilled community rollups from journal_rollups")
+
+
+# ── Incremental maintenance (called by journal_rollups) ─────────────────────
+
+def _deltas(entries: list[dict]) -> tuple[dict, dict]:
+    from api.services.journal_rollups import _contribution, _day, bucket_keys
+
+    sums: dict[tuple, dict] = {}
+    traders: dict[tuple, list] = {}   # (dim, bucket, user) → [trades, last_day]
+    for e in entries:
+        c = _contribution(e)
+        day = _day(e)
+        for dim in DIMENSIONS:
+            for bucket in bucket_keys(e, dim):
+                agg = sums.setdefault((dim, bucket, day), dict.fromkeys(_SUM_COLS, 0))
+                for k in _SUM_COLS:
+                    agg[k] += c[k]
+                t = traders.setdefault((dim, bucket, e["user_id"]), [0, day])
+                t[0] += 1
+                t[1] = max(t[1], day)
+    return sums, traders
+
+
+def add(conn, entries: list[dict]) -> None:
+    """Fold closed trades in. Caller commits."""
+    sums, traders = _deltas(entries)
+    conn.executemany(
+        f"INSERT INTO community_rollups (dimension, bucket, day, {', '.join(_SUM_COLS)}) "
+        f"VALUES (?, ?, ?, {', '.join('?' * len(_SUM_COLS))}) ON CONFLICT(dimension, bucket, day) DO UPDATE SET "
+        + ", ".join(f"{c} = {c} + excluded.{c}" for c in _SUM_COLS),
+        [(*key, *(agg[k] for k in _SUM_COLS)) for key, agg in sums.items()],
+    )
+    conn.executemany(
+        "INSERT INTO community_traders (dimension, bucket, user_id, trades, last_day) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(dimension, bucket, user_id) DO UPDATE SET trades = trades + excluded.trades, "
+        "last_day = MAX(last_day, excluded.last_day)",
+        [(*key, n, day) for key, (n, day) in traders.items()],
+    )
+
+
+def remove(conn, entry: dict) -> None:
+    """Take one closed trade out. Run after journal_rollups has removed it. Caller commits."""
+    sums, traders = _deltas([entry])
+    for key, agg in sums.items():
+        conn.execute(
+            "UPDATE community_rollups SET " + ", ".join(f"{c} = {c} - ?" for c in _SUM_COLS)
+            + " WHERE dimension = ? AND bucket = ? AND day = ?",
+            (*(agg[k] for k in _SUM_COLS), *key),
+        )
+        conn.execute(
+            "DELETE FROM community_rollups WHERE dimension = ? AND bucket = ? AND day = ? AND trade_count <= 0",
+            key,
+        )
+    for (dim, bucket, user_id), (n, day) in traders.items():
+        conn.execute(
+            "UPDATE community_traders SET trades = trades - ? WHERE dimension = ? AND bucket = ? AND user_id = ?",
+            (n, dim, bucket, user_id),
+        )
+        row = conn.execute(
+            "SELECT trades, last_day FROM community_traders WHERE dimension = ? AND bucket = ? AND user_id = ?",
+            (dim, bucket, user_id),
+        ).fetchone()
+        if row is None:
+            continue
+        if row["trades"] <= 0:
+            conn.execute(
+                "DELETE FROM community_traders WHERE dimension = ? AND bucket = ? AND user_id = ?",
+                (dim, bucket, user_id),
+            )
+        elif row["last_day"] == day:
+            # The user's latest trade in this bucket may have been this one
+            latest = conn.execute(
+                "SELECT MAX(day) FROM journal_rollups WHERE user_id = ? AND dimension = ? AND bucket = ? "
+                "AND trade_count > 0",
+                (user_id, dim, bucket),
+            ).fetchone()[0]
+            conn.execute(
+                "UPDATE community_traders SET last_day = ? WHERE dimension = ? AND bucket = ? AND user_id = ?",
+                (latest or day, dim, bucket, user_id),
+            )
+
+
+def remove_user(conn, user_id: str) -> None:
+    """Take out everything a user contributes. Run before their journal_rollups rows go. Caller commits."""
+    dims = ",".join("?" * len(DIMENSIONS))
+    rows = conn.execute(
+        f"SELECT dimension, bucket, day, {', '.join(_SUM_COLS)} FROM journal_rollups "
+        f"WHERE user_id = ? AND dimension IN ({dims})",
+        (user_id, *DIMENSIONS),
+    ).fetchall()
+    conn.executemany(
+        "UPDATE community_rollups SET " + ", ".join(f"{c} = {c} - ?" for c in _SUM_COLS)
+        + " WHERE dimension = ? AND bucket = ? AND day = ?",
+        [(*(r[c] for c in _SUM_COLS), r["dimension"], r["bucket"], r["day"]) for r in rows],
+    )
+    conn.execute("DELETE FROM community_rollups WHERE trade_count <= 0")
+    conn.execute("DELETE FROM community_traders WHERE user_id = ?", (user_id,))
+
+
+# ── Reads ────────────────────────────────────────────────────────────────────
+
+def _hidden(buckets: dict[str, dict], listed, traders: dict[str, int]) -> set[str]:
+    """Buckets of one breakdown that can't be shown: too few traders, or never listed —
+    plus the smallest listed one when a single bucket would otherwise be recoverable."""
+    sensitive = {b for b in buckets if traders.get(b, 0) < MIN_TRADERS}
+    hidden = sensitive | {b for b in buckets if b not in listed}
+    if len(hidden) == 1 and hidden <= sensitive:
+        visible = [b for b in buckets if b not in hidden]
+        if visible:
+            hidden.add(min(visible, key=lambda b: buckets[b]["trade_count"]))
+    return hidden
+
+
+def _bucket_stats(r: dict) -> dict:
+    n, pnl_n = int(r["trade_count"]), int(r["pnl_count"])
+    losses = pnl_n - int(r["wins"])
+    rated = n >= MIN_BUCKET_TRADES and pnl_n > 0
+    return {
+        "count": n,
+        "win_rate": round(r["wins"] / pnl_n * 100, 1) if rated else None,
+        "avg_pnl": round(r["pnl_sum"] / pnl_n, 2) if rated else None,
+        "avg_win_pct": round(r["win_sum"] / r["wins"], 2) if rated and r["wins"] else None,
+        "avg_loss_pct": round(r["loss_sum"] / losses, 2) if rated and losses else None,
+        "profit_factor": round(r["win_sum"] / r["loss_sum"], 2) if rated and r["loss_sum"] > 0 else None,
+        "avg_r": round(r["r_sum"] / r["r_count"], 2) if rated and r["r_count"] else None,
+    }
+
+
+def get_stats(window: str = "all") -> dict:
+    """Community aggregates for a window (7d, 30d, all), k-anonymised per bucket."""
+    if window not in WINDOWS:
+        raise ValueError(f"Unknown window: {window}")
+    days = WINDOWS[window]
+    start = (date.today() - timedelta(days=days)).isoformat() if days else ""
+
+    conn = get_connection()
+    try:
+        sums = conn.execute(
+            f"SELECT dimension, bucket, {', '.join(f'SUM({c}) AS {c}' for c in _SUM_COLS)} "
+            "FROM community_rollups WHERE day >= ? GROUP BY dimension, bucket",
+            (start,),
+        ).fetchall()
+        traders = {
+            (r["dimension"], r["bucket"]): r["n"] for r in conn.execute(
+                "SELECT dimension, bucket, COUNT(*) AS n FROM community_traders WHERE last_day >= ? "
+                "GROUP BY dimension, bucket",
+                (start,),
+            ).fetchall()
+        }
+        week = (date.today() - timedelta(days=7)).isoformat()
+        recent = conn.execute(
+            "SELECT COALESCE(SUM(trade_count), 0) FROM community_rollups WHERE dimension = 'ALL' AND day >= ?",
+            (week,),
+        ).fetchone()[0]
+        recent_traders = conn.execute(
+            "SELECT COUNT(*) FROM community_traders WHERE dimension = 'ALL' AND bucket = 'ALL' AND last_day >= ?",
+            (week,),
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+    by_dim: dict[str, dict] = {d: {} for d in DIMENSIONS}
+    for r in sums:
+        if r["trade_count"] > 0:
+            by_dim[r["dimension"]][r["bucket"]] = dict(r)
+
+    total = by_dim["ALL"].get("ALL")
+    unique_traders = traders.get(("ALL", "ALL"), 0)
+    result = {
+        "window": window,
+        "min_traders": MIN_TRADERS,
+        "total_closed_trades": int(total["trade_count"]) if total else 0,
+        "unique_traders": unique_traders,
+        "community_win_rate": 0,
+        "avg_win_pct": 0,
+        "avg_loss_pct": 0,
+        "profit_factor": 0,
+        "popular_setups": [],
+        "best_setups": [],
+        "setups": [],
+        "direction_split": {"long": 0, "short": 0},
+        "recent_activity": 0,
+        "suppressed": {"setups": 0, "directions": 0},
+    }
+    # Suppress everything until enough traders contribute in this window
+    if not total or unique_traders < MIN_TRADERS:
+        return result
+
+    overall = _bucket_stats(total)
+    result.update({
+        "community_win_rate": overall["win_rate"] or 0,
+        "avg_win_pct": overall["avg_win_pct"] or 0,
+        "avg_loss_pct": overall["avg_loss_pct"] or 0,
+        "profit_factor": overall["profit_factor"] or 0,
+        "recent_activity": int(recent) if recent_traders >= MIN_TRADERS else 0,
+    })
+
+    hidden = _hidden(by_dim["setup"], [b for b in by_dim["setup"] if b != "No Setup"],
+                     {b: n for (d, b), n in traders.items() if d == "setup"})
+    setups = []
+    for bucket, r in by_dim["setup"].items():
+        if bucket == "No Setup":
+            continue
+        if bucket in hidden:
+            result["suppressed"]["setups"] += 1
+            continue
+        setups.append({
+            "setup": bucket,
+            **_bucket_stats(r),
+            "share_pct": round(r["trade_count"] / total["trade_count"] * 100, 1),
+        })
+    setups.sort(key=lambda s: s["count"], reverse=True)
+    result["setups"] = setups
+    result["popular_setups"] = [{"setup": s["setup"], "count": s["count"]} for s in setups[:8]]
+    rated = sorted((s for s in setups if s["win_rate"] is not None), key=lambda s: s["win_rate"], reverse=True)
+    result["best_setups"] = [
+        {"setup": s["setup"], "total": s["count"], "win_rate": s["win_rate"], "avg_pnl": s["avg_pnl"]}
+        for s in rated[:5]
+    ]
+
+    hidden = _hidden(by_dim["direction"], ("long", "short"),
+                     {b: n for (d, b), n in traders.items() if d == "direction"})
+    for direction in ("long", "short"):
+        r = by_dim["direction"].get(direction)
+        if r is None:
+            continue
+        if direction in hidden:
+            result["direction_split"][direction] = None
+            result["suppressed"]["directions"] += 1
+        else:
+            result["direction_split"][direction] = int(r["trade_count"])
+    return result
@@ -4,28 +4,20 @@ Sends real-time alerts to a Discord channel when users sign up, cancel, etc.
 """
 
 import os
-import threading
-import requests
 from datetime import datetime, timezone
 
 DISCORD_ADMIN_WEBHOOK = os.environ.get("DISCORD_WEBHOOK_URL", "")
 
-def _send_webhook(embed: dict):
-    """Fire-and-forget Discord webhook in a background thread."""
+def _send_webhook(embed: dict, dedup_key: str | None = None):
+    """Queue a Discord webhook post (delivered by api.services.outbox)."""
     if not DISCORD_ADMIN_WEBHOOK:
         return
 
-    def _post():
-        try:
-            requests.post(
-                DISCORD_ADMIN_WEBHOOK,
-                json={"embeds": [embed]},
-                timeout=5,
-            )
-        except Exception:
-            pass  # Never crash the app for a notification failure
-
-    threading.Thread(target=_post, daemon=True).start()
+    try:
+        from api.services.outbox import enqueue_discord
+        enqueue_discord(DISCORD_ADMIN_WEBHOOK, embed, dedup_key=dedup_key)
+    except Exception as e:
+        print(f"[discord] Could not queue webhook: {e}")  # Never crash the app for a notification failure
 
 
 def notify_signup(email: str, display_name: str = ""):
@@ -71,7 +63,7 @@ def notify_churn_risk(email: str, days_inactive: int):
         "description": f"**{email}** hasn't logged in for **{days_inactive} days** but has an active subscription",
         "color": 0xE74C3C,
         "timestamp": datetime.now(timezone.utc).isoformat(),
-    })
+    }, dedup_key=f"churn_risk:{email}:{datetime.now(timezone.utc).date()}")
 
 
 def notify_admin_action(admin_email: str, action: str, target_email: str):
@@ -1,38 +1,17 @@
 """Earnings Intelligence — Finnhub analyst consensus, EPS beat history, price targets.
 
-Cached 6 hours per ticker via the shared TTLCache singleton.
+Cached 6 hours per ticker via the shared TTLCache singleton; the raw Finnhub responses
+are cached per endpoint by api.services.finnhub.
 """
 
-import os
 import logging
-import requests
 
+from api.services import finnhub
 from api.services.cache import cache
 
 _logger = logging.getLogger(__name__)
 
 _CACHE_TTL = 21_600  # 6 hours
-_TIMEOUT = 6  # seconds per Finnhub request
-
-
-def _fh_get(path: str, params: dict) -> dict | list | None:
-    """Fire a Finnhub GET request. Returns parsed JSON or None on failure."""
-    api_key = os.environ.get("FINNHUB_API_KEY", "")
-    if not api_key:
-        _logger.warning("FINNHUB_API_KEY not set — earnings intel unavailable")
-        return None
-    params["token"] = api_key
-    try:
-        resp = requests.get(
-            f"https://finnhub.io/api/v1{path}",
-            params=params,
-            timeout=_TIMEOUT,
-        )
-        resp.raise_for_status()
-        return resp.json()
-    except Exception as exc:
-        _logger.warning("Finnhub %s failed for %s: %s", path, params.get("symbol", "?"), exc)
-        return None
 
 
 def get_earnings_intel(ticker: str) -> dict | None:
@@ -49,9 +28,14 @@ def get_earnings_intel(ticker: str) -> dict | None:
     if cached is not None:
         return cached
 
+    eps_raw, rec_raw, pt_raw = finnhub.get_many([
+        ("/stock/earnings", {"symbol": ticker, "limit": 4}),
+        ("/stock/recommendation", {"symbol": ticker}),
+        ("/stock/price-target", {"symbol": ticker}),
+    ])
+
     # ── 1. Historical EPS (last 4 quarters) ─────────────────────────────────
     beat_history = []
-    eps_raw = _fh_get("/stock/earnings", {"symbol": ticker, "limit": 4})
     if isinstance(eps_raw, list):
         for q in eps_raw:
             actual = q.get("actual")
@@ -69,7 +53,6 @@ def get_earnings_intel(ticker: str) -> dict | None:
 
     # ── 2. Analyst recommendation consensus ──────────────────────────────────
     consensus = None
-    rec_raw = _fh_get("/stock/recommendation", {"symbol": ticker})
     if isinstance(rec_raw, list) and rec_raw:
         latest = rec_raw[0]  # most recent month
         consensus = {
@@ -83,7 +66,6 @@ def get_earnings_intel(ticker: str) -> dict | None:
 
     # ── 3. Price target ──────────────────────────────────────────────────────
     price_target = None
-    pt_raw = _fh_get("/stock/price-target", {"symbol": ticker})
     if isinstance(pt_raw, dict) and pt_raw.get("targetMean") is not None:
         price_target = {
             "targetHigh": pt_raw.get("targetHigh"),
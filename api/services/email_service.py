@@ -4,6 +4,8 @@ Dark-themed HTML templates matching UCT dashboard branding.
 """
 
 import os
+import re
+import html as _html
 import logging
 
 logger = logging.getLogger(__name__)
@@ -27,25 +29,33 @@ else:
 
 # ── Core send ────────────────────────────────────────────────────────────────
 
-def send_email(to: str, subject: str, html: str) -> bool:
-    """Send an email via Resend. Returns True on success, False on failure."""
+def send_email(to: str, subject: str, html: str, dedup_key: str | None = None) -> bool:
+    """Queue an email for delivery via Resend (api.services.outbox). Returns True if queued."""
     if not _resend:
         logger.warning(f"[email] Skipping email to {to} (Resend not configured)")
         return False
     try:
-        _resend.Emails.send({
-            "from": FROM_EMAIL,
-            "to": [to],
-            "subject": subject,
-            "html": html,
-        })
-        logger.info(f"[email] Sent '{subject}' to {to}")
+        from api.services.outbox import enqueue_email
+        enqueue_email(to, subject, html, dedup_key=dedup_key)
         return True
     except Exception as e:
-        logger.error(f"[email] Failed to send '{subject}' to {to}: {e}")
+        logger.error(f"[email] Failed to queue '{subject}' to {to}: {e}")
         return False
 
 
+def deliver_email(to: str, subject: str, html: str) -> None:
+    """Send an email via Resend now. Raises on failure — called by the outbox dispatcher."""
+    if not _resend:
+        raise RuntimeError("Resend not configured")
+    _resend.Emails.send({
+        "from": FROM_EMAIL,
+        "to": [to],
+        "subject": subject,
+        "html": html,
+    })
+    logger.info(f"[email] Sent '{subject}' to {to}")
+
+
 # ── HTML wrapper ─────────────────────────────────────────────────────────────
 
 def _wrap_html(content: str) -> str:
@@ -130,3 +140,12 @@ def send_subscription_confirmation(email: str, display_name: str) -> bool:
 <p style="font-size:13px;color:#a8a290;line-height:1.6;margin:0 0 16px 0;">You have unlimited access to every tool in the dashboard. Manage your billing anytime from Settings.</p>
 <p style="font-size:13px;color:#c9a84c;text-align:center;font-weight:500;margin:8px 0 0 0;">Welcome to the team.</p>""")
     return send_email(email, "Pro subscription confirmed — UCT Intelligence", html)
+
+
+def send_alert_email(email: str, title: str, message: str, dedup_key: str | None = None) -> bool:
+    body = re.sub(r"\*\*(.+?)\*\*", r"<strong>\1</strong>", _html.escape(message))
+    html = _wrap_html(f"""\
+<h1 style="font-size:20px;font-weight:600;color:#e8e6df;text-align:center;margin:0 0 4px 0;">{_html.escape(title)}</h1>
+<p style="font-size:14px;color:#a8a290;text-align:center;line-height:1.6;margin:0 0 16px 0;">{body}</p>
+<p style="font-size:12px;color:#6b6a60;text-align:center;margin:16px 0 0 0;">Change which alerts you get by email in Settings &rarr; Alert Notifications.</p>""")
+    return send_email(email, f"{title} — UCT Alert", html, dedup_key=dedup_key)
@@ -530,15 +530,11 @@ def get_earnings() -> dict:
             }
             if pending_syms:
                 try:
-                    import requests as _req2
-                    fh_r = _req2.get(
-                        "https://finnhub.io/api/v1/calendar/earnings",
-                        params={"from": yesterday, "to": today, "token": fh_key},
-                        timeout=15,
-                    )
+                    from api.services import finnhub
+                    fh_cal = finnhub.get("/calendar/earnings", {"from": yesterday, "to": today}, timeout=15)
                     fh_map = {
                         e["symbol"]: e
-                        for e in fh_r.json().get("earningsCalendar", [])
+                        for e in (fh_cal or {}).get("earningsCalendar", [])
                         if e.get("symbol") in pending_syms
                         and e.get("epsActual") is not None
                     }
@@ -571,14 +567,10 @@ def get_earnings() -> dict:
     if fh_key:
         ew_syms = {e["symbol"] for e in amc_tonight_raw}
         try:
-            import requests as _req3
-            fh_r2 = _req3.get(
-                "https://finnhub.io/api/v1/calendar/earnings",
-                params={"from": today, "to": today, "token": fh_key},
-                timeout=15,
-            )
+            from api.services import finnhub
+            fh_cal2 = finnhub.get("/calendar/earnings", {"from": today, "to": today}, timeout=15)
             fh_today_amc = [
-                e for e in fh_r2.json().get("earningsCalendar", [])
+                e for e in (fh_cal2 or {}).get("earningsCalendar", [])
                 if e.get("hour", "").lower() == "amc"
             ]
             fh_by_sym = {e["symbol"]: e for e in fh_today_amc}
@@ -631,6 +623,11 @@ def get_earnings() -> dict:
     _enrich_earnings_with_gap(data)
     _prewarm_earnings_analysis(data)
     cache.set("earnings", data, ttl=1800)
+    try:
+        from api.services.alert_rules import on_earnings
+        on_earnings(data)
+    except Exception as e:
+        _logger.warning("Earnings alert rule evaluation failed: %s", e)
     return data
 
 
@@ -731,7 +728,6 @@ def _generate_earnings_analysis(sym: str, row: dict | None) -> dict:
     import requests as _req
 
     av_key  = os.environ.get("ALPHAVANTAGE_API_KEY", "")
-    fh_key  = os.environ.get("FINNHUB_API_KEY", "")
 
     # ── Step 1: Alpha Vantage quarterly history ───────────────────────────────
     yoy_eps_growth = None
@@ -781,11 +777,10 @@ def _generate_earnings_analysis(sym: str, row: dict | None) -> dict:
     try:
         today_str = _dt.date.today().isoformat()
         from_str  = (_dt.date.today() - _dt.timedelta(days=3)).isoformat()
-        fh_url = (
-            f"https://finnhub.io/api/v1/company-news"
-            f"?symbol={sym}&from={from_str}&to={today_str}&token={fh_key}"
-        )
-        fh_resp = _with_retry(lambda: _req.get(fh_url, timeout=_FH_TIMEOUT_SECS).json())
+        from api.services import finnhub
+        fh_resp = _with_retry(lambda: finnhub.get(
+            "/company-news", {"symbol": sym, "from": from_str, "to": today_str}, timeout=_FH_TIMEOUT_SECS,
+        ))
         if not isinstance(fh_resp, list):
             raise ValueError(f"Finnhub returned unexpected shape: {type(fh_resp)}")
         for item in fh_resp[:_EARNINGS_NEWS_MAX_ITEMS]:
@@ -915,7 +910,6 @@ def _generate_earnings_preview(sym: str, row: dict) -> dict:
     import datetime as _dt
     import requests as _req
     av_key = os.environ.get("ALPHAVANTAGE_API_KEY", "")
-    fh_key = os.environ.get("FINNHUB_API_KEY", "")
 
     # ── Step 1: Alpha Vantage quarterly history ────────────────────────────────
     yoy_eps_growth = None
@@ -963,11 +957,10 @@ def _generate_earnings_preview(sym: str, row: dict) -> dict:
     try:
         today_str = _dt.date.today().isoformat()
         from_str  = (_dt.date.today() - _dt.timedelta(days=3)).isoformat()
-        fh_url = (
-            f"https://finnhub.io/api/v1/company-news"
-            f"?symbol={sym}&from={from_str}&to={today_str}&token={fh_key}"
-        )
-        fh_resp = _with_retry(lambda: _req.get(fh_url, timeout=_FH_TIMEOUT_SECS).json())
+        from api.services import finnhub
+        fh_resp = _with_retry(lambda: finnhub.get(
+            "/company-news", {"symbol": sym, "from": from_str, "to": today_str}, timeout=_FH_TIMEOUT_SECS,
+        ))
         if not isinstance(fh_resp, list):
             raise ValueError(f"Finnhub returned unexpected shape: {type(fh_resp)}")
         for item in fh_resp[:_EARNINGS_NEWS_MAX_ITEMS]:
@@ -0,0 +1,176 @@
+"""
+Event buffer — batched page-view and activity-log writes for auth.db.
+
+Request threads only append to an in-memory buffer; a flush writes everything in one
+transaction with executemany and folds page views into the page_view_daily rollup that
+admin analytics read from. auth_service.flush_pending_writes() drains it on the
+write-behind timer and once more on shutdown, so a graceful restart loses nothing.
+
+Back-pressure: once the buffer passes FLUSH_HIGH_WATER the producer that crossed it
+flushes inline (if no flush is already running). If the buffer is full anyway, new
+events are dropped and counted rather than blocking the request.
+"""
+
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+
+MAX_BUFFERED = 10_000
+FLUSH_HIGH_WATER = 2_000
+PAGE_VIEW_DEDUP_SECONDS = 60
+
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_page_views: deque = deque()        # (id, user_id, page, created_at)
+_activity: deque = deque()          # (id, user_id, action, details, ip_address, created_at)
+_recent_views: dict[tuple[str, str], float] = {}  # (user_id, page) → epoch of last accepted view
+_stats = {"page_views_flushed": 0, "activity_flushed": 0,
+          "page_views_dropped": 0, "activity_dropped": 0, "page_views_deduped": 0}
+
+
+def _sqlite_now() -> str:
+    """UTC timestamp in the same format as SQLite's CURRENT_TIMESTAMP."""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _buffered() -> int:
+    return len(_page_views) + len(_activity)
+
+
+def _maybe_flush_inline() -> None:
+    if _buffered() < FLUSH_HIGH_WATER:
+        return
+    if not _flush_lock.acquire(blocking=False):
+        return  # someone is already draining
+    try:
+        from api.services.auth_db import get_connection
+        conn = get_connection()
+        views, activity = drain()
+        try:
+            write(conn, views, activity)
+            conn.commit()
+            mark_flushed(views, activity)
+        except Exception as e:
+            requeue(views, activity)
+            print(f"[events] Inline flush failed, re-queued {len(views) + len(activity)} events: {e}")
+        finally:
+            conn.close()
+    finally:
+        _flush_lock.release()
+
+
+def add_page_view(user_id: str, page: str) -> bool:
+    """Buffer a page view, deduped per user+page within 60s. Returns False if deduped or dropped."""
+    now = time.time()
+    key = (user_id, page)
+    with _lock:
+        last = _recent_views.get(key)
+        if last is not None and now - last < PAGE_VIEW_DEDUP_SECONDS:
+            _stats["page_views_deduped"] += 1
+            return False
+        if _buffered() >= MAX_BUFFERED:
+            _stats["page_views_dropped"] += 1
+            return False
+        _recent_views[key] = now
+        _page_views.append((str(uuid.uuid4()), user_id, page, _sqlite_now()))
+    _maybe_flush_inline()
+    return True
+
+
+def add_activity(user_id: str, action: str, details: str = "", ip_address: str = "") -> bool:
+    """Buffer an activity_log row. Returns False if dropped."""
+    with _lock:
+        if _buffered() >= MAX_BUFFERED:
+            _stats["activity_dropped"] += 1
+            return False
+        _activity.append((str(uuid.uuid4()), user_id, action, details, ip_address, _sqlite_now()))
+    _maybe_flush_inline()
+    return True
+
+
+def drain() -> tuple[list, list]:
+    """Take everything buffered. Pair with write() + mark_flushed(), or requeue() on failure."""
+    with _lock:
+        views, activity = list(_page_views), list(_activity)
+        _page_views.clear()
+        _activity.clear()
+        cutoff = time.time() - PAGE_VIEW_DEDUP_SECONDS
+        for key in [k for k, ts in _recent_views.items() if ts < cutoff]:
+            del _recent_views[key]
+    return views, activity
+
+
+def requeue(views: list, activity: list) -> None:
+    """Put a failed batch back at the front of the buffer."""
+    with _lock:
+        _page_views.extendleft(reversed(views))
+        _activity.extendleft(reversed(activity))
+
+
+def mark_flushed(views: list, activity: list) -> None:
+    with _lock:
+        _stats["page_views_flushed"] += len(views)
+        _stats["activity_flushed"] += len(activity)
+
+
+def write(conn, views: list, activity: list) -> None:
+    """Insert a drained batch on `conn` and fold page views into page_view_daily. Caller commits."""
+    if activity:
+        # The EXISTS guard skips rows for users deleted since the event was buffered,
+        # so one orphan can't fail the foreign key and wedge the whole batch.
+        conn.executemany(
+            "INSERT OR IGNORE INTO activity_log (id, user_id, action, details, ip_address, created_at) "
+            "SELECT ?, ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM users WHERE id = ?)",
+            [row + (row[1],) for row in activity],
+        )
+    if not views:
+        return
+    conn.executemany(
+        "INSERT OR IGNORE INTO page_views (id, user_id, page, created_at) VALUES (?, ?, ?, ?)",
+        views,
+    )
+    rollup: dict[tuple[str, str, str], list] = {}
+    for _, user_id, page, created_at in views:
+        key = (created_at[:10], user_id, page)
+        agg = rollup.setdefault(key, [0, created_at])
+        agg[0] += 1
+        agg[1] = max(agg[1], created_at)
+    conn.executemany(
+        "INSERT INTO page_view_daily (day, user_id, page, views, last_at) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(day, user_id, page) DO UPDATE SET "
+        "views = views + excluded.views, last_at = MAX(last_at, excluded.last_at)",
+        [(day, uid, page, n, last) for (day, uid, page), (n, last) in rollup.items()],
+    )
+
+
+def rebuild_page_view_rollup(conn) -> int:
+    """Recompute page_view_daily from raw page_views. Returns rollup row count."""
+    conn.execute("DELETE FROM page_view_daily")
+    conn.execute(
+        "INSERT INTO page_view_daily (day, user_id, page, views, last_at) "
+        "SELECT DATE(created_at), user_id, page, COUNT(*), MAX(created_at) "
+        "FROM page_views GROUP BY DATE(created_at), user_id, page"
+    )
+    return conn.execute("SELECT COUNT(*) FROM page_view_daily").fetchone()[0]
+
+
+def get_stats() -> dict:
+    with _lock:
+        return {
+            **_stats,
+            "buffered_page_views": len(_page_views),
+            "buffered_activity": len(_activity),
+            "max_buffered": MAX_BUFFERED,
+        }
+
+
+def reset() -> None:
+    """Discard buffered events and counters (tests)."""
+    with _lock:
+        _page_views.clear()
+        _activity.clear()
+        _recent_views.clear()
+        for k in _stats:
+            _stats[k] = 0
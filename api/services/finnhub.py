@@ -0,0 +1,309 @@
+"""
+api/services/finnhub.py — the one Finnhub client every service goes through.
+
+    get(path, params)        one JSON response, or None if unavailable
+    get_many([(path, params), ...])  the same for a batch, fetched concurrently
+    invalidate(path, symbol) drop cached responses (e.g. once a company reports)
+
+Calls share a token bucket sized to the plan (FINNHUB_CALLS_PER_MINUTE, burst
+FINNHUB_BURST), so a wide batch queues for tokens instead of tripping 429s. A 429 that
+still happens pauses the bucket for Retry-After and the call is retried.
+
+Responses are kept in a SQLite cache (FINNHUB_CACHE_DB_PATH, /data/finnhub_cache.db on
+Railway) with a TTL per endpoint, so they survive restarts and are shared by every
+worker. Earnings history expires when the next report is due. 403/404 answers (premium
+endpoints, unknown symbols) are cached briefly as misses. If a refresh fails, the
+expired response is served rather than nothing. Concurrent requests for the same
+uncached response share one upstream call.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+import requests
+
+_logger = logging.getLogger(__name__)
+
+BASE_URL = "https://finnhub.io/api/v1"
+CALLS_PER_MINUTE = int(os.environ.get("FINNHUB_CALLS_PER_MINUTE", "60"))
+BURST = int(os.environ.get("FINNHUB_BURST", "10"))
+TIMEOUT = 10            # seconds per upstream request
+QUEUE_TIMEOUT = 30.0    # longest a call waits for a rate-limit token
+MAX_RETRIES = 2         # after a 429 or 5xx
+BATCH_WORKERS = 8
+NEGATIVE_TTL = 300
+DEFAULT_TTL = 3600
+PURGE_EVERY = 500       # writes between sweeps of long-expired rows
+
+_DEFAULT_DB_PATH = (
+    "/data/finnhub_cache.db"
+    if os.path.isdir("/data")
+    else os.path.join(os.path.dirname(__file__), "..", "..", "data", "finnhub_cache.db")
+)
+DB_PATH: str = os.environ.get("FINNHUB_CACHE_DB_PATH", _DEFAULT_DB_PATH)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS finnhub_cache (
+    key         TEXT PRIMARY KEY,
+    path        TEXT NOT NULL,
+    symbol      TEXT,
+    status      INTEGER NOT NULL,       -- 200, or the 4xx cached as a miss
+    body        TEXT,
+    fetched_at  REAL NOT NULL,
+    expires_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_finnhub_cache_symbol ON finnhub_cache(path, symbol);
+"""
+
+
+def _earnings_ttl(body) -> float:
+    """EPS history only changes when the company next reports: about a quarter plus the
+    reporting lag after the latest period. Checked every 12 hours once that is overdue."""
+    periods = [q.get("period") for q in body if isinstance(q, dict) and q.get("period")] \
+        if isinstance(body, list) else []
+    if not periods:
+        return 86400
+    try:
+        latest = datetime.strptime(max(periods)[:10], "%Y-%m-%d")
+    except ValueError:
+        return 86400
+    due = (latest + timedelta(days=91 + 25) - datetime.utcnow()).total_seconds()
+    return min(max(due, 12 * 3600), 45 * 86400)
+
+
+# Seconds, or a function of the response body
+TTL = {
+    "/stock/recommendation":         86400,
+    "/stock/price-target":           6 * 3600,
+    "/stock/earnings":               _earnings_ttl,
+    "/stock/insider-transactions":   4 * 3600,
+    "/stock/transcripts/list":       6 * 3600,
+    "/stock/transcripts":            30 * 86400,   # a published transcript doesn't change
+    "/company-news":                 900,
+    "/calendar/earnings":            300,          # actuals land through the morning
+    "/stock/profile2":               86400,
+}
+
+
+class RateLimited(Exception):
+    """No rate-limit token became available within QUEUE_TIMEOUT."""
+
+
+class _TokenBucket:
+    def __init__(self, per_minute: float, burst: int):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._stamp = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now > self._stamp:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+                    self._stamp = now
+                if self._paused_until > now:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Upstream said slow down: no calls for `seconds`, then start from an empty bucket."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._stamp = self._paused_until   # nothing refills during the pause
+            self._tokens = 0.0
+
+
+_bucket = _TokenBucket(CALLS_PER_MINUTE, BURST)
+_lock = threading.Lock()
+_inflight: dict[str, Future] = {}
+_writes = 0
+_stats = {"hits": 0, "fetches": 0, "coalesced": 0, "stale_served": 0, "throttled": 0, "errors": 0}
+
+
+# ─── Cache ────────────────────────────────────────────────────────────────────
+
+def _connect() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(os.path.abspath(DB_PATH)), exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=10, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _key(path: str, params: dict) -> str:
+    return f"{path}?{urlencode(sorted(params.items()))}"
+
+
+def _read(key: str):
+    conn = _connect()
+    try:
+        return conn.execute("SELECT status, body, expires_at FROM finnhub_cache WHERE key = ?", (key,)).fetchone()
+    finally:
+        conn.close()
+
+
+def _write(key: str, path: str, params: dict, status: int, body, ttl: float) -> None:
+    global _writes
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO finnhub_cache (key, path, symbol, status, body, fetched_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, path, params.get("symbol"), status, json.dumps(body), now, now + ttl),
+        )
+        _writes += 1
+        if _writes % PURGE_EVERY == 0:
+            # Keep expired rows a week as stale fallbacks, then drop them
+            conn.execute("DELETE FROM finnhub_cache WHERE expires_at < ?", (now - 7 * 86400,))
+    finally:
+        conn.close()
+
+
+def _body(row):
+    return json.loads(row["body"]) if row is not None and row["status"] == 200 else None
+
+
+def invalidate(path: str, symbol: str | None = None) -> int:
+    """Drop cached responses for an endpoint (optionally one symbol). Returns rows removed."""
+    conn = _connect()
+    try:
+        if symbol is None:
+            cur = conn.execute("DELETE FROM finnhub_cache WHERE path = ?", (path,))
+        else:
+            cur = conn.execute("DELETE FROM finnhub_cache WHERE path = ? AND symbol = ?", (path, symbol.upper()))
+        return cur.rowcount
+    finally:
+        conn.close()
+
+
+# ─── Upstream ─────────────────────────────────────────────────────────────────
+
+def _api_key() -> str:
+    return os.environ.get("FINNHUB_API_KEY", "")
+
+
+def _fetch(path: str, params: dict, timeout: float) -> tuple[int, object]:
+    """(status, body) from Finnhub, waiting for a token per attempt. Raises on failure."""
+    last_error: Exception | None = None
+    for attempt in range(MAX_RETRIES + 1):
+        if not _bucket.acquire(QUEUE_TIMEOUT):
+            raise RateLimited(path)
+        try:
+            resp = requests.get(f"{BASE_URL}{path}", params={**params, "token": _api_key()}, timeout=timeout)
+        except requests.RequestException as e:
+            last_error = e
+            continue
+        if resp.status_code == 429:
+            _stats["throttled"] += 1
+            try:
+                retry_after = float(resp.headers.get("Retry-After", 1))
+            except ValueError:
+                retry_after = 1.0
+            _bucket.pause(retry_after)
+            last_error = RuntimeError("429 Too Many Requests")
+            continue
+        if resp.status_code >= 500:
+            last_error = RuntimeError(f"HTTP {resp.status_code}")
+            time.sleep(0.5 * (attempt + 1))
+            continue
+        if resp.status_code in (403, 404):
+            return resp.status_code, None
+        resp.raise_for_status()
+        return 200, resp.json()
+    raise last_error or RuntimeError("request failed")
+
+
+def _load(path: str, params: dict, key: str, ttl, stale_row, timeout: float):
+    try:
+        status, body = _fetch(path, params, timeout)
+    except Exception as e:
+        _stats["errors"] += 1
+        _logger.warning("Finnhub %s failed for %s: %s", path, params.get("symbol", "?"), e)
+        if stale_row is not None:
+            _stats["stale_served"] += 1
+        return _body(stale_row)
+    _stats["fetches"] += 1
+    if status != 200:
+        _write(key, path, params, status, None, NEGATIVE_TTL)
+        return None
+    ttl = ttl if ttl is not None else TTL.get(path, DEFAULT_TTL)
+    _write(key, path, params, status, body, ttl(body) if callable(ttl) else ttl)
+    return body
+
+
+def get(path: str, params: dict | None = None, ttl: float | None = None, timeout: float = TIMEOUT):
+    """Parsed JSON for a Finnhub GET (path like "/stock/earnings"), or None if unavailable.
+
+    Served from the persistent cache while fresh; ttl overrides the endpoint default.
+    """
+    params = {k: v for k, v in (params or {}).items() if v is not None}
+    if "symbol" in params:
+        params["symbol"] = str(params["symbol"]).upper()
+    key = _key(path, params)
+
+    row = _read(key)
+    if row is not None and row["expires_at"] > time.time():
+        _stats["hits"] += 1
+        return _body(row)
+    if not _api_key():
+        _logger.warning("FINNHUB_API_KEY not set — %s unavailable", path)
+        return _body(row)
+
+    with _lock:
+        fut = _inflight.get(key)
+        leader = fut is None
+        if leader:
+            fut = _inflight[key] = Future()
+    if not leader:
+        _stats["coalesced"] += 1
+        return fut.result()
+
+    try:
+        body = _load(path, params, key, ttl, row, timeout)
+        fut.set_result(body)
+        return body
+    except BaseException as e:
+        fut.set_exception(e)
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+
+
+def get_many(calls: list[tuple[str, dict]], max_workers: int = BATCH_WORKERS) -> list:
+    """get() for each (path, params), run concurrently under the shared rate limit.
+    Results are in input order."""
+    if not calls:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(calls)), thread_name_prefix="finnhub") as pool:
+        return list(pool.map(lambda call: get(*call), calls))
+
+
+def stats() -> dict:
+    conn = _connect()
+    try:
+        entries = conn.execute("SELECT COUNT(*) FROM finnhub_cache").fetchone()[0]
+    finally:
+        conn.close()
+    return {**_stats, "entries": entries, "inflight": len(_inflight), "calls_per_minute": _bucket.rate * 60}
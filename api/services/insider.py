@@ -7,24 +7,17 @@ Feed: aggregate notable insider buys across UCT20 + broad market watchlist.
 from __future__ import annotations
 
 import logging
-import os
 from datetime import datetime, timedelta
 
-import requests
-
+from api.services import finnhub
 from api.services.cache import cache
 
 _logger = logging.getLogger(__name__)
 
-_FINNHUB_BASE = "https://finnhub.io/api/v1"
 _PER_TICKER_TTL = 4 * 3600  # 4 hours
 _FEED_TTL = 3600             # 1 hour
 
 
-def _fh_key() -> str:
-    return os.environ.get("FINNHUB_API_KEY", "")
-
-
 def get_insider_activity(ticker: str) -> list[dict]:
     """Return recent insider transactions for a single ticker (cached 4h)."""
     cache_key = f"insider_{ticker}"
@@ -32,44 +25,10 @@ def get_insider_activity(ticker: str) -> list[dict]:
     if hit is not None:
         return hit
 
-    key = _fh_key()
-    if not key:
-        _logger.warning("FINNHUB_API_KEY not set — insider activity unavailable")
-        return []
-
-    try:
-        resp = requests.get(
-            f"{_FINNHUB_BASE}/stock/insider-transactions",
-            params={"symbol": ticker.upper(), "token": key},
-            timeout=15,
-        )
-        resp.raise_for_status()
-        raw = resp.json().get("data", [])
-    except Exception as e:
-        _logger.error("Finnhub insider fetch failed for %s: %s", ticker, e)
+    raw = finnhub.get("/stock/insider-transactions", {"symbol": ticker})
+    if raw is None:
         return []
-
-    # Normalize to a clean shape, most recent first
-    txns = []
-    for r in raw:
-        txn_type = _classify_txn(r)
-        if txn_type is None:
-            continue
-        shares = r.get("share") or 0
-        price = r.get("transactionPrice") or 0
-        txns.append({
-            "name": r.get("name", "Unknown"),
-            "title": _clean_title(r),
-            "type": txn_type,        # "buy" or "sell"
-            "shares": abs(int(shares)),
-            "price": round(float(price), 2),
-            "amount": round(abs(shares * price), 2),
-            "date": r.get("transactionDate", ""),
-            "filing_date": r.get("filingDate", ""),
-        })
-
-    # Sort by transaction date descending
-    txns.sort(key=lambda t: t["date"], reverse=True)
+    txns = _normalize(raw.get("data", []))
     cache.set(cache_key, txns, _PER_TICKER_TTL)
     return txns
 
@@ -77,29 +36,37 @@ def get_insider_activity(ticker: str) -> list[dict]:
 def get_recent_insider_buys() -> list[dict]:
     """Return notable insider buys across the market in the last 7 days.
 
-    Pulls from a broad watchlist of UCT20 + large-cap tickers.
+    Served from the Form 4 store (insider_filings) once it has filings; until then
+    pulls from a broad watchlist of UCT20 + large-cap tickers, fetched as one
+    concurrent Finnhub batch.
     """
     cache_key = "insider_feed"
     hit = cache.get(cache_key)
     if hit is not None:
         return hit
 
+    stored = _buys_from_filings()
+    if stored:
+        cache.set(cache_key, stored, _FEED_TTL)
+        return stored
+
     # Pull current UCT20 tickers from wire data if available
     tickers = _get_feed_tickers()
     cutoff = (datetime.utcnow() - timedelta(days=7)).strftime("%Y-%m-%d")
 
+    responses = finnhub.get_many([("/stock/insider-transactions", {"symbol": t}) for t in tickers])
     buys: list[dict] = []
-    for ticker in tickers:
-        try:
-            txns = get_insider_activity(ticker)
-            for t in txns:
-                if t["type"] != "buy":
-                    continue
-                if t["date"] < cutoff:
-                    continue
-                buys.append({**t, "symbol": ticker})
-        except Exception:
+    for ticker, raw in zip(tickers, responses):
+        if raw is None:
             continue
+        txns = _normalize(raw.get("data", []))
+        cache.set(f"insider_{ticker}", txns, _PER_TICKER_TTL)
+        for t in txns:
+            if t["type"] != "buy":
+                continue
+            if t["date"] < cutoff:
+                continue
+            buys.append({**t, "symbol": ticker})
 
     # Sort by dollar amount descending — most notable first
     buys.sort(key=lambda b: b["amount"], reverse=True)
@@ -117,6 +84,51 @@ def has_recent_insider_buy(ticker: str, days: int = 30) -> bool:
 
 # ── Helpers ──────────────────────────────────────────────────────────────────
 
+def _buys_from_filings() -> list[dict]:
+    """Last 7 days of open-market purchases from the Form 4 store, in feed shape."""
+    from api.services import insider_filings
+    try:
+        rows = insider_filings.recent_purchases(7)
+    except Exception as e:
+        _logger.warning("Form 4 store unavailable: %s", e)
+        return []
+    buys = [{
+        "name": r["owner_name"],
+        "title": r["title"],
+        "type": "buy",
+        "shares": int(r["shares"]),
+        "price": round(r["price"], 2) if r["price"] is not None else 0,
+        "amount": round(r["value"] or 0, 2),
+        "date": r["txn_date"],
+        "filing_date": (r["filed_at"] or "")[:10],
+        "symbol": r["ticker"],
+    } for r in rows]
+    buys.sort(key=lambda b: b["amount"], reverse=True)
+    return buys[:50]
+
+
+def _normalize(raw: list[dict]) -> list[dict]:
+    """Finnhub insider rows → open-market buys/sells, most recent first."""
+    txns = []
+    for r in raw:
+        txn_type = _classify_txn(r)
+        if txn_type is None:
+            continue
+        shares = r.get("share") or 0
+        price = r.get("transactionPrice") or 0
+        txns.append({
+            "name": r.get("name", "Unknown"),
+            "title": _clean_title(r),
+            "type": txn_type,        # "buy" or "sell"
+            "shares": abs(int(shares)),
+            "price": round(float(price), 2),
+            "amount": round(abs(shares * price), 2),
+            "date": r.get("transactionDate", ""),
+            "filing_date": r.get("filingDate", ""),
+        })
+    txns.sort(key=lambda t: t["date"], reverse=True)
+    return txns
+
 
 def _classify_txn(r: dict) -> str | None:
     """Classify a Finnhub insider transaction as buy/sell or skip."""
@@ -169,4 +181,4 @@ def _get_feed_tickers() -> list[str]:
         "BA", "CAT", "GE", "RTX",
     ]
     tickers.update(_WATCHLIST)
-    return list(tickers)
+    return sorted(tickers)
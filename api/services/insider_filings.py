@@ -0,0 +1,435 @@
+# api/services/insider_filings.py
+"""
+Insider transaction store fed by SEC EDGAR Form 4 filings.
+
+update_from_feed() (scheduler job) reads EDGAR's latest-filings Atom feed for Form 4,
+keeps filings whose issuer is in wire_data["cap_universe"], downloads each new filing's
+submission text and parses the ownershipDocument XML locally (parse_form4). Every
+accession is recorded, so a run only fetches filings it hasn't seen and stops paging
+once a feed page is all known filings. A filing whose fetch failed (SEC 429/503, a
+timeout) is recorded as an error and retried by later runs with exponential backoff,
+up to MAX_ATTEMPTS, independently of the feed paging.
+
+Rows live in a SQLite file (INSIDER_DB_PATH, /data/insider.db on Railway): one row per
+non-derivative transaction, attributed to the filing's first reporting owner (joint
+filers are usually one holder's entities and would otherwise count twice).
+
+scan() ranks names by open-market purchases (code P): distinct insiders buying within
+CLUSTER_DAYS of each other (a cluster buy), and dollars bought as a share of market cap
+(Finnhub profile2).
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+from datetime import date, datetime, timedelta, timezone
+
+try:
+    import requests as _requests
+except ImportError:
+    _requests = None
+
+_USER_AGENT = "UCTDashboard contact@unchartedterritory.com"
+_FEED_URL = (
+    "https://www.sec.gov/cgi-bin/browse-edgar"
+    "?action=getcurrent&type=4&company=&dateb=&owner=include&start={start}&count=100&output=atom"
+)
+_ARCHIVE_URL = "https://www.sec.gov/Archives/edgar/data/{cik}/{folder}/{accession}.txt"
+_SEC_MIN_INTERVAL = 0.15   # SEC fair access: stay under 10 requests/second
+MAX_FEED_PAGES = 5
+CLUSTER_DAYS = 10
+MIN_CLUSTER_INSIDERS = 3
+POLL_MINUTES = 10
+MAX_ATTEMPTS = 6
+RETRY_BASE = POLL_MINUTES * 60   # seconds; doubles per failed attempt
+RETRY_MAX = 6 * 3600
+RETRY_BATCH = 50
+
+_DEFAULT_DB_PATH = (
+    "/data/insider.db"
+    if os.path.isdir("/data")
+    else os.path.join(os.path.dirname(__file__), "..", "..", "data", "insider.db")
+)
+DB_PATH: str = os.environ.get("INSIDER_DB_PATH", _DEFAULT_DB_PATH)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS form4_filings (
+    accession    TEXT PRIMARY KEY,
+    issuer_cik   TEXT NOT NULL,
+    ticker       TEXT,
+    filed_at     TEXT,
+    status       TEXT NOT NULL,          -- stored / empty / skipped (not in universe) / error
+    error        TEXT,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL,                -- error rows: when to retry (NULL = given up)
+    processed_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS insider_transactions (
+    accession    TEXT NOT NULL,
+    seq          INTEGER NOT NULL,
+    ticker       TEXT NOT NULL,
+    issuer_cik   TEXT NOT NULL,
+    owner_cik    TEXT NOT NULL,
+    owner_name   TEXT NOT NULL,
+    title        TEXT NOT NULL,
+    is_director  INTEGER NOT NULL,
+    is_officer   INTEGER NOT NULL,
+    is_ten_pct   INTEGER NOT NULL,
+    code         TEXT NOT NULL,          -- P purchase, S sale, A award, M exercise, ...
+    acquired     INTEGER NOT NULL,       -- 1 acquired, 0 disposed
+    shares       REAL NOT NULL,
+    price        REAL,
+    value        REAL,
+    shares_after REAL,
+    txn_date     TEXT NOT NULL,
+    filed_at     TEXT,
+    PRIMARY KEY (accession, seq)
+);
+CREATE INDEX IF NOT EXISTS idx_insider_txn_ticker ON insider_transactions(ticker, txn_date);
+CREATE INDEX IF NOT EXISTS idx_insider_txn_code ON insider_transactions(code, txn_date);
+"""
+
+_sec_lock = threading.Lock()
+_last_sec_request = 0.0
+
+
+def get_connection() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(os.path.abspath(DB_PATH)), exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=10, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(form4_filings)").fetchall()}
+    for col, typedef in (("attempts", "INTEGER NOT NULL DEFAULT 0"), ("next_attempt_at", "REAL")):
+        if col not in cols:
+            conn.execute(f"ALTER TABLE form4_filings ADD COLUMN {col} {typedef}")
+    return conn
+
+
+# ─── Form 4 parsing ───────────────────────────────────────────────────────────
+
+def _text(node, path: str) -> str:
+    """Text at path; Form 4 wraps most values in a <value> child."""
+    if node is None:
+        return ""
+    el = node.find(path)
+    if el is None:
+        return ""
+    inner = el.find("value")
+    return ((inner.text if inner is not None else el.text) or "").strip()
+
+
+def _num(node, path: str) -> float | None:
+    try:
+        return float(_text(node, path).replace(",", ""))
+    except ValueError:
+        return None
+
+
+def _flag(node, path: str) -> bool:
+    return _text(node, path).lower() in ("1", "true")
+
+
+def _title(rel) -> str:
+    if _flag(rel, "isOfficer") and _text(rel, "officerTitle"):
+        return _text(rel, "officerTitle")
+    if _flag(rel, "isDirector"):
+        return "Director"
+    if _flag(rel, "isTenPercentOwner"):
+        return "10% Owner"
+    if _flag(rel, "isOfficer"):
+        return "Officer"
+    return _text(rel, "otherText") or "Other"
+
+
+def parse_form4(text: str) -> dict | None:
+    """Parse a Form 4 ownershipDocument — bare XML or a full EDGAR submission .txt.
+
+    Returns {issuer_cik, issuer_name, ticker, period, owners: [...], transactions: [...]},
+    or None if no ownershipDocument is found. Only the non-derivative table is read.
+    """
+    m = re.search(r"<ownershipDocument>.*?</ownershipDocument>", text, re.DOTALL)
+    if not m:
+        return None
+    root = ET.fromstring(m.group(0))
+
+    owners = []
+    for ro in root.findall("reportingOwner"):
+        rel = ro.find("reportingOwnerRelationship")
+        owners.append({
+            "cik": _text(ro, "reportingOwnerId/rptOwnerCik").lstrip("0"),
+            "name": _text(ro, "reportingOwnerId/rptOwnerName"),
+            "is_director": _flag(rel, "isDirector"),
+            "is_officer": _flag(rel, "isOfficer"),
+            "is_ten_pct": _flag(rel, "isTenPercentOwner"),
+            "title": _title(rel),
+        })
+
+    transactions = []
+    for tx in root.findall("nonDerivativeTable/nonDerivativeTransaction"):
+        shares = _num(tx, "transactionAmounts/transactionShares") or 0.0
+        price = _num(tx, "transactionAmounts/transactionPricePerShare")
+        transactions.append({
+            "security": _text(tx, "securityTitle"),
+            "date": _text(tx, "transactionDate")[:10],
+            "code": _text(tx, "transactionCoding/transactionCode"),
+            "acquired": _text(tx, "transactionAmounts/transactionAcquiredDisposedCode") == "A",
+            "shares": shares,
+            "price": price,
+            "value": round(shares * price, 2) if price is not None else None,
+            "shares_after": _num(tx, "postTransactionAmounts/sharesOwnedFollowingTransaction"),
+            "direct": _text(tx, "ownershipNature/directOrIndirectOwnership") != "I",
+        })
+
+    return {
+        "issuer_cik": _text(root, "issuer/issuerCik").lstrip("0"),
+        "issuer_name": _text(root, "issuer/issuerName"),
+        "ticker": _text(root, "issuer/issuerTradingSymbol").upper(),
+        "period": _text(root, "periodOfReport"),
+        "owners": owners,
+        "transactions": transactions,
+    }
+
+
+def store_filing(conn, accession: str, doc: dict, ticker: str, filed_at: str | None) -> int:
+    """Replace one filing's transactions. Returns rows stored."""
+    owner = doc["owners"][0] if doc["owners"] else {
+        "cik": "", "name": "Unknown", "is_director": False, "is_officer": False,
+        "is_ten_pct": False, "title": "Other",
+    }
+    rows = [
+        (accession, i, ticker, doc["issuer_cik"], owner["cik"], owner["name"], owner["title"],
+         int(owner["is_director"]), int(owner["is_officer"]), int(owner["is_ten_pct"]),
+         t["code"], int(t["acquired"]), t["shares"], t["price"], t["value"], t["shares_after"],
+         t["date"], filed_at)
+        for i, t in enumerate(doc["transactions"]) if t["date"] and t["code"]
+    ]
+    conn.execute("DELETE FROM insider_transactions WHERE accession = ?", (accession,))
+    conn.executemany(
+        f"INSERT INTO insider_transactions VALUES ({', '.join('?' * 18)})", rows,
+    )
+    return len(rows)
+
+
+# ─── Latest-filings feed ──────────────────────────────────────────────────────
+
+def _sec_get(url: str) -> str:
+    """GET an SEC URL, spaced to respect EDGAR's request-rate policy."""
+    global _last_sec_request
+    with _sec_lock:
+        wait = _last_sec_request + _SEC_MIN_INTERVAL - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        _last_sec_request = time.monotonic()
+    r = _requests.get(url, headers={"User-Agent": _USER_AGENT}, timeout=15)
+    r.raise_for_status()
+    return r.text
+
+
+def _parse_feed(text: str) -> list[dict]:
+    """Issuer entries of a Form 4 Atom page: [{accession, issuer_cik, filed_at}]."""
+    results = []
+    for entry in re.findall(r"<entry>(.*?)</entry>", text, re.DOTALL):
+        title = re.search(r"<title[^>]*>(.*?)</title>", entry, re.DOTALL)
+        issuer = re.search(r"\((\d{10})\)\s*\(Issuer\)", title.group(1)) if title else None
+        acc = re.search(r"accession-number=(\d{10}-\d{2}-\d{6})", entry)
+        if not issuer or not acc:
+            continue
+        updated = re.search(r"<updated>(.*?)</updated>", entry)
+        results.append({
+            "accession": acc.group(1),
+            "issuer_cik": issuer.group(1).lstrip("0"),
+            "filed_at": updated.group(1).strip() if updated else None,
+        })
+    return results
+
+
+def _universe() -> set[str]:
+    from api.services.cache import cache
+    wire = cache.get("wire_data")
+    return set(wire.get("cap_universe", [])) if isinstance(wire, dict) else set()
+
+
+def update_from_feed(max_pages: int = MAX_FEED_PAGES) -> dict:
+    """Scheduler job: store new Form 4 filings for cap_universe issuers. Returns counts."""
+    counts = {"stored": 0, "skipped": 0, "errors": 0, "seen": 0}
+    if _requests is None:
+        return counts
+    universe = _universe()
+    if not universe:
+        print("[insider] No cap_universe in wire_data yet — skipping Form 4 update")
+        return counts
+    from api.services.edgar import _fetch_cik_ticker_map
+    cik_map = _fetch_cik_ticker_map()
+
+    conn = get_connection()
+    try:
+        _retry_errors(conn, counts)
+        for page in range(max_pages):
+            try:
+                entries = _parse_feed(_sec_get(_FEED_URL.format(start=page * 100)))
+            except Exception as e:
+                print(f"[insider] Form 4 feed fetch failed: {e}")
+                counts["errors"] += 1
+                break
+            if not entries:
+                break
+            known = {r["accession"] for r in conn.execute(
+                f"SELECT accession FROM form4_filings WHERE accession IN ({', '.join('?' * len(entries))})",
+                [e["accession"] for e in entries],
+            ).fetchall()}
+            counts["seen"] += len(known)
+            if len(known) == len({e["accession"] for e in entries}):
+                break   # the whole page was already processed: caught up
+            for e in entries:
+                if e["accession"] in known:
+                    continue
+                known.add(e["accession"])
+                ticker = cik_map.get(e["issuer_cik"], "")
+                if ticker not in universe:
+                    # Record it so the next run doesn't look again
+                    _record(conn, e, ticker or None, "skipped", None)
+                    counts["skipped"] += 1
+                    continue
+                counts[_ingest(conn, e, ticker)] += 1
+    finally:
+        conn.close()
+    if counts["stored"]:
+        print(f"[insider] Stored {counts['stored']} new Form 4 filings")
+    return counts
+
+
+def _retry_errors(conn, counts: dict) -> None:
+    """Re-fetch filings whose earlier fetch failed and whose backoff has passed."""
+    due = conn.execute(
+        "SELECT accession, issuer_cik, ticker, filed_at, attempts FROM form4_filings "
+        "WHERE status = 'error' AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+        (time.time(), RETRY_BATCH),
+    ).fetchall()
+    for row in due:
+        counts[_ingest(conn, dict(row), row["ticker"], row["attempts"])] += 1
+
+
+def _ingest(conn, entry: dict, ticker: str, attempts: int = 0) -> str:
+    accession = entry["accession"]
+    url = _ARCHIVE_URL.format(cik=entry["issuer_cik"], folder=accession.replace("-", ""), accession=accession)
+    status, error = "stored", None
+    try:
+        doc = parse_form4(_sec_get(url))
+        if doc is None:
+            status = "empty"
+        else:
+            conn.execute("BEGIN")
+            store_filing(conn, accession, doc, ticker, entry["filed_at"])
+            conn.execute("COMMIT")
+    except Exception as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        status, error = "error", str(e)[:300]
+    if status != "error":
+        _record(conn, entry, ticker, status, None)
+        return "stored" if status == "stored" else "skipped"
+    attempts += 1
+    retry_at = time.time() + min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX) if attempts < MAX_ATTEMPTS else None
+    _record(conn, entry, ticker, status, error, attempts, retry_at)
+    if retry_at is None:
+        print(f"[insider] Giving up on {accession} after {attempts} attempts: {error}")
+    return "errors"
+
+
+def _record(conn, entry: dict, ticker: str | None, status: str, error: str | None,
+            attempts: int = 0, next_attempt_at: float | None = None) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO form4_filings (accession, issuer_cik, ticker, filed_at, status, error, "
+        "attempts, next_attempt_at, processed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (entry["accession"], entry["issuer_cik"], ticker, entry["filed_at"], status, error,
+         attempts, next_attempt_at, datetime.now(timezone.utc).isoformat()),
+    )
+
+
+# ─── Reads ────────────────────────────────────────────────────────────────────
+
+def recent_purchases(days: int = 7, ticker: str | None = None) -> list[dict]:
+    """Open-market purchases with a transaction date in the last `days` days, newest first."""
+    since = (date.today() - timedelta(days=days)).isoformat()
+    sql = ("SELECT * FROM insider_transactions WHERE code = 'P' AND txn_date >= ?"
+           + (" AND ticker = ?" if ticker else "") + " ORDER BY txn_date DESC, accession, seq")
+    conn = get_connection()
+    try:
+        return [dict(r) for r in conn.execute(sql, (since, ticker.upper()) if ticker else (since,)).fetchall()]
+    finally:
+        conn.close()
+
+
+def _largest_cluster(buys: list[dict], window_days: int) -> list[dict]:
+    """Purchases in the window_days span with the most distinct insiders."""
+    buys = sorted(buys, key=lambda b: b["txn_date"])
+    best: list[dict] = []
+    best_n = 0
+    start = 0
+    for end in range(len(buys)):
+        end_day = date.fromisoformat(buys[end]["txn_date"])
+        while date.fromisoformat(buys[start]["txn_date"]) < end_day - timedelta(days=window_days - 1):
+            start += 1
+        n = len({b["owner_cik"] for b in buys[start:end + 1]})
+        if n > best_n:
+            best_n, best = n, buys[start:end + 1]
+    return best
+
+
+def _market_caps(tickers: list[str]) -> dict[str, float]:
+    from api.services import finnhub
+    profiles = finnhub.get_many([("/stock/profile2", {"symbol": t}) for t in tickers])
+    return {
+        t: p["marketCapitalization"] * 1_000_000
+        for t, p in zip(tickers, profiles)
+        if isinstance(p, dict) and p.get("marketCapitalization")
+    }
+
+
+def scan(lookback_days: int = 30, cluster_days: int = CLUSTER_DAYS,
+         min_insiders: int = MIN_CLUSTER_INSIDERS, limit: int = 50) -> list[dict]:
+    """Rank names by insider buying over the lookback.
+
+    Clusters (min_insiders or more distinct insiders buying within cluster_days) rank
+    first, larger clusters ahead; then everything by dollars bought as a percentage of
+    market cap (dollars when the cap is unknown).
+    """
+    by_ticker: dict[str, list[dict]] = {}
+    for b in recent_purchases(lookback_days):
+        by_ticker.setdefault(b["ticker"], []).append(b)
+    if not by_ticker:
+        return []
+    caps = _market_caps(sorted(by_ticker))
+
+    ranked = []
+    for ticker, buys in by_ticker.items():
+        cluster = _largest_cluster(buys, cluster_days)
+        insiders = {b["owner_cik"]: b for b in buys}
+        total = sum(b["value"] or 0 for b in buys)
+        cap = caps.get(ticker)
+        ranked.append({
+            "symbol": ticker,
+            "insiders": len(insiders),
+            "buys": len(buys),
+            "total_value": round(total, 2),
+            "market_cap": cap,
+            "pct_of_market_cap": round(total / cap * 100, 4) if cap else None,
+            "cluster": len({b["owner_cik"] for b in cluster}) >= min_insiders,
+            "cluster_insiders": len({b["owner_cik"] for b in cluster}),
+            "cluster_start": cluster[0]["txn_date"],
+            "cluster_end": cluster[-1]["txn_date"],
+            "officers": sorted({b["title"] for b in buys if b["is_officer"]}),
+            "names": sorted(b["owner_name"] for b in insiders.values()),
+            "first_date": min(b["txn_date"] for b in buys),
+            "last_date": max(b["txn_date"] for b in buys),
+        })
+    # Insider count only orders clusters among themselves; below the threshold it's noise
+    ranked.sort(key=lambda r: (
+        r["cluster"], r["cluster_insiders"] if r["cluster"] else 0,
+        r["pct_of_market_cap"] if r["pct_of_market_cap"] is not None else -1, r["total_value"],
+    ), reverse=True)
+    return ranked[:limit]
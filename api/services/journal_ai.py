@@ -1,12 +1,34 @@
 """
 Journal AI — trade summaries and weekly digests via Claude Haiku.
 Uses existing ANTHROPIC_API_KEY env var. Cost: ~$0.001 per summary.
+
+Generation happens off the request path. Requests read the stored output in ai_outputs
+and, if it is missing or stale, queue a job in ai_jobs and return straight away; a worker
+thread (started in the app lifespan) runs due jobs, at most MAX_CONCURRENCY model calls
+at a time.
+
+- Closing a trade queues its summary (triggers on journal_entries), debounced by
+  DEBOUNCE_SECONDS so a burst of edits costs one call. Edits to a trade that already has
+  a summary queue it again.
+- Every output records a hash of its exact input (model, token limit, prompt). A job whose
+  input hash matches the stored output finishes without a model call, and a read whose
+  hash differs reports the output as stale and requeues it.
+- Weekly digests are queued every Monday for users with closed trades in the week before
+  (enqueue_weekly_digests, a scheduler job), or on demand when a week is opened.
+- Each call reserves its worst-case token cost against a per-user and a global daily
+  budget (ai_usage) and settles to the real usage afterwards. Jobs that don't fit wait
+  until the next UTC day.
 """
 
+import hashlib
+import json
 import os
 import logging
 import threading
-from datetime import datetime, timedelta
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 
 from api.services.auth_db import get_connection
 from api.services.journal_service import get_entry
@@ -18,6 +40,33 @@ _client_lock = threading.Lock()
 
 _AI_MODEL = "claude-haiku-4-5-20251001"
 
+MAX_CONCURRENCY = int(os.environ.get("AI_MAX_CONCURRENCY", "2"))
+USER_DAILY_TOKENS = int(os.environ.get("AI_USER_DAILY_TOKENS", "20000"))
+GLOBAL_DAILY_TOKENS = int(os.environ.get("AI_GLOBAL_DAILY_TOKENS", "2000000"))
+DEBOUNCE_SECONDS = 60
+AUTO_SUMMARY_DAYS = 7     # only trades closed this recently get a summary unasked
+LEASE_SECONDS = 300.0
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 60.0
+FAILED_RETRY_SECONDS = 3600.0   # a read requeues a failed digest at most this often
+POLL_SECONDS = 30.0
+SUMMARY_MAX_TOKENS = 300
+DIGEST_MAX_TOKENS = 500
+KINDS = ("trade_summary", "weekly_digest")
+
+_GLOBAL = "*"
+_BUDGET_ERROR = "token budget exhausted"
+_NOW_SQL = "((julianday('now') - 2440587.5) * 86400.0)"
+_WATCHED = (
+    "status", "sym", "direction", "setup", "entry_price", "exit_price", "pnl_pct", "realized_r",
+    "process_score", "holding_minutes", "thesis", "mistake_tags", "notes", "lesson",
+)
+
+_budget_lock = threading.Lock()
+_wake = threading.Event()
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+
 
 def _get_client():
     """Return the module-level Anthropic client, initializing it once (thread-safe)."""
@@ -33,17 +82,77 @@ def _get_client():
     return _client
 
 
-def generate_trade_summary(user_id: str, trade_id: str, force: bool = False) -> dict:
-    """Generate AI summary for a single trade. Returns {summary, cached} or {error}."""
-    entry = get_entry(user_id, trade_id)
-    if not entry:
-        return {"error": "Trade not found"}
-
-    # Return cached unless force regenerate
-    if entry.get("ai_summary") and not force:
-        return {"summary": entry["ai_summary"], "cached": True}
-
-    # Build prompt context
+# ── Schema ───────────────────────────────────────────────────────────────────
+
+def install(conn) -> None:
+    """Create the job, output and usage tables and the summary triggers. Caller commits."""
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS ai_jobs (
+            kind TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            version INTEGER NOT NULL DEFAULT 1,
+            force INTEGER NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            not_before REAL NOT NULL,
+            lease_until REAL,
+            last_error TEXT,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (kind, user_id, subject)
+        );
+        CREATE INDEX IF NOT EXISTS idx_ai_jobs_due ON ai_jobs(status, not_before);
+
+        CREATE TABLE IF NOT EXISTS ai_outputs (
+            kind TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            input_hash TEXT NOT NULL,
+            content TEXT NOT NULL,
+            meta TEXT,
+            input_tokens INTEGER NOT NULL DEFAULT 0,
+            output_tokens INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (kind, user_id, subject)
+        );
+
+        CREATE TABLE IF NOT EXISTS ai_usage (
+            scope TEXT NOT NULL,
+            day TEXT NOT NULL,
+            tokens INTEGER NOT NULL DEFAULT 0,
+            calls INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (scope, day)
+        );
+    """)
+    enqueue = (
+        "INSERT INTO ai_jobs (kind, user_id, subject, not_before, updated_at) "
+        f"VALUES ('trade_summary', new.user_id, new.id, {_NOW_SQL} + {DEBOUNCE_SECONDS}, {_NOW_SQL}) "
+        "ON CONFLICT(kind, user_id, subject) DO UPDATE SET status = 'pending', version = version + 1, "
+        "attempts = 0, last_error = NULL, not_before = excluded.not_before, updated_at = excluded.updated_at;"
+    )
+    recent = f"COALESCE(new.exit_date, new.entry_date, '') >= date('now', '-{AUTO_SUMMARY_DAYS} days')"
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS journal_entries_ai_ai AFTER INSERT ON journal_entries
+        WHEN new.status = 'closed' AND {recent} BEGIN
+        {enqueue}
+    END""")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS journal_entries_ai_au
+        AFTER UPDATE OF {', '.join(_WATCHED)} ON journal_entries
+        WHEN new.status = 'closed' AND (new.ai_summary IS NOT NULL OR {recent}) BEGIN
+        {enqueue}
+    END""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS journal_entries_ai_ad AFTER DELETE ON journal_entries BEGIN
+        DELETE FROM ai_jobs WHERE kind = 'trade_summary' AND user_id = old.user_id AND subject = old.id;
+        DELETE FROM ai_outputs WHERE kind = 'trade_summary' AND user_id = old.user_id AND subject = old.id;
+    END""")
+
+
+# ── Prompts ──────────────────────────────────────────────────────────────────
+
+def _input_hash(prompt: str, max_tokens: int) -> str:
+    return hashlib.sha256(f"{_AI_MODEL}\n{max_tokens}\n{prompt}".encode()).hexdigest()[:32]
+
+
+def _trade_prompt(entry: dict) -> str:
     direction = entry.get("direction", "long")
     pnl = entry.get("pnl_pct")
     r_mult = entry.get("realized_r")
@@ -64,7 +173,7 @@ def generate_trade_summary(user_id: str, trade_id: str, force: bool = False) ->
         else:
             holding_str = f"{holding / 1440:.1f}d"
 
-    prompt = f"""Analyze this trade and provide:
+    return f"""Analyze this trade and provide:
 1. A 2-3 sentence recap of what happened
 2. One key takeaway
 3. One specific improvement suggestion
@@ -87,89 +196,56 @@ Format your response as:
 **Takeaway:** [one sentence]
 **Improvement:** [one specific suggestion]"""
 
-    try:
-        client = _get_client()
-        response = client.messages.create(
-            model=_AI_MODEL,
-            max_tokens=300,
-            messages=[{"role": "user", "content": prompt}],
-        )
-        summary = response.content[0].text
 
-        # Cache in DB
-        conn = get_connection()
-        try:
-            conn.execute(
-                "UPDATE journal_entries SET ai_summary = ? WHERE id = ? AND user_id = ?",
-                (summary, trade_id, user_id),
-            )
-            conn.commit()
-        finally:
-            conn.close()
-
-        _logger.info(f"Generated AI summary for trade {trade_id} (user {user_id[:8]})")
-        return {"summary": summary, "cached": False}
+def _digest_input(user_id: str, week_start: str) -> tuple[str, dict] | None:
+    """Prompt and stats for a week's digest, or None if the week has no closed trades.
+    Raises ValueError for a malformed week_start."""
+    start_dt = datetime.strptime(week_start, "%Y-%m-%d")
+    end_str = (start_dt + timedelta(days=6)).strftime("%Y-%m-%d")
 
-    except Exception as e:
-        _logger.error(f"AI summary generation failed for trade {trade_id}: {e}")
-        return {"error": str(e)}
-
-
-def generate_weekly_digest(user_id: str, week_start: str) -> dict:
-    """Generate AI weekly digest. week_start is YYYY-MM-DD (Monday)."""
     conn = get_connection()
     try:
-        # Validate and compute week range
-        try:
-            start_dt = datetime.strptime(week_start, "%Y-%m-%d")
-        except ValueError:
-            return {"error": "Invalid date format. Use YYYY-MM-DD."}
-
-        end_dt = start_dt + timedelta(days=6)
-        end_str = end_dt.strftime("%Y-%m-%d")
-
-        # Get week's trades
         rows = conn.execute(
             """SELECT sym, direction, setup, pnl_pct, realized_r, process_score,
                       mistake_tags, entry_date, entry_price, exit_price
                FROM journal_entries
                WHERE user_id = ? AND status = 'closed'
                AND entry_date >= ? AND entry_date <= ?
-               ORDER BY entry_date""",
+               ORDER BY entry_date, id""",
             (user_id, week_start, end_str),
         ).fetchall()
-        trades = [dict(r) for r in rows]
-
-        if not trades:
-            return {"digest": "No closed trades this week.", "trade_count": 0, "week": week_start}
-
-        # Build summary data
-        with_pnl = [t for t in trades if t.get("pnl_pct") is not None]
-        wins = [t for t in with_pnl if t["pnl_pct"] > 0]
-        losses = [t for t in with_pnl if t["pnl_pct"] <= 0]
-        total_pnl = sum(t["pnl_pct"] for t in with_pnl)
-
-        all_mistakes = []
-        for t in trades:
-            if t.get("mistake_tags"):
-                all_mistakes.extend([m.strip() for m in t["mistake_tags"].split(",") if m.strip()])
-
-        with_ps = [t for t in trades if t.get("process_score") is not None]
-        avg_ps = sum(t["process_score"] for t in with_ps) / len(with_ps) if with_ps else None
-
-        # Format trade list for prompt
-        trade_lines = []
-        for t in trades:
-            pnl_str = f"{t.get('pnl_pct', 0):+.1f}%" if t.get("pnl_pct") is not None else "N/A"
-            trade_lines.append(
-                f"  {t['sym']} {t['direction']} ({t.get('setup', '?')}): "
-                f"{pnl_str} | R={t.get('realized_r', '?')} | "
-                f"Process={t.get('process_score', '?')}"
-            )
+    finally:
+        conn.close()
+    trades = [dict(r) for r in rows]
+    if not trades:
+        return None
+
+    with_pnl = [t for t in trades if t.get("pnl_pct") is not None]
+    wins = [t for t in with_pnl if t["pnl_pct"] > 0]
+    losses = [t for t in with_pnl if t["pnl_pct"] <= 0]
+    total_pnl = sum(t["pnl_pct"] for t in with_pnl)
+
+    all_mistakes = []
+    for t in trades:
+        if t.get("mistake_tags"):
+            all_mistakes.extend([m.strip() for m in t["mistake_tags"].split(",") if m.strip()])
+
+    with_ps = [t for t in trades if t.get("process_score") is not None]
+    avg_ps = sum(t["process_score"] for t in with_ps) / len(with_ps) if with_ps else None
+
+    trade_lines = []
+    for t in trades:
+        pnl_str = f"{t.get('pnl_pct', 0):+.1f}%" if t.get("pnl_pct") is not None else "N/A"
+        trade_lines.append(
+            f"  {t['sym']} {t['direction']} ({t.get('setup', '?')}): "
+            f"{pnl_str} | R={t.get('realized_r', '?')} | "
+            f"Process={t.get('process_score', '?')}"
+        )
 
-        mistake_summary = ", ".join(set(all_mistakes)) if all_mistakes else "None tagged"
+    # Sorted so the prompt (and its hash) doesn't depend on set ordering
+    mistake_summary = ", ".join(sorted(set(all_mistakes))) if all_mistakes else "None tagged"
 
-        prompt = f"""Analyze this trader's week and provide:
+    prompt = f"""Analyze this trader's week and provide:
 1. A brief overview (2-3 sentences)
 2. Top 3 patterns you notice (what's working, what isn't)
 3. The single biggest lesson from this week
@@ -193,27 +269,388 @@ Format your response as:
 **Biggest Lesson:** [one sentence]
 **Next Week Focus:** [one specific action item]"""
 
-        client = _get_client()
-        response = client.messages.create(
-            model=_AI_MODEL,
-            max_tokens=500,
-            messages=[{"role": "user", "content": prompt}],
+    return prompt, {
+        "trade_count": len(trades),
+        "week": week_start,
+        "wins": len(wins),
+        "losses": len(losses),
+        "net_pnl": round(total_pnl, 2),
+    }
+
+
+def _job_input(kind: str, user_id: str, subject: str) -> tuple[str, int, dict] | None:
+    """(prompt, max_tokens, meta) for a job, or None if its subject is gone."""
+    if kind == "trade_summary":
+        entry = get_entry(user_id, subject)
+        return (_trade_prompt(entry), SUMMARY_MAX_TOKENS, {}) if entry else None
+    try:
+        built = _digest_input(user_id, subject)
+    except ValueError:
+        return None
+    return (built[0], DIGEST_MAX_TOKENS, built[1]) if built else None
+
+
+# ── Stored outputs and jobs ──────────────────────────────────────────────────
+
+def _output(kind: str, user_id: str, subject: str) -> dict | None:
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            "SELECT input_hash, content, meta, created_at FROM ai_outputs "
+            "WHERE kind = ? AND user_id = ? AND subject = ?",
+            (kind, user_id, subject),
+        ).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+def _store(kind: str, user_id: str, subject: str, input_hash: str, content: str,
+           meta: dict, usage: tuple[int, int]) -> None:
+    conn = get_connection()
+    try:
+        conn.execute(
+            "INSERT INTO ai_outputs (kind, user_id, subject, input_hash, content, meta, input_tokens, "
+            "output_tokens, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(kind, user_id, subject) DO UPDATE SET input_hash = excluded.input_hash, "
+            "content = excluded.content, meta = excluded.meta, input_tokens = excluded.input_tokens, "
+            "output_tokens = excluded.output_tokens, created_at = excluded.created_at",
+            (kind, user_id, subject, input_hash, content, json.dumps(meta), *usage, time.time()),
         )
+        if kind == "trade_summary":
+            # ai_summary isn't a watched column, so this doesn't requeue the trade
+            conn.execute(
+                "UPDATE journal_entries SET ai_summary = ? WHERE id = ? AND user_id = ?",
+                (content, subject, user_id),
+            )
+        conn.commit()
+    finally:
+        conn.close()
 
-        _logger.info(f"Generated weekly digest for {week_start} (user {user_id[:8]}, {len(trades)} trades)")
 
-        return {
-            "digest": response.content[0].text,
-            "trade_count": len(trades),
-            "week": week_start,
-            "wins": len(wins),
-            "losses": len(losses),
-            "net_pnl": round(total_pnl, 2),
-            "generated_at": datetime.utcnow().isoformat(),
-        }
+def _job(kind: str, user_id: str, subject: str) -> dict | None:
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            "SELECT status, attempts, last_error, updated_at FROM ai_jobs WHERE kind = ? AND user_id = ? AND subject = ?",
+            (kind, user_id, subject),
+        ).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+def enqueue(kind: str, user_id: str, subject: str, delay: float = 0.0, force: bool = False) -> None:
+    """Queue (or requeue) generation for one subject. A job already pending keeps its place."""
+    if kind not in KINDS:
+        raise ValueError(f"Unknown kind: {kind}")
+    now = time.time()
+    conn = get_connection()
+    try:
+        conn.execute(
+            "INSERT INTO ai_jobs (kind, user_id, subject, force, not_before, updated_at) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(kind, user_id, subject) DO UPDATE SET version = version + 1, "
+            "force = MAX(force, excluded.force), updated_at = excluded.updated_at, "
+            "not_before = CASE WHEN status = 'pending' THEN MIN(not_before, excluded.not_before) "
+            "  ELSE excluded.not_before END, "
+            "attempts = CASE WHEN status = 'pending' THEN attempts ELSE 0 END, "
+            "last_error = CASE WHEN status = 'pending' THEN last_error ELSE NULL END, "
+            "status = 'pending'",
+            (kind, user_id, subject, int(force), now + delay, now),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    _wake.set()
+
 
+def _claim(limit: int) -> list[dict]:
+    now = time.time()
+    conn = get_connection()
+    try:
+        # Due pending jobs, plus running ones whose worker died (lease expired)
+        rows = conn.execute(
+            "SELECT * FROM ai_jobs WHERE status IN ('pending', 'running') AND not_before <= ? "
+            "AND (lease_until IS NULL OR lease_until < ?) ORDER BY not_before LIMIT ?",
+            (now, now, limit),
+        ).fetchall()
+        claimed = []
+        for row in rows:
+            cur = conn.execute(
+                "UPDATE ai_jobs SET status = 'running', lease_until = ? "
+                "WHERE kind = ? AND user_id = ? AND subject = ? AND version = ? AND status = ? "
+                "AND (lease_until IS NULL OR lease_until < ?)",
+                (now + LEASE_SECONDS, row["kind"], row["user_id"], row["subject"], row["version"],
+                 row["status"], now),
+            )
+            conn.commit()
+            if cur.rowcount:
+                claimed.append(dict(row))
+        return claimed
+    finally:
+        conn.close()
+
+
+def _finish(job: dict, status: str, error: str | None = None, not_before: float | None = None,
+            attempts: int | None = None) -> None:
+    """Record a job's outcome, unless it was requeued while running — then it stays pending."""
+    conn = get_connection()
+    try:
+        key = (job["kind"], job["user_id"], job["subject"])
+        cur = conn.execute(
+            "UPDATE ai_jobs SET status = ?, lease_until = NULL, last_error = ?, force = 0, "
+            "not_before = COALESCE(?, not_before), attempts = COALESCE(?, attempts), updated_at = ? "
+            "WHERE kind = ? AND user_id = ? AND subject = ? AND version = ?",
+            (status, error, not_before, attempts, time.time(), *key, job["version"]),
+        )
+        if not cur.rowcount:
+            conn.execute(
+                "UPDATE ai_jobs SET status = 'pending', lease_until = NULL "
+                "WHERE kind = ? AND user_id = ? AND subject = ?",
+                key,
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+# ── Token budgets ────────────────────────────────────────────────────────────
+
+def _today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def _next_day() -> float:
+    tomorrow = datetime.now(timezone.utc).date() + timedelta(days=1)
+    return datetime(tomorrow.year, tomorrow.month, tomorrow.day, tzinfo=timezone.utc).timestamp()
+
+
+def _charge(conn, user_id: str, tokens: int, calls: int) -> None:
+    conn.executemany(
+        "INSERT INTO ai_usage (scope, day, tokens, calls) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(scope, day) DO UPDATE SET tokens = tokens + excluded.tokens, calls = calls + excluded.calls",
+        [(scope, _today(), tokens, calls) for scope in (user_id, _GLOBAL)],
+    )
+
+
+def _reserve(user_id: str, tokens: int) -> bool:
+    """Reserve a call's worst-case cost against both daily budgets, or refuse."""
+    with _budget_lock:
+        conn = get_connection()
+        try:
+            used = {r["scope"]: r["tokens"] for r in conn.execute(
+                "SELECT scope, tokens FROM ai_usage WHERE day = ? AND scope IN (?, ?)",
+                (_today(), user_id, _GLOBAL),
+            ).fetchall()}
+            if (used.get(user_id, 0) + tokens > USER_DAILY_TOKENS
+                    or used.get(_GLOBAL, 0) + tokens > GLOBAL_DAILY_TOKENS):
+                return False
+            _charge(conn, user_id, tokens, 1)
+            conn.commit()
+            return True
+        finally:
+            conn.close()
+
+
+def _settle(user_id: str, reserved: int, used: int, calls: int = 0) -> None:
+    """Replace a reservation with what the call actually used (0 on failure)."""
+    with _budget_lock:
+        conn = get_connection()
+        try:
+            _charge(conn, user_id, used - reserved, calls)
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def get_usage(user_id: str | None = None) -> dict:
+    """Today's token use and limit for a user, or globally."""
+    scope = user_id or _GLOBAL
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            "SELECT tokens, calls FROM ai_usage WHERE scope = ? AND day = ?", (scope, _today())
+        ).fetchone()
+    finally:
+        conn.close()
+    return {
+        "day": _today(),
+        "tokens": row["tokens"] if row else 0,
+        "calls": row["calls"] if row else 0,
+        "limit": USER_DAILY_TOKENS if user_id else GLOBAL_DAILY_TOKENS,
+    }
+
+
+# ── Worker ───────────────────────────────────────────────────────────────────
+
+def _run_job(job: dict) -> str:
+    kind, user_id, subject = job["kind"], job["user_id"], job["subject"]
+    built = _job_input(kind, user_id, subject)
+    if built is None:
+        _finish(job, "skipped")
+        return "skipped"
+    prompt, max_tokens, meta = built
+    input_hash = _input_hash(prompt, max_tokens)
+
+    stored = _output(kind, user_id, subject)
+    if stored and stored["input_hash"] == input_hash and not job["force"]:
+        _finish(job, "done")
+        return "unchanged"
+
+    estimate = len(prompt) // 3 + max_tokens
+    if not _reserve(user_id, estimate):
+        _finish(job, "pending", error=_BUDGET_ERROR, not_before=_next_day())
+        return "deferred"
+
+    try:
+        response = _get_client().messages.create(
+            model=_AI_MODEL,
+            max_tokens=max_tokens,
+            messages=[{"role": "user", "content": prompt}],
+        )
+        text = response.content[0].text
+        usage = (response.usage.input_tokens, response.usage.output_tokens)
     except Exception as e:
-        _logger.error(f"Weekly digest generation failed for {week_start}: {e}")
-        return {"error": str(e)}
+        _settle(user_id, estimate, 0, calls=-1)
+        attempts = job["attempts"] + 1
+        error = f"{type(e).__name__}: {e}"
+        _logger.error(f"AI {kind} failed for {subject} (user {user_id[:8]}), attempt {attempts}: {error}")
+        if attempts >= MAX_ATTEMPTS:
+            _finish(job, "failed", error=error, attempts=attempts)
+            return "failed"
+        _finish(job, "pending", error=error, attempts=attempts,
+                not_before=time.time() + BACKOFF_BASE * 2 ** (attempts - 1))
+        return "retry"
+
+    _settle(user_id, estimate, sum(usage))
+    _store(kind, user_id, subject, input_hash, text, meta, usage)
+    _finish(job, "done")
+    _logger.info(f"Generated AI {kind} for {subject} (user {user_id[:8]}, {sum(usage)} tokens)")
+    return "generated"
+
+
+def process_due() -> dict:
+    """Run every due job, MAX_CONCURRENCY model calls at a time. Returns counts by outcome."""
+    counts = Counter()
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix="journal-ai") as pool:
+        while True:
+            jobs = _claim(MAX_CONCURRENCY * 4)
+            if not jobs:
+                return dict(counts)
+            counts.update(pool.map(_run_job, jobs))
+
+
+def _run() -> None:
+    while not _stop.is_set():
+        _wake.clear()
+        try:
+            process_due()
+        except Exception as e:
+            print(f"[journal-ai] Worker error: {e}")
+        _wake.wait(timeout=POLL_SECONDS)
+
+
+def start_worker() -> None:
+    """Call from lifespan startup."""
+    global _thread
+    if _thread and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="journal-ai", daemon=True)
+    _thread.start()
+
+
+def stop_worker(timeout: float = 5.0) -> None:
+    """Call from lifespan shutdown."""
+    global _thread
+    _stop.set()
+    _wake.set()
+    if _thread:
+        _thread.join(timeout)
+    _thread = None
+
+
+def enqueue_weekly_digests() -> int:
+    """Scheduler job (Mondays): queue last week's digest for every user who closed trades in it."""
+    today = datetime.now(timezone.utc).date()
+    week_start = today - timedelta(days=today.weekday() + 7)
+    week_end = week_start + timedelta(days=6)
+    conn = get_connection()
+    try:
+        users = [r["user_id"] for r in conn.execute(
+            "SELECT DISTINCT user_id FROM journal_entries WHERE status = 'closed' "
+            "AND entry_date >= ? AND entry_date <= ?",
+            (week_start.isoformat(), week_end.isoformat()),
+        ).fetchall()]
     finally:
         conn.close()
+    for uid in users:
+        enqueue("weekly_digest", uid, week_start.isoformat())
+    print(f"[journal-ai] Queued {len(users)} weekly digests for {week_start}")
+    return len(users)
+
+
+# ── Read path ────────────────────────────────────────────────────────────────
+
+def _pending_status(kind: str, user_id: str, subject: str) -> dict:
+    job = _job(kind, user_id, subject) or {}
+    if job.get("status") == "failed":
+        return {"status": "failed", "error": job.get("last_error")}
+    if job.get("last_error") == _BUDGET_ERROR:
+        return {"status": "deferred", "error": "Daily AI limit reached — it will be generated tomorrow."}
+    return {"status": "pending"}
+
+
+def get_trade_summary(user_id: str, trade_id: str) -> dict:
+    """Stored summary and its state (ready, stale, pending, deferred, failed); never calls the model."""
+    entry = get_entry(user_id, trade_id)
+    if not entry:
+        return {"error": "Trade not found"}
+    stored = _output("trade_summary", user_id, trade_id)
+    fresh = stored is not None and stored["input_hash"] == _input_hash(_trade_prompt(entry), SUMMARY_MAX_TOKENS)
+    job = _job("trade_summary", user_id, trade_id)
+    busy = job is not None and job["status"] in ("pending", "running")
+    if fresh and not busy:
+        return {"summary": stored["content"], "cached": True, "status": "ready"}
+    result = {"summary": stored["content"] if stored else entry.get("ai_summary"), "cached": False}
+    if busy or (job and job["status"] == "failed"):
+        return {**result, **_pending_status("trade_summary", user_id, trade_id)}
+    return {**result, "status": "stale" if result["summary"] else "missing"}
+
+
+def generate_trade_summary(user_id: str, trade_id: str, force: bool = False) -> dict:
+    """Return the summary if it is current; otherwise queue it and return its state.
+    Returns {summary, cached, status} or {error}."""
+    current = get_trade_summary(user_id, trade_id)
+    if "status" not in current or (current["status"] in ("ready", "pending", "deferred") and not force):
+        return current
+    enqueue("trade_summary", user_id, trade_id, force=force)
+    return {"summary": current["summary"], "cached": False, "status": "pending"}
+
+
+def get_weekly_digest(user_id: str, week_start: str) -> dict:
+    """Stored digest for a week (YYYY-MM-DD, Monday). A missing or stale digest is queued and
+    the previous text, if any, is returned with its status. A digest whose retries ran out is
+    queued again only FAILED_RETRY_SECONDS after it failed, however often it is read."""
+    try:
+        built = _digest_input(user_id, week_start)
+    except ValueError:
+        return {"error": "Invalid date format. Use YYYY-MM-DD."}
+    if built is None:
+        return {"digest": "No closed trades this week.", "trade_count": 0, "week": week_start, "status": "ready"}
+    prompt, meta = built
+    stored = _output("weekly_digest", user_id, week_start)
+    if stored and stored["input_hash"] == _input_hash(prompt, DIGEST_MAX_TOKENS):
+        return {
+            **meta, "digest": stored["content"], "status": "ready",
+            "generated_at": datetime.fromtimestamp(stored["created_at"], timezone.utc).isoformat(),
+        }
+    job = _job("weekly_digest", user_id, week_start)
+    if job is None or job["status"] not in ("pending", "running", "failed") or (
+        job["status"] == "failed" and time.time() - job["updated_at"] >= FAILED_RETRY_SECONDS
+    ):
+        enqueue("weekly_digest", user_id, week_start)
+    return {
+        **meta, "digest": stored["content"] if stored else None,
+        "stale": stored is not None, **_pending_status("weekly_digest", user_id, week_start),
+    }
@@ -5,6 +5,7 @@ Trade execution service — scale-in/out tracking with VWAP computation.
 import uuid
 from datetime import datetime, timezone
 
+from api.services import journal_rollups
 from api.services.auth_db import get_connection
 
 
@@ -144,8 +145,10 @@ def _recompute_trade_from_executions(conn, user_id: str, trade_id: str):
 
     set_clause = ", ".join(f"{k} = ?" for k in updates)
     values = list(updates.values()) + [trade_id, user_id]
+    before = journal_rollups.fetch_row(conn, user_id, trade_id)
     conn.execute(
         f"UPDATE journal_entries SET {set_clause} WHERE id = ? AND user_id = ?",
         values,
     )
+    journal_rollups.apply_change(conn, before, journal_rollups.fetch_row(conn, user_id, trade_id))
     conn.commit()
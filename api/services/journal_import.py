@@ -1,5 +1,5 @@
 """
-CSV import service — parse broker exports, map fields, detect duplicates, create trades.
+CSV import service — parse broker exports, map fields, diff against existing trades, bulk-insert.
 Supports TD Ameritrade, Interactive Brokers, Schwab, and generic CSV formats.
 """
 
@@ -8,8 +8,9 @@ import io
 import uuid
 from datetime import datetime, timezone
 
+from api.services import journal_rollups
 from api.services.auth_db import get_connection
-from api.services.journal_service import create_entry
+from api.services.journal_service import prepare_entry
 
 
 # Known broker column mappings
@@ -187,78 +188,154 @@ def _normalize_date(date_str: str) -> str:
     return date_str[:10]
 
 
-def find_duplicates(user_id: str, rows: list[dict], tolerance: float = 0.01) -> list[int]:
-    """Return indices of rows that are likely duplicates of existing trades.
-    Matches on symbol + date + price within tolerance (default 1%).
-    """
-    conn = get_connection()
-    try:
+def _price_close(a: float, b: float, tolerance: float) -> bool:
+    return bool(a and b) and abs(a - b) / b <= tolerance
+
+
+def _load_index(conn, user_id: str, rows: list[dict]) -> dict[tuple, list[dict]]:
+    """Hash index of the user's existing trades keyed by (sym, entry_date), limited to
+    the symbols and date span of the import."""
+    syms = sorted({r["sym"] for r in rows if r.get("sym")})
+    dates = [r["entry_date"] for r in rows if r.get("entry_date")]
+    if not syms or not dates:
+        return {}
+    index: dict[tuple, list[dict]] = {}
+    for i in range(0, len(syms), 500):
+        chunk = syms[i:i + 500]
         existing = conn.execute(
-            "SELECT sym, entry_date, entry_price FROM journal_entries WHERE user_id = ?",
-            (user_id,),
+            f"""SELECT id, sym, direction, entry_date, entry_price, shares FROM journal_entries
+                WHERE user_id = ? AND entry_date BETWEEN ? AND ?
+                AND sym IN ({','.join('?' * len(chunk))})""",
+            [user_id, min(dates), max(dates), *chunk],
         ).fetchall()
-        existing_set = [
-            (r["sym"], r["entry_date"], r["entry_price"])
-            for r in existing if r["entry_price"]
-        ]
-
-        dupes = []
-        for i, row in enumerate(rows):
-            sym = row.get("sym")
-            date = row.get("entry_date")
-            price = row.get("entry_price")
-            if not all([sym, date, price]):
-                continue
-            for e_sym, e_date, e_price in existing_set:
-                if (sym == e_sym and date == e_date
-                        and e_price and abs(price - e_price) / e_price <= tolerance):
-                    dupes.append(i)
-                    break
+        for r in existing:
+            index.setdefault((r["sym"], r["entry_date"]), []).append(dict(r))
+    return index
+
+
+def diff_import(user_id: str, rows: list[dict], tolerance: float = 0.01) -> dict:
+    """Classify parsed rows against existing trades without writing anything.
 
-        return dupes
+    Rows are looked up in a hash index on (symbol, entry date), then compared on side,
+    quantity and price:
+      duplicate   — same side, same quantity (or none given), price within tolerance (default 1%)
+      conflicting — same symbol/side/date but quantity or price differs
+      new         — everything else, including rows missing symbol, date or price
+    Returns {"new": [i...], "duplicate": [{index, existing_id}], "conflicting": [{index, existing_id, diffs}]}.
+    """
+    conn = get_connection()
+    try:
+        index = _load_index(conn, user_id, rows)
     finally:
         conn.close()
 
+    new, dupes, conflicts = [], [], []
+    for i, row in enumerate(rows):
+        sym, date, price = row.get("sym"), row.get("entry_date"), row.get("entry_price")
+        if not all([sym, date, price]):
+            new.append(i)
+            continue
+        direction = row.get("direction") or "long"
+        shares = row.get("shares")
+        conflict = None
+        for e in index.get((sym, date), ()):
+            if (e["direction"] or "long") != direction:
+                continue
+            same_qty = not shares or not e["shares"] or abs(abs(e["shares"]) - shares) < 1e-9
+            if same_qty and _price_close(price, e["entry_price"], tolerance):
+                dupes.append({"index": i, "existing_id": e["id"]})
+                break
+            if conflict is None:
+                diffs = {}
+                if not same_qty:
+                    diffs["shares"] = {"import": shares, "existing": e["shares"]}
+                if not _price_close(price, e["entry_price"], tolerance):
+                    diffs["entry_price"] = {"import": price, "existing": e["entry_price"]}
+                conflict = {"index": i, "existing_id": e["id"], "diffs": diffs}
+        else:
+            if conflict:
+                conflicts.append(conflict)
+            else:
+                new.append(i)
+
+    return {"new": new, "duplicate": dupes, "conflicting": conflicts}
+
+
+def find_duplicates(user_id: str, rows: list[dict], tolerance: float = 0.01) -> list[int]:
+    """Return indices of rows that are likely duplicates of existing trades."""
+    return [d["index"] for d in diff_import(user_id, rows, tolerance)["duplicate"]]
+
 
 def import_trades(user_id: str, rows: list[dict], skip_indices: set = None,
                   filename: str = None, broker_format: str = None) -> dict:
-    """Create journal entries from parsed rows. Returns import summary."""
+    """Create journal entries from parsed rows. Returns import summary.
+
+    Rows are prepared up front (validation errors are per row), then inserted with a
+    single executemany in one transaction together with the rollup updates and the
+    import_sessions record. Playbook stats are recomputed once per playbook afterwards.
+    """
     skip_indices = skip_indices or set()
-    created = 0
     skipped = 0
     errors = []
+    prepared = []
+    balances: dict = {}
 
     for i, row in enumerate(rows):
         if i in skip_indices:
             skipped += 1
             continue
         try:
-            create_entry(user_id, row)
-            created += 1
+            prepared.append(prepare_entry(user_id, row, balances=balances))
         except Exception as e:
             skipped += 1
             errors.append(f"Row {i + 1}: {str(e)[:100]}")
 
-    # Record import session
+    # Derived fields are only set when computable, so insert the union of columns.
+    cols = list(dict.fromkeys(c for p in prepared for c in p))
     session_id = str(uuid.uuid4())[:12]
     now = datetime.now(timezone.utc).isoformat()
     conn = get_connection()
     try:
+        if prepared:
+            conn.executemany(
+                f"INSERT INTO journal_entries ({','.join(cols)}) VALUES ({','.join('?' * len(cols))})",
+                [[p.get(c) for c in cols] for p in prepared],
+            )
+            journal_rollups.add_many(conn, user_id, [{c: p.get(c) for c in cols} for p in prepared])
         conn.execute(
             """INSERT INTO import_sessions
                (id, user_id, filename, format, imported_count, duplicate_count, error_count, created_at)
                VALUES (?,?,?,?,?,?,?,?)""",
             (session_id, user_id, filename or "unknown.csv",
-             broker_format or "unknown", created, skipped,
+             broker_format or "unknown", len(prepared), skipped,
              len(errors), now),
         )
         conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"[journal] Import of {len(prepared)} rows failed: {e}")
+        return {
+            "session_id": None,
+            "imported": 0,
+            "duplicates": skipped,
+            "errors": (errors + [f"Import failed, nothing was saved: {str(e)[:100]}"])[:20],
+            "total": len(rows),
+        }
     finally:
         conn.close()
 
+    playbook_ids = {p["playbook_id"] for p in prepared if p.get("playbook_id")}
+    if playbook_ids:
+        from api.services.playbook_service import recompute_playbook_stats
+        for pb_id in playbook_ids:
+            try:
+                recompute_playbook_stats(user_id, pb_id)
+            except Exception as e:
+                print(f"[journal] Playbook stats recompute failed for {pb_id}: {e}")
+
     return {
         "session_id": session_id,
-        "imported": created,
+        "imported": len(prepared),
         "duplicates": skipped,
         "errors": errors[:20],
         "total": len(rows),
@@ -1,60 +1,223 @@
 """
 Insights engine — 8 pattern-derived coaching statements from trade data.
-All server-side computation, no AI. Results cached 5 minutes in-memory.
+All server-side computation, no AI.
+
+Results are precomputed and persisted per user in journal_insights_state, so insight
+pages always read a stored result (shared by every worker, survives restarts).
+Triggers on journal_entries bump data_version and dirty_at on every trade change;
+refresh_due() (scheduler job) recomputes users whose stored version is behind once they
+have been quiet for DEBOUNCE_SECONDS, or MAX_DELAY_SECONDS after the first unprocessed
+change, whichever is first. A claim column keeps two workers off the same user.
+
+Setup, day-of-week, playbook and mistake insights read the incrementally maintained
+journal_rollups; the rest need per-trade order or distribution and scan a narrow column set.
 """
 
+import json
 import time
-from api.services.auth_db import get_connection
+from collections import Counter
 
-# Simple in-memory cache: {user_id: (timestamp, results)}
-_cache: dict[str, tuple[float, list[dict]]] = {}
-_CACHE_TTL = 300  # 5 minutes
+from api.services import journal_rollups
+from api.services.auth_db import get_connection
 
+DEBOUNCE_SECONDS = 10
+MAX_DELAY_SECONDS = 60
+REFRESH_INTERVAL = 5      # scheduler poll period
+CLAIM_TTL = 120           # a crashed worker's claim expires after this
+MIN_TRADES = 5
+
+_NOW_SQL = "((julianday('now') - 2440587.5) * 86400.0)"
+_WATCHED = (
+    "status", "setup", "pnl_pct", "entry_date", "entry_time", "day_of_week",
+    "mistake_tags", "size_pct", "playbook_id",
+)
+
+
+# ── Schema ───────────────────────────────────────────────────────────────────
+
+def install(conn) -> None:
+    """Create the state table and the dirty-marking triggers. Caller commits."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS journal_insights_state (
+            user_id         TEXT PRIMARY KEY,
+            data_version    INTEGER NOT NULL DEFAULT 0,
+            version         INTEGER NOT NULL DEFAULT -1,
+            first_dirty_at  REAL,
+            dirty_at        REAL,
+            claimed_at      REAL,
+            computed_at     REAL,
+            insights        TEXT
+        )
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_journal_insights_dirty ON journal_insights_state(dirty_at) "
+        "WHERE version < data_version"
+    )
+    mark = (
+        "INSERT INTO journal_insights_state (user_id, data_version, first_dirty_at, dirty_at) "
+        f"VALUES ({{who}}.user_id, 1, {_NOW_SQL}, {_NOW_SQL}) "
+        "ON CONFLICT(user_id) DO UPDATE SET data_version = data_version + 1, dirty_at = excluded.dirty_at, "
+        "first_dirty_at = CASE WHEN version < data_version THEN first_dirty_at ELSE excluded.first_dirty_at END;"
+    )
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS journal_entries_insights_ai AFTER INSERT ON journal_entries BEGIN
+        {mark.format(who="new")}
+    END""")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS journal_entries_insights_au
+        AFTER UPDATE OF {', '.join(_WATCHED)} ON journal_entries BEGIN
+        {mark.format(who="new")}
+    END""")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS journal_entries_insights_ad AFTER DELETE ON journal_entries BEGIN
+        {mark.format(who="old")}
+    END""")
+
+
+# ── Read path ────────────────────────────────────────────────────────────────
 
 def get_insights(user_id: str, limit: int = 8) -> list[dict]:
-    """Generate up to 8 pattern-derived coaching statements."""
-    now = time.time()
-    cached = _cache.get(user_id)
-    if cached and (now - cached[0]) < _CACHE_TTL:
-        return cached[1][:limit]
+    """Up to 8 pattern-derived coaching statements, from the stored result.
 
+    Only a user who has never been computed is computed inline; a stale result is served
+    as-is and refreshed by the background job.
+    """
     conn = get_connection()
     try:
-        rows = conn.execute(
-            "SELECT * FROM journal_entries WHERE user_id = ? AND status = 'closed' ORDER BY entry_date",
+        row = conn.execute(
+            "SELECT insights FROM journal_insights_state WHERE user_id = ?", (user_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+    if row and row["insights"] is not None:
+        return json.loads(row["insights"])[:limit]
+    return refresh_user(user_id)[:limit]
+
+
+def get_state(user_id: str) -> dict | None:
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            "SELECT data_version, version, dirty_at, computed_at FROM journal_insights_state WHERE user_id = ?",
             (user_id,),
-        ).fetchall()
-        entries = [dict(r) for r in rows]
-
-        if len(entries) < 5:
-            return []  # Not enough data for insights
-
-        insights = []
-
-        # 1. Time-of-day win rates
-        _insight_time_of_day(entries, insights)
-        # 2. Setup comparison
-        _insight_setup_comparison(entries, insights)
-        # 3. Mistake correlation
-        _insight_mistake_correlation(entries, insights)
-        # 4. Position size clustering
-        _insight_size_clustering(entries, insights)
-        # 5. Trades-per-day analysis
-        _insight_daily_count(entries, insights)
-        # 6. Day-of-week analysis
-        _insight_day_of_week(entries, insights)
-        # 7. Playbook vs unlinked
-        _insight_playbook_performance(entries, insights)
-        # 8. Streak detection
-        _insight_streaks(entries, insights)
-
-        result = sorted(insights, key=lambda x: x["priority"])[:limit]
-        _cache[user_id] = (now, result)
+        ).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+# ── Refresh ──────────────────────────────────────────────────────────────────
+
+def refresh_user(user_id: str) -> list[dict]:
+    """Recompute and persist one user's insights, stamped with the data_version read first."""
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            "SELECT data_version FROM journal_insights_state WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        data_version = row["data_version"] if row else 0
+        result = compute_insights(conn, user_id)
+        conn.execute(
+            "INSERT INTO journal_insights_state (user_id, data_version, version, computed_at, insights) "
+            f"VALUES (?, ?, ?, {_NOW_SQL}, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET version = excluded.version, computed_at = excluded.computed_at, "
+            "insights = excluded.insights, claimed_at = NULL",
+            (user_id, data_version, data_version, json.dumps(result)),
+        )
+        conn.commit()
         return result
     finally:
         conn.close()
 
 
+def refresh_due(max_users: int = 50) -> int:
+    """Scheduler job: recompute users whose insights are behind and past the debounce.
+    Returns how many users were refreshed."""
+    now = time.time()
+    conn = get_connection()
+    try:
+        due = [r["user_id"] for r in conn.execute(
+            "SELECT user_id FROM journal_insights_state WHERE version < data_version "
+            "AND (dirty_at <= ? OR first_dirty_at <= ?) "
+            "AND (claimed_at IS NULL OR claimed_at < ?) ORDER BY dirty_at LIMIT ?",
+            (now - DEBOUNCE_SECONDS, now - MAX_DELAY_SECONDS, now - CLAIM_TTL, max_users),
+        ).fetchall()]
+        claimed = []
+        for uid in due:
+            cur = conn.execute(
+                "UPDATE journal_insights_state SET claimed_at = ? "
+                "WHERE user_id = ? AND (claimed_at IS NULL OR claimed_at < ?)",
+                (now, uid, now - CLAIM_TTL),
+            )
+            if cur.rowcount:
+                claimed.append(uid)
+        conn.commit()
+    finally:
+        conn.close()
+
+    for uid in claimed:
+        try:
+            refresh_user(uid)
+        except Exception as e:
+            print(f"[insights] Refresh failed for {uid}: {e}")
+    return len(claimed)
+
+
+# ── Computation ──────────────────────────────────────────────────────────────
+
+def compute_insights(conn, user_id: str) -> list[dict]:
+    """Run every insight for a user. Returns them sorted by priority."""
+    buckets = {
+        dim: {b["bucket"]: b for b in journal_rollups.read_buckets(conn, user_id, dim)}
+        for dim in ("ALL", "setup", "day_of_week", "playbook", "mistake_tag")
+    }
+    total = buckets["ALL"].get("ALL")
+    if not total or total["trade_count"] < MIN_TRADES:
+        return []  # Not enough data for insights
+
+    rows = conn.execute(
+        "SELECT entry_date, entry_time, pnl_pct, size_pct, mistake_tags FROM journal_entries "
+        "WHERE user_id = ? AND status = 'closed' ORDER BY entry_date, id",
+        (user_id,),
+    ).fetchall()
+    entries = [dict(r) for r in rows]
+
+    insights = []
+
+    # 1. Time-of-day win rates
+    _insight_time_of_day(entries, insights)
+    # 2. Setup comparison
+    _insight_setup_comparison(buckets["setup"], insights)
+    # 3. Mistake correlation
+    _insight_mistake_correlation(total, buckets["mistake_tag"].get("No Mistakes"), insights)
+    # 4. Position size clustering
+    _insight_size_clustering(entries, insights)
+    # 5. Trades-per-day analysis
+    _insight_daily_count(entries, insights)
+    # 6. Day-of-week analysis
+    _insight_day_of_week(buckets["day_of_week"], insights)
+    # 7. Playbook vs unlinked
+    _insight_playbook_performance(total, buckets["playbook"].get("No Playbook"), insights)
+    # 8. Streak detection
+    _insight_streaks(entries, insights)
+
+    return sorted(insights, key=lambda x: x["priority"])
+
+
+def _pnl_avgs(buckets: dict, rename: dict = None, skip: tuple = (), min_count: int = 3) -> dict[str, tuple[int, float]]:
+    """{label: (trades with P&L, avg P&L)} for buckets with at least min_count such trades."""
+    out = {}
+    for key, b in buckets.items():
+        if key in skip or b["pnl_count"] < min_count:
+            continue
+        out[(rename or {}).get(key, key)] = (b["pnl_count"], b["pnl_sum"] / b["pnl_count"])
+    return out
+
+
+def _minus(total: dict, part: dict | None) -> tuple[int, float]:
+    """(count, sum) of P&L for ALL minus one bucket."""
+    if not part:
+        return total["pnl_count"], total["pnl_sum"]
+    return total["pnl_count"] - part["pnl_count"], total["pnl_sum"] - part["pnl_sum"]
+
+
 def _insight_time_of_day(entries: list[dict], insights: list[dict]):
     """Compare win rate by session buckets."""
     buckets: dict[str, dict] = {}
@@ -108,19 +271,13 @@ def _insight_time_of_day(entries: list[dict], insights: list[dict]):
         })
 
 
-def _insight_setup_comparison(entries: list[dict], insights: list[dict]):
+def _insight_setup_comparison(setup_buckets: dict, insights: list[dict]):
     """Find best and worst setups by expectancy."""
-    setups: dict[str, list[float]] = {}
-    for e in entries:
-        s = e.get("setup") or "Unknown"
-        if e.get("pnl_pct") is not None:
-            setups.setdefault(s, []).append(e["pnl_pct"])
-
-    qualified = {k: v for k, v in setups.items() if len(v) >= 3}
+    qualified = _pnl_avgs(setup_buckets, rename={"No Setup": "Unknown"})
     if len(qualified) < 2:
         return
 
-    avgs = {k: sum(v) / len(v) for k, v in qualified.items()}
+    avgs = {k: v[1] for k, v in qualified.items()}
     best = max(avgs, key=avgs.get)
     worst = min(avgs, key=avgs.get)
     if avgs[best] - avgs[worst] >= 1:
@@ -128,30 +285,30 @@ def _insight_setup_comparison(entries: list[dict], insights: list[dict]):
             "id": "setup_comparison",
             "type": "setup_comparison",
             "statement": f"{best} averages +{avgs[best]:.1f}% per trade vs {worst} at {avgs[worst]:+.1f}%.",
-            "evidence": f"{len(qualified[best])} {best} trades, {len(qualified[worst])} {worst} trades.",
+            "evidence": f"{qualified[best][0]} {best} trades, {qualified[worst][0]} {worst} trades.",
             "action_type": "analytics",
             "action_label": "View by setup",
             "priority": 1,
         })
 
 
-def _insight_mistake_correlation(entries: list[dict], insights: list[dict]):
+def _insight_mistake_correlation(total: dict, no_mistakes: dict | None, insights: list[dict]):
     """Compare P&L on trades with vs without mistakes."""
-    with_mistakes = [e for e in entries if e.get("mistake_tags") and e.get("pnl_pct") is not None]
-    without = [e for e in entries if not e.get("mistake_tags") and e.get("pnl_pct") is not None]
+    n_with, sum_with = _minus(total, no_mistakes)
+    n_without = no_mistakes["pnl_count"] if no_mistakes else 0
 
-    if len(with_mistakes) < 3 or len(without) < 3:
+    if n_with < 3 or n_without < 3:
         return
 
-    avg_with = sum(e["pnl_pct"] for e in with_mistakes) / len(with_mistakes)
-    avg_without = sum(e["pnl_pct"] for e in without) / len(without)
+    avg_with = sum_with / n_with
+    avg_without = no_mistakes["pnl_sum"] / n_without
 
     if avg_without - avg_with >= 0.5:
         insights.append({
             "id": "mistake_correlation",
             "type": "mistake_correlation",
             "statement": f"Trades with mistakes average {avg_with:+.1f}% vs {avg_without:+.1f}% without.",
-            "evidence": f"{len(with_mistakes)} trades had mistakes tagged, {len(without)} did not.",
+            "evidence": f"{n_with} trades had mistakes tagged, {n_without} did not.",
             "action_type": "analytics",
             "action_label": "View by mistake",
             "priority": 3,
@@ -221,19 +378,13 @@ def _insight_daily_count(entries: list[dict], insights: list[dict]):
         })
 
 
-def _insight_day_of_week(entries: list[dict], insights: list[dict]):
+def _insight_day_of_week(dow_buckets: dict, insights: list[dict]):
     """Best and worst day of week."""
-    by_dow: dict[str, list[float]] = {}
-    for e in entries:
-        dow = e.get("day_of_week")
-        if dow and e.get("pnl_pct") is not None:
-            by_dow.setdefault(dow, []).append(e["pnl_pct"])
-
-    qualified = {k: v for k, v in by_dow.items() if len(v) >= 3}
+    qualified = _pnl_avgs(dow_buckets, skip=("Unknown",))
     if len(qualified) < 3:
         return
 
-    avgs = {k: sum(v) / len(v) for k, v in qualified.items()}
+    avgs = {k: v[1] for k, v in qualified.items()}
     best = max(avgs, key=avgs.get)
     worst = min(avgs, key=avgs.get)
     if avgs[best] - avgs[worst] >= 1:
@@ -241,30 +392,30 @@ def _insight_day_of_week(entries: list[dict], insights: list[dict]):
             "id": "day_of_week",
             "type": "day_of_week",
             "statement": f"{best}s average {avgs[best]:+.1f}% while {worst}s average {avgs[worst]:+.1f}%.",
-            "evidence": f"Across {sum(len(v) for v in qualified.values())} trades with day data.",
+            "evidence": f"Across {sum(v[0] for v in qualified.values())} trades with day data.",
             "action_type": "analytics",
             "action_label": "View by day",
             "priority": 5,
         })
 
 
-def _insight_playbook_performance(entries: list[dict], insights: list[dict]):
+def _insight_playbook_performance(total: dict, no_playbook: dict | None, insights: list[dict]):
     """Compare playbook-linked vs unlinked trades."""
-    linked = [e for e in entries if e.get("playbook_id") and e.get("pnl_pct") is not None]
-    unlinked = [e for e in entries if not e.get("playbook_id") and e.get("pnl_pct") is not None]
+    n_linked, sum_linked = _minus(total, no_playbook)
+    n_unlinked = no_playbook["pnl_count"] if no_playbook else 0
 
-    if len(linked) < 3 or len(unlinked) < 3:
+    if n_linked < 3 or n_unlinked < 3:
         return
 
-    avg_linked = sum(e["pnl_pct"] for e in linked) / len(linked)
-    avg_unlinked = sum(e["pnl_pct"] for e in unlinked) / len(unlinked)
+    avg_linked = sum_linked / n_linked
+    avg_unlinked = no_playbook["pnl_sum"] / n_unlinked
 
     if abs(avg_linked - avg_unlinked) >= 0.5:
         insights.append({
             "id": "playbook_performance",
             "type": "playbook_performance",
             "statement": f"Playbook trades average {avg_linked:+.1f}% vs {avg_unlinked:+.1f}% without.",
-            "evidence": f"{len(linked)} playbook-linked, {len(unlinked)} unlinked.",
+            "evidence": f"{n_linked} playbook-linked, {n_unlinked} unlinked.",
             "action_type": "playbooks",
             "action_label": "View playbooks",
             "priority": 4,
@@ -302,7 +453,6 @@ def _insight_streaks(entries: list[dict], insights: list[dict]):
 
         tag_note = ""
         if all_tags:
-            from collections import Counter
             common = Counter(all_tags).most_common(1)
             if common and common[0][1] >= 2:
                 tag_note = f" — {common[0][0]} appeared in {common[0][1]} of them"
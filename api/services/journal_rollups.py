@@ -0,0 +1,550 @@
+"""
+Journal rollups — incrementally maintained per-user aggregates behind journal stats and analytics.
+
+journal_rollups holds additive sums per (user, dimension, bucket, day) for closed trades,
+where dimension is one of the 13 analytics group-bys plus "ALL". Keeping the entry day in
+the key means date-filtered requests are still a SUM over an index range. journal_equity
+stores the cumulative P&L series in (entry_date, trade id) order.
+
+Every write path that touches journal_entries calls apply_change(conn, old_row, new_row)
+inside its own transaction; bulk inserts use add_many(). The same paths keep the cross-user
+community_stats tables in step. check_user() recomputes everything from raw rows and diffs;
+rebuild_user() replaces a user's rollups with the recomputed ones.
+"""
+
+from datetime import datetime
+
+from api.services import community_stats
+from api.services.auth_db import get_connection
+
+_HOLDING_BUCKETS = [
+    (0, 60, "< 1hr"),
+    (60, 390, "1hr-1D"),
+    (390, 1950, "1-5D"),
+    (1950, 9750, "1-5W"),
+    (9750, 999999, "5W+"),
+]
+
+_PROCESS_BUCKETS = [
+    (0, 30, "0-30 (Poor)"),
+    (31, 60, "31-60 (Average)"),
+    (61, 80, "61-80 (Good)"),
+    (81, 100, "81-100 (Elite)"),
+]
+
+DIMENSIONS = (
+    "setup", "symbol", "direction", "day_of_week", "session",
+    "asset_class", "playbook", "month", "week", "mistake_tag",
+    "emotion_tag", "holding_period_bucket", "process_score_bucket",
+)
+
+_SUM_COLS = (
+    "trade_count", "pnl_count", "wins", "win_sum", "loss_sum", "pnl_sum",
+    "r_count", "r_sum", "ps_count", "ps_sum", "hold_count", "hold_sum",
+)
+_EXTREME_COLS = ("best_id", "best_sym", "best_pnl", "worst_id", "worst_sym", "worst_pnl")
+
+# Columns a trade row needs for bucketing + contributions.
+_ROW_COLS = (
+    "id, user_id, sym, status, setup, direction, day_of_week, session, asset_class, "
+    "playbook_id, entry_date, mistake_tags, emotion_tags, holding_minutes, "
+    "process_score, pnl_pct, realized_r"
+)
+
+_EPS = 1e-6
+
+
+# ── Bucketing ────────────────────────────────────────────────────────────────
+
+def bucket_keys(entry: dict, group_by: str) -> list[str]:
+    """Return bucket key(s) for an entry.
+
+    Most dimensions return a single key, but comma-separated fields
+    (mistake_tag, emotion_tag) can produce multiple keys so the trade
+    appears in each relevant bucket.
+    """
+    if group_by == "ALL":
+        return ["ALL"]
+    elif group_by == "setup":
+        return [entry.get("setup") or "No Setup"]
+    elif group_by == "symbol":
+        return [entry.get("sym") or "Unknown"]
+    elif group_by == "direction":
+        return [entry.get("direction") or "Unknown"]
+    elif group_by == "day_of_week":
+        return [entry.get("day_of_week") or "Unknown"]
+    elif group_by == "session":
+        return [entry.get("session") or "Unknown"]
+    elif group_by == "asset_class":
+        return [entry.get("asset_class") or "equity"]
+    elif group_by == "playbook":
+        return [entry.get("playbook_id") or "No Playbook"]
+    elif group_by == "month":
+        ed = entry.get("entry_date") or ""
+        return [ed[:7]] if len(ed) >= 7 else ["Unknown"]
+    elif group_by == "week":
+        try:
+            dt = datetime.strptime(entry["entry_date"][:10], "%Y-%m-%d")
+            iso = dt.isocalendar()
+            return [f"{iso[0]}-W{iso[1]:02d}"]
+        except (ValueError, KeyError, TypeError):
+            return ["Unknown"]
+    elif group_by == "mistake_tag":
+        tags = (entry.get("mistake_tags") or "").strip()
+        if not tags:
+            return ["No Mistakes"]
+        return list(dict.fromkeys(t.strip() for t in tags.split(",") if t.strip()))
+    elif group_by == "emotion_tag":
+        tags = (entry.get("emotion_tags") or "").strip()
+        if not tags:
+            return ["No Emotion Tag"]
+        return list(dict.fromkeys(t.strip() for t in tags.split(",") if t.strip()))
+    elif group_by == "holding_period_bucket":
+        mins = entry.get("holding_minutes")
+        if mins is None:
+            return ["Unknown"]
+        for lo, hi, label in _HOLDING_BUCKETS:
+            if lo <= mins < hi:
+                return [label]
+        return ["5W+"]
+    elif group_by == "process_score_bucket":
+        ps = entry.get("process_score")
+        if ps is None:
+            return ["Unscored"]
+        for lo, hi, label in _PROCESS_BUCKETS:
+            if lo <= ps <= hi:
+                return [label]
+        return ["Unscored"]
+    return ["Unknown"]
+
+
+def _day(entry: dict) -> str:
+    return (entry.get("entry_date") or "")[:10]
+
+
+def _keys(entry: dict):
+    day = _day(entry)
+    for dim in ("ALL",) + DIMENSIONS:
+        for bucket in bucket_keys(entry, dim):
+            yield dim, bucket, day
+
+
+def _contribution(entry: dict) -> dict:
+    pnl = entry.get("pnl_pct")
+    r = entry.get("realized_r")
+    ps = entry.get("process_score")
+    hold = entry.get("holding_minutes")
+    c = dict.fromkeys(_SUM_COLS, 0)
+    c["trade_count"] = 1
+    if pnl is not None:
+        c["pnl_count"] = 1
+        c["pnl_sum"] = pnl
+        if pnl > 0:
+            c["wins"] = 1
+            c["win_sum"] = pnl
+        else:
+            c["loss_sum"] = abs(pnl)
+        if r is not None:
+            c["r_count"] = 1
+            c["r_sum"] = r
+    if ps is not None:
+        c["ps_count"] = 1
+        c["ps_sum"] = ps
+    if hold is not None:
+        c["hold_count"] = 1
+        c["hold_sum"] = hold
+    return c
+
+
+def _counts(entry: dict | None) -> bool:
+    return bool(entry) and entry.get("status") == "closed"
+
+
+# ── Incremental maintenance ──────────────────────────────────────────────────
+
+_UPSERT_SQL = (
+    f"INSERT INTO journal_rollups (user_id, dimension, bucket, day, {', '.join(_SUM_COLS)}, "
+    f"{', '.join(_EXTREME_COLS)}) VALUES ({', '.join(['?'] * (4 + len(_SUM_COLS) + len(_EXTREME_COLS)))}) "
+    "ON CONFLICT(user_id, dimension, bucket, day) DO UPDATE SET "
+    + ", ".join(f"{c} = {c} + excluded.{c}" for c in _SUM_COLS) + ", "
+    + ", ".join(
+        f"{c} = CASE WHEN excluded.best_pnl IS NOT NULL AND (best_pnl IS NULL OR excluded.best_pnl > best_pnl) "
+        f"THEN excluded.{c} ELSE {c} END" for c in ("best_id", "best_sym", "best_pnl")
+    ) + ", "
+    + ", ".join(
+        f"{c} = CASE WHEN excluded.worst_pnl IS NOT NULL AND (worst_pnl IS NULL OR excluded.worst_pnl < worst_pnl) "
+        f"THEN excluded.{c} ELSE {c} END" for c in ("worst_id", "worst_sym", "worst_pnl")
+    )
+)
+
+
+def _add(conn, entry: dict) -> None:
+    c = _contribution(entry)
+    pnl = entry.get("pnl_pct")
+    extremes = (
+        (entry["id"], entry["sym"], pnl, entry["id"], entry["sym"], pnl)
+        if pnl is not None else (None,) * 6
+    )
+    conn.executemany(
+        _UPSERT_SQL,
+        [(entry["user_id"], dim, bucket, day, *(c[k] for k in _SUM_COLS), *extremes)
+         for dim, bucket, day in _keys(entry)],
+    )
+    if pnl is not None:
+        _equity_insert(conn, entry)
+    community_stats.add(conn, [entry])
+
+
+def _remove(conn, entry: dict) -> None:
+    c = _contribution(entry)
+    set_clause = ", ".join(f"{k} = {k} - ?" for k in _SUM_COLS)
+    user_id = entry["user_id"]
+    for dim, bucket, day in _keys(entry):
+        key = (user_id, dim, bucket, day)
+        conn.execute(
+            f"UPDATE journal_rollups SET {set_clause} "
+            "WHERE user_id = ? AND dimension = ? AND bucket = ? AND day = ?",
+            (*(c[k] for k in _SUM_COLS), *key),
+        )
+        row = conn.execute(
+            "SELECT trade_count, best_id, worst_id FROM journal_rollups "
+            "WHERE user_id = ? AND dimension = ? AND bucket = ? AND day = ?",
+            key,
+        ).fetchone()
+        if row is None:
+            continue
+        if row["trade_count"] <= 0:
+            conn.execute(
+                "DELETE FROM journal_rollups WHERE user_id = ? AND dimension = ? AND bucket = ? AND day = ?",
+                key,
+            )
+        elif entry["id"] in (row["best_id"], row["worst_id"]):
+            _refresh_extremes(conn, key, exclude_id=entry["id"])
+    if entry.get("pnl_pct") is not None:
+        _equity_delete(conn, entry)
+    community_stats.remove(conn, entry)
+
+
+def _refresh_extremes(conn, key: tuple, exclude_id: str) -> None:
+    """Recompute best/worst for one (dimension, bucket, day) after its extreme trade left.
+    Only that user's closed trades on that day are scanned."""
+    user_id, dim, bucket, day = key
+    rows = conn.execute(
+        f"SELECT {_ROW_COLS} FROM journal_entries WHERE user_id = ? AND status = 'closed' "
+        "AND substr(COALESCE(entry_date, ''), 1, 10) = ? AND pnl_pct IS NOT NULL AND id != ? "
+        "ORDER BY entry_date, id",
+        (user_id, day, exclude_id),
+    ).fetchall()
+    members = [dict(r) for r in rows if bucket in bucket_keys(dict(r), dim)]
+    best = max(members, key=lambda t: t["pnl_pct"]) if members else None
+    worst = min(members, key=lambda t: t["pnl_pct"]) if members else None
+    conn.execute(
+        "UPDATE journal_rollups SET best_id = ?, best_sym = ?, best_pnl = ?, "
+        "worst_id = ?, worst_sym = ?, worst_pnl = ? "
+        "WHERE user_id = ? AND dimension = ? AND bucket = ? AND day = ?",
+        (
+            best["id"] if best else None, best["sym"] if best else None, best["pnl_pct"] if best else None,
+            worst["id"] if worst else None, worst["sym"] if worst else None, worst["pnl_pct"] if worst else None,
+            *key,
+        ),
+    )
+
+
+def _equity_insert(conn, entry: dict) -> None:
+    user_id, ed, tid, pnl = entry["user_id"], entry.get("entry_date") or "", entry["id"], entry["pnl_pct"]
+    prev = conn.execute(
+        "SELECT cum_pnl FROM journal_equity WHERE user_id = ? "
+        "AND (entry_date < ? OR (entry_date = ? AND trade_id < ?)) "
+        "ORDER BY entry_date DESC, trade_id DESC LIMIT 1",
+        (user_id, ed, ed, tid),
+    ).fetchone()
+    conn.execute(
+        "UPDATE journal_equity SET cum_pnl = cum_pnl + ? WHERE user_id = ? "
+        "AND (entry_date > ? OR (entry_date = ? AND trade_id > ?))",
+        (pnl, user_id, ed, ed, tid),
+    )
+    conn.execute(
+        "INSERT INTO journal_equity (user_id, trade_id, entry_date, sym, pnl_pct, cum_pnl) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (user_id, tid, ed, entry["sym"], pnl, (prev["cum_pnl"] if prev else 0) + pnl),
+    )
+
+
+def _equity_delete(conn, entry: dict) -> None:
+    row = conn.execute(
+        "SELECT entry_date, pnl_pct FROM journal_equity WHERE user_id = ? AND trade_id = ?",
+        (entry["user_id"], entry["id"]),
+    ).fetchone()
+    if not row:
+        return
+    ed = row["entry_date"]
+    conn.execute(
+        "UPDATE journal_equity SET cum_pnl = cum_pnl - ? WHERE user_id = ? "
+        "AND (entry_date > ? OR (entry_date = ? AND trade_id > ?))",
+        (row["pnl_pct"], entry["user_id"], ed, ed, entry["id"]),
+    )
+    conn.execute(
+        "DELETE FROM journal_equity WHERE user_id = ? AND trade_id = ?",
+        (entry["user_id"], entry["id"]),
+    )
+
+
+def fetch_row(conn, user_id: str, trade_id: str) -> dict | None:
+    """Read the columns rollups depend on for one trade (use before/after a write)."""
+    row = conn.execute(
+        f"SELECT {_ROW_COLS} FROM journal_entries WHERE id = ? AND user_id = ?",
+        (trade_id, user_id),
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def apply_change(conn, old: dict | None, new: dict | None) -> None:
+    """Move a trade's contribution from `old` to `new` (either may be None). Caller commits."""
+    if _counts(old):
+        _remove(conn, old)
+    if _counts(new):
+        _add(conn, new)
+
+
+def add_many(conn, user_id: str, entries: list[dict]) -> None:
+    """Fold a batch of newly inserted trades in one pass (bulk import). Caller commits.
+
+    Contributions are summed per key in Python and upserted with one executemany, and the
+    equity series is re-walked once from the earliest new trade instead of shifting
+    successors for every row.
+    """
+    closed = [e for e in entries if _counts(e)]
+    if not closed:
+        return
+    deltas: dict[tuple, dict] = {}
+    for e in closed:
+        c = _contribution(e)
+        pnl = e.get("pnl_pct")
+        for key in _keys(e):
+            agg = deltas.setdefault(key, {**dict.fromkeys(_SUM_COLS, 0), "best": None, "worst": None})
+            for k in _SUM_COLS:
+                agg[k] += c[k]
+            if pnl is not None:
+                if agg["best"] is None or pnl > agg["best"]["pnl_pct"]:
+                    agg["best"] = e
+                if agg["worst"] is None or pnl < agg["worst"]["pnl_pct"]:
+                    agg["worst"] = e
+    params = []
+    for (dim, bucket, day), agg in deltas.items():
+        b, w = agg["best"], agg["worst"]
+        params.append((
+            user_id, dim, bucket, day, *(agg[k] for k in _SUM_COLS),
+            b["id"] if b else None, b["sym"] if b else None, b["pnl_pct"] if b else None,
+            w["id"] if w else None, w["sym"] if w else None, w["pnl_pct"] if w else None,
+        ))
+    conn.executemany(_UPSERT_SQL, params)
+    community_stats.add(conn, closed)
+
+    with_pnl = [e for e in closed if e.get("pnl_pct") is not None]
+    if with_pnl:
+        _equity_rewalk(conn, user_id, min(e.get("entry_date") or "" for e in with_pnl))
+
+
+def _equity_rewalk(conn, user_id: str, from_date: str) -> None:
+    """Rebuild the equity series from `from_date` onward out of raw closed trades."""
+    prev = conn.execute(
+        "SELECT cum_pnl FROM journal_equity WHERE user_id = ? AND entry_date < ? "
+        "ORDER BY entry_date DESC, trade_id DESC LIMIT 1",
+        (user_id, from_date),
+    ).fetchone()
+    cum = prev["cum_pnl"] if prev else 0.0
+    conn.execute("DELETE FROM journal_equity WHERE user_id = ? AND entry_date >= ?", (user_id, from_date))
+    rows = conn.execute(
+        "SELECT id, sym, COALESCE(entry_date, '') AS entry_date, pnl_pct FROM journal_entries "
+        "WHERE user_id = ? AND status = 'closed' AND pnl_pct IS NOT NULL AND COALESCE(entry_date, '') >= ? "
+        "ORDER BY COALESCE(entry_date, ''), id",
+        (user_id, from_date),
+    ).fetchall()
+    params = []
+    for r in rows:
+        cum += r["pnl_pct"]
+        params.append((user_id, r["id"], r["entry_date"], r["sym"], r["pnl_pct"], cum))
+    conn.executemany(
+        "INSERT INTO journal_equity (user_id, trade_id, entry_date, sym, pnl_pct, cum_pnl) VALUES (?, ?, ?, ?, ?, ?)",
+        params,
+    )
+
+
+def delete_user(conn, user_id: str) -> None:
+    community_stats.remove_user(conn, user_id)
+    conn.execute("DELETE FROM journal_rollups WHERE user_id = ?", (user_id,))
+    conn.execute("DELETE FROM journal_equity WHERE user_id = ?", (user_id,))
+
+
+# ── Reads ────────────────────────────────────────────────────────────────────
+
+def _range(date_from: str = None, date_to: str = None) -> tuple[str, list]:
+    sql, params = "", []
+    if date_from:
+        sql += " AND day >= ?"
+        params.append(date_from)
+    if date_to:
+        sql += " AND day <= ?"
+        params.append(date_to)
+    return sql, params
+
+
+def read_buckets(conn, user_id: str, dimension: str, date_from: str = None, date_to: str = None) -> list[dict]:
+    """Aggregate sums + best/worst per bucket for one dimension over a day range."""
+    rng, rng_params = _range(date_from, date_to)
+    sums = conn.execute(
+        f"SELECT bucket, {', '.join(f'SUM({c}) AS {c}' for c in _SUM_COLS)} FROM journal_rollups "
+        f"WHERE user_id = ? AND dimension = ?{rng} GROUP BY bucket",
+        [user_id, dimension, *rng_params],
+    ).fetchall()
+    # SQLite returns the bare columns from the row holding the MAX/MIN.
+    best = {
+        r["bucket"]: r for r in conn.execute(
+            "SELECT bucket, best_id, best_sym, MAX(best_pnl) AS best_pnl FROM journal_rollups "
+            f"WHERE user_id = ? AND dimension = ?{rng} AND best_pnl IS NOT NULL GROUP BY bucket",
+            [user_id, dimension, *rng_params],
+        ).fetchall()
+    }
+    worst = {
+        r["bucket"]: r for r in conn.execute(
+            "SELECT bucket, worst_id, worst_sym, MIN(worst_pnl) AS worst_pnl FROM journal_rollups "
+            f"WHERE user_id = ? AND dimension = ?{rng} AND worst_pnl IS NOT NULL GROUP BY bucket",
+            [user_id, dimension, *rng_params],
+        ).fetchall()
+    }
+    out = []
+    for r in sums:
+        if not r["trade_count"]:
+            continue
+        d = dict(r)
+        b, w = best.get(r["bucket"]), worst.get(r["bucket"])
+        d["best"] = {"id": b["best_id"], "sym": b["best_sym"], "pnl_pct": b["best_pnl"]} if b else None
+        d["worst"] = {"id": w["worst_id"], "sym": w["worst_sym"], "pnl_pct": w["worst_pnl"]} if w else None
+        out.append(d)
+    return out
+
+
+def read_equity(conn, user_id: str, date_from: str = None, date_to: str = None) -> list[dict]:
+    """Cumulative P&L per trade in chronological order, rebased to 0 at date_from."""
+    base = 0.0
+    if date_from:
+        prev = conn.execute(
+            "SELECT cum_pnl FROM journal_equity WHERE user_id = ? AND entry_date < ? "
+            "ORDER BY entry_date DESC, trade_id DESC LIMIT 1",
+            (user_id, date_from),
+        ).fetchone()
+        base = prev["cum_pnl"] if prev else 0.0
+    where, params = "user_id = ?", [user_id]
+    if date_from:
+        where += " AND entry_date >= ?"
+        params.append(date_from)
+    if date_to:
+        where += " AND entry_date <= ?"
+        params.append(date_to)
+    rows = conn.execute(
+        f"SELECT entry_date, sym, cum_pnl FROM journal_equity WHERE {where} ORDER BY entry_date, trade_id",
+        params,
+    ).fetchall()
+    return [{"date": r["entry_date"], "sym": r["sym"], "cum_pnl": round(r["cum_pnl"] - base, 2)} for r in rows]
+
+
+# ── Consistency ──────────────────────────────────────────────────────────────
+
+def _expected(conn, user_id: str) -> tuple[dict, dict]:
+    """Recompute rollup rows and equity series for a user from raw journal_entries."""
+    rows = conn.execute(
+        f"SELECT {_ROW_COLS} FROM journal_entries WHERE user_id = ? AND status = 'closed' "
+        "ORDER BY entry_date, id",
+        (user_id,),
+    ).fetchall()
+    rollups: dict[tuple, dict] = {}
+    equity: dict[str, float] = {}
+    cum = 0.0
+    for r in rows:
+        e = dict(r)
+        c = _contribution(e)
+        pnl = e["pnl_pct"]
+        for key in _keys(e):
+            agg = rollups.setdefault(key, {**dict.fromkeys(_SUM_COLS, 0), "best_pnl": None, "worst_pnl": None})
+            for k in _SUM_COLS:
+                agg[k] += c[k]
+            if pnl is not None:
+                if agg["best_pnl"] is None or pnl > agg["best_pnl"]:
+                    agg["best_pnl"] = pnl
+                if agg["worst_pnl"] is None or pnl < agg["worst_pnl"]:
+                    agg["worst_pnl"] = pnl
+        if pnl is not None:
+            cum += pnl
+            equity[e["id"]] = cum
+    return rollups, equity
+
+
+def check_user(user_id: str) -> dict:
+    """Diff stored rollups against a recomputation from raw rows.
+
+    Returns {"ok": bool, "missing": [...], "extra": [...], "mismatched": [...], "equity_mismatched": [...]}.
+    """
+    conn = get_connection()
+    try:
+        expected, expected_equity = _expected(conn, user_id)
+        stored = {
+            (r["dimension"], r["bucket"], r["day"]): dict(r)
+            for r in conn.execute("SELECT * FROM journal_rollups WHERE user_id = ?", (user_id,)).fetchall()
+        }
+        stored_equity = {
+            r["trade_id"]: r["cum_pnl"]
+            for r in conn.execute("SELECT trade_id, cum_pnl FROM journal_equity WHERE user_id = ?", (user_id,))
+        }
+    finally:
+        conn.close()
+
+    def _close(a, b):
+        if a is None or b is None:
+            return a is None and b is None
+        return abs(a - b) < _EPS
+
+    missing = [list(k) for k in expected if k not in stored]
+    extra = [list(k) for k in stored if k not in expected]
+    mismatched = []
+    for key, exp in expected.items():
+        got = stored.get(key)
+        if not got:
+            continue
+        diffs = {c: {"expected": exp[c], "stored": got[c]}
+                 for c in _SUM_COLS + ("best_pnl", "worst_pnl") if not _close(exp[c], got[c])}
+        if diffs:
+            mismatched.append({"key": list(key), "diffs": diffs})
+    equity_mismatched = [
+        tid for tid in set(expected_equity) | set(stored_equity)
+        if not _close(expected_equity.get(tid), stored_equity.get(tid))
+    ]
+    return {
+        "ok": not (missing or extra or mismatched or equity_mismatched),
+        "missing": missing,
+        "extra": extra,
+        "mismatched": mismatched,
+        "equity_mismatched": sorted(equity_mismatched),
+    }
+
+
+def rebuild_user(conn, user_id: str) -> int:
+    """Replace a user's rollups and equity series with a recomputation from raw rows. Caller commits.
+    Returns the number of trades folded in."""
+    delete_user(conn, user_id)
+    rows = conn.execute(
+        f"SELECT {_ROW_COLS} FROM journal_entries WHERE user_id = ? AND status = 'closed' "
+        "ORDER BY entry_date, id",
+        (user_id,),
+    ).fetchall()
+    add_many(conn, user_id, [dict(r) for r in rows])
+    return len(rows)
+
+
+def rebuild_all(conn) -> int:
+    """Rebuild rollups for every user with closed trades. Caller commits. Returns user count."""
+    users = [r["user_id"] for r in conn.execute(
+        "SELECT DISTINCT user_id FROM journal_entries WHERE status = 'closed'"
+    ).fetchall()]
+    for uid in users:
+        rebuild_user(conn, uid)
+    return len(users)
@@ -0,0 +1,319 @@
+"""
+Journal search — FTS5 full-text search over trades, daily journals and playbooks, plus
+normalized trade tags.
+
+journal_search_docs maps each indexed row (kind, ref_id) to an integer doc_id, which is
+the rowid of that row's document in the journal_search FTS5 table. Triggers on the source
+tables keep both in sync, so every writer (CRUD, CSV import, executions) is covered
+without touching the services. The FTS table also indexes the owner's user id, so a
+per-user query is resolved by the index rather than filtered afterwards.
+
+journal_entry_tags holds one lowercase, trimmed row per tag in tags / mistake_tags /
+emotion_tags. It is maintained by triggers too, and it is what the tag filters match on
+instead of LIKE over the comma-separated column.
+"""
+
+import html
+import re
+
+from api.services.auth_db import get_connection
+
+KINDS = ("trade", "daily", "playbook")
+TAG_KINDS = {"tag": "tags", "mistake": "mistake_tags", "emotion": "emotion_tags"}
+
+# kind → source table, date column, and the columns folded into each FTS column
+_SOURCES = {
+    "trade": {
+        "table": "journal_entries",
+        "date": "entry_date",
+        "title": ("sym", "setup", "strategy"),
+        "body": ("notes", "thesis", "market_context", "lesson", "follow_up"),
+        "tags": ("tags", "mistake_tags", "emotion_tags"),
+    },
+    "daily": {
+        "table": "daily_journals",
+        "date": "date",
+        "title": ("date",),
+        "body": ("premarket_thesis", "focus_list", "a_plus_setups", "risk_plan", "market_regime",
+                 "emotional_state", "midday_notes", "eod_recap", "did_well", "did_poorly",
+                 "learned", "tomorrow_focus"),
+        "tags": (),
+    },
+    "playbook": {
+        "table": "playbooks",
+        "date": None,
+        "title": ("name",),
+        "body": ("description", "market_condition", "trigger_criteria", "invalidations",
+                 "entry_model", "exit_model", "sizing_rules", "common_mistakes",
+                 "best_practices", "ideal_time", "ideal_volatility"),
+        "tags": (),
+    },
+}
+
+# bm25 column weights: title, body, tags, owner
+_WEIGHTS = "10.0, 1.0, 4.0, 0.0"
+_SNIPPET_TOKENS = 16
+# Private-use markers around matches; swapped for <mark> after HTML-escaping the text.
+_HL_OPEN, _HL_CLOSE = "\ue000", "\ue001"
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+# ── Schema ───────────────────────────────────────────────────────────────────
+
+def _concat(prefix: str, cols: tuple) -> str:
+    if not cols:
+        return "''"
+    return " || ' ' || ".join(f"COALESCE({prefix}{c}, '')" for c in cols)
+
+
+def _doc_id(kind: str, ref: str) -> str:
+    return f"(SELECT doc_id FROM journal_search_docs WHERE kind = '{kind}' AND ref_id = {ref})"
+
+
+def _split_tags_sql(id_expr: str, user_expr: str, kind: str, col_expr: str) -> str:
+    """INSERT that splits a comma-separated column into normalized journal_entry_tags rows."""
+    return (
+        "INSERT OR IGNORE INTO journal_entry_tags (trade_id, user_id, kind, tag) "
+        "WITH RECURSIVE split(tag, rest) AS ("
+        f"SELECT '', COALESCE({col_expr}, '') || ',' UNION ALL "
+        "SELECT lower(trim(substr(rest, 1, instr(rest, ',') - 1))), substr(rest, instr(rest, ',') + 1) "
+        "FROM split WHERE rest <> '') "
+        f"SELECT {id_expr}, {user_expr}, '{kind}', tag FROM split WHERE tag <> ''"
+    )
+
+
+def _triggers(kind: str) -> list[str]:
+    src = _SOURCES[kind]
+    table = src["table"]
+    date = f"new.{src['date']}" if src["date"] else "NULL"
+    watched = ", ".join(dict.fromkeys(src["title"] + src["body"] + src["tags"] + ((src["date"],) if src["date"] else ())))
+    index_new = (
+        f"INSERT INTO journal_search (rowid, title, body, tags, owner) VALUES ({_doc_id(kind, 'new.id')}, "
+        f"{_concat('new.', src['title'])}, {_concat('new.', src['body'])}, {_concat('new.', src['tags'])}, new.user_id);"
+    )
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_search_ai AFTER INSERT ON {table} BEGIN
+            INSERT OR IGNORE INTO journal_search_docs (kind, ref_id, user_id, doc_date) VALUES ('{kind}', new.id, new.user_id, {date});
+            {index_new}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_search_au AFTER UPDATE OF {watched} ON {table} BEGIN
+            DELETE FROM journal_search WHERE rowid = {_doc_id(kind, 'old.id')};
+            INSERT OR IGNORE INTO journal_search_docs (kind, ref_id, user_id, doc_date) VALUES ('{kind}', new.id, new.user_id, {date});
+            UPDATE journal_search_docs SET doc_date = {date} WHERE kind = '{kind}' AND ref_id = new.id;
+            {index_new}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_search_ad AFTER DELETE ON {table} BEGIN
+            DELETE FROM journal_search WHERE rowid = {_doc_id(kind, 'old.id')};
+            DELETE FROM journal_search_docs WHERE kind = '{kind}' AND ref_id = old.id;
+        END""",
+    ]
+
+
+def _tag_triggers() -> list[str]:
+    split_new = "\n".join(
+        _split_tags_sql("new.id", "new.user_id", tk, f"new.{col}") + ";" for tk, col in TAG_KINDS.items()
+    )
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS journal_entries_tags_ai AFTER INSERT ON journal_entries BEGIN
+            {split_new}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS journal_entries_tags_au
+            AFTER UPDATE OF {', '.join(TAG_KINDS.values())} ON journal_entries BEGIN
+            DELETE FROM journal_entry_tags WHERE trade_id = old.id;
+            {split_new}
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS journal_entries_tags_ad AFTER DELETE ON journal_entries BEGIN
+            DELETE FROM journal_entry_tags WHERE trade_id = old.id;
+        END""",
+    ]
+
+
+def install(conn) -> None:
+    """Create the tag and search tables and their triggers, backfilling on first install.
+    Caller commits. Raises sqlite3.OperationalError if this SQLite build has no FTS5;
+    the tag table is committed before that point, so tag filters work either way."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS journal_entry_tags (
+            trade_id    TEXT NOT NULL,
+            user_id     TEXT NOT NULL,
+            kind        TEXT NOT NULL,
+            tag         TEXT NOT NULL,
+            PRIMARY KEY (trade_id, kind, tag)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_journal_entry_tags_lookup ON journal_entry_tags(user_id, kind, tag)")
+    tags_new = not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'journal_entries_tags_ai'"
+    ).fetchone()
+    for stmt in _tag_triggers():
+        conn.execute(stmt)
+    if tags_new:
+        _rebuild_tags(conn)
+    conn.commit()
+
+    # Full-text index — needs FTS5, so it comes after the tag table that filters rely on.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS journal_search_docs (
+            doc_id      INTEGER PRIMARY KEY,
+            kind        TEXT NOT NULL,
+            ref_id      TEXT NOT NULL,
+            user_id     TEXT NOT NULL,
+            doc_date    TEXT,
+            UNIQUE(kind, ref_id)
+        )
+    """)
+    created = not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'journal_search'"
+    ).fetchone()
+    conn.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS journal_search USING fts5("
+        "title, body, tags, owner, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    for kind in KINDS:
+        for stmt in _triggers(kind):
+            conn.execute(stmt)
+    if created:
+        rebuild_index(conn)
+
+
+def rebuild_index(conn) -> dict:
+    """Re-index every source row and re-split every trade's tags. Caller commits."""
+    conn.execute("DELETE FROM journal_search")
+    conn.execute("DELETE FROM journal_search_docs")
+    counts = {}
+    for kind in KINDS:
+        src = _SOURCES[kind]
+        date = src["date"] or "NULL"
+        conn.execute(
+            f"INSERT INTO journal_search_docs (kind, ref_id, user_id, doc_date) "
+            f"SELECT '{kind}', id, user_id, {date} FROM {src['table']}"
+        )
+        counts[kind] = conn.execute(
+            f"INSERT INTO journal_search (rowid, title, body, tags, owner) "
+            f"SELECT d.doc_id, {_concat('s.', src['title'])}, {_concat('s.', src['body'])}, "
+            f"{_concat('s.', src['tags'])}, s.user_id FROM {src['table']} s "
+            f"JOIN journal_search_docs d ON d.kind = '{kind}' AND d.ref_id = s.id"
+        ).rowcount
+    _rebuild_tags(conn)
+    return counts
+
+
+def _rebuild_tags(conn) -> None:
+    conn.execute("DELETE FROM journal_entry_tags")
+    for r in conn.execute("SELECT id, user_id, tags, mistake_tags, emotion_tags FROM journal_entries").fetchall():
+        for tk, col in TAG_KINDS.items():
+            if r[col]:
+                # The column value is bound first: it appears in the CTE before the id/user select.
+                conn.execute(_split_tags_sql("?", "?", tk, "?"), (r[col], r["id"], r["user_id"]))
+
+
+# ── Queries ──────────────────────────────────────────────────────────────────
+
+def normalize_tag(tag: str) -> str:
+    return (tag or "").strip().lower()
+
+
+def build_match(q: str, prefix: bool = True) -> str | None:
+    """Turn free text into an FTS5 expression: every word must match, each as a quoted
+    term (so user input can't inject FTS syntax), with prefix matching on each."""
+    terms = _TERM_RE.findall(q or "")
+    if not terms:
+        return None
+    star = "*" if prefix else ""
+    return " AND ".join(f'"{t}"{star}' for t in terms)
+
+
+def owner_match(user_id: str, match: str) -> str:
+    """Scope a match expression to one user's documents, keeping the terms off the owner column."""
+    return f'owner : "{user_id.replace(chr(34), "")}" AND {{title body tags}} : ({match})'
+
+
+def _mark(text: str) -> str:
+    return html.escape(text or "").replace(_HL_OPEN, "<mark>").replace(_HL_CLOSE, "</mark>")
+
+
+def search(user_id: str, q: str, kinds: list[str] = None, filters: dict = None,
+           limit: int = 20, offset: int = 0) -> dict:
+    """Ranked search with highlighted titles and snippets.
+
+    Structured trade filters (same keys as journal_service.list_entries) narrow the trade
+    hits; date_from/date_to also narrow daily journals. Playbooks have no date or trade
+    fields, so they drop out when any structured filter is given.
+    Returns {"results": [...], "total": int}.
+    """
+    from api.services.journal_service import build_entry_filters
+
+    match = build_match(q)
+    if not match:
+        return {"results": [], "total": 0}
+    kinds = [k for k in (kinds or KINDS) if k in KINDS]
+    filters = {k: v for k, v in (filters or {}).items() if v not in (None, "")}
+    if filters:
+        kinds = [k for k in kinds if k != "playbook"]
+    if not kinds:
+        return {"results": [], "total": 0}
+    limit = min(max(limit, 1), 100)
+
+    where = ["journal_search MATCH ?", "d.user_id = ?", f"d.kind IN ({','.join('?' * len(kinds))})"]
+    params: list = [owner_match(user_id, match), user_id, *kinds]
+    trade_filters = {k: v for k, v in filters.items() if k not in ("sort_by", "sort_dir")}
+    if trade_filters and "trade" in kinds:
+        trade_where, trade_params = build_entry_filters(user_id, trade_filters)
+        where.append(
+            f"(d.kind != 'trade' OR d.ref_id IN (SELECT id FROM journal_entries WHERE {trade_where}))"
+        )
+        params += trade_params
+    if filters.get("date_from"):
+        where.append("(d.kind != 'daily' OR d.doc_date >= ?)")
+        params.append(filters["date_from"])
+    if filters.get("date_to"):
+        where.append("(d.kind != 'daily' OR d.doc_date <= ?)")
+        params.append(filters["date_to"])
+    where_clause = " AND ".join(where)
+    base = "FROM journal_search JOIN journal_search_docs d ON d.doc_id = journal_search.rowid"
+
+    conn = get_connection()
+    try:
+        total = conn.execute(f"SELECT COUNT(*) {base} WHERE {where_clause}", params).fetchone()[0]
+        rows = conn.execute(
+            f"""SELECT d.kind, d.ref_id, d.doc_date,
+                       highlight(journal_search, 0, ?, ?) AS title,
+                       snippet(journal_search, 1, ?, ?, '…', {_SNIPPET_TOKENS}) AS body_snippet,
+                       snippet(journal_search, 2, ?, ?, '…', {_SNIPPET_TOKENS}) AS tags_snippet,
+                       bm25(journal_search, {_WEIGHTS}) AS score
+                {base} WHERE {where_clause}
+                ORDER BY score LIMIT ? OFFSET ?""",
+            [_HL_OPEN, _HL_CLOSE] * 3 + params + [limit, offset],
+        ).fetchall()
+    finally:
+        conn.close()
+
+    results = []
+    for r in rows:
+        # Prefer the body excerpt; fall back to tags when the hit was only in tags.
+        snippet = r["body_snippet"]
+        if _HL_OPEN not in (snippet or "") and _HL_OPEN in (r["tags_snippet"] or ""):
+            snippet = r["tags_snippet"]
+        results.append({
+            "kind": r["kind"],
+            "id": r["ref_id"],
+            "date": r["doc_date"],
+            "title": _mark(r["title"]),
+            "snippet": _mark(snippet),
+            "score": round(-r["score"], 4),
+        })
+    return {"results": results, "total": total}
+
+
+def list_tags(user_id: str, kind: str = "tag") -> list[dict]:
+    """Distinct normalized tags of one kind with their trade counts, most used first."""
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            "SELECT tag, COUNT(*) AS count FROM journal_entry_tags WHERE user_id = ? AND kind = ? "
+            "GROUP BY tag ORDER BY count DESC, tag",
+            (user_id, kind),
+        ).fetchall()
+        return [dict(r) for r in rows]
+    finally:
+        conn.close()
@@ -8,7 +8,9 @@ import uuid
 from datetime import date as _date
 from datetime import datetime, timezone
 
+from api.services import journal_rollups
 from api.services.auth_db import get_connection
+from api.services.journal_search import build_match, normalize_tag, owner_match
 from api.services.journal_taxonomy import (
     VALID_DIRECTIONS, VALID_STATUSES, VALID_ASSET_CLASSES, VALID_SESSIONS,
     REVIEW_STATUSES, compute_review_status,
@@ -60,8 +62,9 @@ def _safe_int(val):
         return None
 
 
-def _compute_derived(data: dict, existing: dict = None, user_id: str = None) -> dict:
-    """Compute P&L, R-multiple, risk_dollars, size_pct, day_of_week, holding_minutes from fields."""
+def _compute_derived(data: dict, existing: dict = None, user_id: str = None, balances: dict = None) -> dict:
+    """Compute P&L, R-multiple, risk_dollars, size_pct, day_of_week, holding_minutes from fields.
+    `balances` memoizes account balance lookups across calls (bulk import)."""
     merged = {**(existing or {}), **data}
 
     entry_price = _safe_float(merged.get("entry_price"))
@@ -112,7 +115,12 @@ def _compute_derived(data: dict, existing: dict = None, user_id: str = None) ->
         try:
             from api.services.trading_accounts import get_account_balance
             account_name = merged.get("account")
-            balance = get_account_balance(user_id, account_name)
+            if balances is None:
+                balance = get_account_balance(user_id, account_name)
+            else:
+                if account_name not in balances:
+                    balances[account_name] = get_account_balance(user_id, account_name)
+                balance = balances[account_name]
             if balance and balance > 0:
                 data["size_pct"] = round((abs(shares) * entry_price) / balance * 100, 2)
         except Exception:
@@ -153,7 +161,9 @@ def _compute_derived(data: dict, existing: dict = None, user_id: str = None) ->
     return data
 
 
-def create_entry(user_id: str, data: dict) -> dict:
+def prepare_entry(user_id: str, data: dict, balances: dict = None) -> dict:
+    """Sanitize input and compute derived fields. Returns the full column dict
+    (including id, user_id and timestamps) ready to insert into journal_entries."""
     entry_id = str(uuid.uuid4())[:12]
     now = datetime.now(timezone.utc).isoformat()
 
@@ -213,16 +223,23 @@ def create_entry(user_id: str, data: dict) -> dict:
     }
 
     # Compute derived fields
-    clean = _compute_derived(clean, user_id=user_id)
+    clean = _compute_derived(clean, user_id=user_id, balances=balances)
+    return {**clean, "id": entry_id, "user_id": user_id, "created_at": now, "updated_at": now}
+
+
+def create_entry(user_id: str, data: dict) -> dict:
+    clean = prepare_entry(user_id, data)
+    entry_id = clean["id"]
 
-    cols = list(clean.keys()) + ["id", "user_id", "created_at", "updated_at"]
-    vals = list(clean.values()) + [entry_id, user_id, now, now]
+    cols = list(clean.keys())
+    vals = list(clean.values())
     placeholders = ",".join(["?"] * len(cols))
     col_names = ",".join(cols)
 
     conn = get_connection()
     try:
         conn.execute(f"INSERT INTO journal_entries ({col_names}) VALUES ({placeholders})", vals)
+        journal_rollups.apply_change(conn, None, journal_rollups.fetch_row(conn, user_id, entry_id))
         conn.commit()
         # Recompute playbook stats if linked
         if clean.get("playbook_id"):
@@ -248,11 +265,9 @@ def get_entry(user_id: str, entry_id: str) -> dict | None:
         conn.close()
 
 
-def list_entries(user_id: str, filters: dict = None, limit: int = 50, offset: int = 0) -> dict:
-    """List trades with filtering. Returns {trades: [...], total: int}."""
-    filters = filters or {}
-    limit = min(limit, 500)
-
+def build_entry_filters(user_id: str, filters: dict) -> tuple[str, list]:
+    """WHERE clause + params over journal_entries for the structured list filters.
+    Shared with journal_search so full-text hits can be narrowed the same way."""
     where = ["user_id = ?"]
     params = [user_id]
 
@@ -300,13 +315,23 @@ def list_entries(user_id: str, filters: dict = None, limit: int = 50, offset: in
         where.append("entry_date <= ?")
         params.append(filters["date_to"])
 
-    # Tag filters (LIKE for comma-separated)
-    if filters.get("tag"):
-        where.append("tags LIKE ?")
-        params.append(f"%{filters['tag']}%")
-    if filters.get("mistake_tag"):
-        where.append("mistake_tags LIKE ?")
-        params.append(f"%{filters['mistake_tag']}%")
+    # Tag filters (exact match on normalized tags)
+    for field, kind in (("tag", "tag"), ("mistake_tag", "mistake"), ("emotion_tag", "emotion")):
+        if filters.get(field):
+            where.append(
+                "id IN (SELECT trade_id FROM journal_entry_tags WHERE user_id = ? AND kind = ? AND tag = ?)"
+            )
+            params.extend([user_id, kind, normalize_tag(filters[field])])
+
+    # Full-text
+    if filters.get("q"):
+        match = build_match(filters["q"])
+        if match:
+            where.append(
+                "id IN (SELECT d.ref_id FROM journal_search JOIN journal_search_docs d "
+                "ON d.doc_id = journal_search.rowid WHERE journal_search MATCH ? AND d.kind = 'trade')"
+            )
+            params.append(owner_match(user_id, match))
 
     # Boolean filters
     if filters.get("has_screenshots") == "true":
@@ -336,7 +361,14 @@ def list_entries(user_id: str, filters: dict = None, limit: int = 50, offset: in
         where.append("pnl_pct <= ?")
         params.append(float(filters["max_pnl"]))
 
-    where_clause = " AND ".join(where)
+    return " AND ".join(where), params
+
+
+def list_entries(user_id: str, filters: dict = None, limit: int = 50, offset: int = 0) -> dict:
+    """List trades with filtering. Returns {trades: [...], total: int}."""
+    filters = filters or {}
+    limit = min(limit, 500)
+    where_clause, params = build_entry_filters(user_id, filters)
 
     # Sort
     sort_by = filters.get("sort_by", "entry_date")
@@ -400,10 +432,12 @@ def update_entry(user_id: str, entry_id: str, data: dict) -> dict | None:
 
     conn = get_connection()
     try:
+        before = journal_rollups.fetch_row(conn, user_id, entry_id)
         conn.execute(
             f"UPDATE journal_entries SET {set_clause} WHERE id = ? AND user_id = ?",
             values,
         )
+        journal_rollups.apply_change(conn, before, journal_rollups.fetch_row(conn, user_id, entry_id))
         conn.commit()
         # Recompute playbook stats if playbook changed
         try:
@@ -449,6 +483,7 @@ def delete_entry(user_id: str, entry_id: str) -> bool:
             "DELETE FROM trade_executions WHERE trade_id = ? AND user_id = ?",
             (entry_id, user_id),
         )
+        journal_rollups.apply_change(conn, journal_rollups.fetch_row(conn, user_id, entry_id), None)
         result = conn.execute(
             "DELETE FROM journal_entries WHERE id = ? AND user_id = ?",
             (entry_id, user_id),
@@ -460,20 +495,11 @@ def delete_entry(user_id: str, entry_id: str) -> bool:
 
 
 def get_stats(user_id: str, date_from: str = None, date_to: str = None) -> dict:
-    """Aggregate stats for a user's journal."""
+    """Aggregate stats for a user's journal, read from the journal_rollups table."""
     conn = get_connection()
     try:
-        where = "user_id = ? AND status = 'closed'"
-        params = [user_id]
-        if date_from:
-            where += " AND entry_date >= ?"
-            params.append(date_from)
-        if date_to:
-            where += " AND entry_date <= ?"
-            params.append(date_to)
-
-        rows = conn.execute(f"SELECT * FROM journal_entries WHERE {where}", params).fetchall()
-        entries = [dict(r) for r in rows]
+        totals = journal_rollups.read_buckets(conn, user_id, "ALL", date_from, date_to)
+        agg = totals[0] if totals else None
 
         open_count = conn.execute(
             "SELECT COUNT(*) as c FROM journal_entries WHERE user_id = ? AND status = 'open'",
@@ -486,7 +512,7 @@ def get_stats(user_id: str, date_from: str = None, date_to: str = None) -> dict:
             (user_id, today),
         ).fetchone()["c"]
 
-        if not entries:
+        if not agg:
             return {
                 "total_trades": 0, "open_trades": open_count, "today_trade_count": today_count, "wins": 0, "losses": 0,
                 "win_rate": 0, "avg_win_pct": 0, "avg_loss_pct": 0,
@@ -496,72 +522,57 @@ def get_stats(user_id: str, date_from: str = None, date_to: str = None) -> dict:
                 "review_counts": _get_review_counts(conn, user_id),
             }
 
-        with_pnl = [e for e in entries if e["pnl_pct"] is not None]
-        wins = [e for e in with_pnl if e["pnl_pct"] > 0]
-        losses = [e for e in with_pnl if e["pnl_pct"] <= 0]
+        n_pnl = agg["pnl_count"]
+        n_wins = agg["wins"]
+        n_losses = n_pnl - n_wins
 
-        avg_win = sum(e["pnl_pct"] for e in wins) / len(wins) if wins else 0
-        avg_loss = sum(abs(e["pnl_pct"]) for e in losses) / len(losses) if losses else 0
-        total_win = sum(e["pnl_pct"] for e in wins)
-        total_loss = sum(abs(e["pnl_pct"]) for e in losses)
-        pf = total_win / total_loss if total_loss > 0 else 0
+        avg_win = agg["win_sum"] / n_wins if n_wins else 0
+        avg_loss = agg["loss_sum"] / n_losses if n_losses else 0
+        # Sums are maintained incrementally, so round away float drift before comparing to zero.
+        total_loss = round(agg["loss_sum"], 9)
+        pf = agg["win_sum"] / total_loss if total_loss > 0 else 0
 
         # Expectancy
-        wr = len(wins) / len(with_pnl) if with_pnl else 0
-        expectancy = (wr * avg_win) - ((1 - wr) * avg_loss) if with_pnl else 0
+        wr = n_wins / n_pnl if n_pnl else 0
+        expectancy = (wr * avg_win) - ((1 - wr) * avg_loss) if n_pnl else 0
 
-        # Avg R
-        with_r = [e for e in with_pnl if e.get("realized_r") is not None]
-        avg_r = sum(e["realized_r"] for e in with_r) / len(with_r) if with_r else 0
+        avg_r = agg["r_sum"] / agg["r_count"] if agg["r_count"] else 0
+        avg_ps = agg["ps_sum"] / agg["ps_count"] if agg["ps_count"] else 0
 
-        # Avg process score
-        with_ps = [e for e in entries if e.get("process_score") is not None]
-        avg_ps = sum(e["process_score"] for e in with_ps) / len(with_ps) if with_ps else 0
-
-        sorted_by_pnl = sorted(with_pnl, key=lambda e: e["pnl_pct"])
-        best = sorted_by_pnl[-1] if sorted_by_pnl else None
-        worst = sorted_by_pnl[0] if sorted_by_pnl else None
+        best, worst = agg["best"], agg["worst"]
 
         # Top setups
-        setup_map = {}
-        for e in with_pnl:
-            s = e["setup"] or "Unknown"
-            if s not in setup_map:
-                setup_map[s] = {"setup": s, "wins": 0, "total": 0, "pnl_sum": 0, "r_sum": 0, "r_count": 0}
-            setup_map[s]["total"] += 1
-            setup_map[s]["pnl_sum"] += e["pnl_pct"]
-            if e["pnl_pct"] > 0:
-                setup_map[s]["wins"] += 1
-            if e.get("realized_r") is not None:
-                setup_map[s]["r_sum"] += e["realized_r"]
-                setup_map[s]["r_count"] += 1
-
-        top_setups = sorted(
-            [v for v in setup_map.values() if v["total"] >= 2],
-            key=lambda x: x["wins"] / x["total"],
-            reverse=True,
-        )[:5]
+        top_setups = []
+        for b in journal_rollups.read_buckets(conn, user_id, "setup", date_from, date_to):
+            if b["pnl_count"] < 2:
+                continue
+            top_setups.append({
+                "setup": "Unknown" if b["bucket"] == "No Setup" else b["bucket"],
+                "wins": b["wins"], "total": b["pnl_count"], "pnl_sum": b["pnl_sum"],
+                "r_sum": b["r_sum"], "r_count": b["r_count"],
+            })
+        top_setups = sorted(top_setups, key=lambda x: x["wins"] / x["total"], reverse=True)[:5]
         for s in top_setups:
             s["win_rate"] = round(s["wins"] / s["total"] * 100, 1)
             s["avg_pnl"] = round(s["pnl_sum"] / s["total"], 2)
             s["avg_r"] = round(s["r_sum"] / s["r_count"], 2) if s["r_count"] else None
 
         return {
-            "total_trades": len(entries),
+            "total_trades": agg["trade_count"],
             "open_trades": open_count,
             "today_trade_count": today_count,
-            "wins": len(wins),
-            "losses": len(losses),
-            "win_rate": round(wr * 100, 1) if with_pnl else 0,
+            "wins": n_wins,
+            "losses": n_losses,
+            "win_rate": round(wr * 100, 1) if n_pnl else 0,
             "avg_win_pct": round(avg_win, 2),
             "avg_loss_pct": round(avg_loss, 2),
             "profit_factor": round(pf, 2),
-            "total_pnl_pct": round(sum(e["pnl_pct"] for e in with_pnl), 2),
+            "total_pnl_pct": round(agg["pnl_sum"], 2),
             "avg_r": round(avg_r, 2),
             "expectancy": round(expectancy, 2),
             "avg_process_score": round(avg_ps, 1),
-            "best_trade": {"sym": best["sym"], "pnl_pct": best["pnl_pct"], "id": best["id"]} if best else None,
-            "worst_trade": {"sym": worst["sym"], "pnl_pct": worst["pnl_pct"], "id": worst["id"]} if worst else None,
+            "best_trade": dict(best) if best else None,
+            "worst_trade": dict(worst) if worst else None,
             "top_setups": top_setups,
             "review_counts": _get_review_counts(conn, user_id),
         }
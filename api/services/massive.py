@@ -269,6 +269,11 @@ def _detect_session() -> str:
     return "regular"
 
 
+def is_regular_session() -> bool:
+    """True between 9:30 and 16:00 ET on weekdays (market holidays aren't excluded)."""
+    return _detect_session() == "regular"
+
+
 def get_extended_movers() -> dict:
     """Return gainers/losers for the extended-hours movers page.
 
@@ -0,0 +1,462 @@
+# api/services/outbox.py — Durable outbound notification queue
+"""
+Discord webhooks and transactional email go through an outbox table in auth.db
+instead of being sent inline. enqueue() writes the row and wakes the dispatcher;
+delivery happens on the dispatcher thread (started in the app lifespan), so a slow
+or rate-limited provider never blocks a request and a restart loses nothing.
+
+- dedup_key is UNIQUE: enqueueing the same key twice is a no-op (returns None).
+- Batching: queued Discord messages for the same webhook that are plain embed posts
+  are rolled into one POST of up to MAX_EMBEDS embeds (Discord's per-message limit).
+- Rate limiting is per destination (webhook URL, or "email" for the provider).
+  Claiming a batch reserves the destination for MIN_INTERVAL seconds. A 429's
+  retry_after / Retry-After (or an exhausted X-RateLimit bucket) blocks the
+  destination until it passes; the rows are requeued without spending an attempt.
+- Other failures retry after BACKOFF_BASE * 2**attempts (capped, jittered). After
+  MAX_ATTEMPTS, or straight away on a permanent 4xx, a row is dead-lettered
+  (status 'dead') for the admin view. A merged batch rejected as a whole is split
+  and retried one message at a time before anything is dead-lettered.
+- Claims are leases: a row left 'sending' by a worker that died mid-send is picked
+  up again once claimed_until passes, so delivery is at-least-once.
+
+Claims are conditional UPDATEs, so several uvicorn workers can each run a
+dispatcher against the same table.
+"""
+
+import json
+import random
+import threading
+import time
+
+from api.services.auth_db import get_connection
+
+MAX_EMBEDS = 10
+MAX_EMBED_CHARS = 6000  # Discord's combined limit across all embeds in one message
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 5.0
+BACKOFF_MAX = 3600.0
+LEASE_SECONDS = 60.0
+POLL_SECONDS = 5.0
+MIN_INTERVAL = {"discord": 0.5, "email": 0.5}
+SENT_RETENTION_DAYS = 7
+STATUSES = ("pending", "sending", "sent", "dead")
+
+_wake = threading.Event()
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+
+
+class DeliveryError(Exception):
+    """A failed send. retry_after (seconds) means rate limited; permanent means don't retry."""
+
+    def __init__(self, message: str, retry_after: float | None = None, permanent: bool = False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.permanent = permanent
+
+
+# ── Schema ───────────────────────────────────────────────────────────────────
+
+def install(conn) -> None:
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel TEXT NOT NULL,
+            destination TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            dedup_key TEXT UNIQUE,
+            batch INTEGER NOT NULL DEFAULT 1,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            claimed_until REAL,
+            last_error TEXT,
+            created_at REAL NOT NULL,
+            sent_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt_at);
+
+        CREATE TABLE IF NOT EXISTS outbox_destinations (
+            destination TEXT PRIMARY KEY,
+            blocked_until REAL NOT NULL DEFAULT 0
+        );
+    """)
+
+
+# ── Enqueue ──────────────────────────────────────────────────────────────────
+
+def enqueue(channel: str, destination: str, payload: dict, dedup_key: str | None = None) -> int | None:
+    """Queue a message. Returns its outbox id, or None if dedup_key was already queued."""
+    if channel not in MIN_INTERVAL:
+        raise ValueError(f"Unknown channel: {channel}")
+    batch = int(channel == "discord" and set(payload) == {"embeds"})
+    now = time.time()
+    conn = get_connection()
+    try:
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO outbox (channel, destination, payload, dedup_key, batch, "
+            "next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (channel, destination, json.dumps(payload), dedup_key, batch, now, now),
+        )
+        conn.commit()
+        if cur.rowcount == 0:
+            return None
+        outbox_id = cur.lastrowid
+    finally:
+        conn.close()
+    _wake.set()
+    return outbox_id
+
+
+def enqueue_discord(webhook_url: str, embed: dict, dedup_key: str | None = None) -> int | None:
+    return enqueue("discord", webhook_url, {"embeds": [embed]}, dedup_key)
+
+
+def enqueue_email(to: str, subject: str, html: str, dedup_key: str | None = None) -> int | None:
+    return enqueue("email", "email", {"to": to, "subject": subject, "html": html}, dedup_key)
+
+
+# ── Transports ───────────────────────────────────────────────────────────────
+
+def _retry_after(resp) -> float | None:
+    try:
+        body = resp.json()
+        if isinstance(body, dict) and body.get("retry_after") is not None:
+            return float(body["retry_after"])
+    except ValueError:
+        pass
+    try:
+        return float(resp.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+
+def _send_discord(url: str, payload: dict) -> float | None:
+    """POST to a Discord webhook. Returns seconds until the bucket resets if it is now empty."""
+    import requests
+
+    try:
+        resp = requests.post(url, json=payload, timeout=10)
+    except requests.RequestException as e:
+        raise DeliveryError(f"{type(e).__name__}: {e}")
+    if resp.status_code == 429:
+        raise DeliveryError("429 rate limited", retry_after=_retry_after(resp) or 1.0)
+    if resp.status_code >= 400:
+        permanent = resp.status_code < 500 and resp.status_code != 408
+        raise DeliveryError(f"HTTP {resp.status_code}: {resp.text[:200]}", permanent=permanent)
+    if resp.headers.get("X-RateLimit-Remaining") == "0":
+        try:
+            return float(resp.headers.get("X-RateLimit-Reset-After", ""))
+        except ValueError:
+            return None
+    return None
+
+
+def _send_email(destination: str, payload: dict) -> None:
+    from api.services.email_service import deliver_email
+
+    try:
+        deliver_email(payload["to"], payload["subject"], payload["html"])
+    except Exception as e:
+        raise DeliveryError(f"{type(e).__name__}: {e}")
+
+
+_TRANSPORTS = {"discord": _send_discord, "email": _send_email}
+
+
+# ── Dispatch ─────────────────────────────────────────────────────────────────
+
+_DUE = "((status = 'pending' AND next_attempt_at <= :now) OR (status = 'sending' AND claimed_until < :now))"
+
+
+def _embed_chars(embed: dict) -> int:
+    n = len(embed.get("title", "")) + len(embed.get("description", ""))
+    n += len((embed.get("footer") or {}).get("text", "")) + len((embed.get("author") or {}).get("name", ""))
+    for f in embed.get("fields", []):
+        n += len(f.get("name", "")) + len(f.get("value", ""))
+    return n
+
+
+def _take_batch(rows: list) -> list:
+    """Leading rows of one destination that go out as a single message."""
+    first = rows[0]
+    if first["channel"] != "discord" or not first["batch"]:
+        return [first]
+    batch, embeds, chars = [], 0, 0
+    for row in rows:
+        if not row["batch"]:
+            break
+        row_embeds = json.loads(row["payload"])["embeds"]
+        row_chars = sum(_embed_chars(e) for e in row_embeds)
+        if batch and (embeds + len(row_embeds) > MAX_EMBEDS or chars + row_chars > MAX_EMBED_CHARS):
+            break
+        batch.append(row)
+        embeds += len(row_embeds)
+        chars += row_chars
+    return batch
+
+
+def _claim(limit: int) -> list[tuple[str, str, list]]:
+    """Claim at most one batch per unblocked destination. Returns (channel, destination, rows)."""
+    now = time.time()
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            f"SELECT o.* FROM outbox o LEFT JOIN outbox_destinations d ON d.destination = o.destination "
+            f"WHERE {_DUE} AND COALESCE(d.blocked_until, 0) <= :now ORDER BY o.id LIMIT :limit",
+            {"now": now, "limit": limit},
+        ).fetchall()
+        by_dest: dict[str, list] = {}
+        for row in rows:
+            by_dest.setdefault(row["destination"], []).append(row)
+
+        claimed = []
+        for destination, dest_rows in by_dest.items():
+            channel = dest_rows[0]["channel"]
+            # Reserve the destination's next send slot; another worker may have it already
+            cur = conn.execute(
+                "INSERT INTO outbox_destinations (destination, blocked_until) VALUES (?, ?) "
+                "ON CONFLICT(destination) DO UPDATE SET blocked_until = excluded.blocked_until "
+                "WHERE blocked_until <= ?",
+                (destination, now + MIN_INTERVAL.get(channel, 0.0), now),
+            )
+            if cur.rowcount == 0:
+                conn.commit()
+                continue
+            batch = []
+            for row in _take_batch(dest_rows):
+                cur = conn.execute(
+                    f"UPDATE outbox SET status = 'sending', claimed_until = :lease WHERE id = :id AND {_DUE}",
+                    {"lease": now + LEASE_SECONDS, "id": row["id"], "now": now},
+                )
+                if cur.rowcount:
+                    batch.append(row)
+            conn.commit()
+            if batch:
+                claimed.append((channel, destination, batch))
+        return claimed
+    finally:
+        conn.close()
+
+
+def _backoff(attempts: int) -> float:
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _block(conn, destination: str, until: float) -> None:
+    conn.execute(
+        "INSERT INTO outbox_destinations (destination, blocked_until) VALUES (?, ?) "
+        "ON CONFLICT(destination) DO UPDATE SET blocked_until = MAX(blocked_until, excluded.blocked_until)",
+        (destination, until),
+    )
+
+
+def _deliver(channel: str, destination: str, rows: list) -> str:
+    """Send one claimed batch and record the outcome. Returns sent | retry | split | dead."""
+    if len(rows) == 1:
+        payload = json.loads(rows[0]["payload"])
+    else:
+        payload = {"embeds": [e for r in rows for e in json.loads(r["payload"])["embeds"]]}
+    ids = [r["id"] for r in rows]
+    marks = ",".join("?" * len(ids))
+
+    error, reset_after = None, None
+    try:
+        reset_after = _TRANSPORTS[channel](destination, payload)
+    except DeliveryError as e:
+        error = e
+
+    now = time.time()
+    conn = get_connection()
+    try:
+        if error is None:
+            conn.execute(
+                f"UPDATE outbox SET status = 'sent', sent_at = ?, claimed_until = NULL, last_error = NULL "
+                f"WHERE id IN ({marks})", (now, *ids),
+            )
+            if reset_after:
+                _block(conn, destination, now + reset_after)
+            outcome = "sent"
+        elif error.retry_after is not None:
+            _block(conn, destination, now + error.retry_after)
+            conn.execute(
+                f"UPDATE outbox SET status = 'pending', claimed_until = NULL, next_attempt_at = ?, last_error = ? "
+                f"WHERE id IN ({marks})", (now + error.retry_after, str(error), *ids),
+            )
+            outcome = "retry"
+        elif error.permanent and len(rows) > 1:
+            # One bad embed shouldn't sink the others: retry them unbatched
+            conn.execute(
+                f"UPDATE outbox SET status = 'pending', batch = 0, claimed_until = NULL, next_attempt_at = ?, "
+                f"last_error = ? WHERE id IN ({marks})", (now, str(error), *ids),
+            )
+            outcome = "split"
+        else:
+            outcome = "dead"
+            for row in rows:
+                attempts = row["attempts"] + 1
+                if error.permanent or attempts >= MAX_ATTEMPTS:
+                    conn.execute(
+                        "UPDATE outbox SET status = 'dead', attempts = ?, claimed_until = NULL, last_error = ? "
+                        "WHERE id = ?", (attempts, str(error), row["id"]),
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE outbox SET status = 'pending', attempts = ?, claimed_until = NULL, "
+                        "next_attempt_at = ?, last_error = ? WHERE id = ?",
+                        (attempts, now + _backoff(attempts), str(error), row["id"]),
+                    )
+                    outcome = "retry"
+        conn.commit()
+    finally:
+        conn.close()
+    if error is not None:
+        print(f"[outbox] {channel} delivery of {len(rows)} message(s) failed ({outcome}): {error}")
+    return outcome
+
+
+def dispatch_pending(limit: int = 100) -> dict:
+    """Claim and deliver whatever is due now. Returns counts by outcome (in messages)."""
+    counts = {"sent": 0, "retry": 0, "split": 0, "dead": 0}
+    for channel, destination, rows in _claim(limit):
+        counts[_deliver(channel, destination, rows)] += len(rows)
+    return counts
+
+
+def _seconds_until_due() -> float:
+    now = time.time()
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            "SELECT MIN(MAX(o.next_attempt_at, COALESCE(d.blocked_until, 0))) AS due FROM outbox o "
+            "LEFT JOIN outbox_destinations d ON d.destination = o.destination WHERE o.status = 'pending'"
+        ).fetchone()
+        lease = conn.execute("SELECT MIN(claimed_until) FROM outbox WHERE status = 'sending'").fetchone()[0]
+    finally:
+        conn.close()
+    due = min(x for x in (row["due"], lease, now + POLL_SECONDS) if x is not None)
+    return min(max(due - now, 0.05), POLL_SECONDS)
+
+
+def _run() -> None:
+    while not _stop.is_set():
+        _wake.clear()
+        try:
+            dispatch_pending()
+            wait = _seconds_until_due()
+        except Exception as e:
+            print(f"[outbox] Dispatcher error: {e}")
+            wait = POLL_SECONDS
+        _wake.wait(timeout=wait)
+
+
+def start_dispatcher() -> None:
+    """Call from lifespan startup."""
+    global _thread
+    if _thread and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="outbox-dispatcher", daemon=True)
+    _thread.start()
+
+
+def stop_dispatcher(timeout: float = 5.0) -> None:
+    """Call from lifespan shutdown. Lets an in-flight send finish."""
+    global _thread
+    _stop.set()
+    _wake.set()
+    if _thread:
+        _thread.join(timeout)
+    _thread = None
+
+
+# ── Admin ────────────────────────────────────────────────────────────────────
+
+def _mask(destination: str) -> str:
+    """Webhook URLs end in a secret token — don't echo it back."""
+    if "://" not in destination:
+        return destination
+    return destination.rstrip("/").rsplit("/", 1)[0] + "/…"
+
+
+def _row_to_dict(row) -> dict:
+    return {
+        "id": row["id"],
+        "channel": row["channel"],
+        "destination": _mask(row["destination"]),
+        "payload": json.loads(row["payload"]),
+        "dedup_key": row["dedup_key"],
+        "status": row["status"],
+        "attempts": row["attempts"],
+        "last_error": row["last_error"],
+        "created_at": row["created_at"],
+        "next_attempt_at": row["next_attempt_at"],
+        "sent_at": row["sent_at"],
+    }
+
+
+def list_messages(status: str = "dead", limit: int = 50) -> list[dict]:
+    if status not in STATUSES:
+        raise ValueError(f"Unknown status: {status}")
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            "SELECT * FROM outbox WHERE status = ? ORDER BY id DESC LIMIT ?", (status, limit)
+        ).fetchall()
+        return [_row_to_dict(r) for r in rows]
+    finally:
+        conn.close()
+
+
+def stats() -> dict:
+    conn = get_connection()
+    try:
+        rows = conn.execute("SELECT status, COUNT(*) AS n FROM outbox GROUP BY status").fetchall()
+        counts = {s: 0 for s in STATUSES}
+        counts.update({r["status"]: r["n"] for r in rows})
+        blocked = conn.execute(
+            "SELECT COUNT(*) FROM outbox_destinations WHERE blocked_until > ?", (time.time(),)
+        ).fetchone()[0]
+        return {"counts": counts, "blocked_destinations": blocked}
+    finally:
+        conn.close()
+
+
+def retry(outbox_id: int) -> bool:
+    """Requeue a dead-lettered message with a fresh attempt budget."""
+    conn = get_connection()
+    try:
+        cur = conn.execute(
+            "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = ?, claimed_until = NULL "
+            "WHERE id = ? AND status = 'dead'", (time.time(), outbox_id),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    if cur.rowcount:
+        _wake.set()
+    return cur.rowcount > 0
+
+
+def discard(outbox_id: int) -> bool:
+    conn = get_connection()
+    try:
+        cur = conn.execute("DELETE FROM outbox WHERE id = ? AND status = 'dead'", (outbox_id,))
+        conn.commit()
+        return cur.rowcount > 0
+    finally:
+        conn.close()
+
+
+def prune(days: int = SENT_RETENTION_DAYS) -> int:
+    """Delete delivered messages older than `days` (their dedup keys go with them)."""
+    conn = get_connection()
+    try:
+        cur = conn.execute(
+            "DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?", (time.time() - days * 86400,)
+        )
+        conn.commit()
+        return cur.rowcount
+    finally:
+        conn.close()
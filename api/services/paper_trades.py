@@ -0,0 +1,552 @@
+"""
+Paper trades — per-user model book positions in auth.db.
+
+A trade is opened with a planned entry, stop, target and size (size_pct, percent of the
+book). Every change to the position is a fill: open, add, reduce, close. A trade keeps
+running totals (percent bought/sold, entry/exit notional, the open position's cost
+basis and the realized P&L), so the average entry and the open size follow from one
+row. Realized P&L is locked in at each reduce/close against the average entry in effect
+at that moment, so a later add doesn't rewrite it. Fills are applied inside
+BEGIN IMMEDIATE, so two requests scaling the same trade can't both read the old size.
+
+P&L is in percent-of-book terms, like the sizes: a 10% position closed 20% above its
+average entry contributes +2.0 to the book. R-multiples use the initial stop.
+
+tick() (scheduler, regular session only) marks open trades from the shared live snapshot
+(portfolio_risk.get_marks) and closes any whose mark has crossed the stop or target
+at that mark, with a personal "paper_exit" alert.
+
+Trades from the old shared data/trades.json are imported into the shared book (user_id
+MODEL_BOOK), which is what signed-out visitors see. The import is a one-time migration:
+it runs only when the paper_trades table is first created on a database that already
+has users, so fresh installs (and test databases) start without it. The model book is
+frozen after the import — there is no write path to it and the monitor skips it.
+"""
+
+import json
+import os
+import uuid
+from datetime import date, datetime, timezone
+
+from api.services.auth_db import get_connection
+
+MODEL_BOOK = ""    # user_id of the shared book imported from trades.json
+LEGACY_FILE = os.path.join(os.path.dirname(__file__), "..", "..", "data", "trades.json")
+MAX_OPEN_PER_USER = 100
+EXIT_REASONS = ("manual", "stop", "target")
+
+
+# ── Schema ───────────────────────────────────────────────────────────────────
+
+def install(conn) -> None:
+    """Create the paper trade tables; on first creation in an existing database, import the
+    legacy JSON book. Caller commits."""
+    created = not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'paper_trades'"
+    ).fetchone()
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS paper_trades (
+            id              TEXT PRIMARY KEY,
+            user_id         TEXT NOT NULL,
+            sym             TEXT NOT NULL,
+            direction       TEXT NOT NULL DEFAULT 'long',
+            setup           TEXT NOT NULL DEFAULT '',
+            notes           TEXT NOT NULL DEFAULT '',
+            trade_date      TEXT NOT NULL,
+            entry           REAL NOT NULL,          -- planned / first fill price
+            stop            REAL NOT NULL,
+            initial_stop    REAL NOT NULL,
+            target          REAL NOT NULL,
+            size_pct        REAL NOT NULL,          -- planned size, % of book
+            bought_pct      REAL NOT NULL DEFAULT 0,
+            entry_notional  REAL NOT NULL DEFAULT 0,
+            sold_pct        REAL NOT NULL DEFAULT 0,
+            exit_notional   REAL NOT NULL DEFAULT 0,
+            cost_basis      REAL NOT NULL DEFAULT 0,   -- entry notional of the open size
+            realized_pnl    REAL NOT NULL DEFAULT 0,   -- percent of book, locked in per exit
+            status          TEXT NOT NULL DEFAULT 'open',
+            exit_reason     TEXT,
+            closed_at       TEXT,
+            created_at      TEXT NOT NULL,
+            updated_at      TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_paper_trades_user ON paper_trades(user_id, trade_date);
+        CREATE INDEX IF NOT EXISTS idx_paper_trades_open ON paper_trades(status, sym);
+
+        CREATE TABLE IF NOT EXISTS paper_fills (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            trade_id    TEXT NOT NULL,
+            user_id     TEXT NOT NULL,
+            action      TEXT NOT NULL,              -- open / add / reduce / close
+            qty_pct     REAL NOT NULL,
+            price       REAL NOT NULL,
+            reason      TEXT NOT NULL DEFAULT 'manual',
+            filled_at   TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_paper_fills_trade ON paper_fills(trade_id, id);
+    """)
+    added = False
+    for col in ("cost_basis", "realized_pnl"):
+        try:
+            conn.execute(f"ALTER TABLE paper_trades ADD COLUMN {col} REAL NOT NULL DEFAULT 0")
+            added = True
+        except Exception:
+            pass  # column already exists
+    if added:
+        # Backfill from the running totals at the blended average entry
+        conn.execute(
+            "UPDATE paper_trades SET cost_basis = (bought_pct - sold_pct) * entry_notional / bought_pct, "
+            "realized_pnl = (exit_notional * bought_pct / entry_notional - sold_pct) "
+            "* CASE direction WHEN 'short' THEN -1 ELSE 1 END WHERE bought_pct > 0"
+        )
+    if created and conn.execute("SELECT 1 FROM users LIMIT 1").fetchone():
+        _import_legacy(conn)
+
+
+def _import_legacy(conn) -> None:
+    if not os.path.exists(LEGACY_FILE):
+        return
+    try:
+        with open(LEGACY_FILE) as f:
+            legacy = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[paper] Could not read {LEGACY_FILE}: {e}")
+        return
+    n = 0
+    for t in legacy if isinstance(legacy, list) else []:
+        try:
+            trade_id = t.get("id") or _new_id()
+            trade_date = t.get("date") or str(date.today())
+            _insert(conn, MODEL_BOOK, trade_id, t["sym"], float(t["entry"]), float(t["stop"]),
+                    float(t["target"]), float(t["size_pct"]), t.get("notes") or "", t.get("setup") or "",
+                    trade_date, "long")
+            if (t.get("status") or "open") != "open":
+                _close_legacy(conn, trade_id, float(t.get("exit") or t["entry"]), trade_date)
+            n += 1
+        except (KeyError, TypeError, ValueError):
+            continue
+    if n:
+        print(f"[paper] Migrated: imported {n} trades from trades.json into the shared model book")
+
+
+def _close_legacy(conn, trade_id: str, price: float, closed_on: str) -> None:
+    """Close an imported trade in one go at its recorded exit (the entry when there is none)."""
+    row = conn.execute("SELECT * FROM paper_trades WHERE id = ?", (trade_id,)).fetchone()
+    pnl = row["bought_pct"] * (price - row["entry"]) / row["entry"]
+    conn.execute(
+        "UPDATE paper_trades SET sold_pct = bought_pct, exit_notional = bought_pct * ?, cost_basis = 0, "
+        "realized_pnl = ?, status = 'closed', exit_reason = 'manual', closed_at = ? WHERE id = ?",
+        (price, pnl, closed_on, trade_id),
+    )
+    conn.execute(
+        "INSERT INTO paper_fills (trade_id, user_id, action, qty_pct, price, reason, filled_at) "
+        "VALUES (?, ?, 'close', ?, ?, 'manual', ?)",
+        (trade_id, MODEL_BOOK, row["bought_pct"], price, closed_on),
+    )
+
+
+# ── Helpers ──────────────────────────────────────────────────────────────────
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _new_id() -> str:
+    return uuid.uuid4().hex[:8]
+
+
+def _sign(direction: str) -> int:
+    return -1 if direction == "short" else 1
+
+
+def _validate_levels(direction: str, entry: float, stop: float, target: float) -> None:
+    if min(entry, stop, target) <= 0:
+        raise ValueError("Prices must be positive")
+    sign = _sign(direction)
+    if (entry - stop) * sign <= 0:
+        raise ValueError(f"Stop must be {'below' if sign > 0 else 'above'} entry for a {direction} trade")
+    if (target - entry) * sign <= 0:
+        raise ValueError(f"Target must be {'above' if sign > 0 else 'below'} entry for a {direction} trade")
+
+
+def _insert(conn, user_id, trade_id, sym, entry, stop, target, size_pct, notes, setup, trade_date, direction):
+    now = _now()
+    cur = conn.execute(
+        "INSERT OR IGNORE INTO paper_trades (id, user_id, sym, direction, setup, notes, trade_date, entry, stop, "
+        "initial_stop, target, size_pct, bought_pct, entry_notional, cost_basis, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (trade_id, user_id, sym.upper().strip(), direction, setup, notes, trade_date, entry, stop, stop, target,
+         size_pct, size_pct, size_pct * entry, size_pct * entry, now, now),
+    )
+    if not cur.rowcount:
+        return
+    conn.execute(
+        "INSERT INTO paper_fills (trade_id, user_id, action, qty_pct, price, reason, filled_at) "
+        "VALUES (?, ?, 'open', ?, ?, 'manual', ?)",
+        (trade_id, user_id, size_pct, entry, now),
+    )
+
+
+def _row_to_trade(row, mark: float | None = None) -> dict:
+    sign = _sign(row["direction"])
+    open_pct = max(row["bought_pct"] - row["sold_pct"], 0.0)
+    if open_pct > 1e-9:
+        avg_entry = row["cost_basis"] / open_pct
+    else:
+        avg_entry = row["entry_notional"] / row["bought_pct"] if row["bought_pct"] else row["entry"]
+    avg_exit = row["exit_notional"] / row["sold_pct"] if row["sold_pct"] else None
+    realized = row["realized_pnl"]
+    risk = abs(avg_entry - row["initial_stop"])
+    # Return and R of what has been sold, against the cost basis it was sold at
+    sold_return = realized / row["sold_pct"] if row["sold_pct"] else None
+    sold_entry = (row["entry_notional"] - row["cost_basis"]) / row["sold_pct"] if row["sold_pct"] else None
+    sold_risk = abs(sold_entry - row["initial_stop"]) if sold_entry is not None else None
+    trade = {
+        "id": row["id"],
+        "sym": row["sym"],
+        "direction": row["direction"],
+        "setup": row["setup"],
+        "notes": row["notes"],
+        "date": row["trade_date"],
+        "entry": row["entry"],
+        "stop": row["stop"],
+        "target": row["target"],
+        "size_pct": row["size_pct"],
+        "status": row["status"],
+        "exit_reason": row["exit_reason"],
+        "closed_at": row["closed_at"],
+        "avg_entry": round(avg_entry, 4),
+        "avg_exit": round(avg_exit, 4) if avg_exit is not None else None,
+        "open_pct": round(open_pct, 4),
+        "realized_pnl_pct": round(realized, 4),
+        "return_pct": round(sold_return * 100, 2) if sold_return is not None else None,
+        "r_multiple": round(sold_return * sold_entry / sold_risk, 2) if sold_return is not None and sold_risk else None,
+    }
+    if mark is not None:
+        move = (mark - avg_entry) * sign / avg_entry
+        trade["mark"] = mark
+        trade["unrealized_pnl_pct"] = round(move * open_pct, 4)
+        trade["unrealized_return_pct"] = round(move * 100, 2)
+        trade["unrealized_r"] = round((mark - avg_entry) * sign / risk, 2) if risk else None
+        trade["distance_to_stop_pct"] = round((mark - row["stop"]) * sign / mark * 100, 2)
+        trade["distance_to_target_pct"] = round((row["target"] - mark) * sign / mark * 100, 2)
+    return trade
+
+
+# ── Reads ────────────────────────────────────────────────────────────────────
+
+def list_trades(user_id: str, status: str | None = None) -> list[dict]:
+    sql = "SELECT * FROM paper_trades WHERE user_id = ?"
+    params: tuple = (user_id,)
+    if status:
+        sql += " AND status = ?"
+        params += (status,)
+    conn = get_connection()
+    try:
+        rows = conn.execute(sql + " ORDER BY trade_date, created_at", params).fetchall()
+    finally:
+        conn.close()
+    return [_row_to_trade(r) for r in rows]
+
+
+def get_trade(user_id: str, trade_id: str) -> dict | None:
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT * FROM paper_trades WHERE id = ? AND user_id = ?", (trade_id, user_id)).fetchone()
+        if row is None:
+            return None
+        fills = conn.execute(
+            "SELECT action, qty_pct, price, reason, filled_at FROM paper_fills WHERE trade_id = ? ORDER BY id",
+            (trade_id,),
+        ).fetchall()
+    finally:
+        conn.close()
+    return {**_row_to_trade(row), "fills": [dict(f) for f in fills]}
+
+
+def open_positions(user_id: str) -> dict:
+    """Open trades marked to the live snapshot."""
+    from api.services.portfolio_risk import get_marks
+
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            "SELECT * FROM paper_trades WHERE user_id = ? AND status = 'open' ORDER BY trade_date", (user_id,)
+        ).fetchall()
+    finally:
+        conn.close()
+    symbols = sorted({r["sym"] for r in rows})
+    prices, as_of = get_marks(symbols) if symbols else ({}, None)
+    positions = [_row_to_trade(r, prices.get(r["sym"])) for r in rows]
+    return {
+        "as_of": as_of,
+        "positions": positions,
+        "exposure_pct": round(sum(p["open_pct"] for p in positions), 2),
+        "unrealized_pnl_pct": round(sum(p.get("unrealized_pnl_pct") or 0 for p in positions), 4),
+    }
+
+
+def get_stats(user_id: str) -> dict:
+    """Closed-trade performance: win rate, average win/loss, profit factor, R, by setup."""
+    trades = list_trades(user_id)
+    closed = [t for t in trades if t["status"] == "closed"]
+    wins = [t for t in closed if t["realized_pnl_pct"] > 0]
+    losses = [t for t in closed if t["realized_pnl_pct"] <= 0]
+    gross_win = sum(t["realized_pnl_pct"] for t in wins)
+    gross_loss = -sum(t["realized_pnl_pct"] for t in losses)
+    rs = [t["r_multiple"] for t in closed if t["r_multiple"] is not None]
+
+    by_setup: dict[str, dict] = {}
+    for t in closed:
+        s = by_setup.setdefault(t["setup"] or "Untagged", {"setup": t["setup"] or "Untagged", "trades": 0,
+                                                           "wins": 0, "pnl_pct": 0.0})
+        s["trades"] += 1
+        s["wins"] += t["realized_pnl_pct"] > 0
+        s["pnl_pct"] += t["realized_pnl_pct"]
+    for s in by_setup.values():
+        s["win_rate"] = round(s["wins"] / s["trades"] * 100, 1)
+        s["pnl_pct"] = round(s["pnl_pct"], 4)
+
+    exits: dict[str, int] = {}
+    for t in closed:
+        exits[t["exit_reason"] or "manual"] = exits.get(t["exit_reason"] or "manual", 0) + 1
+    return {
+        "trades": len(trades),
+        "open": len(trades) - len(closed),
+        "closed": len(closed),
+        "wins": len(wins),
+        "losses": len(losses),
+        "win_rate": round(len(wins) / len(closed) * 100, 1) if closed else None,
+        "avg_win_pct": round(sum(t["return_pct"] for t in wins) / len(wins), 2) if wins else None,
+        "avg_loss_pct": round(sum(t["return_pct"] for t in losses) / len(losses), 2) if losses else None,
+        "profit_factor": round(gross_win / gross_loss, 2) if gross_loss else None,
+        "avg_r": round(sum(rs) / len(rs), 2) if rs else None,
+        "total_pnl_pct": round(gross_win - gross_loss, 4),
+        "by_setup": sorted(by_setup.values(), key=lambda s: s["trades"], reverse=True),
+        "exits": exits,
+    }
+
+
+# ── Lifecycle ────────────────────────────────────────────────────────────────
+
+def open_trade(user_id: str, sym: str, entry: float, stop: float, target: float, size_pct: float,
+               notes: str = "", setup: str = "", trade_date: str = "", direction: str = "long") -> dict:
+    direction = (direction or "long").lower()
+    if direction not in ("long", "short"):
+        raise ValueError("direction must be long or short")
+    if not sym or not sym.strip():
+        raise ValueError("sym is required")
+    if not 0 < size_pct <= 100:
+        raise ValueError("size_pct must be between 0 and 100")
+    _validate_levels(direction, entry, stop, target)
+    trade_id = _new_id()
+    conn = get_connection()
+    try:
+        count = conn.execute(
+            "SELECT COUNT(*) FROM paper_trades WHERE user_id = ? AND status = 'open'", (user_id,)
+        ).fetchone()[0]
+        if count >= MAX_OPEN_PER_USER:
+            raise ValueError(f"Open trade limit reached ({MAX_OPEN_PER_USER})")
+        _insert(conn, user_id, trade_id, sym, entry, stop, target, size_pct, (notes or "")[:2000],
+                (setup or "")[:100], trade_date or str(date.today()), direction)
+        conn.commit()
+        row = conn.execute("SELECT * FROM paper_trades WHERE id = ?", (trade_id,)).fetchone()
+    finally:
+        conn.close()
+    return _row_to_trade(row)
+
+
+def apply_fill(user_id: str | None, trade_id: str, action: str, price: float,
+               qty_pct: float | None = None, reason: str = "manual") -> dict | None:
+    """Add to, reduce or close an open trade. qty_pct defaults to the whole open size for
+    reduce/close. user_id None skips the ownership check (the stop/target monitor).
+    Returns the updated trade, or None if it doesn't exist (or isn't the user's)."""
+    if action not in ("add", "reduce", "close"):
+        raise ValueError(f"Unknown action: {action}")
+    if reason not in EXIT_REASONS:
+        raise ValueError(f"Unknown reason: {reason}")
+    if price is None or price <= 0:
+        raise ValueError("price must be positive")
+    conn = get_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT * FROM paper_trades WHERE id = ?", (trade_id,)).fetchone()
+        if row is None or (user_id is not None and row["user_id"] != user_id):
+            conn.rollback()
+            return None
+        if row["status"] != "open":
+            conn.rollback()
+            raise ValueError("Trade is already closed")
+        open_pct = row["bought_pct"] - row["sold_pct"]
+        if action == "close" or qty_pct is None:
+            if action == "add":
+                conn.rollback()
+                raise ValueError("qty_pct is required to add")
+            qty_pct = open_pct
+        if qty_pct <= 0:
+            conn.rollback()
+            raise ValueError("qty_pct must be positive")
+        if action == "reduce" and qty_pct > open_pct + 1e-9:
+            conn.rollback()
+            raise ValueError(f"Only {open_pct:g}% is open")
+
+        now = _now()
+        if action == "add":
+            conn.execute(
+                "UPDATE paper_trades SET bought_pct = bought_pct + ?, entry_notional = entry_notional + ?, "
+                "cost_basis = cost_basis + ?, updated_at = ? WHERE id = ?",
+                (qty_pct, qty_pct * price, qty_pct * price, now, trade_id),
+            )
+        else:
+            closing = qty_pct >= open_pct - 1e-9
+            avg_entry = row["cost_basis"] / open_pct
+            pnl = qty_pct * (price - avg_entry) * _sign(row["direction"]) / avg_entry
+            conn.execute(
+                "UPDATE paper_trades SET sold_pct = sold_pct + ?, exit_notional = exit_notional + ?, "
+                "cost_basis = ?, realized_pnl = realized_pnl + ?, "
+                "status = ?, exit_reason = ?, closed_at = ?, updated_at = ? WHERE id = ?",
+                (qty_pct, qty_pct * price, 0.0 if closing else row["cost_basis"] - qty_pct * avg_entry, pnl,
+                 "closed" if closing else "open", reason if closing else None, now if closing else None,
+                 now, trade_id),
+            )
+            if closing:
+                action = "close"
+        conn.execute(
+            "INSERT INTO paper_fills (trade_id, user_id, action, qty_pct, price, reason, filled_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (trade_id, row["user_id"], action, qty_pct, price, reason, now),
+        )
+        conn.commit()
+        row = conn.execute("SELECT * FROM paper_trades WHERE id = ?", (trade_id,)).fetchone()
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return _row_to_trade(row)
+
+
+def update_levels(user_id: str, trade_id: str, updates: dict) -> dict | None:
+    """Move an open trade's stop/target, or edit its notes/setup."""
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            "SELECT * FROM paper_trades WHERE id = ? AND user_id = ?", (trade_id, user_id)
+        ).fetchone()
+        if row is None:
+            return None
+        stop = updates.get("stop", row["stop"])
+        target = updates.get("target", row["target"])
+        if ("stop" in updates or "target" in updates) and row["status"] != "open":
+            raise ValueError("Trade is already closed")
+        if min(stop, target) <= 0 or (target - stop) * _sign(row["direction"]) <= 0:
+            raise ValueError("Target must be beyond the stop")
+        conn.execute(
+            "UPDATE paper_trades SET stop = ?, target = ?, notes = ?, setup = ?, updated_at = ? "
+            "WHERE id = ? AND user_id = ?",
+            (stop, target, (updates.get("notes", row["notes"]) or "")[:2000],
+             (updates.get("setup", row["setup"]) or "")[:100], _now(), trade_id, user_id),
+        )
+        conn.commit()
+        row = conn.execute("SELECT * FROM paper_trades WHERE id = ?", (trade_id,)).fetchone()
+    finally:
+        conn.close()
+    return _row_to_trade(row)
+
+
+def delete_trade(user_id: str, trade_id: str) -> bool:
+    conn = get_connection()
+    try:
+        cur = conn.execute("DELETE FROM paper_trades WHERE id = ? AND user_id = ?", (trade_id, user_id))
+        if cur.rowcount:
+            conn.execute("DELETE FROM paper_fills WHERE trade_id = ?", (trade_id,))
+        conn.commit()
+    finally:
+        conn.close()
+    return bool(cur.rowcount)
+
+
+# ── Stop / target monitor ────────────────────────────────────────────────────
+
+def check_levels(prices: dict[str, float]) -> int:
+    """Close every open trade whose mark is through its stop or target. Returns exits.
+    The frozen model book is left alone."""
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            "SELECT id, user_id, sym, direction, stop, target FROM paper_trades "
+            "WHERE status = 'open' AND user_id != ?",
+            (MODEL_BOOK,),
+        ).fetchall()
+    finally:
+        conn.close()
+    exits = 0
+    for r in rows:
+        mark = prices.get(r["sym"])
+        if mark is None:
+            continue
+        sign = _sign(r["direction"])
+        if (mark - r["stop"]) * sign <= 0:
+            reason = "stop"
+        elif (mark - r["target"]) * sign >= 0:
+            reason = "target"
+        else:
+            continue
+        try:
+            trade = apply_fill(None, r["id"], "close", mark, reason=reason)
+        except ValueError:
+            continue   # closed by the user in the meantime
+        if trade is None:
+            continue
+        exits += 1
+        _notify_exit(r["user_id"], trade)
+    return exits
+
+
+def _notify_exit(user_id: str, trade: dict) -> None:
+    from api.services import alerts
+
+    conn = get_connection()
+    try:
+        subscribed = alerts.is_subscribed(conn, user_id, "paper_exit")
+    finally:
+        conn.close()
+    if not subscribed:
+        return
+    what = "stopped out" if trade["exit_reason"] == "stop" else "hit target"
+    alerts.add_alert(
+        "paper_exit",
+        f"{trade['sym']} {what}",
+        f"Paper trade **{trade['sym']}** {what} at ${trade['avg_exit']:,.2f} "
+        f"({trade['return_pct']:+.2f}%, {trade['r_multiple'] if trade['r_multiple'] is not None else '—'}R)",
+        severity=alerts.SEVERITY_WARNING if trade["exit_reason"] == "stop" else alerts.SEVERITY_INFO,
+        data={"trade_id": trade["id"], "sym": trade["sym"], "reason": trade["exit_reason"],
+              "price": trade["avg_exit"]},
+        user_id=user_id,
+        dedupe_key=f"paper_exit_{trade['id']}",
+    )
+
+
+def tick() -> int:
+    """Scheduler job: mark open paper trades from the live snapshot and apply stop/target exits.
+    Only during the regular session — the cron window also covers pre- and post-market marks."""
+    from api.services.massive import is_regular_session
+    from api.services.portfolio_risk import get_marks
+
+    if not is_regular_session():
+        return 0
+    conn = get_connection()
+    try:
+        symbols = [r["sym"] for r in conn.execute(
+            "SELECT DISTINCT sym FROM paper_trades WHERE status = 'open' AND user_id != ?", (MODEL_BOOK,)
+        ).fetchall()]
+    finally:
+        conn.close()
+    if not symbols:
+        return 0
+    prices, _ = get_marks(symbols)
+    exits = check_levels(prices)
+    if exits:
+        print(f"[paper] {exits} paper trades closed at stop/target")
+    return exits
@@ -7,6 +7,7 @@ whenever trades are linked/unlinked.
 import uuid
 from datetime import datetime, timezone
 
+from api.services import journal_rollups
 from api.services.auth_db import get_connection
 
 
@@ -104,11 +105,18 @@ def delete_playbook(user_id: str, playbook_id: str) -> bool:
     """Delete a playbook and unlink all associated trades."""
     conn = get_connection()
     try:
-        # Clear playbook_id from linked trades
+        # Clear playbook_id from linked trades (moving them to "No Playbook" in the rollups)
+        linked = [r["id"] for r in conn.execute(
+            "SELECT id FROM journal_entries WHERE playbook_id = ? AND user_id = ?",
+            (playbook_id, user_id),
+        ).fetchall()]
+        before = [journal_rollups.fetch_row(conn, user_id, tid) for tid in linked]
         conn.execute(
             "UPDATE journal_entries SET playbook_id = NULL WHERE playbook_id = ? AND user_id = ?",
             (playbook_id, user_id),
         )
+        for old in before:
+            journal_rollups.apply_change(conn, old, journal_rollups.fetch_row(conn, user_id, old["id"]))
         result = conn.execute(
             "DELETE FROM playbooks WHERE id = ? AND user_id = ?",
             (playbook_id, user_id),
@@ -0,0 +1,346 @@
+"""
+Live portfolio risk — mark-to-market layer over open journal positions.
+
+portfolio_service.get_portfolio works from entry and stop prices alone. This module
+adds live marks: a scheduler tick collects every user's open symbols, dedupes them,
+and fetches them with one chunked batch snapshot (price_stream.fetch_quotes). The
+marks go into the shared cache, so get_live_risk() reads them without an upstream
+call per request; only symbols the tick hasn't covered yet (a position opened
+since) are fetched on demand.
+
+Per position: unrealized P&L, R-multiple to date, distance to stop, and open risk
+(mark-to-stop dollars — what a stop fill from here would give back).
+Per account: heat = open risk as % of the trading_accounts balance. Portfolio-wide:
+theme concentration (from wire_data theme holdings) and correlation-weighted
+exposure, sqrt(vᵀCv) over the signed position values with C the daily-return
+correlation matrix (correlation.compute_correlation_matrix).
+
+Each tick (regular session only) also checks stops: a mark through a position's stop fires a personal
+"stop_breach" alert (once per trade and stop level), and the marks are fed to the
+alert-rule engine's price_cross rules.
+"""
+
+import math
+import time
+
+from api.services.auth_db import get_connection
+from api.services.cache import cache
+
+MARKS_KEY = "portfolio_marks"
+MARKS_TTL = 300
+STALE_SECONDS = 120   # marks older than this are refetched on demand
+
+
+def _safe_float(val):
+    if val is None:
+        return None
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        return None
+
+
+def _sign(direction) -> int:
+    return -1 if (direction or "long").lower() == "short" else 1
+
+
+def _open_positions(user_id: str | None = None) -> list[dict]:
+    sql = ("SELECT id, user_id, sym, direction, entry_price, stop_price, shares, account, setup "
+           "FROM journal_entries WHERE status = 'open'")
+    params = ()
+    if user_id is not None:
+        sql += " AND user_id = ?"
+        params = (user_id,)
+    conn = get_connection()
+    try:
+        return [dict(r) for r in conn.execute(sql, params).fetchall()]
+    finally:
+        conn.close()
+
+
+# ── Marks ────────────────────────────────────────────────────────────────────
+
+def _fetch_marks(symbols: list[str]) -> dict[str, float]:
+    from api.services.price_stream import fetch_quotes
+
+    quotes = fetch_quotes(symbols)
+    return {sym: q["price"] for sym, q in quotes.items() if q.get("price")}
+
+
+def get_marks(symbols: list[str]) -> tuple[dict[str, float], float | None]:
+    """Marks for `symbols` from the last tick, fetching any missing or stale ones."""
+    snap = cache.get(MARKS_KEY) or {"ts": 0, "prices": {}}
+    prices = dict(snap["prices"])
+    as_of = snap["ts"] or None
+    missing = [s for s in symbols if s not in prices]
+    if snap["ts"] < time.time() - STALE_SECONDS:
+        missing = list(symbols)
+    if missing:
+        try:
+            prices.update(_fetch_marks(missing))
+            as_of = time.time()
+        except Exception as e:
+            print(f"[portfolio] Mark fetch failed for {len(missing)} symbols: {e}")
+    return prices, as_of
+
+
+def tick() -> dict:
+    """Scheduler job: mark every open symbol across all users in one batch, then check stops.
+    Only during the regular session — the cron window also covers pre- and post-market marks."""
+    from api.services.massive import is_regular_session
+
+    if not is_regular_session():
+        return {"symbols": 0, "breaches": 0}
+    positions = _open_positions()
+    symbols = sorted({p["sym"].upper() for p in positions if p["sym"]})
+    if not symbols:
+        return {"symbols": 0, "breaches": 0}
+    try:
+        prices = _fetch_marks(symbols)
+    except Exception as e:
+        print(f"[portfolio] Tick price fetch failed: {e}")
+        return {"symbols": len(symbols), "breaches": 0}
+    cache.set(MARKS_KEY, {"ts": time.time(), "prices": prices}, ttl=MARKS_TTL)
+
+    breaches = check_stops(positions, prices)
+    try:
+        from api.services import alert_rules
+        alert_rules.on_prices(prices)
+    except Exception as e:
+        print(f"[portfolio] Alert rule evaluation failed: {e}")
+    return {"symbols": len(symbols), "breaches": breaches}
+
+
+def check_stops(positions: list[dict], prices: dict[str, float]) -> int:
+    """Fire a stop_breach alert for each position whose mark is through its stop."""
+    from api.services import alerts
+
+    fired = 0
+    for p in positions:
+        mark = prices.get((p["sym"] or "").upper())
+        stop = _safe_float(p["stop_price"])
+        if mark is None or stop is None:
+            continue
+        sign = _sign(p["direction"])
+        if (mark - stop) * sign > 0:
+            continue
+        conn = get_connection()
+        try:
+            subscribed = alerts.is_subscribed(conn, p["user_id"], "stop_breach")
+        finally:
+            conn.close()
+        if not subscribed:
+            continue
+        side = "below" if sign > 0 else "above"
+        alert = alerts.add_alert(
+            "stop_breach",
+            f"{p['sym']} through stop",
+            f"**{p['sym']}** at ${mark:,.2f} is {side} your ${stop:,.2f} stop",
+            severity=alerts.SEVERITY_WARNING,
+            data={"trade_id": p["id"], "sym": p["sym"], "mark": mark, "stop": stop},
+            user_id=p["user_id"],
+            dedupe_key=f"stop_breach_{p['id']}_{stop:g}",
+        )
+        if alert is not None:
+            fired += 1
+    return fired
+
+
+# ── Risk view ────────────────────────────────────────────────────────────────
+
+def _position_risk(p: dict, mark: float | None) -> dict:
+    entry = _safe_float(p["entry_price"])
+    stop = _safe_float(p["stop_price"])
+    shares = abs(_safe_float(p["shares"]) or 0)
+    sign = _sign(p["direction"])
+    out = {
+        "id": p["id"],
+        "sym": p["sym"],
+        "direction": (p["direction"] or "long").lower(),
+        "account": p["account"] or "default",
+        "setup": p["setup"] or "",
+        "shares": shares,
+        "entry_price": entry,
+        "stop_price": stop,
+        "mark": mark,
+        "market_value": None,
+        "unrealized_pnl": None,
+        "unrealized_pct": None,
+        "r_multiple": None,
+        "distance_to_stop_pct": None,
+        "open_risk": None,
+        "stop_breached": False,
+    }
+    if mark is None:
+        return out
+    if shares:
+        out["market_value"] = round(mark * shares, 2)
+    if entry:
+        move = (mark - entry) * sign
+        out["unrealized_pct"] = round(move / entry * 100, 2)
+        if shares:
+            out["unrealized_pnl"] = round(move * shares, 2)
+        if stop is not None and entry != stop:
+            out["r_multiple"] = round(move / abs(entry - stop), 2)
+    if stop is not None:
+        cushion = (mark - stop) * sign
+        out["distance_to_stop_pct"] = round(cushion / mark * 100, 2)
+        out["stop_breached"] = cushion <= 0
+        if shares:
+            out["open_risk"] = round(max(cushion, 0.0) * shares, 2)
+    return out
+
+
+def _theme_map() -> dict[str, list[str]]:
+    """symbol → names of the wire_data themes holding it."""
+    from api.services.engine import _load_wire_data
+
+    wire = _load_wire_data() or {}
+    themes = wire.get("themes") or {}
+    out: dict[str, list[str]] = {}
+    for key, theme in themes.items():
+        if not isinstance(theme, dict):
+            continue
+        for h in theme.get("holdings", []):
+            if isinstance(h, dict) and h.get("sym"):
+                out.setdefault(h["sym"].upper(), []).append(theme.get("name") or key)
+    return out
+
+
+def _concentration(rows: list[dict]) -> dict:
+    gross = sum(r["market_value"] or 0 for r in rows)
+    risk = sum(r["open_risk"] or 0 for r in rows)
+    membership = _theme_map()
+    themes: dict[str, dict] = {}
+    for r in rows:
+        for name in membership.get(r["sym"].upper(), ["Unthemed"]):
+            t = themes.setdefault(name, {"theme": name, "market_value": 0.0, "open_risk": 0.0, "symbols": []})
+            t["market_value"] += r["market_value"] or 0
+            t["open_risk"] += r["open_risk"] or 0
+            if r["sym"] not in t["symbols"]:
+                t["symbols"].append(r["sym"])
+    for t in themes.values():
+        t["market_value"] = round(t["market_value"], 2)
+        t["open_risk"] = round(t["open_risk"], 2)
+        t["pct_of_gross"] = round(t["market_value"] / gross * 100, 1) if gross else None
+        t["pct_of_risk"] = round(t["open_risk"] / risk * 100, 1) if risk else None
+    largest = max((r["market_value"] or 0 for r in rows), default=0)
+    return {
+        "themes": sorted(themes.values(), key=lambda t: t["market_value"], reverse=True),
+        "largest_position_pct": round(largest / gross * 100, 1) if gross else None,
+    }
+
+
+def _quadratic(vec: dict[str, float], matrix: dict[tuple[str, str], float]) -> float:
+    syms = list(vec)
+    total = 0.0
+    for a in syms:
+        for b in syms:
+            corr = 1.0 if a == b else matrix.get((a, b), 0.0)
+            total += vec[a] * vec[b] * corr
+    return math.sqrt(max(total, 0.0))
+
+
+def _correlation(rows: list[dict]) -> dict:
+    exposure: dict[str, float] = {}
+    risk: dict[str, float] = {}
+    for r in rows:
+        if r["market_value"] is None:
+            continue
+        sign = _sign(r["direction"])
+        sym = r["sym"].upper()
+        exposure[sym] = exposure.get(sym, 0.0) + sign * r["market_value"]
+        risk[sym] = risk.get(sym, 0.0) + sign * (r["open_risk"] or 0)
+
+    matrix: dict[tuple[str, str], float] = {}
+    high_pairs = []
+    if len(exposure) >= 2:
+        try:
+            from api.services import correlation
+            corr = correlation.compute_correlation_matrix(sorted(exposure))
+            tickers = corr.get("tickers", [])
+            for i, a in enumerate(tickers):
+                for j, b in enumerate(tickers):
+                    if i < len(corr.get("matrix", [])) and j < len(corr["matrix"][i]):
+                        matrix[(a, b)] = corr["matrix"][i][j]
+            high_pairs = corr.get("high_correlations", [])
+        except Exception as e:
+            print(f"[portfolio] Correlation matrix unavailable: {e}")
+
+    gross = sum(abs(v) for v in exposure.values())
+    weighted = _quadratic(exposure, matrix)
+    return {
+        "gross_exposure": round(gross, 2),
+        "net_exposure": round(sum(exposure.values()), 2),
+        "correlated_exposure": round(weighted, 2),
+        "diversification_ratio": round(gross / weighted, 2) if weighted else None,
+        "correlated_risk": round(_quadratic(risk, matrix), 2),
+        "high_correlations": high_pairs,
+        "matrix_available": bool(matrix),
+    }
+
+
+def _accounts(user_id: str) -> tuple[dict[str, dict], dict | None]:
+    from api.services.trading_accounts import list_accounts
+
+    accounts = list_accounts(user_id)
+    by_name = {a["name"]: a for a in accounts}
+    default = next((a for a in accounts if a["is_default"]), accounts[0] if accounts else None)
+    return by_name, default
+
+
+def get_live_risk(user_id: str, with_correlation: bool = True) -> dict:
+    """Mark-to-market risk for a user's open positions."""
+    positions = _open_positions(user_id)
+    symbols = sorted({p["sym"].upper() for p in positions if p["sym"]})
+    prices, as_of = get_marks(symbols) if symbols else ({}, None)
+    rows = [_position_risk(p, prices.get((p["sym"] or "").upper())) for p in positions]
+
+    by_name, default = _accounts(user_id)
+    accounts: dict[str, dict] = {}
+    for r in rows:
+        acct = by_name.get(r["account"]) or default
+        key = acct["name"] if acct else r["account"]
+        a = accounts.setdefault(key, {
+            "account": key,
+            "balance": acct["balance"] if acct else None,
+            "max_risk_pct": acct["max_risk_pct"] if acct else None,
+            "positions": 0, "market_value": 0.0, "unrealized_pnl": 0.0, "open_risk": 0.0,
+        })
+        a["positions"] += 1
+        a["market_value"] += r["market_value"] or 0
+        a["unrealized_pnl"] += r["unrealized_pnl"] or 0
+        a["open_risk"] += r["open_risk"] or 0
+        if a["balance"] and r["open_risk"] is not None:
+            r["risk_pct_of_account"] = round(r["open_risk"] / a["balance"] * 100, 2)
+            r["over_risk_limit"] = bool(a["max_risk_pct"]) and r["risk_pct_of_account"] > a["max_risk_pct"]
+    for a in accounts.values():
+        for k in ("market_value", "unrealized_pnl", "open_risk"):
+            a[k] = round(a[k], 2)
+        a["heat_pct"] = round(a["open_risk"] / a["balance"] * 100, 2) if a["balance"] else None
+
+    balance = sum(a["balance"] or 0 for a in accounts.values())
+    open_risk = sum(r["open_risk"] or 0 for r in rows)
+    summary = {
+        "positions": len(rows),
+        "positions_unpriced": sum(1 for r in rows if r["mark"] is None),
+        "market_value": round(sum(r["market_value"] or 0 for r in rows), 2),
+        "unrealized_pnl": round(sum(r["unrealized_pnl"] or 0 for r in rows), 2),
+        "open_risk": round(open_risk, 2),
+        "balance": round(balance, 2) if balance else None,
+        "heat_pct": round(open_risk / balance * 100, 2) if balance else None,
+        "stops_breached": [r["sym"] for r in rows if r["stop_breached"]],
+    }
+    result = {
+        "as_of": as_of,
+        "positions": rows,
+        "accounts": list(accounts.values()),
+        "summary": summary,
+        "concentration": _concentration(rows),
+    }
+    if with_correlation:
+        corr = _correlation(rows)
+        if balance:
+            corr["correlated_heat_pct"] = round(corr["correlated_risk"] / balance * 100, 2)
+        result["correlation"] = corr
+    return result
@@ -0,0 +1,334 @@
+"""
+Price stream — one upstream poll shared by every connected live-price client.
+
+Clients subscribe to ticker sets over SSE or WebSocket. The hub keeps a refcounted union
+of every subscribed ticker and, while anyone is connected, fetches that union once per
+tick with chunked batch snapshots, so upstream calls scale with distinct tickers rather
+than with connections. The tick keeps the 15s cadence clients used to poll at, so a
+single viewer costs no more upstream calls than before.
+
+Market-wide data rides along as channels (CHANNELS: the FuturesStrip snapshot and the
+movers sidebar). A channel is fetched only while somebody subscribes to it, through the
+same cached service call its REST endpoint uses, and pushed when it changes.
+
+Every quote carries the hub sequence number of the tick it last changed on. A
+subscription remembers the sequence it last sent per ticker and pushes only newer
+quotes; a reconnecting client that presents its last event id gets just what it missed
+(no id, or an id from a previous process, replays the full last state).
+
+Per connection: at most MAX_TICKERS tickers, at most one push per MIN_PUSH_INTERVAL
+(changes coalesce in between), and a heartbeat after HEARTBEAT_SECONDS of silence.
+"""
+
+import asyncio
+import threading
+import time
+
+TICK_SECONDS = 15
+CHUNK_SIZE = 50           # tickers per upstream batch snapshot call
+MAX_TICKERS = 50          # per connection
+MIN_PUSH_INTERVAL = 1.0   # seconds between pushes to one connection
+HEARTBEAT_SECONDS = 15
+MIN_POLL_GAP = 1.0        # floor between polls when new tickers kick the loop early
+CHANNELS = ("snapshot", "movers")
+_CHANNEL_PREFIX = "$"     # channel keys share the refcounts/state with tickers
+
+_REST_BASE = "https://api.massive.com"
+
+
+def parse_quote(t: dict) -> dict:
+    """Reduce one batch-snapshot ticker blob to {price, change_pct, change, volume}."""
+    day = t.get("day", {})
+    prev_day = t.get("prevDay", {})
+    last_trade = t.get("lastTrade", {})
+
+    # Price: day close → last trade → prev day close
+    price = day.get("c") or last_trade.get("p") or prev_day.get("c") or 0.0
+    return {
+        "price": round(float(price), 2),
+        "change_pct": round(float(t.get("todaysChangePerc", 0.0)), 4),
+        "change": round(float(t.get("todaysChange", 0.0)), 4),
+        "volume": int(day.get("v") or 0),
+    }
+
+
+def fetch_quotes(tickers: list[str]) -> dict[str, dict]:
+    """Fetch quotes for any number of tickers, CHUNK_SIZE per batch snapshot call.
+
+    Raises on client or network failure (callers decide between 503 and keeping state).
+    """
+    from api.services.massive import _get_client
+
+    client = _get_client()
+    result = {}
+    for i in range(0, len(tickers), CHUNK_SIZE):
+        chunk = ",".join(tickers[i:i + CHUNK_SIZE])
+        url = (
+            f"{_REST_BASE}/v2/snapshot/locale/us/markets/stocks/tickers"
+            f"?tickers={chunk}&apiKey={client._api_key}"
+        )
+        data = client._get(url)
+        for t in data.get("tickers", []):
+            ticker = t.get("ticker", "")
+            if ticker:
+                result[ticker] = parse_quote(t)
+    return result
+
+
+def _fetch_channel(name: str) -> dict:
+    from api.services import massive
+    return massive.get_snapshot() if name == "snapshot" else massive.get_movers()
+
+
+def normalize_channels(raw) -> list[str]:
+    """Lower-case and dedupe a comma string or list of channels. Raises ValueError on unknown ones."""
+    if isinstance(raw, str):
+        raw = raw.split(",")
+    channels = list(dict.fromkeys(c.strip().lower() for c in raw if c and c.strip()))
+    unknown = [c for c in channels if c not in CHANNELS]
+    if unknown:
+        raise ValueError(f"Unknown channel: {', '.join(unknown)}")
+    return channels
+
+
+def normalize_tickers(raw) -> list[str]:
+    """Upper-case, strip and dedupe (order preserved) a comma string or list of tickers."""
+    if isinstance(raw, str):
+        raw = raw.split(",")
+    return list(dict.fromkeys(t.strip().upper() for t in raw if t and t.strip()))
+
+
+class PriceHub:
+    """Union subscription + last-known state shared by all subscriptions in this process."""
+
+    def __init__(self, fetch=fetch_quotes, fetch_channel=_fetch_channel):
+        self._fetch = fetch
+        self._fetch_channel = fetch_channel
+        self._lock = threading.Lock()
+        self._refs: dict[str, int] = {}
+        self._quotes: dict[str, dict] = {}
+        self._changed: dict[str, int] = {}   # ticker → seq of the tick it last changed on
+        self.epoch = format(int(time.time() * 1000), "x")
+        self.seq = 0
+        self._task = None
+        self._tick_event = None
+        self._kick = None
+        self.stats = {"ticks": 0, "upstream_calls": 0, "errors": 0, "subscriptions": 0}
+
+    # ── Subscriptions ─────────────────────────────────────────────────────────
+
+    def subscribe(self, tickers, channels=(), last_event_id: str | None = None) -> "Subscription":
+        return Subscription(self, tickers, channels=channels, last_event_id=last_event_id)
+
+    def _retain(self, keys) -> None:
+        with self._lock:
+            unseen = [k for k in keys if k not in self._refs]
+            for k in keys:
+                self._refs[k] = self._refs.get(k, 0) + 1
+        if unseen and self._kick is not None:
+            self._kick.set()  # fetch new tickers now rather than at the next tick
+
+    def _release(self, keys) -> None:
+        with self._lock:
+            for k in keys:
+                n = self._refs.get(k, 0) - 1
+                if n > 0:
+                    self._refs[k] = n
+                else:
+                    self._refs.pop(k, None)
+
+    def tickers(self) -> list[str]:
+        """Sorted union of every subscribed ticker (channels excluded)."""
+        with self._lock:
+            return sorted(k for k in self._refs if not k.startswith(_CHANNEL_PREFIX))
+
+    def channels(self) -> list[str]:
+        """Channels somebody subscribes to."""
+        with self._lock:
+            return [c for c in CHANNELS if _CHANNEL_PREFIX + c in self._refs]
+
+    def event_id(self) -> str:
+        return f"{self.epoch}-{self.seq}"
+
+    def resume_seq(self, last_event_id: str | None) -> int:
+        """Sequence a reconnecting client already has; 0 (full replay) if unknown."""
+        if not last_event_id:
+            return 0
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return 0
+        return min(int(seq), self.seq)
+
+    def changes(self, sent: dict[str, int]) -> tuple[str, dict[str, dict]]:
+        """Quotes newer than what `sent` records, and the event id they bring the client to."""
+        with self._lock:
+            fresh = {
+                k: self._quotes[k] for k, seq in sent.items()
+                if k in self._quotes and self._changed[k] > seq
+            }
+            return self.event_id(), fresh
+
+    # ── Upstream ──────────────────────────────────────────────────────────────
+
+    def poll_once(self) -> int:
+        """Fetch the union once and record what changed. Returns the number of changed keys."""
+        union = self.tickers()
+        fresh = {}
+        if union:
+            try:
+                self.stats["upstream_calls"] += -(-len(union) // CHUNK_SIZE)
+                fresh.update(self._fetch(union))
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"[stream] Price fetch failed for {len(union)} tickers: {e}")
+        for name in self.channels():
+            try:
+                fresh[_CHANNEL_PREFIX + name] = self._fetch_channel(name)
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"[stream] {name} fetch failed: {e}")
+
+        with self._lock:
+            self.stats["ticks"] += 1
+            changed = [k for k, v in fresh.items() if k in self._refs and self._quotes.get(k) != v]
+            if changed:
+                self.seq += 1
+                for k in changed:
+                    self._quotes[k] = fresh[k]
+                    self._changed[k] = self.seq
+            # Forget state nobody subscribes to any more
+            for k in [k for k in self._quotes if k not in self._refs]:
+                del self._quotes[k]
+                del self._changed[k]
+        return len(changed)
+
+    # ── Async driver ──────────────────────────────────────────────────────────
+
+    def ensure_running(self) -> None:
+        """Start the poll loop on the current event loop if it is not already running."""
+        if self._tick_event is None:
+            self._tick_event = asyncio.Event()
+        if self._kick is None:
+            self._kick = asyncio.Event()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                with self._lock:
+                    if not self._refs:
+                        break
+                self._kick.clear()
+                await asyncio.to_thread(self.poll_once)
+                self._notify()
+                await asyncio.sleep(MIN_POLL_GAP)
+                try:
+                    await asyncio.wait_for(self._kick.wait(), timeout=TICK_SECONDS - MIN_POLL_GAP)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._task = None
+
+    def _notify(self) -> None:
+        event, self._tick_event = self._tick_event, asyncio.Event()
+        if event is not None:
+            event.set()
+
+    async def wait_tick(self, timeout: float) -> None:
+        if self._tick_event is None:
+            self._tick_event = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._tick_event.wait(), timeout=max(timeout, 0))
+        except asyncio.TimeoutError:
+            pass
+
+
+class Subscription:
+    """One client's view of the hub: its ticker set and what it has already been sent."""
+
+    def __init__(self, hub: PriceHub, tickers, channels=(), last_event_id: str | None = None):
+        self.hub = hub
+        self.keys: set[str] = set()
+        self._sent: dict[str, int] = {}
+        self._last_push = 0.0
+        self._last_send = time.monotonic()
+        self.closed = False
+        channel_keys = [_CHANNEL_PREFIX + c for c in normalize_channels(channels)]
+        base = hub.resume_seq(last_event_id)
+        self.add(tickers, base=base)
+        self._add_keys(channel_keys, base)
+        hub.stats["subscriptions"] += 1
+
+    @property
+    def tickers(self) -> list[str]:
+        return sorted(k for k in self.keys if not k.startswith(_CHANNEL_PREFIX))
+
+    def add(self, tickers, base: int = 0) -> list[str]:
+        """Subscribe to more tickers. Raises ValueError past MAX_TICKERS."""
+        new = [t for t in normalize_tickers(tickers) if t not in self.keys]
+        if len(self.tickers) + len(new) > MAX_TICKERS:
+            raise ValueError(f"Maximum {MAX_TICKERS} tickers per connection")
+        self._add_keys(new, base)
+        return new
+
+    def remove(self, tickers) -> None:
+        gone = [t for t in normalize_tickers(tickers) if t in self.keys]
+        for t in gone:
+            self.keys.discard(t)
+            self._sent.pop(t, None)
+        self.hub._release(gone)
+
+    def _add_keys(self, keys, base: int) -> None:
+        for k in keys:
+            self.keys.add(k)
+            self._sent[k] = base
+        self.hub._retain(keys)
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self.hub._release(list(self.keys))
+            self.hub.stats["subscriptions"] -= 1
+
+    def next_message(self, now: float | None = None) -> dict | None:
+        """The next push for this client, or None if nothing changed or it is rate-capped."""
+        now = time.monotonic() if now is None else now
+        if now - self._last_push < MIN_PUSH_INTERVAL:
+            return None
+        event_id, fresh = self.hub.changes(self._sent)
+        if not fresh:
+            return None
+        seq = self.hub.resume_seq(event_id)
+        for k in fresh:
+            self._sent[k] = seq
+        self._last_push = self._last_send = now
+        msg = {"type": "prices", "id": event_id,
+               "prices": {k: v for k, v in fresh.items() if not k.startswith(_CHANNEL_PREFIX)}}
+        for k, v in fresh.items():
+            if k.startswith(_CHANNEL_PREFIX):
+                msg[k[len(_CHANNEL_PREFIX):]] = v
+        return msg
+
+    async def messages(self):
+        """Async stream of price pushes and heartbeats until the subscription is closed."""
+        self.hub.ensure_running()
+        while not self.closed:
+            now = time.monotonic()
+            msg = self.next_message(now)
+            if msg is None and now - self._last_send >= HEARTBEAT_SECONDS:
+                self._last_send = now
+                msg = {"type": "heartbeat", "id": self.hub.event_id()}
+            if msg is not None:
+                yield msg
+                continue
+            capped = MIN_PUSH_INTERVAL - (now - self._last_push)
+            if capped > 0 and self.hub.changes(self._sent)[1]:
+                timeout = capped
+            else:
+                timeout = HEARTBEAT_SECONDS - (now - self._last_send)
+            await self.hub.wait_tick(timeout)
+
+
+# Singleton used by the live-prices router
+hub = PriceHub()
@@ -0,0 +1,339 @@
+"""
+api/services/profiler.py — Per-route latency and per-request dependency breakdown.
+
+Every request's latency is recorded against its route template (cheap: one
+perf_counter pair and a deque append), giving p50/p90/p99 over the last
+LATENCY_WINDOW requests per route.
+
+A sampled fraction of requests (PROFILE_SAMPLE_RATE, default 0.05; 0 disables) also
+carry a Trace. While a trace is active in the request's context, outbound calls
+through requests, httpx, urllib, curl_cffi (yfinance) and sqlite3 are timed as spans
+and bucketed by dependency: massive, yfinance, claude, finnhub, uw, edgar, sqlite, or
+the bare host. Whatever is left of the request time is "app" (Python CPU, waits on
+locks, etc.). The SLOWEST_N slowest sampled traces are kept for the admin endpoint.
+
+Spans are only recorded in the request's own context — work a handler hands to its
+own thread pool is counted as "app" time, not attributed to a dependency.
+
+install() patches the client libraries once, at startup when sampling is on (or when
+an admin turns it on); calls made outside a sampled request pay one ContextVar
+lookup. With PROFILE_SAMPLE_RATE=0 nothing is patched. Connections opened with their own
+factory= (auth.db's pool) get tracing mixed into that factory.
+"""
+
+import heapq
+import itertools
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import urlsplit
+
+SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0.05"))
+SLOWEST_N = int(os.environ.get("PROFILE_SLOWEST_N", "50"))
+LATENCY_WINDOW = 1000
+MAX_ROUTES = 500
+MAX_SPANS_PER_TRACE = 200
+
+# Host suffix → dependency name
+_HOSTS = {
+    "massive.com": "massive",
+    "polygon.io": "massive",
+    "yahoo.com": "yfinance",
+    "anthropic.com": "claude",
+    "finnhub.io": "finnhub",
+    "unusualwhales.com": "uw",
+    "sec.gov": "edgar",
+}
+
+_current: ContextVar["Trace | None"] = ContextVar("profile_trace", default=None)
+_in_span: ContextVar[bool] = ContextVar("profile_in_span", default=False)
+
+_lock = threading.Lock()
+_routes: dict[str, dict] = {}
+_slowest: list[tuple[float, int, dict]] = []  # min-heap of (duration_ms, seq, trace)
+_seq = itertools.count()
+_installed = False
+
+
+def dependency_for(url: str) -> str:
+    host = (urlsplit(str(url)).hostname or "").lower()
+    for suffix, name in _HOSTS.items():
+        if host == suffix or host.endswith("." + suffix):
+            return name
+    return host or "http"
+
+
+class Trace:
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self.deps: dict[str, list] = {}  # dependency → [ms, count]
+        self.spans: list[tuple[float, str, str]] = []  # (ms, dependency, detail)
+
+    def add(self, dep: str, detail: str, ms: float) -> None:
+        with self._lock:
+            totals = self.deps.setdefault(dep, [0.0, 0])
+            totals[0] += ms
+            totals[1] += 1
+            if len(self.spans) < MAX_SPANS_PER_TRACE:
+                self.spans.append((ms, dep, detail))
+
+    def finish(self, route: str, status: int, duration_ms: float) -> dict:
+        with self._lock:
+            deps = {k: {"ms": round(v[0], 1), "count": v[1]} for k, v in self.deps.items()}
+            spans = sorted(self.spans, reverse=True)[:20]
+        outbound = sum(d["ms"] for d in deps.values())
+        return {
+            "route": route,
+            "method": self.method,
+            "path": self.path,
+            "status": status,
+            "started_at": self.started,
+            "duration_ms": round(duration_ms, 1),
+            "breakdown": {**deps, "app": {"ms": round(max(duration_ms - outbound, 0.0), 1), "count": 1}},
+            "top_spans": [{"dep": d, "detail": detail, "ms": round(ms, 1)} for ms, d, detail in spans],
+        }
+
+
+@contextmanager
+def span(dep: str, detail: str = ""):
+    """Time a block against the active trace. Nested spans count once, as the outer one."""
+    trace = _current.get()
+    if trace is None or _in_span.get():
+        yield
+        return
+    token = _in_span.set(True)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _in_span.reset(token)
+        trace.add(dep, detail, (time.perf_counter() - t0) * 1000)
+
+
+# ─── Request lifecycle (called by ProfilingMiddleware) ────────────────────────
+
+def start_trace(method: str, path: str):
+    """Begin a trace for this request if it is sampled. Returns a token for end_trace."""
+    if SAMPLE_RATE <= 0 or random.random() >= SAMPLE_RATE:
+        return None
+    return _current.set(Trace(method, path))
+
+
+def end_trace(token, route: str, status: int, duration_ms: float) -> None:
+    record_latency(route, duration_ms, status)
+    if token is None:
+        return
+    trace = _current.get()
+    _current.reset(token)
+    if trace is None:
+        return
+    with _lock:
+        if len(_slowest) >= SLOWEST_N and duration_ms <= _slowest[0][0]:
+            return
+    summary = trace.finish(route, status, duration_ms)
+    with _lock:
+        entry = (duration_ms, next(_seq), summary)
+        if len(_slowest) < SLOWEST_N:
+            heapq.heappush(_slowest, entry)
+        elif duration_ms > _slowest[0][0]:
+            heapq.heapreplace(_slowest, entry)
+
+
+def record_latency(route: str, duration_ms: float, status: int) -> None:
+    with _lock:
+        stats = _routes.get(route)
+        if stats is None:
+            if len(_routes) >= MAX_ROUTES:
+                route = "other"
+                stats = _routes.get(route)
+            if stats is None:
+                stats = _routes[route] = {"count": 0, "errors": 0, "total_ms": 0.0,
+                                          "max_ms": 0.0, "recent": deque(maxlen=LATENCY_WINDOW)}
+        stats["count"] += 1
+        stats["total_ms"] += duration_ms
+        stats["max_ms"] = max(stats["max_ms"], duration_ms)
+        if status >= 500:
+            stats["errors"] += 1
+        stats["recent"].append(duration_ms)
+
+
+def _percentile(ordered: list[float], p: float) -> float:
+    if not ordered:
+        return 0.0
+    i = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered) + 0.5) - 1))
+    return ordered[i]
+
+
+def get_route_stats(sort: str = "p99") -> list[dict]:
+    with _lock:
+        snapshot = [(route, dict(s), list(s["recent"])) for route, s in _routes.items()]
+    rows = []
+    for route, s, recent in snapshot:
+        recent.sort()
+        rows.append({
+            "route": route,
+            "count": s["count"],
+            "errors": s["errors"],
+            "avg_ms": round(s["total_ms"] / s["count"], 1) if s["count"] else 0.0,
+            "max_ms": round(s["max_ms"], 1),
+            "p50_ms": round(_percentile(recent, 50), 1),
+            "p90_ms": round(_percentile(recent, 90), 1),
+            "p99_ms": round(_percentile(recent, 99), 1),
+        })
+    key = sort if sort in ("count", "errors") else f"{sort}_ms"
+    if key not in ("count", "errors", "avg_ms", "max_ms", "p50_ms", "p90_ms", "p99_ms"):
+        key = "p99_ms"
+    rows.sort(key=lambda r: r[key], reverse=True)
+    return rows
+
+
+def get_slowest(limit: int = SLOWEST_N) -> list[dict]:
+    with _lock:
+        entries = sorted(_slowest, reverse=True)
+    return [summary for _, _, summary in entries[:limit]]
+
+
+def set_sample_rate(rate: float) -> float:
+    global SAMPLE_RATE
+    SAMPLE_RATE = min(max(float(rate), 0.0), 1.0)
+    if SAMPLE_RATE > 0:
+        install()
+    return SAMPLE_RATE
+
+
+def reset() -> None:
+    with _lock:
+        _routes.clear()
+        _slowest.clear()
+
+
+# ─── Outbound instrumentation ─────────────────────────────────────────────────
+
+def _wrap_sync(fn, describe):
+    def wrapper(*args, **kwargs):
+        if _current.get() is None:
+            return fn(*args, **kwargs)
+        dep, detail = describe(*args, **kwargs)
+        with span(dep, detail):
+            return fn(*args, **kwargs)
+    wrapper.__wrapped__ = fn
+    return wrapper
+
+
+def _wrap_async(fn, describe):
+    async def wrapper(*args, **kwargs):
+        if _current.get() is None:
+            return await fn(*args, **kwargs)
+        dep, detail = describe(*args, **kwargs)
+        with span(dep, detail):
+            return await fn(*args, **kwargs)
+    wrapper.__wrapped__ = fn
+    return wrapper
+
+
+def _describe_url(method, url) -> tuple[str, str]:
+    parts = urlsplit(str(url))
+    return dependency_for(url), f"{str(method).upper()} {parts.hostname or ''}{parts.path}"
+
+
+def _describe_session_request(self, method, url, *args, **kwargs):
+    return _describe_url(method, url)
+
+
+def _describe_httpx_send(self, request, *args, **kwargs):
+    return _describe_url(request.method, request.url)
+
+
+def _describe_urlopen(self, fullurl, *args, **kwargs):
+    if isinstance(fullurl, str):
+        return _describe_url("GET", fullurl)
+    return _describe_url(fullurl.get_method(), fullurl.full_url)
+
+
+def _describe_sql(self, sql="", *args, **kwargs):
+    return "sqlite", " ".join(str(sql).split())[:120]
+
+
+class _TracedCursor(sqlite3.Cursor):
+    execute = _wrap_sync(sqlite3.Cursor.execute, _describe_sql)
+    executemany = _wrap_sync(sqlite3.Cursor.executemany, _describe_sql)
+    executescript = _wrap_sync(sqlite3.Cursor.executescript, _describe_sql)
+
+
+class _TracedConnection(sqlite3.Connection):
+    def cursor(self, factory=_TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        return self.cursor().executemany(sql, parameters)
+
+    def executescript(self, sql):
+        return self.cursor().executescript(sql)
+
+    commit = _wrap_sync(sqlite3.Connection.commit, lambda self: ("sqlite", "COMMIT"))
+
+
+_traced_factories: dict[type, type] = {}
+
+
+def _traced_factory(factory):
+    """A Connection subclass passed as factory= (auth_db's pool) with tracing mixed in."""
+    if factory is sqlite3.Connection:
+        return _TracedConnection
+    if not (isinstance(factory, type) and issubclass(factory, sqlite3.Connection)) \
+            or issubclass(factory, _TracedConnection):
+        return factory
+    traced = _traced_factories.get(factory)
+    if traced is None:
+        traced = type(f"_Traced{factory.__name__.lstrip('_')}", (_TracedConnection, factory), {})
+        _traced_factories[factory] = traced
+    return traced
+
+
+def install() -> None:
+    """Patch outbound client libraries so sampled requests get spans. Idempotent."""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+
+    import urllib.request
+    urllib.request.OpenerDirector.open = _wrap_sync(urllib.request.OpenerDirector.open, _describe_urlopen)
+
+    try:
+        import requests
+        requests.Session.request = _wrap_sync(requests.Session.request, _describe_session_request)
+    except ImportError:
+        pass
+    try:
+        import httpx
+        httpx.Client.send = _wrap_sync(httpx.Client.send, _describe_httpx_send)
+        httpx.AsyncClient.send = _wrap_async(httpx.AsyncClient.send, _describe_httpx_send)
+    except ImportError:
+        pass
+    try:
+        from curl_cffi import requests as curl_requests
+        curl_requests.Session.request = _wrap_sync(curl_requests.Session.request, _describe_session_request)
+    except ImportError:
+        pass
+
+    _connect = sqlite3.connect
+
+    def connect(*args, **kwargs):
+        if len(args) < 6:
+            kwargs["factory"] = _traced_factory(kwargs.get("factory", sqlite3.Connection))
+        return _connect(*args, **kwargs)
+
+    connect.__wrapped__ = _connect
+    sqlite3.connect = connect
@@ -167,6 +167,12 @@ def compute_rs_scores() -> list[dict]:
 
     cache.set(_CACHE_KEY, ranked, ttl=_CACHE_TTL)
     logger.info(f"[rs_ranking] Cached {len(ranked)} RS rankings")
+
+    try:
+        from api.services.alert_rules import on_rs_ranks
+        on_rs_ranks({item["ticker"]: item["rs_rank"] for item in ranked})
+    except Exception as e:
+        logger.warning(f"[rs_ranking] Alert rule evaluation failed: {e}")
     return ranked
 
 
@@ -0,0 +1,334 @@
+# api/services/stripe_events.py — Stripe webhook event ledger and worker
+"""
+Every verified Stripe webhook is recorded in the stripe_events ledger in auth.db,
+keyed by Stripe's event id, and acknowledged straight away. The worker thread
+(started in the app lifespan) applies events through stripe_service.apply_event.
+
+Ordering and convergence:
+- Redeliveries of an event id are dropped at the ledger (INSERT OR IGNORE).
+- Events are applied one at a time per customer, oldest event.created first; a
+  customer with an event in flight gets no other event claimed until it finishes.
+- Subscription and invoice events carry state as of event.created. The customer's
+  watermark (stripe_customer_state.last_event_created) records the newest one
+  applied; anything older that arrives later is marked 'skipped' instead of
+  rolling the subscription back. Checkout completion fetches the live subscription
+  from Stripe, so it is always applied and advances the watermark.
+- A subscription event for a customer not yet linked to a user (Stripe often sends
+  customer.subscription.* before checkout.session.completed) waits as pending until
+  the checkout links it, or is skipped after UNLINKED_WAIT_SECONDS.
+- Handler errors retry with backoff; after MAX_ATTEMPTS the event is 'failed' until an
+  admin replays it.
+- A claim is a lease: an event left 'processing' by a worker that died (crash, deploy)
+  is due again once lease_until passes, ahead of the customer's later events.
+
+Statuses: pending → processing → processed | skipped | failed.
+"""
+
+import json
+import threading
+import time
+
+from api.services.auth_db import get_connection
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 30.0
+LEASE_SECONDS = 120.0
+POLL_SECONDS = 10.0
+UNLINKED_RETRY_SECONDS = 15.0
+UNLINKED_WAIT_SECONDS = 86400.0
+STATUSES = ("pending", "processing", "processed", "skipped", "failed")
+_UNLINKED = "customer not linked yet"
+# Claimable: pending and due, or processing under a lease that expired
+_DUE = "(({t}.status = 'pending' AND {t}.next_attempt_at <= :now) " \
+       "OR ({t}.status = 'processing' AND {t}.lease_until < :now))"
+
+_wake = threading.Event()
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+
+
+# ── Schema ───────────────────────────────────────────────────────────────────
+
+def install(conn) -> None:
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS stripe_events (
+            event_id TEXT PRIMARY KEY,
+            type TEXT NOT NULL,
+            customer_id TEXT NOT NULL,
+            created INTEGER NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            lease_until REAL,
+            last_error TEXT,
+            result TEXT,
+            received_at REAL NOT NULL,
+            processed_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_stripe_events_queue ON stripe_events(status, customer_id, created);
+
+        CREATE TABLE IF NOT EXISTS stripe_customer_state (
+            customer_id TEXT PRIMARY KEY,
+            last_event_created INTEGER NOT NULL,
+            last_event_id TEXT NOT NULL
+        );
+    """)
+
+
+# ── Ledger ───────────────────────────────────────────────────────────────────
+
+def record(event: dict) -> bool:
+    """Durably enqueue a verified event. Returns False if its id was already recorded."""
+    from api.services.stripe_service import event_customer
+
+    now = time.time()
+    conn = get_connection()
+    try:
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO stripe_events (event_id, type, customer_id, created, payload, "
+            "next_attempt_at, received_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (event["id"], event.get("type", ""), event_customer(event), int(event.get("created") or 0),
+             json.dumps(event), now, now),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    if cur.rowcount:
+        _wake.set()
+    return cur.rowcount > 0
+
+
+def _claim() -> list:
+    """Claim the oldest due event of every customer with nothing in flight."""
+    now = time.time()
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            f"SELECT e.* FROM stripe_events e WHERE {_DUE.format(t='e')} "
+            "AND NOT EXISTS (SELECT 1 FROM stripe_events o WHERE o.customer_id = e.customer_id "
+            f"  AND {_DUE.format(t='o')} "
+            "  AND (o.created < e.created OR (o.created = e.created AND o.received_at < e.received_at))) "
+            "ORDER BY e.created, e.received_at LIMIT 100",
+            {"now": now},
+        ).fetchall()
+        claimed = []
+        for row in rows:
+            cur = conn.execute(
+                "UPDATE stripe_events SET status = 'processing', lease_until = :lease "
+                f"WHERE event_id = :id AND {_DUE.format(t='stripe_events')} AND NOT EXISTS ("
+                "  SELECT 1 FROM stripe_events WHERE customer_id = :customer "
+                "  AND status = 'processing' AND lease_until > :now)",
+                {"lease": now + LEASE_SECONDS, "id": row["event_id"], "customer": row["customer_id"], "now": now},
+            )
+            conn.commit()
+            if cur.rowcount:
+                if row["status"] == "processing":
+                    print(f"[stripe-events] Reclaimed {row['event_id']} after its lease expired")
+                claimed.append(row)
+        return claimed
+    finally:
+        conn.close()
+
+
+def _finish(event_id: str, status: str, result: dict | None = None, error: str | None = None,
+            next_attempt_at: float | None = None, attempts: int | None = None) -> None:
+    conn = get_connection()
+    try:
+        conn.execute(
+            "UPDATE stripe_events SET status = ?, lease_until = NULL, result = COALESCE(?, result), "
+            "last_error = ?, next_attempt_at = COALESCE(?, next_attempt_at), "
+            "attempts = COALESCE(?, attempts), processed_at = ? WHERE event_id = ?",
+            (status, json.dumps(result) if result is not None else None, error, next_attempt_at,
+             attempts, time.time() if status in ("processed", "skipped") else None, event_id),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _watermark(customer_id: str) -> int | None:
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            "SELECT last_event_created FROM stripe_customer_state WHERE customer_id = ?", (customer_id,)
+        ).fetchone()
+        return row["last_event_created"] if row else None
+    finally:
+        conn.close()
+
+
+def _advance(customer_id: str, created: int, event_id: str) -> None:
+    conn = get_connection()
+    try:
+        conn.execute(
+            "INSERT INTO stripe_customer_state (customer_id, last_event_created, last_event_id) VALUES (?, ?, ?) "
+            "ON CONFLICT(customer_id) DO UPDATE SET last_event_created = excluded.last_event_created, "
+            "last_event_id = excluded.last_event_id WHERE excluded.last_event_created >= last_event_created",
+            (customer_id, created, event_id),
+        )
+        # Subscription events that were waiting for this customer to be linked can go now
+        conn.execute(
+            "UPDATE stripe_events SET next_attempt_at = ? WHERE customer_id = ? AND status = 'pending' "
+            "AND last_error = ?",
+            (time.time(), customer_id, _UNLINKED),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _process(row) -> str:
+    from api.services import stripe_service
+
+    event = json.loads(row["payload"])
+    event_id, customer_id, created = row["event_id"], row["customer_id"], row["created"]
+
+    if row["type"] not in stripe_service.HANDLED_EVENTS:
+        _finish(event_id, "skipped", {"reason": "unhandled type"})
+        return "skipped"
+
+    if row["type"] != "checkout.session.completed":
+        mark = _watermark(customer_id)
+        if mark is not None and created < mark:
+            _finish(event_id, "skipped", {"reason": "stale", "watermark": mark})
+            return "skipped"
+
+    try:
+        result = stripe_service.apply_event(event)
+    except stripe_service.CustomerNotLinked:
+        if time.time() - row["received_at"] > UNLINKED_WAIT_SECONDS:
+            _finish(event_id, "skipped", {"reason": "customer never linked"})
+            return "skipped"
+        _finish(event_id, "pending", error=_UNLINKED,
+                next_attempt_at=time.time() + UNLINKED_RETRY_SECONDS)
+        return "waiting"
+    except Exception as e:
+        attempts = row["attempts"] + 1
+        error = f"{type(e).__name__}: {e}"
+        print(f"[stripe-events] {event_id} ({row['type']}) failed, attempt {attempts}: {error}")
+        if attempts >= MAX_ATTEMPTS:
+            _finish(event_id, "failed", error=error, attempts=attempts)
+            return "failed"
+        _finish(event_id, "pending", error=error, attempts=attempts,
+                next_attempt_at=time.time() + BACKOFF_BASE * 2 ** (attempts - 1))
+        return "retry"
+
+    _advance(customer_id, created, event_id)
+    _finish(event_id, "processed", result)
+    return "processed"
+
+
+def process_pending() -> dict:
+    """Apply everything that's due, respecting per-customer order. Returns counts by outcome."""
+    counts = {"processed": 0, "skipped": 0, "waiting": 0, "retry": 0, "failed": 0}
+    while True:
+        claimed = _claim()
+        if not claimed:
+            return counts
+        for row in claimed:
+            counts[_process(row)] += 1
+
+
+# ── Worker ───────────────────────────────────────────────────────────────────
+
+def _run() -> None:
+    while not _stop.is_set():
+        _wake.clear()
+        try:
+            process_pending()
+        except Exception as e:
+            print(f"[stripe-events] Worker error: {e}")
+        _wake.wait(timeout=POLL_SECONDS)
+
+
+def start_worker() -> None:
+    """Call from lifespan startup."""
+    global _thread
+    if _thread and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="stripe-events", daemon=True)
+    _thread.start()
+
+
+def stop_worker(timeout: float = 5.0) -> None:
+    """Call from lifespan shutdown."""
+    global _thread
+    _stop.set()
+    _wake.set()
+    if _thread:
+        _thread.join(timeout)
+    _thread = None
+
+
+# ── Admin ────────────────────────────────────────────────────────────────────
+
+def list_events(status: str | None = None, customer_id: str | None = None, limit: int = 50) -> list[dict]:
+    if status is not None and status not in STATUSES:
+        raise ValueError(f"Unknown status: {status}")
+    where, params = [], []
+    if status:
+        where.append("status = ?")
+        params.append(status)
+    if customer_id:
+        where.append("customer_id = ?")
+        params.append(customer_id)
+    sql = "SELECT event_id, type, customer_id, created, status, attempts, last_error, result, " \
+          "received_at, processed_at FROM stripe_events"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    conn = get_connection()
+    try:
+        rows = conn.execute(sql + " ORDER BY created DESC, received_at DESC LIMIT ?", (*params, limit)).fetchall()
+    finally:
+        conn.close()
+    return [{**dict(r), "result": json.loads(r["result"]) if r["result"] else None} for r in rows]
+
+
+def replay(event_id: str, fetch: bool = False) -> dict:
+    """
+    Requeue an event for another attempt (fresh attempt budget). With fetch=True an event
+    missing from the ledger — e.g. one whose delivery never reached us — is pulled from
+    the Stripe API and recorded. Raises LookupError if it can't be found.
+    Replaying still respects the customer's watermark: a stale event is skipped.
+    """
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            "SELECT status, lease_until FROM stripe_events WHERE event_id = ?", (event_id,)
+        ).fetchone()
+        if row is None and not fetch:
+            raise LookupError(event_id)
+        if row is not None:
+            if row["status"] == "processing" and (row["lease_until"] or 0) > time.time():
+                raise ValueError("Event is being processed")
+            conn.execute(
+                "UPDATE stripe_events SET status = 'pending', attempts = 0, next_attempt_at = ?, "
+                "lease_until = NULL, last_error = NULL WHERE event_id = ?",
+                (time.time(), event_id),
+            )
+            conn.commit()
+            _wake.set()
+            return {"event_id": event_id, "requeued": True, "previous_status": row["status"]}
+    finally:
+        conn.close()
+
+    import stripe
+    try:
+        event = stripe.Event.retrieve(event_id)
+    except stripe.InvalidRequestError:
+        raise LookupError(event_id)
+    record(json.loads(str(event)))
+    return {"event_id": event_id, "requeued": True, "previous_status": None}
+
+
+def stats() -> dict:
+    conn = get_connection()
+    try:
+        rows = conn.execute("SELECT status, COUNT(*) AS n FROM stripe_events GROUP BY status").fetchall()
+    finally:
+        conn.close()
+    counts = {s: 0 for s in STATUSES}
+    counts.update({r["status"]: r["n"] for r in rows})
+    return counts
@@ -3,6 +3,7 @@ Stripe integration — checkout sessions, customer portal, webhook handling.
 All Stripe interactions isolated here. Nothing else in the codebase touches Stripe.
 """
 
+import json
 import os
 from datetime import datetime, timezone
 
@@ -57,41 +58,51 @@ def create_portal_session(user_id: str, return_url: str) -> str:
     return session.url
 
 
-def handle_webhook_event(payload: bytes, sig_header: str) -> dict:
+# Event types whose data object is the customer's subscription as of event.created
+SUBSCRIPTION_EVENTS = (
+    "customer.subscription.created",
+    "customer.subscription.updated",
+    "customer.subscription.deleted",
+)
+HANDLED_EVENTS = ("checkout.session.completed", "invoice.payment_failed", *SUBSCRIPTION_EVENTS)
+
+
+class CustomerNotLinked(Exception):
+    """The event's Stripe customer isn't tied to a user yet (its checkout event hasn't been applied)."""
+
+
+def verify_webhook(payload: bytes, sig_header: str) -> dict:
     """
-    Process a Stripe webhook event. Returns a summary dict.
-    This is the ONLY function that writes subscription data.
+    Verify a webhook's signature and return the event as a plain dict.
+    Raises ValueError / stripe.SignatureVerificationError on a bad payload or signature.
     """
-    event = stripe.Webhook.construct_event(payload, sig_header, STRIPE_WEBHOOK_SECRET)
+    stripe.Webhook.construct_event(payload, sig_header, STRIPE_WEBHOOK_SECRET)
+    # Work from the verified JSON rather than the StripeObject — it stores cleanly in the
+    # event ledger and avoids stripe-version differences in object-to-dict conversion.
+    return json.loads(payload)
 
-    # Access event attributes directly — stripe v8+ objects don't reliably
-    # convert to plain dicts (calling .get() on nested objects raises AttributeError).
-    event_type = event.type if hasattr(event, "type") else event.get("type", "")
-    print(f"[stripe] Webhook event: {event_type}")
 
-    # Extract the inner object: event.data.object (stripe obj) → convert to dict
-    try:
-        data_obj = event.data.object
-        # stripe v8+ objects have to_dict_recursive or similar; fall back to vars/dict
-        if hasattr(data_obj, "to_dict_recursive"):
-            data = data_obj.to_dict_recursive()
-        elif hasattr(data_obj, "to_dict"):
-            data = data_obj.to_dict()
-        elif isinstance(data_obj, dict):
-            data = data_obj
-        else:
-            # Last resort: use __dict__ or convert via JSON round-trip
-            import json
-            data = json.loads(str(data_obj))
-    except Exception as e:
-        print(f"[stripe] Failed to extract event data object: {e} — falling back to dict conversion")
-        # Fallback: try the old dict conversion path
-        try:
-            event_dict = event.to_dict() if hasattr(event, "to_dict") else {}
-            data = event_dict.get("data", {}).get("object", {})
-        except Exception as e2:
-            print(f"[stripe] Dict fallback also failed: {e2}")
-            data = {}
+def event_customer(event: dict) -> str:
+    """Ordering key for an event: its Stripe customer, else the checkout's user, else the event itself."""
+    data = (event.get("data") or {}).get("object") or {}
+    customer = data.get("customer")
+    if isinstance(customer, dict):
+        customer = customer.get("id")
+    if customer:
+        return customer
+    user_id = (data.get("metadata") or {}).get("user_id")
+    return f"user:{user_id}" if user_id else f"event:{event['id']}"
+
+
+def apply_event(event: dict) -> dict:
+    """
+    Apply one Stripe event to subscription state. Returns a summary dict.
+    This is the ONLY function that writes subscription data — called by the
+    api.services.stripe_events worker, which handles ordering and deduplication.
+    """
+    event_type = event.get("type", "")
+    data = (event.get("data") or {}).get("object") or {}
+    print(f"[stripe] Applying event {event.get('id')}: {event_type}")
 
     result = {"event_type": event_type, "handled": False}
 
@@ -99,10 +110,7 @@ def handle_webhook_event(payload: bytes, sig_header: str) -> dict:
         _handle_checkout_completed(data)
         result["handled"] = True
 
-    elif event_type in (
-        "customer.subscription.updated",
-        "customer.subscription.deleted",
-    ):
+    elif event_type in SUBSCRIPTION_EVENTS:
         _handle_subscription_change(data)
         result["handled"] = True
 
@@ -191,8 +199,7 @@ def _handle_subscription_change(sub_data):
     customer_id = _safe_get(sub_data, "customer")
     sub_record = get_subscription_by_stripe_customer(customer_id)
     if not sub_record:
-        print(f"[stripe] subscription change for unknown customer {customer_id}")
-        return
+        raise CustomerNotLinked(customer_id)
 
     status = _safe_get(sub_data, "status", "active")
     period_end = None
@@ -225,7 +232,7 @@ def _handle_payment_failed(invoice_data):
     customer_id = _safe_get(invoice_data, "customer")
     sub_record = get_subscription_by_stripe_customer(customer_id)
     if not sub_record:
-        return
+        raise CustomerNotLinked(customer_id)
 
     upsert_subscription(
         user_id=sub_record["user_id"],
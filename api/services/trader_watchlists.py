@@ -0,0 +1,416 @@
+"""
+Trader watchlists — the /api/traders registry and how each list has performed.
+
+Traders and their tickers live in auth.db and are edited by admins through the API.
+Ticker membership is kept as intervals (added_on, removed_on), so removing a name
+ends its interval instead of deleting it, and re-adding it opens a new one.
+The first start seeds the registry from DEFAULT_TRADERS, the list that used to be
+compiled into the router.
+
+Performance is computed from the shared bar store's daily series (bar_store.get_series)
+for every name a list has held, plus SPY and the UCT20 composite:
+
+    nav          equal-weight NAV of the list, rebalanced daily, since its first addition.
+                 A name counts from the close of its add date to the close of its
+                 remove date.
+    rs_vs_spy    list NAV vs SPY over the same span (% outperformance)
+    rs_vs_uct20  same vs the UCT20 composite (uct20_nav compositions run as intervals)
+    hit_rate     % of additions up since they were added (beat_spy_rate: % that beat SPY)
+
+Everything is one numpy pass over an (intervals × days) return matrix. Results are
+cached for the bar store's daily TTL, keyed on the trader's updated_at, so an edit
+shows up on the next request.
+"""
+
+import re
+from datetime import date, datetime, timezone
+
+import numpy as np
+
+from api.services.auth_db import get_connection
+from api.services.cache import cache
+
+BENCHMARK = "SPY"
+MAX_BARS = 1000          # bar_store.DEFAULT_DEPTH["D"]
+PERF_TTL = 300           # bar_store.TTL["D"]
+MAX_TICKERS = 50
+PERIODS = {"1w": 5, "1m": 21, "3m": 63}
+
+DEFAULT_TRADERS = [
+    {"id": "tsdr", "name": "TSDR", "color": "#3cb868",
+     "tickers": ["NVDA", "META", "GOOGL", "AMZN", "MSFT", "AAPL", "AMD", "TSM", "AVGO", "ARM"]},
+    {"id": "bracco", "name": "Bracco", "color": "#e74c3c",
+     "tickers": ["SMCI", "PLTR", "IONQ", "RGTI", "ACHR", "JOBY", "RKLB", "LUNR", "TDW", "PRFX"]},
+    {"id": "qullamaggie", "name": "Qullamaggie", "color": "#6ba3be",
+     "tickers": ["CELH", "AXON", "ANET", "TTD", "MNDY", "DUOL", "IOT", "SMAR", "GTLB", "DDOG"]},
+    {"id": "manrav", "name": "Manrav", "color": "#c9a84c",
+     "tickers": ["CRS", "FIX", "EQIX", "MCK", "TOL", "GLW", "STX", "MU", "SNDK", "LITE"]},
+]
+
+_ID_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,31}$")
+_TICKER_RE = re.compile(r"^[A-Z][A-Z0-9.\-]{0,9}$")
+_COLOR_RE = re.compile(r"^#[0-9a-fA-F]{6}$")
+
+
+# ── Schema ───────────────────────────────────────────────────────────────────
+
+def install(conn) -> None:
+    """Create the registry tables; seed DEFAULT_TRADERS into an empty registry. Caller commits."""
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS traders (
+            id          TEXT PRIMARY KEY,
+            name        TEXT NOT NULL,
+            color       TEXT NOT NULL DEFAULT '#888888',
+            sort_order  INTEGER NOT NULL DEFAULT 0,
+            active      INTEGER NOT NULL DEFAULT 1,
+            created_at  TEXT NOT NULL,
+            updated_at  TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS trader_tickers (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            trader_id   TEXT NOT NULL,
+            ticker      TEXT NOT NULL,
+            added_on    TEXT NOT NULL,
+            removed_on  TEXT                        -- NULL while on the list
+        );
+        CREATE INDEX IF NOT EXISTS idx_trader_tickers ON trader_tickers(trader_id, ticker);
+    """)
+    if conn.execute("SELECT 1 FROM traders LIMIT 1").fetchone():
+        return
+    today = date.today().isoformat()
+    for i, t in enumerate(DEFAULT_TRADERS):
+        conn.execute(
+            "INSERT INTO traders (id, name, color, sort_order, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (t["id"], t["name"], t["color"], i, _now(), _now()),
+        )
+        conn.executemany(
+            "INSERT INTO trader_tickers (trader_id, ticker, added_on) VALUES (?, ?, ?)",
+            [(t["id"], sym, today) for sym in t["tickers"]],
+        )
+    print(f"[traders] Seeded {len(DEFAULT_TRADERS)} trader watchlists")
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+# ── Registry ─────────────────────────────────────────────────────────────────
+
+def _clean_tickers(tickers: list[str]) -> list[str]:
+    out: list[str] = []
+    for raw in tickers:
+        sym = (raw or "").strip().upper()
+        if not _TICKER_RE.match(sym):
+            raise ValueError(f"Invalid ticker: {raw!r}")
+        if sym not in out:
+            out.append(sym)
+    if len(out) > MAX_TICKERS:
+        raise ValueError(f"At most {MAX_TICKERS} tickers per list")
+    return out
+
+
+def _row_to_trader(row, tickers: list[str]) -> dict:
+    return {"id": row["id"], "name": row["name"], "color": row["color"], "tickers": tickers}
+
+
+def list_traders() -> list[dict]:
+    """Active traders with their current tickers, in display order (the /api/traders shape)."""
+    conn = get_connection()
+    try:
+        traders = conn.execute(
+            "SELECT * FROM traders WHERE active = 1 ORDER BY sort_order, name"
+        ).fetchall()
+        rows = conn.execute(
+            "SELECT trader_id, ticker FROM trader_tickers WHERE removed_on IS NULL ORDER BY id"
+        ).fetchall()
+    finally:
+        conn.close()
+    current: dict[str, list[str]] = {}
+    for r in rows:
+        current.setdefault(r["trader_id"], []).append(r["ticker"])
+    return [_row_to_trader(t, current.get(t["id"], [])) for t in traders]
+
+
+def get_trader(trader_id: str) -> dict | None:
+    """One trader with current tickers and the full add/remove history."""
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT * FROM traders WHERE id = ? AND active = 1", (trader_id,)).fetchone()
+        if row is None:
+            return None
+        history = conn.execute(
+            "SELECT ticker, added_on, removed_on FROM trader_tickers WHERE trader_id = ? ORDER BY id",
+            (trader_id,),
+        ).fetchall()
+    finally:
+        conn.close()
+    return {
+        **_row_to_trader(row, [h["ticker"] for h in history if h["removed_on"] is None]),
+        "history": [dict(h) for h in history],
+        "updated_at": row["updated_at"],
+    }
+
+
+def create_trader(trader_id: str, name: str, color: str = "#888888", tickers: list[str] | None = None) -> dict:
+    trader_id = (trader_id or "").strip().lower()
+    if not _ID_RE.match(trader_id):
+        raise ValueError("id must be lowercase letters, digits, - or _ (max 32)")
+    if not (name or "").strip():
+        raise ValueError("name is required")
+    if not _COLOR_RE.match(color or ""):
+        raise ValueError("color must be #rrggbb")
+    tickers = _clean_tickers(tickers or [])
+    conn = get_connection()
+    try:
+        existing = conn.execute("SELECT active FROM traders WHERE id = ?", (trader_id,)).fetchone()
+        if existing is not None and existing["active"]:
+            raise ValueError(f"Trader {trader_id} already exists")
+        order = conn.execute("SELECT COALESCE(MAX(sort_order), -1) + 1 FROM traders").fetchone()[0]
+        conn.execute(
+            "INSERT OR REPLACE INTO traders (id, name, color, sort_order, active, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, 1, ?, ?)",
+            (trader_id, name.strip()[:60], color, order, _now(), _now()),
+        )
+        _apply_tickers(conn, trader_id, tickers)
+        conn.commit()
+    finally:
+        conn.close()
+    return get_trader(trader_id)
+
+
+def update_trader(trader_id: str, updates: dict) -> dict | None:
+    """Rename, recolor, reorder, and/or replace the ticker list (diffed into add/remove history)."""
+    if "color" in updates and not _COLOR_RE.match(updates["color"] or ""):
+        raise ValueError("color must be #rrggbb")
+    if "name" in updates and not (updates["name"] or "").strip():
+        raise ValueError("name is required")
+    tickers = _clean_tickers(updates["tickers"]) if updates.get("tickers") is not None else None
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT * FROM traders WHERE id = ? AND active = 1", (trader_id,)).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "UPDATE traders SET name = ?, color = ?, sort_order = ?, updated_at = ? WHERE id = ?",
+            ((updates.get("name") or row["name"]).strip()[:60], updates.get("color") or row["color"],
+             int(updates.get("sort_order", row["sort_order"])), _now(), trader_id),
+        )
+        if tickers is not None:
+            _apply_tickers(conn, trader_id, tickers)
+        conn.commit()
+    finally:
+        conn.close()
+    return get_trader(trader_id)
+
+
+def _apply_tickers(conn, trader_id: str, tickers: list[str]) -> None:
+    """Close intervals for names no longer listed and open one for each new name."""
+    today = date.today().isoformat()
+    current = {r["ticker"]: r["id"] for r in conn.execute(
+        "SELECT id, ticker FROM trader_tickers WHERE trader_id = ? AND removed_on IS NULL", (trader_id,)
+    ).fetchall()}
+    for sym, interval_id in current.items():
+        if sym not in tickers:
+            conn.execute("UPDATE trader_tickers SET removed_on = ? WHERE id = ?", (today, interval_id))
+    conn.executemany(
+        "INSERT INTO trader_tickers (trader_id, ticker, added_on) VALUES (?, ?, ?)",
+        [(trader_id, sym, today) for sym in tickers if sym not in current],
+    )
+
+
+def add_ticker(trader_id: str, ticker: str) -> dict | None:
+    current = get_trader(trader_id)
+    if current is None:
+        return None
+    return update_trader(trader_id, {"tickers": current["tickers"] + [ticker]})
+
+
+def remove_ticker(trader_id: str, ticker: str) -> dict | None:
+    current = get_trader(trader_id)
+    if current is None:
+        return None
+    sym = ticker.strip().upper()
+    if sym not in current["tickers"]:
+        raise ValueError(f"{sym} is not on {current['name']}'s list")
+    return update_trader(trader_id, {"tickers": [t for t in current["tickers"] if t != sym]})
+
+
+def delete_trader(trader_id: str) -> bool:
+    """Retire a trader: hidden from the registry; membership history is kept."""
+    conn = get_connection()
+    try:
+        cur = conn.execute(
+            "UPDATE traders SET active = 0, updated_at = ? WHERE id = ? AND active = 1", (_now(), trader_id)
+        )
+        if cur.rowcount:
+            conn.execute(
+                "UPDATE trader_tickers SET removed_on = ? WHERE trader_id = ? AND removed_on IS NULL",
+                (date.today().isoformat(), trader_id),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+    return bool(cur.rowcount)
+
+
+# ── Performance ──────────────────────────────────────────────────────────────
+
+def _closes(tickers: list[str], axis: np.ndarray, bars: int) -> np.ndarray:
+    """(tickers × days) daily closes from the bar store, forward-filled onto axis; NaN before a
+    name's first bar."""
+    from api.services import bar_store
+
+    out = np.full((len(tickers), len(axis)), np.nan)
+    for i, sym in enumerate(tickers):
+        try:
+            cols = bar_store.get_series(sym, "D", bars)
+        except Exception as e:
+            print(f"[traders] Bars unavailable for {sym}: {e}")
+            continue
+        if not cols["t"]:
+            continue
+        t = np.array(cols["t"], dtype="datetime64[D]")
+        idx = np.searchsorted(t, axis, side="right") - 1
+        c = np.asarray(cols["c"], dtype=float)
+        out[i] = np.where(idx >= 0, c[np.clip(idx, 0, None)], np.nan)
+    return out
+
+
+def _equal_weight(returns: np.ndarray, held: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Daily equal-weight portfolio return and whether anything was held that day."""
+    valid = held & np.isfinite(returns)
+    n = valid.sum(axis=0)
+    total = np.where(valid, returns, 0.0).sum(axis=0)
+    return np.where(n > 0, total / np.maximum(n, 1), 0.0), n > 0
+
+
+def _held(axis: np.ndarray, added: np.ndarray, removed: np.ndarray) -> np.ndarray:
+    """(intervals × return days) mask: return day d (close d-1 → close d) counts for an
+    interval if the previous close is on/after its add date and before its removal."""
+    prev = axis[:-1][None, :]
+    return (prev >= added[:, None]) & (prev < removed[:, None])
+
+
+def _uct20_intervals() -> list[tuple[str, str, str | None]]:
+    """UCT20 composition snapshots as (ticker, added_on, removed_on) intervals."""
+    from api.services.uct20_nav import _load_compositions
+
+    comps = _load_compositions()
+    intervals: list[tuple[str, str, str | None]] = []
+    open_since: dict[str, str] = {}
+    for c in comps:
+        holdings = set(c.get("holdings", []))
+        for sym in list(open_since):
+            if sym not in holdings:
+                intervals.append((sym, open_since.pop(sym), c["date"]))
+        for sym in holdings:
+            open_since.setdefault(sym, c["date"])
+    intervals.extend((sym, since, None) for sym, since in open_since.items())
+    return intervals if len(comps) >= 2 else []
+
+
+def _pct(a: float, b: float) -> float | None:
+    return round((a / b - 1) * 100, 2) if b and np.isfinite(a) and np.isfinite(b) else None
+
+
+def compute_performance(history: list[dict], with_series: bool = False) -> dict:
+    """Performance of one list's membership history ([{ticker, added_on, removed_on}])."""
+    empty = {"inception": None, "nav": None, "return_pct": None, "rs_vs_spy": None, "rs_vs_uct20": None,
+             "hit_rate": None, "beat_spy_rate": None, "periods": {},
+             "tickers": [{**h, "return_pct": None, "vs_spy": None} for h in history]}
+    if not history:
+        return empty
+    today = np.datetime64(date.today().isoformat(), "D")
+    inception = min(np.datetime64(h["added_on"], "D") for h in history)
+    bars = int(min(MAX_BARS, np.busday_count(inception, today) + 10))
+
+    from api.services import bar_store
+    spy = bar_store.get_series(BENCHMARK, "D", bars)
+    if not spy["t"]:
+        return empty
+    axis = np.array(spy["t"], dtype="datetime64[D]")
+
+    uct = _uct20_intervals()
+    names = sorted({h["ticker"] for h in history} | {u[0] for u in uct})
+    closes = _closes(names, axis, bars)
+    spy_close = np.asarray(spy["c"], dtype=float)
+    rets = closes[:, 1:] / closes[:, :-1] - 1
+    spy_ret = spy_close[1:] / spy_close[:-1] - 1
+    row = {sym: i for i, sym in enumerate(names)}
+    far = np.datetime64("9999-12-31", "D")
+
+    def run(intervals):
+        added = np.array([a for _, a, _ in intervals], dtype="datetime64[D]")
+        removed = np.array([r or far for _, _, r in intervals], dtype="datetime64[D]")
+        held = _held(axis, added, removed)
+        r = rets[[row[s] for s, _, _ in intervals]]
+        return held, r, _equal_weight(r, held)
+
+    held, r, (port, active) = run([(h["ticker"], h["added_on"], h["removed_on"]) for h in history])
+    if not active.any():
+        return {**empty, "inception": str(inception)}
+    start = int(np.argmax(active))                 # first return day with a holding
+    nav = 100 * np.cumprod(1 + port[start:])
+    spy_nav = 100 * np.cumprod(1 + spy_ret[start:])
+    uct_nav = None
+    if uct:
+        _, _, (uport, uactive) = run(uct)
+        if uactive[start:].any():
+            uct_nav = 100 * np.cumprod(1 + uport[start:])
+
+    # Per addition: compounded return while held, and SPY's over the same days
+    log_r = np.where(held & np.isfinite(r), np.log1p(np.where(np.isfinite(r), r, 0.0)), 0.0)
+    name_ret = np.expm1(log_r.sum(axis=1))
+    spy_same = np.expm1((held * np.log1p(spy_ret)[None, :]).sum(axis=1))
+    scored = held.any(axis=1)
+
+    periods = {}
+    for label, n in PERIODS.items():
+        if len(nav) > n:
+            periods[label] = _pct(nav[-1], nav[-1 - n])
+    result = {
+        "inception": str(axis[start]),
+        "as_of": str(axis[-1]),
+        "nav": round(float(nav[-1]), 2),
+        "return_pct": _pct(nav[-1], 100),
+        "spy_return_pct": _pct(spy_nav[-1], 100),
+        "rs_vs_spy": _pct(nav[-1], spy_nav[-1]),
+        "rs_vs_uct20": _pct(nav[-1], uct_nav[-1]) if uct_nav is not None else None,
+        "hit_rate": round(float((name_ret[scored] > 0).mean()) * 100, 1) if scored.any() else None,
+        "beat_spy_rate": round(float((name_ret[scored] > spy_same[scored]).mean()) * 100, 1)
+        if scored.any() else None,
+        "periods": periods,
+        "tickers": [
+            {**h, "return_pct": round(float(name_ret[i]) * 100, 2) if scored[i] else None,
+             "vs_spy": round(float(name_ret[i] - spy_same[i]) * 100, 2) if scored[i] else None}
+            for i, h in enumerate(history)
+        ],
+    }
+    if with_series:
+        dates = axis[start:]   # NAV after each return day → stamp with that day's close
+        result["series"] = [
+            {"date": str(d), "nav": round(float(v), 2), "spy": round(float(s), 2),
+             "uct20": round(float(uct_nav[i]), 2) if uct_nav is not None else None}
+            for i, (d, v, s) in enumerate(zip(dates[1:], nav, spy_nav))
+        ]
+    return result
+
+
+def get_performance(trader_id: str, with_series: bool = True) -> dict | None:
+    trader = get_trader(trader_id)
+    if trader is None:
+        return None
+    key = f"trader_perf_{trader_id}_{trader['updated_at']}_{int(with_series)}"
+    hit = cache.get(key)
+    if hit is not None:
+        return hit
+    perf = {"id": trader["id"], "name": trader["name"], "color": trader["color"],
+            **compute_performance(trader["history"], with_series)}
+    cache.set(key, perf, PERF_TTL)
+    return perf
+
+
+def get_all_performance() -> list[dict]:
+    """Summary performance (no NAV series) for every active trader."""
+    return [p for p in (get_performance(t["id"], with_series=False) for t in list_traders()) if p]
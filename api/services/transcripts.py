@@ -29,28 +29,12 @@ def _fetch_latest_transcript(symbol: str) -> dict | None:
 
     Returns {text, quarter, year, title} or None if unavailable.
     """
-    import requests
-
-    fh_key = os.environ.get("FINNHUB_API_KEY", "")
-    if not fh_key:
-        return None
+    from api.services import finnhub
 
     # Step 1: list available transcripts
-    try:
-        list_url = (
-            f"https://finnhub.io/api/v1/stock/transcripts/list"
-            f"?symbol={symbol}&token={fh_key}"
-        )
-        resp = requests.get(list_url, timeout=10)
-        if not resp.ok:
-            _logger.warning("Transcript list HTTP %d for %s", resp.status_code, symbol)
-            return None
-        data = resp.json()
-        transcripts = data.get("transcripts", [])
-        if not transcripts:
-            return None
-    except Exception as exc:
-        _logger.warning("Transcript list fetch failed for %s: %s", symbol, exc)
+    data = finnhub.get("/stock/transcripts/list", {"symbol": symbol})
+    transcripts = (data or {}).get("transcripts", [])
+    if not transcripts:
         return None
 
     # Pick the most recent transcript
@@ -60,18 +44,8 @@ def _fetch_latest_transcript(symbol: str) -> dict | None:
         return None
 
     # Step 2: fetch full transcript
-    try:
-        detail_url = (
-            f"https://finnhub.io/api/v1/stock/transcripts"
-            f"?id={transcript_id}&token={fh_key}"
-        )
-        resp = requests.get(detail_url, timeout=15)
-        if not resp.ok:
-            _logger.warning("Transcript detail HTTP %d for %s", resp.status_code, symbol)
-            return None
-        detail = resp.json()
-    except Exception as exc:
-        _logger.warning("Transcript detail fetch failed for %s: %s", symbol, exc)
+    detail = finnhub.get("/stock/transcripts", {"id": transcript_id}, timeout=15)
+    if detail is None:
         return None
 
     # Concatenate all speech entries
@@ -0,0 +1,455 @@
+"""
+api/services/wire_store.py — Versioned wire_data document.
+
+Every push produces a new version number. Versions are recorded in a SQLite history
+(WIRE_HISTORY_DB_PATH, /data/wire_history.db on Railway) so a bad push can be
+rolled back.
+
+A push can be:
+  put(doc)                      full replacement (the morning engine run)
+  update_sections(set, remove)  replace or drop whole top-level sections
+  apply_patch(ops)              RFC 6902 JSON Patch operations against the document
+
+All three reduce to "these top-level sections changed". Only the cache keys listed for
+those sections in SECTION_CACHE_KEYS are invalidated. Only the recomputes listed in
+SECTION_RECOMPUTES run. A push that changes nothing creates no version.
+
+History rows store either the whole document (snapshot) or just the changed sections.
+A snapshot is taken on full pushes, rollbacks and every HISTORY_LIMIT deltas, so
+rebuilding any kept version replays at most HISTORY_LIMIT small rows. Pruning keeps
+the newest HISTORY_LIMIT versions plus the snapshot they are built on.
+
+Pass base_version to any push to refuse it (VersionConflict) if another push landed
+first.
+"""
+
+import copy
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from api.services.cache import cache
+
+_DEFAULT_DB_PATH = (
+    "/data/wire_history.db"
+    if os.path.isdir("/data")
+    else os.path.join(os.path.dirname(__file__), "..", "..", "data", "wire_history.db")
+)
+DB_PATH: str = os.environ.get("WIRE_HISTORY_DB_PATH", _DEFAULT_DB_PATH)
+PERSISTENT_WIRE_DATA_FILE = "/data/wire_data.json"
+
+WIRE_TTL = 82800  # 23 hours
+HISTORY_LIMIT = 20
+
+# Top-level section → cache keys derived from it
+SECTION_CACHE_KEYS: dict[str, list[str]] = {
+    "date":            ["rundown"],
+    "rundown_html":    ["rundown"],
+    "breadth":         ["breadth"],
+    "exposure":        ["breadth"],
+    "ma_data":         ["breadth"],
+    "themes":          ["themes_1W", "themes_1M", "themes_3M", "themes_Today"],
+    "leadership":      ["leadership", "screener", "rs_rankings"],
+    "earnings":        ["earnings"],
+    "cap_universe":    ["earnings", "calendar_weekly", "rs_rankings"],
+    "weekly_calendar": ["calendar_weekly"],
+    "movers":          ["movers", "movers_discovery"],
+    "uct20_portfolio": ["uct20_portfolio"],
+    "analyst_actions": ["analyst_actions"],
+    "candidates":      ["candidates"],
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS wire_versions (
+    version     INTEGER PRIMARY KEY,
+    created_at  TEXT NOT NULL,
+    kind        TEXT NOT NULL,          -- full / sections / patch / rollback
+    sections    TEXT NOT NULL,          -- JSON list of changed top-level sections
+    restored    INTEGER,                -- rollback: the version restored
+    snapshot    INTEGER NOT NULL,       -- 1: body is the whole document
+    body        TEXT NOT NULL           -- document, or {"set": {...}, "remove": [...]}
+)
+"""
+
+_lock = threading.Lock()
+
+
+class VersionConflict(Exception):
+    """base_version no longer matches the current version."""
+
+
+# ─── Downstream recomputes ────────────────────────────────────────────────────
+
+def _record_composition(doc: dict) -> None:
+    """Record UCT20 composition snapshot (for portfolio NAV tracking)."""
+    from api.services.uct20_nav import record_composition
+    leadership = doc.get("leadership", [])
+    holdings = [e["sym"] for e in leadership if isinstance(e, dict) and "sym" in e]
+    if holdings:
+        record_composition(holdings)
+
+
+def _recompute_themes(doc: dict) -> None:
+    """Theme performance depends on the theme list and the UCT20 holdings."""
+    from api.services.theme_performance import trigger_recompute
+    trigger_recompute()
+
+
+def _evaluate_breadth_rules(doc: dict) -> None:
+    from api.services.alert_rules import on_breadth
+    on_breadth((doc.get("breadth") or {}).get("breadth_score"))
+
+
+SECTION_RECOMPUTES = {
+    "leadership": [_record_composition, _recompute_themes],
+    "themes":     [_recompute_themes],
+    "breadth":    [_evaluate_breadth_rules],
+}
+
+
+# ─── DB ───────────────────────────────────────────────────────────────────────
+
+def get_connection() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(os.path.abspath(DB_PATH)), exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=10, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(_SCHEMA)
+    return conn
+
+
+def _latest_version(conn) -> int:
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM wire_versions").fetchone()[0]
+
+
+def _build(conn, version: int) -> dict | None:
+    """Rebuild the document at version from its snapshot plus the deltas after it."""
+    base = conn.execute(
+        "SELECT MAX(version) FROM wire_versions WHERE snapshot = 1 AND version <= ?", (version,)
+    ).fetchone()[0]
+    if base is None:
+        return None
+    rows = conn.execute(
+        "SELECT version, snapshot, body FROM wire_versions WHERE version BETWEEN ? AND ? ORDER BY version",
+        (base, version),
+    ).fetchall()
+    if not rows or rows[-1]["version"] != version:
+        return None
+    doc: dict = {}
+    for row in rows:
+        body = json.loads(row["body"])
+        if row["snapshot"]:
+            doc = body
+        else:
+            doc = {k: v for k, v in doc.items() if k not in body["remove"]}
+            doc.update(body["set"])
+    return doc
+
+
+def _current(conn, latest: int) -> dict:
+    """The document at latest, preferring this process's cached copy."""
+    if cache.get("wire_version") == latest:
+        doc = cache.get("wire_data")
+        if isinstance(doc, dict):
+            return doc
+    if latest:
+        doc = _build(conn, latest)
+        if doc is not None:
+            return doc
+    from api.services.engine import _load_wire_data
+    return _load_wire_data() or {}
+
+
+def _prune(conn, latest: int) -> None:
+    oldest_kept = latest - HISTORY_LIMIT + 1
+    base = conn.execute(
+        "SELECT MAX(version) FROM wire_versions WHERE snapshot = 1 AND version <= ?", (oldest_kept,)
+    ).fetchone()[0]
+    if base is not None:
+        conn.execute("DELETE FROM wire_versions WHERE version < ?", (base,))
+
+
+# ─── Commit ───────────────────────────────────────────────────────────────────
+
+def _commit(kind: str, build, base_version: int | None = None, restored: int | None = None) -> dict:
+    """Apply build(current) → new document as one new version and propagate it.
+
+    build receives the current document (do not mutate it) and returns the new one
+    plus the top-level sections it may have touched (None = any).
+    """
+    with _lock:
+        conn = get_connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                latest = _latest_version(conn)
+                if base_version is not None and base_version != latest:
+                    raise VersionConflict(f"current version is {latest}, not {base_version}")
+                current = _current(conn, latest)
+                doc, touched = build(current)
+                keys = set(current) | set(doc) if touched is None else set(touched)
+                removed = sorted(k for k in keys if k in current and k not in doc)
+                changed = sorted(k for k in keys if k in doc and current.get(k) != doc[k])
+                if not changed and not removed:
+                    conn.execute("ROLLBACK")
+                    cache.set("wire_data", current, ttl=WIRE_TTL)
+                    cache.set("wire_version", latest, ttl=WIRE_TTL)
+                    return {"version": latest, "changed": [], "invalidated": []}
+
+                version = latest + 1
+                deltas_since_snapshot = conn.execute(
+                    "SELECT COUNT(*) FROM wire_versions WHERE version > "
+                    "(SELECT COALESCE(MAX(version), 0) FROM wire_versions WHERE snapshot = 1)"
+                ).fetchone()[0]
+                has_snapshot = conn.execute(
+                    "SELECT 1 FROM wire_versions WHERE snapshot = 1 LIMIT 1"
+                ).fetchone() is not None
+                snapshot = (
+                    kind in ("full", "rollback") or not has_snapshot
+                    or deltas_since_snapshot + 1 >= HISTORY_LIMIT
+                )
+                body = doc if snapshot else {"set": {k: doc[k] for k in changed}, "remove": removed}
+                conn.execute(
+                    "INSERT INTO wire_versions (version, created_at, kind, sections, restored, snapshot, body) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (version, datetime.now(timezone.utc).isoformat(), kind,
+                     json.dumps(changed + removed), restored, int(snapshot), json.dumps(body)),
+                )
+                _prune(conn, version)
+                conn.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+        cache.set("wire_data", doc, ttl=WIRE_TTL)
+        cache.set("wire_version", version, ttl=WIRE_TTL)
+
+    _persist(doc)
+    sections = changed + removed
+    invalidated = _invalidate(sections)
+    _run_recomputes(sections, doc)
+    print(f"[wire] v{version} {kind}: {', '.join(sections)}")
+    return {"version": version, "changed": sections, "invalidated": invalidated}
+
+
+def _persist(doc: dict) -> None:
+    # Railway volume copy of the latest document, read at startup
+    try:
+        os.makedirs(os.path.dirname(PERSISTENT_WIRE_DATA_FILE), exist_ok=True)
+        tmp = f"{PERSISTENT_WIRE_DATA_FILE}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(doc, f)
+        os.replace(tmp, PERSISTENT_WIRE_DATA_FILE)
+    except OSError:
+        pass  # Volume not mounted in local dev — safe to ignore
+
+
+def _invalidate(sections: list[str]) -> list[str]:
+    keys = sorted({key for s in sections for key in SECTION_CACHE_KEYS.get(s, [])})
+    for key in keys:
+        cache.invalidate(key)
+    return keys
+
+
+def _run_recomputes(sections: list[str], doc: dict) -> None:
+    hooks = []
+    for s in sections:
+        for hook in SECTION_RECOMPUTES.get(s, []):
+            if hook not in hooks:
+                hooks.append(hook)
+    for hook in hooks:
+        try:
+            hook(doc)
+        except Exception as e:
+            print(f"[wire] {hook.__name__} failed: {e}")
+
+
+# ─── JSON Patch (RFC 6902) ────────────────────────────────────────────────────
+
+def _pointer(path: str) -> list[str]:
+    if not isinstance(path, str) or not path.startswith("/"):
+        raise ValueError(f"invalid JSON pointer: {path!r}")
+    return [p.replace("~1", "/").replace("~0", "~") for p in path[1:].split("/")]
+
+
+def _resolve(doc, parts: list[str]):
+    """Parent container and final token for a pointer."""
+    target = doc
+    for part in parts[:-1]:
+        if isinstance(target, list):
+            target = target[_index(target, part)]
+        elif isinstance(target, dict) and part in target:
+            target = target[part]
+        else:
+            raise ValueError(f"path not found: /{'/'.join(parts)}")
+    return target, parts[-1]
+
+
+def _index(arr: list, token: str, allow_end: bool = False) -> int:
+    if allow_end and token == "-":
+        return len(arr)
+    if not token.isdigit():
+        raise ValueError(f"invalid array index: {token!r}")
+    i = int(token)
+    if i > len(arr) or (i == len(arr) and not allow_end):
+        raise ValueError(f"array index out of range: {i}")
+    return i
+
+
+def _get(doc, parts):
+    parent, token = _resolve(doc, parts)
+    if isinstance(parent, list):
+        return parent[_index(parent, token)]
+    if token not in parent:
+        raise ValueError(f"path not found: /{'/'.join(parts)}")
+    return parent[token]
+
+
+def _add(doc, parts, value):
+    parent, token = _resolve(doc, parts)
+    if isinstance(parent, list):
+        parent.insert(_index(parent, token, allow_end=True), value)
+    else:
+        parent[token] = value
+
+
+def _remove(doc, parts):
+    parent, token = _resolve(doc, parts)
+    if isinstance(parent, list):
+        return parent.pop(_index(parent, token))
+    if token not in parent:
+        raise ValueError(f"path not found: /{'/'.join(parts)}")
+    return parent.pop(token)
+
+
+def patch_sections(ops: list[dict]) -> list[str]:
+    """Top-level sections a patch reads or writes."""
+    sections = []
+    for op in ops:
+        for field in ("path", "from"):
+            if field in op:
+                if op[field] == "":
+                    raise ValueError("patching the document root is not supported; use a full push")
+                parts = _pointer(op[field])
+                if parts[0] not in sections:
+                    sections.append(parts[0])
+    return sections
+
+
+def _apply_ops(doc: dict, ops: list[dict]) -> dict:
+    """Apply ops to doc in place (callers pass a copy)."""
+    for op in ops:
+        name = op.get("op")
+        parts = _pointer(op.get("path"))
+        if name == "add":
+            _add(doc, parts, copy.deepcopy(op["value"]))
+        elif name == "remove":
+            _remove(doc, parts)
+        elif name == "replace":
+            _remove(doc, parts)
+            _add(doc, parts, copy.deepcopy(op["value"]))
+        elif name == "move":
+            _add(doc, parts, _remove(doc, _pointer(op.get("from"))))
+        elif name == "copy":
+            _add(doc, parts, copy.deepcopy(_get(doc, _pointer(op.get("from")))))
+        elif name == "test":
+            if _get(doc, parts) != op.get("value"):
+                raise ValueError(f"test failed at {op['path']}")
+        else:
+            raise ValueError(f"unsupported patch op: {name!r}")
+    return doc
+
+
+# ─── Public API ───────────────────────────────────────────────────────────────
+
+def put(doc: dict, base_version: int | None = None) -> dict:
+    """Replace the whole document. Only sections that differ count as changed."""
+    return _commit("full", lambda current: (doc, None), base_version)
+
+
+def update_sections(sections: dict, remove: list[str] | None = None,
+                    base_version: int | None = None) -> dict:
+    """Replace the given top-level sections and drop those in remove."""
+    remove = list(remove or [])
+
+    def build(current):
+        doc = {k: v for k, v in current.items() if k not in remove}
+        doc.update(sections)
+        return doc, list(sections) + remove
+
+    return _commit("sections", build, base_version)
+
+
+def apply_patch(ops: list[dict], base_version: int | None = None) -> dict:
+    """Apply a JSON Patch. Raises ValueError if any op fails (nothing is applied)."""
+    if not isinstance(ops, list) or not all(isinstance(op, dict) for op in ops):
+        raise ValueError("patch must be a list of operations")
+    touched = patch_sections(ops)
+
+    def build(current):
+        # Copy only the sections the patch touches; the rest are shared with current
+        doc = dict(current)
+        for s in touched:
+            if s in doc:
+                doc[s] = copy.deepcopy(doc[s])
+        return _apply_ops(doc, ops), touched
+
+    return _commit("patch", build, base_version)
+
+
+def rollback(version: int, base_version: int | None = None) -> dict:
+    """Restore a kept version's document as a new version."""
+    conn = get_connection()
+    try:
+        doc = _build(conn, version)
+    finally:
+        conn.close()
+    if doc is None:
+        raise LookupError(f"version {version} is not in the history")
+    return _commit("rollback", lambda current: (doc, None), base_version, restored=version)
+
+
+def get_version() -> int:
+    cached = cache.get("wire_version")
+    if cached is not None:
+        return cached
+    conn = get_connection()
+    try:
+        return _latest_version(conn)
+    finally:
+        conn.close()
+
+
+def get_document(version: int) -> dict | None:
+    conn = get_connection()
+    try:
+        return _build(conn, version)
+    finally:
+        conn.close()
+
+
+def list_versions() -> list[dict]:
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            "SELECT version, created_at, kind, sections, restored, snapshot "
+            "FROM wire_versions ORDER BY version DESC"
+        ).fetchall()
+    finally:
+        conn.close()
+    return [
+        {
+            "version": r["version"],
+            "created_at": r["created_at"],
+            "kind": r["kind"],
+            "sections": json.loads(r["sections"]),
+            "restored": r["restored"],
+            "snapshot": bool(r["snapshot"]),
+        }
+        for r in rows
+    ]
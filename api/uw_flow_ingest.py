@@ -0,0 +1,416 @@
+"""
+uw_flow_ingest.py — Background ingester for Unusual Whales flow alerts.
+
+One poller per process asks UW for alerts newer than the newest one it has seen
+(paging back with before_id when a burst overflows a page) and appends them to:
+  - a SQLite archive partitioned by session date (UW_FLOW_DB_PATH, /data/uw_flow.db on
+    Railway), keyed by UW alert id so overlapping polls and several workers never
+    store an alert twice
+  - a bounded in-memory ring buffer of the newest RING_SIZE rows
+  - running aggregates for the current session (premium by ticker, call/put counts and
+    premium, sweeps), updated per alert rather than recomputed from scratch
+
+Every archived alert gets a monotonically increasing `id` (the archive rowid). Clients
+ask for "flow since id X" and get only newer rows; the ring serves recent cursors, the
+archive anything older and any past session by date. Each process fills its ring from
+the archive (not from its own fetch), so workers stay consistent whichever one won the
+insert.
+
+Rows are the BBS-CSV-compatible dicts from uw_live_flow.transform_alert_to_bbs_row,
+plus `id`.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime
+
+import httpx
+
+from api.uw_live_flow import BASE, ET, _headers, transform_alert_to_bbs_row
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_DB_PATH = (
+    "/data/uw_flow.db"
+    if os.path.isdir("/data")
+    else os.path.join(os.path.dirname(__file__), "..", "data", "uw_flow.db")
+)
+DB_PATH: str = os.environ.get("UW_FLOW_DB_PATH", _DEFAULT_DB_PATH)
+
+POLL_SECONDS = 15
+PAGE_SIZE = 200          # UW caps flow-alerts at 200 per request
+MAX_PAGES = 10           # per poll; a longer gap is backfilled on the following polls
+MIN_PREMIUM = 50_000
+RING_SIZE = 5_000
+MAX_DELTA_ROWS = 1_000
+_TIMEOUT = 15.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS flow_alerts (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    alert_id     TEXT NOT NULL UNIQUE,
+    session_date TEXT NOT NULL,          -- ET date of created_at, YYYY-MM-DD
+    created_at   TEXT NOT NULL,
+    ticker       TEXT NOT NULL,
+    cp           TEXT NOT NULL,          -- C / P
+    premium      REAL NOT NULL,
+    is_sweep     INTEGER NOT NULL,
+    raw          TEXT NOT NULL           -- UW alert JSON
+);
+CREATE INDEX IF NOT EXISTS idx_flow_session ON flow_alerts(session_date, id);
+CREATE INDEX IF NOT EXISTS idx_flow_session_ticker ON flow_alerts(session_date, ticker, id);
+"""
+
+_lock = threading.Lock()
+_poll_lock = threading.Lock()
+_ring: deque = deque()          # (id, alert_id, row), oldest first, at most RING_SIZE
+_ring_alert_ids: set[str] = set()
+_state = {"loaded": False, "last_id": 0, "newest_created": None}
+_agg: dict = {}
+_stats = {"polls": 0, "fetched": 0, "archived": 0, "errors": 0}
+
+
+_schema_ready: set[str] = set()
+
+
+def _conn() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(os.path.abspath(DB_PATH)), exist_ok=True)
+    c = sqlite3.connect(DB_PATH, timeout=10)
+    c.row_factory = sqlite3.Row
+    if DB_PATH not in _schema_ready:
+        c.execute("PRAGMA journal_mode=WAL")
+        c.executescript(_SCHEMA)
+        _schema_ready.add(DB_PATH)
+    return c
+
+
+def _session_date(created_at: str) -> str:
+    try:
+        dt = datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+        return dt.astimezone(ET).date().isoformat()
+    except (ValueError, AttributeError):
+        return datetime.now(ET).date().isoformat()
+
+
+# ─── Aggregates ───────────────────────────────────────────────────────────────
+
+def _empty_agg(session: str) -> dict:
+    return {
+        "session": session, "alerts": 0, "calls": 0, "puts": 0,
+        "call_premium": 0.0, "put_premium": 0.0, "sweeps": 0, "sweep_premium": 0.0,
+        "by_ticker": {},
+    }
+
+
+def _apply(agg: dict, ticker: str, cp: str, premium: float, is_sweep: bool, n: int = 1) -> None:
+    """Fold n alerts (premium is their total) into an aggregate."""
+    t = agg["by_ticker"].setdefault(ticker, {
+        "premium": 0.0, "call_premium": 0.0, "put_premium": 0.0, "alerts": 0, "sweeps": 0,
+    })
+    side = "call" if cp == "C" else "put"
+    agg["alerts"] += n
+    agg[f"{side}s"] += n
+    agg[f"{side}_premium"] += premium
+    t["alerts"] += n
+    t["premium"] += premium
+    t[f"{side}_premium"] += premium
+    if is_sweep:
+        agg["sweeps"] += n
+        agg["sweep_premium"] += premium
+        t["sweeps"] += n
+
+
+def _summarize(agg: dict, top: int) -> dict:
+    tickers = sorted(agg["by_ticker"].items(), key=lambda kv: kv[1]["premium"], reverse=True)
+    return {
+        "session": agg["session"] or None,
+        "alerts": agg["alerts"],
+        "calls": agg["calls"],
+        "puts": agg["puts"],
+        "call_premium": round(agg["call_premium"], 2),
+        "put_premium": round(agg["put_premium"], 2),
+        "call_put_ratio": round(agg["calls"] / agg["puts"], 3) if agg["puts"] else None,
+        "call_put_premium_ratio": (
+            round(agg["call_premium"] / agg["put_premium"], 3) if agg["put_premium"] else None
+        ),
+        "sweeps": agg["sweeps"],
+        "sweep_premium": round(agg["sweep_premium"], 2),
+        "top_tickers": [
+            {"ticker": k, **{f: round(v, 2) if isinstance(v, float) else v for f, v in t.items()}}
+            for k, t in tickers[:top]
+        ],
+    }
+
+
+def _aggregate_session(conn: sqlite3.Connection, session_date: str) -> dict:
+    agg = _empty_agg(session_date)
+    grouped = conn.execute(
+        "SELECT ticker, cp, is_sweep, COUNT(*) AS n, SUM(premium) AS prem "
+        "FROM flow_alerts WHERE session_date = ? GROUP BY ticker, cp, is_sweep",
+        (session_date,),
+    ).fetchall()
+    for g in grouped:
+        _apply(agg, g["ticker"], g["cp"], g["prem"], bool(g["is_sweep"]), n=g["n"])
+    return agg
+
+
+# ─── Archive → ring/aggregates ────────────────────────────────────────────────
+
+def _ingest_row(r: sqlite3.Row, aggregate: bool = True) -> None:
+    """Append one archived alert to the ring and the session aggregate (caller holds _lock)."""
+    row = transform_alert_to_bbs_row(json.loads(r["raw"]))
+    row["id"] = r["id"]
+    if len(_ring) >= RING_SIZE:
+        _, old_alert_id, _ = _ring.popleft()
+        _ring_alert_ids.discard(old_alert_id)
+    _ring.append((r["id"], r["alert_id"], row))
+    _ring_alert_ids.add(r["alert_id"])
+    _state["last_id"] = r["id"]
+    if not _state["newest_created"] or r["created_at"] > _state["newest_created"]:
+        _state["newest_created"] = r["created_at"]
+    if not aggregate:
+        return
+
+    if r["session_date"] > _agg.get("session", ""):
+        _agg.clear()
+        _agg.update(_empty_agg(r["session_date"]))
+    if r["session_date"] == _agg["session"]:
+        _apply(_agg, r["ticker"], r["cp"], r["premium"], bool(r["is_sweep"]))
+
+
+_SYNC_COLS = "id, alert_id, session_date, created_at, ticker, cp, premium, is_sweep, raw"
+
+
+def _sync(conn: sqlite3.Connection) -> int:
+    """Pull archive rows past last_id into memory (caller holds _lock)."""
+    if not _state["loaded"]:
+        # Cold start: the newest RING_SIZE rows for the ring, and the latest archived
+        # session's aggregate straight from the archive.
+        conn.execute("BEGIN")  # one read snapshot for both
+        latest = conn.execute("SELECT MAX(session_date) FROM flow_alerts").fetchone()[0]
+        _agg.clear()
+        _agg.update(_aggregate_session(conn, latest or ""))  # "" until the first alert
+        rows = conn.execute(
+            f"SELECT {_SYNC_COLS} FROM flow_alerts ORDER BY id DESC LIMIT ?", (RING_SIZE,)
+        ).fetchall()
+        conn.commit()
+        for r in reversed(rows):
+            _ingest_row(r, aggregate=False)
+        _state["loaded"] = True
+        return len(rows)
+    rows = conn.execute(
+        f"SELECT {_SYNC_COLS} FROM flow_alerts WHERE id > ? ORDER BY id", (_state["last_id"],)
+    ).fetchall()
+    for r in rows:
+        _ingest_row(r)
+    return len(rows)
+
+
+def _ensure_loaded() -> None:
+    if _state["loaded"]:
+        return
+    conn = _conn()
+    try:
+        with _lock:
+            if not _state["loaded"]:
+                _sync(conn)
+    finally:
+        conn.close()
+
+
+# ─── Upstream ─────────────────────────────────────────────────────────────────
+
+def _fetch_page(params: dict) -> list[dict]:
+    """One flow-alerts request, newest first."""
+    with httpx.Client(timeout=_TIMEOUT) as client:
+        resp = client.get(f"{BASE}/api/option-trades/flow-alerts", headers=_headers(), params=params)
+        resp.raise_for_status()
+        return resp.json().get("data", [])
+
+
+def _fetch_new() -> list[dict]:
+    """Alerts we have not archived yet, newest first, paging back until we hit known ones."""
+    params = {"limit": PAGE_SIZE, "min_premium": MIN_PREMIUM}
+    if _state["newest_created"]:
+        params["newer_than"] = _state["newest_created"]
+    out = []
+    for _ in range(MAX_PAGES):
+        page = _fetch_page(params)
+        with _lock:
+            fresh = [a for a in page if a.get("id") and a["id"] not in _ring_alert_ids]
+        out.extend(fresh)
+        if len(page) < PAGE_SIZE or len(fresh) < len(page):
+            break
+        params["before_id"] = page[-1]["id"]
+    return out
+
+
+def _archive(conn: sqlite3.Connection, alerts: list[dict]) -> int:
+    rows = []
+    for a in reversed(alerts):  # oldest first so ids follow time
+        created = a.get("created_at") or ""
+        rows.append((
+            a["id"], _session_date(created), created, (a.get("ticker") or "").upper(),
+            "C" if (a.get("type") or "").lower() == "call" else "P",
+            float(a.get("total_premium") or 0), 1 if a.get("has_sweep") else 0,
+            json.dumps(a, separators=(",", ":")),
+        ))
+    before = conn.total_changes
+    conn.executemany(
+        "INSERT OR IGNORE INTO flow_alerts "
+        "(alert_id, session_date, created_at, ticker, cp, premium, is_sweep, raw) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    return conn.total_changes - before
+
+
+def poll_once() -> int:
+    """Fetch new alerts, archive them, and fold everything new in the archive into memory.
+
+    Returns the number of rows added to this process's ring. Safe to call from several
+    workers at once: the archive dedupes on alert id.
+    """
+    if not _poll_lock.acquire(blocking=False):
+        return 0
+    try:
+        _ensure_loaded()
+        _stats["polls"] += 1
+        try:
+            alerts = _fetch_new()
+        except Exception as e:
+            _stats["errors"] += 1
+            logger.error("[UW-ingest] flow-alerts fetch failed: %s", e)
+            alerts = []
+        conn = _conn()
+        try:
+            if alerts:
+                _stats["fetched"] += len(alerts)
+                _stats["archived"] += _archive(conn, alerts)
+                conn.commit()
+            with _lock:
+                added = _sync(conn)
+        finally:
+            conn.close()
+        if added:
+            logger.info("[UW-ingest] %d new alerts (fetched %d)", added, len(alerts))
+        return added
+    finally:
+        _poll_lock.release()
+
+
+# ─── Reads ────────────────────────────────────────────────────────────────────
+
+def get_flow_since(since_id: int | None = None, limit: int = 500, ticker: str | None = None) -> dict:
+    """Rows newer than since_id, oldest first, with a cursor for the next call.
+
+    since_id=None returns the newest `limit` rows. Cursors inside the ring are served from
+    memory; older ones read the archive.
+    """
+    _ensure_loaded()
+    limit = max(1, min(limit, MAX_DELTA_ROWS))
+    ticker = ticker.upper() if ticker else None
+    with _lock:
+        last_id = _state["last_id"]
+        oldest = _ring[0][0] if _ring else None
+        in_ring = oldest is not None and (since_id is None or since_id >= oldest - 1)
+        if in_ring or since_id is None or since_id >= last_id:
+            rows = [r for i, _, r in _ring
+                    if (since_id is None or i > since_id) and (not ticker or r["symbol"] == ticker)]
+            if since_id is None:
+                rows = rows[-limit:]
+            more = len(rows) > limit
+            rows = rows[:limit]
+            return {"rows": rows, "cursor": rows[-1]["id"] if more else last_id, "more": more}
+
+    sql = "SELECT id, raw FROM flow_alerts WHERE id > ? AND id <= ?"
+    params: list = [since_id, last_id]
+    if ticker:
+        sql += " AND ticker = ?"
+        params.append(ticker)
+    sql += " ORDER BY id LIMIT ?"
+    params.append(limit + 1)
+    conn = _conn()
+    try:
+        found = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+    more = len(found) > limit
+    rows = []
+    for r in found[:limit]:
+        row = transform_alert_to_bbs_row(json.loads(r["raw"]))
+        row["id"] = r["id"]
+        rows.append(row)
+    return {"rows": rows, "cursor": rows[-1]["id"] if more else last_id, "more": more}
+
+
+def get_session(session_date: str, ticker: str | None = None, limit: int = 500, offset: int = 0) -> dict:
+    """Archived flow for one past (or the current) session, newest first."""
+    where, params = "session_date = ?", [session_date]
+    if ticker:
+        where += " AND ticker = ?"
+        params.append(ticker.upper())
+    conn = _conn()
+    try:
+        total = conn.execute(f"SELECT COUNT(*) FROM flow_alerts WHERE {where}", params).fetchone()[0]
+        found = conn.execute(
+            f"SELECT id, raw FROM flow_alerts WHERE {where} ORDER BY id DESC LIMIT ? OFFSET ?",
+            params + [limit, offset],
+        ).fetchall()
+    finally:
+        conn.close()
+    rows = []
+    for r in found:
+        row = transform_alert_to_bbs_row(json.loads(r["raw"]))
+        row["id"] = r["id"]
+        rows.append(row)
+    return {"session": session_date, "total": total, "rows": rows}
+
+
+def get_aggregates(session_date: str | None = None, top: int = 25) -> dict:
+    """Session aggregates — the live running totals, or a GROUP BY over the archive for past days."""
+    _ensure_loaded()
+    with _lock:
+        if session_date is None or session_date == _agg.get("session"):
+            return _summarize(_agg, top)
+    conn = _conn()
+    try:
+        agg = _aggregate_session(conn, session_date)
+    finally:
+        conn.close()
+    return _summarize(agg, top)
+
+
+def list_sessions(limit: int = 30) -> list[dict]:
+    conn = _conn()
+    try:
+        rows = conn.execute(
+            "SELECT session_date, COUNT(*) AS alerts, SUM(premium) AS premium FROM flow_alerts "
+            "GROUP BY session_date ORDER BY session_date DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [{"session": r["session_date"], "alerts": r["alerts"], "premium": round(r["premium"], 2)}
+            for r in rows]
+
+
+def get_stats() -> dict:
+    with _lock:
+        return {**_stats, "ring_size": len(_ring), "last_id": _state["last_id"],
+                "session": _agg.get("session")}
+
+
+def reset() -> None:
+    """Drop in-memory state (tests, or after pointing DB_PATH elsewhere)."""
+    with _lock:
+        _ring.clear()
+        _ring_alert_ids.clear()
+        _agg.clear()
+        _state.update({"loaded": False, "last_id": 0, "newest_created": None})
+        for k in _stats:
+            _stats[k] = 0
@@ -0,0 +1,58 @@
+"""
+uw_flow_router.py — API routes for the ingested Unusual Whales flow feed.
+
+GET /api/uw-flow              — rows since a cursor id (deltas), or the newest rows
+GET /api/uw-flow/aggregates   — premium by ticker, call/put ratio, sweeps for a session
+GET /api/uw-flow/sessions     — archived sessions with alert counts
+GET /api/uw-flow/history      — archived flow for any past session
+"""
+
+from datetime import date as _date
+
+from fastapi import APIRouter, HTTPException, Query
+
+router = APIRouter(prefix="/api/uw-flow", tags=["uw-flow"])
+
+
+def _check_date(value: str | None) -> None:
+    if value is None:
+        return
+    try:
+        _date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="date must be YYYY-MM-DD")
+
+
+@router.get("")
+def get_flow(
+    since: int | None = Query(None, description="Return rows with id greater than this"),
+    limit: int = Query(500, ge=1, le=1000),
+    ticker: str | None = None,
+):
+    from api.uw_flow_ingest import get_flow_since
+    return get_flow_since(since, limit=limit, ticker=ticker)
+
+
+@router.get("/aggregates")
+def get_aggregates(date: str | None = None, top: int = Query(25, ge=1, le=200)):
+    from api.uw_flow_ingest import get_aggregates as _aggregates
+    _check_date(date)
+    return _aggregates(date, top=top)
+
+
+@router.get("/sessions")
+def get_sessions(limit: int = Query(30, ge=1, le=365)):
+    from api.uw_flow_ingest import list_sessions
+    return {"sessions": list_sessions(limit)}
+
+
+@router.get("/history")
+def get_history(
+    date: str,
+    ticker: str | None = None,
+    limit: int = Query(500, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+):
+    from api.uw_flow_ingest import get_session
+    _check_date(date)
+    return get_session(date, ticker=ticker, limit=limit, offset=offset)
@@ -1,13 +1,11 @@
 // app/src/components/MoversSidebar.jsx
 import { useState } from 'react'
-import useMobileSWR from '../hooks/useMobileSWR'
+import useMarketStream from '../hooks/useMarketStream'
 import TickerPopup from './TickerPopup'
 import ErrorState from './ErrorState'
 import { SkeletonTable } from './Skeleton'
 import styles from './MoversSidebar.module.css'
 
-const fetcher = url => fetch(url).then(r => r.json())
-
 function MoverSection({ label, items, positive }) {
   return (
     <div className={styles.section}>
@@ -33,11 +31,7 @@ function MoverSection({ label, items, positive }) {
 export default function MoversSidebar({ data: propData }) {
   const [open, setOpen] = useState(true)
 
-  const { data: fetched, error, mutate } = useMobileSWR(
-    propData !== undefined ? null : '/api/movers',
-    fetcher,
-    { refreshInterval: 30000, marketHoursOnly: true }
-  )
+  const { data: fetched, error, refresh } = useMarketStream('movers', { enabled: propData === undefined })
   const data = propData !== undefined ? propData : fetched
 
   return (
@@ -49,7 +43,7 @@ export default function MoversSidebar({ data: propData }) {
       {open && (
         <div className={styles.body}>
           {error ? (
-            <ErrorState compact message="Failed to load movers" onRetry={() => mutate()} />
+            <ErrorState compact message="Failed to load movers" onRetry={() => refresh()} />
           ) : !data ? (
             <SkeletonTable rows={6} cols={2} />
           ) : (
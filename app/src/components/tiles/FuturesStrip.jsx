@@ -1,6 +1,6 @@
 // app/src/components/tiles/FuturesStrip.jsx
 import { useMemo } from 'react'
-import useSWR from 'swr'
+import useMarketStream from '../../hooks/useMarketStream'
 import styles from './FuturesStrip.module.css'
 import TickerPopup from '../TickerPopup'
 
@@ -420,8 +420,6 @@ function QuoteOfTheDay() {
   )
 }
 
-const fetcher = url => fetch(url).then(r => r.json())
-
 // Display order: 2 rows of 3
 const ORDER = ['QQQ', 'SPY', 'IWM', 'DIA', 'BTC', 'VIX']
 
@@ -553,11 +551,7 @@ function Cell({ sym, price, chg, css }) {
 }
 
 export default function FuturesStrip({ data: propData }) {
-  const { data: fetched } = useSWR(
-    propData !== undefined ? null : '/api/snapshot',
-    fetcher,
-    { refreshInterval: 10000 }
-  )
+  const { data: fetched } = useMarketStream('snapshot', { enabled: propData === undefined })
   const data = propData !== undefined ? propData : fetched
 
   if (!data) {
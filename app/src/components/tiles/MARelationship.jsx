@@ -1,10 +1,8 @@
 // app/src/components/tiles/MARelationship.jsx
 // SPY + QQQ price relationship to 9EMA, 20EMA, 50SMA, 200SMA
-import useMobileSWR from '../../hooks/useMobileSWR'
+import useMarketStream from '../../hooks/useMarketStream'
 import styles from './MARelationship.module.css'
 
-const fetcher = url => fetch(url).then(r => r.json())
-
 const ROW1 = [
   { key: 'ema9_pct',  label: '9EMA' },
   { key: 'ema20_pct', label: '20EMA' },
@@ -57,10 +55,9 @@ function TickerCol({ ticker, data, livePrice, chg, chgCss }) {
 }
 
 export default function MARelationship({ maData }) {
+  const { data: snapData } = useMarketStream('snapshot')
   if (!maData || (!maData.spy && !maData.qqq)) return null
 
-  const { data: snapData } = useMobileSWR('/api/snapshot', fetcher, { refreshInterval: 15000 })
-
   return (
     <div className={styles.wrap}>
       <div className={styles.cols}>
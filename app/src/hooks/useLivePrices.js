@@ -1,26 +1,56 @@
+import { useEffect, useState } from 'react'
 import useMobileSWR from './useMobileSWR'
 
 const fetcher = url => fetch(url).then(r => r.json())
 
 /**
- * Fetch live prices for a list of tickers.
+ * Live prices for a list of tickers.
  * Returns { prices, isLoading, error, refresh }
  * where prices = { AAPL: { price: 195.23, change_pct: 1.45 }, ... }
+ *
+ * Streams from /api/live-prices/stream (SSE — the server pushes only changed prices and
+ * the browser resumes with Last-Event-ID on reconnect). Falls back to 15s polling when
+ * EventSource is unavailable or the stream keeps failing.
  */
 export default function useLivePrices(tickers = []) {
-  // Sort and dedupe tickers for stable cache key
-  const key = tickers.length > 0
-    ? `/api/live-prices?tickers=${[...new Set(tickers)].sort().join(',')}`
-    : null  // null key = don't fetch
+  // Sort and dedupe tickers for a stable key
+  const list = tickers.length > 0 ? [...new Set(tickers)].sort().join(',') : ''
+  const [streamed, setStreamed] = useState({})
+  const [streamFailed, setStreamFailed] = useState(typeof EventSource === 'undefined')
 
+  useEffect(() => {
+    setStreamed({})
+    if (!list || streamFailed) return undefined
+    const es = new EventSource(`/api/live-prices/stream?tickers=${list}`)
+    let errors = 0
+    es.addEventListener('prices', e => {
+      errors = 0
+      const msg = JSON.parse(e.data)
+      setStreamed(prev => ({ ...prev, ...msg.prices }))
+    })
+    es.onerror = () => {
+      errors += 1
+      if (errors >= 3) {
+        es.close()
+        setStreamFailed(true)
+      }
+    }
+    return () => es.close()
+  }, [list, streamFailed])
+
+  // Polling fallback — null key = don't fetch
+  const key = list && streamFailed ? `/api/live-prices?tickers=${list}` : null
   const { data, error, isLoading, mutate } = useMobileSWR(key, fetcher, {
     refreshInterval: 15000,  // 15s (will be 30s on mobile via useMobileSWR)
   })
 
+  if (streamFailed) {
+    return { prices: data || {}, isLoading, error, refresh: mutate }
+  }
   return {
-    prices: data || {},
-    isLoading,
-    error,
-    refresh: mutate,
+    prices: streamed,
+    isLoading: Boolean(list) && Object.keys(streamed).length === 0,
+    error: undefined,
+    refresh: () => setStreamFailed(false),
   }
 }
@@ -0,0 +1,99 @@
+import { useEffect, useState } from 'react'
+import useMobileSWR from './useMobileSWR'
+
+const fetcher = url => fetch(url).then(r => r.json())
+
+// Polling fallback per channel: the REST endpoint the channel mirrors, and its old cadence
+const FALLBACK = {
+  snapshot: { url: '/api/snapshot', refreshInterval: 15000 },
+  movers: { url: '/api/movers', refreshInterval: 30000, marketHoursOnly: true },
+}
+const CHANNELS = Object.keys(FALLBACK)
+
+// One EventSource shared by every mounted consumer, subscribed to the channels they use
+const counts = {}
+const latest = {}
+const listeners = new Set()
+let source = null
+let openFor = ''
+let syncQueued = false
+let failed = typeof EventSource === 'undefined'
+
+function notify() {
+  listeners.forEach(fn => fn())
+}
+
+function sync() {
+  syncQueued = false
+  const wanted = failed ? '' : CHANNELS.filter(c => counts[c] > 0).join(',')
+  if (wanted === openFor) return
+  if (source) source.close()
+  source = null
+  openFor = wanted
+  if (!wanted) return
+
+  const es = new EventSource(`/api/live-prices/stream?channels=${wanted}`)
+  let errors = 0
+  es.addEventListener('prices', e => {
+    errors = 0
+    const msg = JSON.parse(e.data)
+    CHANNELS.forEach(c => {
+      if (msg[c] !== undefined) latest[c] = msg[c]
+    })
+    notify()
+  })
+  es.onerror = () => {
+    errors += 1
+    if (errors >= 3) {
+      es.close()
+      source = null
+      openFor = ''
+      failed = true
+      notify()
+    }
+  }
+  source = es
+}
+
+function queueSync() {
+  // Consumers mounting in the same commit share one (re)connect
+  if (!syncQueued) {
+    syncQueued = true
+    queueMicrotask(sync)
+  }
+}
+
+/**
+ * Market-wide data pushed over /api/live-prices/stream.
+ * channel: 'snapshot' (FuturesStrip data, as /api/snapshot) or 'movers' (as /api/movers).
+ * Returns { data, error, refresh }.
+ *
+ * Every consumer shares one SSE connection. The server pushes a channel only when it
+ * changes. Falls back to polling the REST endpoint when EventSource is unavailable or
+ * the stream keeps failing. enabled=false (e.g. data passed in as a prop) subscribes to nothing.
+ */
+export default function useMarketStream(channel, { enabled = true } = {}) {
+  const [, setVersion] = useState(0)
+  const streaming = enabled && !failed
+
+  useEffect(() => {
+    if (!enabled) return undefined
+    const listener = () => setVersion(v => v + 1)
+    listeners.add(listener)
+    counts[channel] = (counts[channel] || 0) + 1
+    queueSync()
+    return () => {
+      listeners.delete(listener)
+      counts[channel] -= 1
+      queueSync()
+    }
+  }, [channel, enabled])
+
+  const { url, ...options } = FALLBACK[channel]
+  const { data, error, mutate } = useMobileSWR(enabled && !streaming ? url : null, fetcher, options)
+
+  if (!streaming) {
+    return { data, error, refresh: mutate }
+  }
+  return { data: latest[channel], error: undefined, refresh: () => {} }
+}
@@ -1,6 +1,7 @@
 import { useState } from 'react'
 import useSWR from 'swr'
 import TileCard from '../components/TileCard'
+import { useAuth } from '../context/AuthContext'
 import styles from './ModelBook.module.css'
 
 const fetcher = url => fetch(url).then(r => r.json())
@@ -62,12 +63,14 @@ function filterTrades(trades, sel) {
 }
 
 export default function ModelBook() {
+  const { user } = useAuth()
   const { data: trades, mutate } = useSWR('/api/trades', fetcher, { refreshInterval: 60000 })
   const [form, setForm] = useState(EMPTY_FORM)
   const [adding, setAdding] = useState(false)
   const [showForm, setShowForm] = useState(false)
   const [expandedYears, setExpandedYears] = useState({})
   const [selected, setSelected] = useState(null)
+  const [formError, setFormError] = useState(null)
 
   function toggleYear(year, e) {
     e.stopPropagation()
@@ -82,8 +85,9 @@ export default function ModelBook() {
   async function handleSubmit(e) {
     e.preventDefault()
     setAdding(true)
+    setFormError(null)
     try {
-      await fetch('/api/trades', {
+      const res = await fetch('/api/trades', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
@@ -97,6 +101,11 @@ export default function ModelBook() {
           date: form.date || new Date().toISOString().slice(0, 10),
         })
       })
+      if (!res.ok) {
+        const err = await res.json().catch(() => ({}))
+        setFormError(res.status === 401 ? 'Sign in to keep your own model book.' : err.detail || `Failed (${res.status})`)
+        return
+      }
       setForm(EMPTY_FORM)
       setShowForm(false)
       mutate()
@@ -105,6 +114,17 @@ export default function ModelBook() {
     }
   }
 
+  async function handleClose(trade) {
+    const price = parseFloat(window.prompt(`Exit price for ${trade.sym}?`, trade.entry))
+    if (!price) return
+    const res = await fetch(`/api/trades/${trade.id}/close`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ price }),
+    })
+    if (res.ok) mutate()
+  }
+
   const filtered = filterTrades(trades, selected)
 
   return (
@@ -137,6 +157,7 @@ export default function ModelBook() {
             </div>
             <input className={`${styles.input} ${styles.notesInput}`} placeholder="Notes (optional)" value={form.notes} onChange={e => setForm(f => ({...f, notes: e.target.value}))} />
             <button className={styles.submitBtn} type="submit" disabled={adding}>{adding ? 'Adding…' : 'Add Trade'}</button>
+            {formError && <p className={styles.noTrades}>{formError}</p>}
           </form>
         </TileCard>
       )}
@@ -214,6 +235,7 @@ export default function ModelBook() {
                         <th>Target</th>
                         <th>Size %</th>
                         <th>R:R</th>
+                        <th>P&amp;L</th>
                         <th>Status</th>
                       </tr>
                     </thead>
@@ -232,7 +254,17 @@ export default function ModelBook() {
                             <td className={styles.num} style={{color:'var(--gain)'}}>{trade.target}</td>
                             <td className={styles.num}>{trade.size_pct}%</td>
                             <td className={styles.num}>{rr}:1</td>
-                            <td><span className={trade.status === 'open' ? styles.open : styles.closed}>{trade.status}</span></td>
+                            <td className={styles.num} style={{color: trade.return_pct > 0 ? 'var(--gain)' : trade.return_pct < 0 ? 'var(--loss)' : undefined}}>
+                              {trade.return_pct != null ? `${trade.return_pct > 0 ? '+' : ''}${trade.return_pct}%` : '—'}
+                            </td>
+                            <td>
+                              <span className={trade.status === 'open' ? styles.open : styles.closed}>
+                                {trade.status === 'closed' && trade.exit_reason && trade.exit_reason !== 'manual' ? trade.exit_reason : trade.status}
+                              </span>
+                              {trade.status === 'open' && user && (
+                                <button className={styles.addBtn} onClick={() => handleClose(trade)}>Close</button>
+                              )}
+                            </td>
                           </tr>
                         )
                       })}
@@ -10,8 +10,17 @@ vi.mock('swr', () => ({
   }))
 }))
 
+const auth = vi.hoisted(() => ({ user: null }))
+vi.mock('../context/AuthContext', () => ({
+  useAuth: () => auth,
+}))
+
 import ModelBook from './ModelBook'
 
+afterEach(() => {
+  auth.user = null
+})
+
 test('renders model book heading', () => {
   render(<ModelBook />)
   expect(screen.getByText(/model book/i)).toBeInTheDocument()
@@ -26,3 +35,13 @@ test('renders add trade button', () => {
   render(<ModelBook />)
   expect(screen.getByText(/\+ add trade/i)).toBeInTheDocument()
 })
+
+test('close button is only shown to signed-in users', () => {
+  const { unmount } = render(<ModelBook />)
+  expect(screen.queryByText('Close')).not.toBeInTheDocument()
+  unmount()
+
+  auth.user = { id: 'u1', email: 'trader@example.com' }
+  render(<ModelBook />)
+  expect(screen.getByText('Close')).toBeInTheDocument()
+})
@@ -390,6 +390,90 @@ function ChartSettingsSection({ prefs, setPref }) {
   )
 }
 
+const ALERT_TYPE_LABELS = {
+  regime_change: 'Regime change',
+  exposure_shift: 'Exposure shift',
+  stop_hit: 'Stop hit',
+  scanner_match: 'Scanner match',
+  ep_resolved: 'Episodic pivot resolved',
+  stop_breach: 'Position stop breach',
+  paper_exit: 'Paper trade exit',
+  price_cross: 'Price alert rules',
+  rs_rank: 'RS rank rules',
+  breadth_change: 'Breadth rules',
+  gex_level: 'GEX level rules',
+  earnings_surprise: 'Earnings surprise rules',
+}
+
+function AlertSubscriptionsSection() {
+  const [subs, setSubs] = useState(null)
+  const [error, setError] = useState('')
+
+  useEffect(() => {
+    fetch('/api/alerts/subscriptions')
+      .then(r => r.ok ? r.json() : null)
+      .then(d => { if (d) setSubs(d) })
+      .catch(() => {})
+  }, [])
+
+  async function save(type, pref) {
+    const prev = subs
+    setSubs({ ...subs, [type]: pref })
+    setError('')
+    try {
+      const res = await fetch('/api/alerts/subscriptions', {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ [type]: pref }),
+      })
+      if (!res.ok) throw new Error()
+      setSubs(await res.json())
+    } catch {
+      setSubs(prev)
+      setError('Could not save alert preferences')
+    }
+  }
+
+  function toggleEmail(type, on) {
+    const pref = subs[type]
+    const channels = pref.channels.filter(c => c !== 'email')
+    save(type, { ...pref, channels: on ? [...channels, 'email'] : channels })
+  }
+
+  if (!subs) return null
+
+  return (
+    <TileCard title="Alert Notifications">
+      <div className={styles.section}>
+        <p className={styles.hint} style={{ marginBottom: 12 }}>
+          Choose which alerts you receive, and which are also sent by email.
+        </p>
+        {Object.entries(subs).map(([type, pref]) => (
+          <div key={type} className={styles.row}>
+            <span className={styles.rowLabel}>{ALERT_TYPE_LABELS[type] || type}</span>
+            <div className={styles.chartRow}>
+              <label className={styles.chartToggle}>
+                <input type="checkbox" checked={pref.enabled} onChange={e => save(type, { ...pref, enabled: e.target.checked })} />
+                <span>On</span>
+              </label>
+              <label className={styles.chartToggle}>
+                <input
+                  type="checkbox"
+                  checked={pref.channels.includes('email')}
+                  disabled={!pref.enabled}
+                  onChange={e => toggleEmail(type, e.target.checked)}
+                />
+                <span>Email</span>
+              </label>
+            </div>
+          </div>
+        ))}
+        {error && <span className={styles.error}>{error}</span>}
+      </div>
+    </TileCard>
+  )
+}
+
 function ReferralSection() {
   const [referral, setReferral] = useState(null)
   const [copied, setCopied] = useState(false)
@@ -786,6 +870,9 @@ export default function Settings() {
         {/* ── Chart Settings ── */}
         <ChartSettingsSection prefs={prefs} setPref={setPref} />
 
+        {/* ── Alert Notifications ── */}
+        <AlertSubscriptionsSection />
+
         {/* ── Data & Privacy ── */}
         <TileCard title="Data & Privacy">
           <div className={styles.section}>
@@ -4,8 +4,20 @@ import styles from './Traders.module.css'
 
 const fetcher = url => fetch(url).then(r => r.json())
 
+function fmtPct(v) {
+  if (v == null) return '—'
+  return `${v > 0 ? '+' : ''}${v.toFixed(1)}%`
+}
+
+function tone(v) {
+  if (v == null) return undefined
+  return v > 0 ? 'var(--gain)' : v < 0 ? 'var(--loss)' : undefined
+}
+
 export default function Traders() {
   const { data: traders } = useMobileSWR('/api/traders', fetcher, { refreshInterval: 60000 })
+  const { data: performance } = useMobileSWR('/api/traders/performance', fetcher, { refreshInterval: 300000 })
+  const perfById = Object.fromEntries((Array.isArray(performance) ? performance : []).map(p => [p.id, p]))
 
   return (
     <div className={styles.page}>
@@ -14,7 +26,15 @@ export default function Traders() {
         ? (
           <div className={styles.grid}>
             {traders.map(trader => (
-              <TileCard key={trader.name} title={trader.name}>
+              <TileCard key={trader.id || trader.name} title={trader.name}>
+                {perfById[trader.id] && (
+                  <div className={styles.stats}>
+                    <span>NAV <b style={{ color: tone(perfById[trader.id].return_pct) }}>{fmtPct(perfById[trader.id].return_pct)}</b></span>
+                    <span>vs SPY <b style={{ color: tone(perfById[trader.id].rs_vs_spy) }}>{fmtPct(perfById[trader.id].rs_vs_spy)}</b></span>
+                    <span>vs UCT20 <b style={{ color: tone(perfById[trader.id].rs_vs_uct20) }}>{fmtPct(perfById[trader.id].rs_vs_uct20)}</b></span>
+                    <span>Hit <b>{perfById[trader.id].hit_rate != null ? `${perfById[trader.id].hit_rate}%` : '—'}</b></span>
+                  </div>
+                )}
                 <div className={styles.tickers}>
                   {trader.tickers.map(sym => (
                     <a
@@ -24,10 +24,20 @@ export default function AISummary({ tradeId, aiSummary, onUpdated }) {
         throw new Error(errData.detail || errData.error || `Failed (${res.status})`)
       }
 
-      const data = await res.json()
+      let data = await res.json()
+      // Summaries are generated in the background — poll until the worker is done
+      for (let i = 0; i < 60 && data.status === 'pending'; i++) {
+        await new Promise(r => setTimeout(r, 3000))
+        const poll = await fetch(`/api/journal/${tradeId}/ai-summary`)
+        if (!poll.ok) throw new Error(`Failed (${poll.status})`)
+        data = await poll.json()
+      }
       if (data.error) {
         throw new Error(data.error)
       }
+      if (data.status === 'pending') {
+        throw new Error('Still generating — check back in a minute.')
+      }
 
       setLocalSummary(data.summary)
       if (onUpdated) onUpdated()
@@ -0,0 +1,124 @@
+"""
+Benchmark authenticated journal endpoints (requests/sec) against a throwaway auth.db.
+
+Runs every request through the real FastAPI app (session cookie → validate_session →
+service call) with N concurrent clients, once with the auth.db connection pool disabled
+and once with it enabled, and prints a before/after table.
+
+Usage: python scripts/bench_journal.py [--requests 2000] [--concurrency 16] [--trades 500]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+ENDPOINTS = [
+    "/api/journal?limit=50",
+    "/api/journal/stats",
+    "/api/journal/review-queue",
+    "/api/journal/analytics?group_by=setup",
+]
+
+
+def _seed(n_trades: int) -> str:
+    """Create a user, a session, and n_trades closed journal entries. Returns the session token."""
+    from api.services import auth_db, journal_rollups
+    from api.services.auth_service import create_user, create_session
+
+    auth_db.init_db()
+    user = create_user(f"bench-{uuid.uuid4().hex[:8]}@example.com", "bench-password")
+    token = create_session(user["id"])
+
+    setups = ["Breakout", "Pullback", "EP", "Base Breakout", "Short Squeeze"]
+    rows = []
+    start = date.today() - timedelta(days=n_trades)
+    for i in range(n_trades):
+        entry = round(random.uniform(20, 400), 2)
+        pnl_pct = round(random.uniform(-8, 15), 2)
+        d = (start + timedelta(days=i)).isoformat()
+        rows.append((
+            str(uuid.uuid4()), user["id"], random.choice(["NVDA", "AAPL", "TSLA", "AMD", "META"]),
+            "long", random.choice(setups), entry, round(entry * (1 + pnl_pct / 100), 2),
+            "closed", d, d, pnl_pct, round(pnl_pct * 10, 2), round(pnl_pct / 3, 2),
+        ))
+    conn = auth_db.get_connection()
+    try:
+        conn.executemany(
+            "INSERT INTO journal_entries (id, user_id, sym, direction, setup, entry_price, exit_price, "
+            "status, entry_date, exit_date, pnl_pct, pnl_dollar, realized_r) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        journal_rollups.rebuild_user(conn, user["id"])
+        conn.commit()
+    finally:
+        conn.close()
+    return token
+
+
+async def _run(app, token: str, n_requests: int, concurrency: int) -> tuple[float, list[float]]:
+    from httpx import AsyncClient, ASGITransport
+
+    latencies: list[float] = []
+    counter = iter(range(n_requests))
+
+    async def worker(client):
+        for i in counter:
+            path = ENDPOINTS[i % len(ENDPOINTS)]
+            t0 = time.perf_counter()
+            r = await client.get(path)
+            latencies.append(time.perf_counter() - t0)
+            if r.status_code != 200:
+                raise RuntimeError(f"{path} → {r.status_code}: {r.text[:200]}")
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://bench", cookies={"uct_session": token}
+    ) as client:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+    return elapsed, latencies
+
+
+def _pct(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--trades", type=int, default=500)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="uct-bench-")
+    os.environ["AUTH_DB_PATH"] = os.path.join(tmp, "auth.db")
+
+    from api.services import auth_db
+    from api.main import app
+
+    token = _seed(args.trades)
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, {args.trades} trades")
+    print(f"{'mode':<12}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'conns opened':>15}")
+    for label, pool_size in (("no pool", 0), ("pooled", max(args.concurrency, 8))):
+        auth_db.close_pool()
+        auth_db._pool = auth_db._ConnectionPool(pool_size)
+        elapsed, lat = asyncio.run(_run(app, token, args.requests, args.concurrency))
+        stats = auth_db.pool_stats()
+        print(f"{label:<12}{args.requests / elapsed:>10.1f}{_pct(lat, 0.5):>10.2f}"
+              f"{_pct(lat, 0.95):>10.2f}{stats['created']:>15}")
+    auth_db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
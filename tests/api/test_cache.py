@@ -22,3 +22,65 @@ def test_overwrite_key():
     c.set("key", {"v": 1}, ttl=10)
     c.set("key", {"v": 2}, ttl=10)
     assert c.get("key") == {"v": 2}
+
+
+# ─── SQLiteCache (shared across workers) ─────────────────────────────────────
+
+from api.services.cache import SQLiteCache
+
+
+def _pair(tmp_path):
+    path = str(tmp_path / "cache.db")
+    return SQLiteCache(path), SQLiteCache(path)
+
+
+def test_sqlite_value_visible_to_other_worker(tmp_path):
+    a, b = _pair(tmp_path)
+    a.set("wire_data", {"v": 1}, ttl=10)
+    assert b.get("wire_data") == {"v": 1}
+    a.set("wire_data", {"v": 2}, ttl=10)
+    assert b.get("wire_data") == {"v": 2}
+
+
+def test_sqlite_invalidate_reaches_other_worker(tmp_path):
+    a, b = _pair(tmp_path)
+    a.set("snapshot", [1, 2], ttl=10)
+    assert b.get("snapshot") == [1, 2]  # now memoized in b
+    a.invalidate("snapshot")
+    assert b.get("snapshot") is None
+
+
+def test_sqlite_expiry(tmp_path):
+    a, b = _pair(tmp_path)
+    a.set("key", "x", ttl=0.01)
+    time.sleep(0.02)
+    assert a.get("key") is None
+    assert b.get("key") is None
+
+
+def test_sqlite_update_does_not_lose_writes(tmp_path):
+    import threading
+
+    path = str(tmp_path / "cache.db")
+    workers = [SQLiteCache(path) for _ in range(4)]
+
+    def append(c, n):
+        for i in range(25):
+            c.update("alerts", lambda xs: [*(xs or []), (n, i)], ttl=60)
+
+    threads = [threading.Thread(target=append, args=(c, n)) for n, c in enumerate(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(SQLiteCache(path).get("alerts")) == 100
+
+
+def test_sqlite_unpicklable_value_stays_local(tmp_path):
+    import threading
+
+    a, b = _pair(tmp_path)
+    lock = threading.Lock()
+    a.set("lock", lock, ttl=10)
+    assert a.get("lock") is lock
+    assert b.get("lock") is None
@@ -5,7 +5,15 @@ from httpx import AsyncClient, ASGITransport
 from api.main import app
 
 
+@pytest.fixture
+def session_cookie(tmp_auth_db):
+    from api.services import auth_service
+    user = auth_service.create_user("modelbook@example.com", "password123")
+    return {"uct_session": auth_service.create_session(user["id"])}
+
+
 @pytest.mark.asyncio
+@pytest.mark.usefixtures("tmp_auth_db")
 async def test_trades_get_returns_list():
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
         r = await ac.get("/api/trades")
@@ -14,7 +22,7 @@ async def test_trades_get_returns_list():
 
 
 @pytest.mark.asyncio
-async def test_trades_post_adds_trade():
+async def test_trades_post_adds_trade(session_cookie):
     trade = {
         "sym": "NVDA",
         "entry": 850.0,
@@ -24,7 +32,10 @@ async def test_trades_post_adds_trade():
         "notes": "VCP breakout"
     }
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        anonymous = await ac.post("/api/trades", json=trade)
+        ac.cookies.update(session_cookie)
         r = await ac.post("/api/trades", json=trade)
+    assert anonymous.status_code == 401
     assert r.status_code == 200
     data = r.json()
     assert data["sym"] == "NVDA"
@@ -33,6 +44,7 @@ async def test_trades_post_adds_trade():
 
 
 @pytest.mark.asyncio
+@pytest.mark.usefixtures("tmp_auth_db")
 async def test_traders_returns_list():
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
         r = await ac.get("/api/traders")
@@ -0,0 +1,35 @@
+import pytest
+
+
+@pytest.fixture
+def tmp_auth_db(tmp_path, monkeypatch):
+    """Point auth.db at a fresh temp file with its own connection pool and empty caches."""
+    from api.services import auth_db, auth_service, event_buffer
+
+    monkeypatch.setattr(auth_db, "_DB_PATH", str(tmp_path / "auth.db"))
+    monkeypatch.setattr(auth_db, "_pool", auth_db._ConnectionPool(4))
+    auth_service.clear_auth_caches()
+    event_buffer.reset()
+    auth_db.init_db()
+    yield
+    auth_service.flush_pending_writes()
+    auth_service.clear_auth_caches()
+    event_buffer.reset()
+    auth_db.close_pool()
+
+
+@pytest.fixture
+def tmp_wire_store(tmp_path, monkeypatch):
+    """Point the wire_data history and volume copy at temp files; start with no wire_data."""
+    from api.services import wire_store
+    from api.services.cache import cache
+
+    monkeypatch.setattr(wire_store, "DB_PATH", str(tmp_path / "wire_history.db"))
+    monkeypatch.setattr(wire_store, "PERSISTENT_WIRE_DATA_FILE", str(tmp_path / "wire_data.json"))
+    monkeypatch.setattr(wire_store, "SECTION_RECOMPUTES", {})
+    monkeypatch.setattr("api.services.engine._load_wire_data", lambda: None)
+    cache.invalidate("wire_data")
+    cache.invalidate("wire_version")
+    yield wire_store
+    cache.invalidate("wire_data")
+    cache.invalidate("wire_version")
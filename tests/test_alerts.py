@@ -0,0 +1,198 @@
+"""Durable alerts: per-user read state, subscriptions, and incremental rule evaluation."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.services import alert_rules, alerts, auth_service
+
+
+@pytest.fixture
+def engine(tmp_auth_db):
+    alert_rules.reset_state()
+    yield alert_rules
+    alert_rules.reset_state()
+
+
+def _ids(feed):
+    return [a["id"] for a in feed]
+
+
+def test_read_state_is_per_user(tmp_auth_db):
+    first = alerts.alert_regime_change("Markup", "Distribution", 40)
+    second = alerts.alert_scanner_match("ANET", 88, "VCP")
+    assert _ids(alerts.get_alerts(user_id="a")) == [second["id"], first["id"]]
+
+    assert alerts.mark_read(first["id"], "a")
+    assert [a["read"] for a in alerts.get_alerts(user_id="a")] == [False, True]
+    assert not any(a["read"] for a in alerts.get_alerts(user_id="b"))
+    assert alerts.unread_count("a") == 1
+
+    assert alerts.mark_all_read("a") == 1
+    assert alerts.unread_count("a") == 0
+    alerts.alert_stop_hit("NVDA", 100.0, 94.0)
+    assert alerts.unread_count("a") == 1
+    assert alerts.unread_count("b") == 3
+
+
+def test_subscriptions_mute_broadcast_types(tmp_auth_db):
+    alerts.alert_scanner_match("ANET", 88, "VCP")
+    alerts.alert_stop_hit("NVDA", 100.0, 94.0)
+    alerts.set_subscriptions("a", {"scanner_match": {"enabled": False}})
+    assert [a["type"] for a in alerts.get_alerts(user_id="a")] == ["stop_hit"]
+    assert alerts.get_subscriptions("a")["scanner_match"]["enabled"] is False
+    assert set(alerts.POSITION_TYPES) <= set(alerts.get_subscriptions("a"))   # listed in Settings too
+    with pytest.raises(ValueError):
+        alerts.set_subscriptions("a", {"nope": {"enabled": True}})
+
+
+def test_channels_choose_email_and_the_feed(tmp_auth_db, monkeypatch):
+    from api.services import email_service
+
+    sent = []
+    monkeypatch.setattr(email_service, "send_email",
+                        lambda to, subject, html, dedup_key=None: sent.append((to, dedup_key)) or True)
+    user = auth_service.create_user("channels@example.com", "password123")["id"]
+    prefs = alerts.set_subscriptions(user, {
+        "scanner_match": {"enabled": True, "channels": ["email"]},
+        "stop_hit": {"enabled": True, "channels": ["in_app", "email", "discord"]},
+    })
+    assert prefs["stop_hit"]["channels"] == ["in_app", "email"]
+
+    scan = alerts.alert_scanner_match("ANET", 88, "VCP")
+    stop = alerts.alert_stop_hit("NVDA", 100.0, 94.0)
+    alerts.alert_regime_change("Markup", "Distribution")
+    assert sent == [("channels@example.com", f"alert:{scan['id']}:{user}"),
+                    ("channels@example.com", f"alert:{stop['id']}:{user}")]
+    assert [a["type"] for a in alerts.get_alerts(user_id=user)] == ["regime_change", "stop_hit"]
+
+
+def test_price_cross_fires_once_for_owner_within_cooldown(engine):
+    engine.create_rule("a", "price_cross", "nvda", {"level": 150, "direction": "above"})
+    assert engine.on_prices({"NVDA": 140.0}) == 0  # baseline
+    assert engine.on_prices({"NVDA": 145.0}) == 0
+    assert engine.on_prices({"NVDA": 151.0}) == 1
+    assert engine.on_prices({"NVDA": 149.0}) == 0
+    assert engine.on_prices({"NVDA": 152.0}) == 0  # cooldown
+
+    [alert] = alerts.get_alerts(user_id="a")
+    assert alert["type"] == "price_cross" and alert["personal"]
+    assert "crossed above $150.00" in alert["message"]
+    assert alerts.get_alerts(user_id="b") == []
+    assert alerts.get_alerts() == []
+
+
+def test_market_rules_job_only_runs_in_the_regular_session(engine, monkeypatch):
+    from api.services import massive, price_stream
+
+    fetched = []
+    monkeypatch.setattr(price_stream, "fetch_quotes", lambda tickers: fetched.append(tickers) or {})
+    engine.create_rule("a", "price_cross", "NVDA", {"level": 150})
+    monkeypatch.setattr(massive, "_detect_session", lambda: "post_market")
+    assert engine.evaluate_market_rules() == 0 and fetched == []
+    monkeypatch.setattr(massive, "_detect_session", lambda: "regular")
+    engine.evaluate_market_rules()
+    assert fetched == [["NVDA"]]
+
+
+def test_only_changed_subjects_reach_their_rules(engine, monkeypatch):
+    engine.create_rule("a", "price_cross", "NVDA", {"level": 150}, cooldown_seconds=0)
+    engine.create_rule("a", "price_cross", "AMD", {"level": 100}, cooldown_seconds=0)
+    calls = []
+    real = engine._CONDITIONS["price_cross"]
+    monkeypatch.setitem(engine._CONDITIONS, "price_cross",
+                        lambda s, p, prev, cur: calls.append(s) or real(s, p, prev, cur))
+
+    engine.on_prices({"NVDA": 140.0, "AMD": 90.0, "TSLA": 200.0})
+    calls.clear()
+    engine.on_prices({"NVDA": 140.0, "AMD": 101.0, "TSLA": 201.0})
+    assert calls == ["AMD"]
+    assert engine.subjects("price_cross") == ["AMD", "NVDA"]
+
+
+def test_breadth_rsrank_and_gex_rules(engine):
+    engine.create_rule("a", "breadth_change", None, {"min_change": 10})
+    engine.create_rule("a", "rs_rank", "ANET", {"threshold": 90})
+    engine.create_rule("a", "gex_level", "SPY", {"level": "zero_gamma", "direction": "below"})
+
+    engine.on_breadth(60)
+    assert engine.on_breadth(48) == 1
+    engine.on_rs_ranks({"ANET": 85})
+    assert engine.on_rs_ranks({"ANET": 93}) == 1
+    gex = {"spot": 505.0, "zeroGamma": 500.0, "callWall": {"strike": 520}, "putWall": {"strike": 490}}
+    engine.on_gex("SPY", gex)
+    assert engine.on_gex("SPY", {**gex, "spot": 498.0}) == 1
+    assert sorted(a["type"] for a in alerts.get_alerts(user_id="a")) == ["breadth_change", "gex_level", "rs_rank"]
+
+
+def test_earnings_alert_is_deduped_per_report_across_restarts(engine):
+    engine.create_rule("a", "earnings_surprise", None, {"min_surprise_pct": 10, "direction": "beat"})
+    data = {"bmo": [{"sym": "CRWD", "surprise_pct": "+18.2%", "date": "2026-03-04"},
+                    {"sym": "ZS", "surprise_pct": "-12.0%", "date": "2026-03-04"}],
+            "amc": [{"sym": "MDB", "surprise_pct": "+4.0%", "date": "2026-03-04"}]}
+    assert engine.on_earnings(data) == 1
+    engine.reset_state()  # another worker / a restart sees the same report
+    assert engine.on_earnings(data) == 0
+    [alert] = alerts.get_alerts(user_id="a")
+    assert alert["data"]["subject"] == "CRWD"
+
+
+def test_rule_validation(engine):
+    with pytest.raises(ValueError):
+        engine.create_rule("a", "price_cross", None, {"level": 10})
+    with pytest.raises(ValueError):
+        engine.create_rule("a", "gex_level", "SPY", {"level": "moon"})
+    with pytest.raises(ValueError):
+        engine.create_rule("a", "volume_spike", "SPY", {})
+
+
+def test_rule_endpoints_are_scoped_to_the_user(engine):
+    from api.main import app
+
+    client = TestClient(app)
+    owner = auth_service.create_user("owner@example.com", "password123")
+    other = auth_service.create_user("other@example.com", "password123")
+    client.cookies.set("uct_session", auth_service.create_session(owner["id"]))
+    resp = client.post("/api/alerts/rules", json={"kind": "price_cross", "ticker": "NVDA", "params": {"level": 150}})
+    assert resp.status_code == 200
+    rule_id = resp.json()["id"]
+    assert client.post("/api/alerts/rules", json={"kind": "price_cross", "params": {}}).status_code == 400
+    assert client.patch(f"/api/alerts/rules/{rule_id}", json={"enabled": False}).json()["enabled"] is False
+
+    client.cookies.set("uct_session", auth_service.create_session(other["id"]))
+    assert client.get("/api/alerts/rules").json()["rules"] == []
+    assert client.delete(f"/api/alerts/rules/{rule_id}").status_code == 404
+
+
+def test_muted_rule_does_not_start_its_cooldown(engine):
+    engine.create_rule("a", "price_cross", "NVDA", {"level": 150, "direction": "above"})
+    alerts.set_subscriptions("a", {"price_cross": {"enabled": False}})
+    engine.on_prices({"NVDA": 140.0})
+    assert engine.on_prices({"NVDA": 151.0}) == 0
+    assert engine.list_rules("a")[0]["last_fired_at"] is None
+
+    alerts.set_subscriptions("a", {"price_cross": {"enabled": True}})
+    engine.on_prices({"NVDA": 149.0})
+    assert engine.on_prices({"NVDA": 152.0}) == 1
+
+
+def test_malformed_subscription_prefs_are_a_400(engine):
+    from api.main import app
+
+    client = TestClient(app)
+    user = auth_service.create_user("prefs@example.com", "password123")
+    client.cookies.set("uct_session", auth_service.create_session(user["id"]))
+    for body in ({"price_cross": True}, {"price_cross": {"channels": "email"}}):
+        assert client.put("/api/alerts/subscriptions", json=body).status_code == 400
+
+
+def test_deleted_user_rules_stop_firing(engine):
+    from api.routers import auth as auth_router
+
+    user = auth_service.create_user("gone@example.com", "password123")["id"]
+    engine.create_rule(user, "price_cross", "NVDA", {"level": 150, "direction": "above"})
+    alerts.set_subscriptions(user, {"stop_hit": {"enabled": False}})
+    engine.on_prices({"NVDA": 140.0})
+
+    auth_router.admin_delete_user_by_id(user, user={"id": "admin", "role": "admin"})
+    assert engine.on_prices({"NVDA": 151.0}) == 0
+    assert engine.list_rules(user) == [] and alerts.get_subscriptions(user)["stop_hit"]["enabled"] is True
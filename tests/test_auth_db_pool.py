@@ -0,0 +1,81 @@
+import threading
+
+from api.services import auth_db
+
+
+def test_close_returns_connection_to_pool(tmp_auth_db):
+    conn = auth_db.get_connection()
+    conn.close()
+    again = auth_db.get_connection()
+    assert again is conn
+    again.close()
+    assert auth_db.pool_stats()["created"] == 1
+
+
+def test_double_close_does_not_duplicate(tmp_auth_db):
+    conn = auth_db.get_connection()
+    conn.close()
+    conn.close()
+    assert auth_db.pool_stats()["idle"] == 1
+
+
+def test_uncommitted_work_rolled_back_on_release(tmp_auth_db):
+    conn = auth_db.get_connection()
+    conn.execute("INSERT INTO feedback (id, message) VALUES ('fb1', 'hello')")
+    conn.close()
+    conn = auth_db.get_connection()
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM feedback").fetchone()[0] == 0
+    finally:
+        conn.close()
+
+
+def test_pragmas_and_row_factory_persist(tmp_auth_db):
+    conn = auth_db.get_connection()
+    conn.close()
+    conn = auth_db.get_connection()
+    try:
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+        row = conn.execute("SELECT 1 AS one").fetchone()
+        assert row["one"] == 1
+    finally:
+        conn.close()
+
+
+def test_pool_size_caps_idle_connections(tmp_auth_db):
+    conns = [auth_db.get_connection() for _ in range(6)]
+    for c in conns:
+        c.close()
+    assert auth_db.pool_stats()["idle"] == 4
+
+
+def test_concurrent_threads_share_pool(tmp_auth_db):
+    errors = []
+
+    def work(i):
+        try:
+            for j in range(20):
+                conn = auth_db.get_connection()
+                try:
+                    conn.execute(
+                        "INSERT INTO feedback (id, message) VALUES (?, 'x')", (f"{i}-{j}",)
+                    )
+                    conn.commit()
+                finally:
+                    conn.close()
+        except Exception as e:  # pragma: no cover - surfaced by assert below
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    conn = auth_db.get_connection()
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM feedback").fetchone()[0] == 160
+    finally:
+        conn.close()
+    assert auth_db.pool_stats()["created"] <= 8
@@ -0,0 +1,109 @@
+from datetime import date, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.services import bar_store
+
+
+def _daily(n, start=date(2025, 1, 6), close=100.0):
+    return [
+        {"t": (start + timedelta(days=i)).isoformat(), "o": close, "h": close + 1,
+         "l": close - 1, "c": close + i, "v": 10}
+        for i in range(n)
+    ]
+
+
+class _Upstream:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def __call__(self, ticker, max_bars):
+        self.calls.append(max_bars)
+        return self.rows[-max_bars:]
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    bar_store.clear()
+    up = _Upstream(_daily(60))
+    monkeypatch.setattr(bar_store, "_fetch_daily", up)
+    monkeypatch.setattr(bar_store, "DEFAULT_DEPTH", {**bar_store.DEFAULT_DEPTH, "D": 20})
+    yield up
+    bar_store.clear()
+
+
+def test_one_canonical_series_serves_every_count(upstream):
+    assert len(bar_store.get_series("nvda", "D", 5)["t"]) == 5
+    assert len(bar_store.get_series("NVDA", "D", 20)["t"]) == 20
+    assert upstream.calls == [20]
+    # Deeper than the canonical series → one deeper refetch, then shared again.
+    assert len(bar_store.get_series("NVDA", "D", 50)["t"]) == 50
+    assert len(bar_store.get_series("NVDA", "D", 10)["t"]) == 10
+    assert upstream.calls == [20, 50]
+    # Upstream ran out: asking for more never refetches.
+    assert len(bar_store.get_series("NVDA", "D", 500)["t"]) == 60
+    assert len(bar_store.get_series("NVDA", "D", 1000)["t"]) == 60
+    assert upstream.calls == [20, 50, 500]
+
+
+def test_expired_series_refreshes_only_the_tail(upstream):
+    bar_store.get_series("NVDA", "D", 20)
+    # Last bar moved and a new one printed.
+    rows = _daily(61)
+    rows[59] = dict(rows[59], c=999.0)
+    upstream.rows = rows
+    bar_store._series[("NVDA", "D")]["fresh_until"] = 0  # TTL elapsed
+    cols = bar_store.get_series("NVDA", "D", 20)
+    assert upstream.calls == [20, 10]
+    assert cols["t"][-1] == rows[60]["t"] and cols["c"][-2] == 999.0
+    assert len(cols["t"]) == 20 and cols["t"] == sorted(set(cols["t"]))
+
+
+def test_empty_results_are_cached_briefly(upstream):
+    upstream.rows = []
+    assert bar_store.get_series("NOPE", "D", 20)["t"] == []
+    assert bar_store.get_series("NOPE", "D", 20)["t"] == []
+    assert upstream.calls == [20]
+    series = bar_store._series[("NOPE", "D")]
+    assert series["fresh_until"] - bar_store.time.time() <= bar_store.NEGATIVE_TTL
+
+    upstream.rows = _daily(60)
+    series["fresh_until"] = 0   # negative TTL elapsed: a full fetch, not a tail merge
+    assert len(bar_store.get_series("NOPE", "D", 20)["t"]) == 20
+    assert upstream.calls == [20, 20]
+
+
+def test_since_returns_changed_and_new_tail(upstream):
+    cols = bar_store.get_series("NVDA", "D", 20)
+    tail = bar_store.since(cols, cols["t"][-2])
+    assert tail["t"] == cols["t"][-2:]
+    assert bar_store.since(cols, "2099-01-01")["t"] == []
+
+
+def test_weekly_is_resampled_from_daily(upstream):
+    weekly = bar_store.get_series("NVDA", "W", 3)
+    assert upstream.calls == [20]
+    # 2025-01-06 is a Monday; each ISO week groups seven daily rows.
+    assert weekly["t"] == ["2025-02-17", "2025-02-24", "2025-03-03"]
+    assert weekly["v"] == [70, 70, 40]  # data ends on Thursday 2025-03-06
+    assert weekly["o"][0] == 100.0 and weekly["c"][0] == 100.0 + 48
+
+
+def test_binary_round_trip_and_endpoint_formats(upstream):
+    cols = bar_store.get_series("NVDA", "D", 5)
+    assert bar_store.decode_binary(bar_store.encode_binary(cols, "D")) == {
+        k: [float(x) for x in v] if k != "t" else v for k, v in cols.items()
+    }
+
+    from api.main import app
+    client = TestClient(app)
+    rows = client.get("/api/bars/NVDA?tf=D&bars=3").json()
+    assert [b["t"] for b in rows["bars"]] == cols["t"][-3:]
+    columnar = client.get(f"/api/bars/NVDA?tf=D&bars=3&format=columnar&since={cols['t'][-1]}").json()
+    assert columnar["t"] == cols["t"][-1:] and columnar["c"] == cols["c"][-1:]
+    binary = client.get("/api/bars/NVDA?tf=D&bars=3&format=binary")
+    assert binary.headers["content-type"] == "application/octet-stream"
+    assert bar_store.decode_binary(binary.content)["t"] == cols["t"][-3:]
+    assert client.get("/api/bars/NVDA?tf=5&since=yesterday").status_code == 400
@@ -0,0 +1,100 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from api.services import chart_render
+from api.services.cache import cache
+
+
+def _bars(last_close=120.5, n=30):
+    idx = pd.date_range("2026-01-01", periods=n, freq="D")
+    close = np.linspace(100, last_close, n)
+    return pd.DataFrame(
+        {"Open": close - 0.5, "High": close + 1, "Low": close - 1, "Close": close, "Volume": 1000},
+        index=idx,
+    )
+
+
+@pytest.fixture
+def charts(tmp_path, monkeypatch):
+    monkeypatch.setattr(chart_render, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(chart_render, "_disk", {"scanned": False, "bytes": 0})
+    monkeypatch.setattr(chart_render, "_executor", ThreadPoolExecutor(1))
+    renders = []
+    monkeypatch.setattr(chart_render, "_render_png", lambda df: renders.append(len(df)) or b"\x89PNG" + b"x" * 100)
+    bars = {"NVDA": _bars()}
+    monkeypatch.setattr(chart_render, "_fetch_bars", lambda t, tf: bars.get(t, pd.DataFrame()))
+    for t in ("NVDA", "NONE"):
+        cache.invalidate(f"chart_bars_{t}_D")
+    yield bars, renders
+    chart_render.shutdown()
+
+
+def test_identical_chart_renders_once(charts):
+    bars, renders = charts
+    key = chart_render.get_chart("nvda", "D")
+    assert chart_render.get_chart("NVDA", "D") == key
+    assert renders == [30]
+    assert os.path.exists(chart_render.image_path(key))
+
+    # A moved last bar is a different chart.
+    cache.invalidate("chart_bars_NVDA_D")
+    bars["NVDA"] = _bars(last_close=121.0)
+    assert chart_render.get_chart("NVDA", "D") != key
+    assert len(renders) == 2
+    assert chart_render.get_chart("NONE", "D") is None
+
+
+def test_lru_eviction_keeps_recently_served(charts, monkeypatch):
+    monkeypatch.setattr(chart_render, "MAX_CACHE_BYTES", 250)
+    keys = [f"{i:032x}" for i in range(3)]
+    for i, key in enumerate(keys):
+        chart_render._store(key, b"x" * 100)
+        os.utime(chart_render.image_path(key), (1000 + i, 1000 + i))
+        if i == 1:
+            chart_render.cached_image(keys[0])  # touch the oldest
+    assert chart_render.cached_image(keys[0]) is not None
+    assert chart_render.cached_image(keys[1]) is None
+    assert chart_render.get_stats()["cache_bytes"] <= 250
+
+    # Overwriting an image counts only the size difference
+    before = chart_render.get_stats()["cache_bytes"]
+    chart_render._store(keys[0], b"x" * 60)
+    assert chart_render.get_stats()["cache_bytes"] == before - 40
+
+
+def test_full_queue_refuses_new_renders(charts, monkeypatch):
+    monkeypatch.setattr(chart_render, "MAX_QUEUE", 0)
+    with pytest.raises(chart_render.ChartBusy):
+        chart_render.get_chart("NVDA", "D")
+
+    from api.main import app
+    r = TestClient(app).get("/api/chart/NVDA?tf=D")
+    assert r.status_code == 503 and r.headers["retry-after"] == "2"
+
+
+def test_endpoints_send_etag_and_immutable_headers(charts):
+    from api.main import app
+
+    client = TestClient(app)
+    r = client.get("/api/chart/NVDA?tf=D")
+    assert r.status_code == 200 and r.content.startswith(b"\x89PNG")
+    etag, location = r.headers["etag"], r.headers["content-location"]
+    assert client.get("/api/chart/NVDA?tf=D", headers={"If-None-Match": etag}).status_code == 304
+
+    img = client.get(location)
+    assert img.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert img.headers["etag"] == etag
+    assert client.get(location, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/chart/img/not-a-key.png").status_code == 404
+
+
+def test_prerender_counts_only_new_renders(charts, monkeypatch):
+    _, renders = charts
+    assert chart_render.prerender(["NVDA", "NONE"]) == 1
+    assert chart_render.prerender(["NVDA"]) == 0
+    assert renders == [30]
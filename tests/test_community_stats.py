@@ -0,0 +1,103 @@
+"""Community stats: incremental cross-user rollups, time windows, complementary k-anonymity."""
+
+from datetime import date, timedelta
+
+import pytest
+
+from api.services import auth_db, auth_service, community_stats, journal_rollups, journal_service
+
+
+@pytest.fixture
+def traders(tmp_auth_db, monkeypatch):
+    monkeypatch.setattr(community_stats, "MIN_TRADERS", 3)
+    return [auth_service.create_user(f"t{i}@example.com", "password123")["id"] for i in range(4)]
+
+
+def _day(days_ago):
+    return (date.today() - timedelta(days=days_ago)).isoformat()
+
+
+def _trade(uid, exit_price, days_ago, **extra):
+    return journal_service.create_entry(uid, {
+        "sym": "NVDA", "entry_price": 100, "exit_price": exit_price, "status": "closed",
+        "entry_date": _day(days_ago), "exit_date": _day(days_ago), **extra,
+    })
+
+
+def test_setups_and_directions_suppressed_below_threshold(traders):
+    for uid in traders[:3]:
+        _trade(uid, 110, 1, setup="Breakout")
+        _trade(uid, 95, 2, setup="Breakout")
+        _trade(uid, 105, 2, setup="Pullback")
+    _trade(traders[3], 120, 1, setup="EP", direction="short")
+
+    stats = community_stats.get_stats()
+    assert stats["total_closed_trades"] == 10 and stats["unique_traders"] == 4
+    assert [s["setup"] for s in stats["setups"]] == ["Breakout"]
+    breakout = stats["setups"][0]
+    assert breakout["count"] == 6 and breakout["win_rate"] == 50.0 and breakout["profit_factor"] == 2.0
+    # EP and the short side come from a single trader. Hiding just them would let the
+    # total minus the shown buckets give them away, so Pullback and long go too.
+    assert stats["suppressed"] == {"setups": 2, "directions": 2}
+    assert stats["total_closed_trades"] - sum(s["count"] for s in stats["setups"]) == 4   # EP + Pullback
+    assert stats["direction_split"] == {"long": None, "short": None}
+    assert stats["recent_activity"] == 10
+
+
+def test_windows_count_traders_active_in_window(traders):
+    for uid in traders[:3]:
+        _trade(uid, 110, 40, setup="Breakout")
+    _trade(traders[0], 105, 3, setup="Breakout")
+
+    overall = community_stats.get_stats("all")
+    assert overall["total_closed_trades"] == 4
+    assert overall["recent_activity"] == 0   # last 7 days: one trader
+    week = community_stats.get_stats("7d")
+    # One trader in the last week: nothing is shown
+    assert week["unique_traders"] == 1 and week["community_win_rate"] == 0 and week["setups"] == []
+    with pytest.raises(ValueError):
+        community_stats.get_stats("1y")
+
+
+def test_edits_deletes_and_rebuilds_stay_consistent(traders):
+    trades = [_trade(uid, 110, 1, setup="Breakout") for uid in traders[:3]]
+    before = community_stats.get_stats()
+
+    journal_service.update_entry(traders[0], trades[0]["id"], {"setup": "EP"})
+    stats = community_stats.get_stats()
+    assert stats["setups"] == [] and stats["suppressed"]["setups"] == 2
+
+    journal_service.update_entry(traders[0], trades[0]["id"], {"setup": "Breakout"})
+    conn = auth_db.get_connection()
+    try:
+        journal_rollups.rebuild_user(conn, traders[1])
+        conn.commit()
+    finally:
+        conn.close()
+    assert community_stats.get_stats() == before
+
+    journal_service.delete_entry(traders[2], trades[2]["id"])
+    assert community_stats.get_stats()["unique_traders"] == 2
+    conn = auth_db.get_connection()
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM community_traders WHERE user_id = ?", (traders[2],)).fetchone()[0] == 0
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("by_email", [False, True])
+def test_deleted_user_drops_out_of_community_stats(traders, by_email):
+    from api.routers import auth as auth_router
+
+    for uid in traders[:3]:
+        _trade(uid, 110, 1, setup="Breakout")
+    assert community_stats.get_stats()["unique_traders"] == 3
+
+    admin = {"id": "admin", "email": "admin@example.com", "role": "admin"}
+    if by_email:
+        auth_router.admin_delete_user(auth_router.DeleteUserRequest(email="t2@example.com"), user=admin)
+    else:
+        auth_router.admin_delete_user_by_id(traders[2], user=admin)
+    stats = community_stats.get_stats()
+    assert stats["unique_traders"] == 2 and stats["total_closed_trades"] == 2
+    assert stats["setups"] == []   # two traders are below the threshold now
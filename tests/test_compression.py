@@ -0,0 +1,106 @@
+"""CompressionETagMiddleware: strong ETags, 304s and gzip above the size threshold."""
+
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from api.middleware.compression import CompressionETagMiddleware, etag_matches
+
+app = FastAPI(default_response_class=ORJSONResponse)
+app.add_middleware(CompressionETagMiddleware)
+
+BIG = {"themes": [{"ticker": f"T{i}", "1W": i * 0.5, "holdings": ["AAA", "BBB"]} for i in range(200)]}
+
+
+@app.get("/big")
+def big():
+    return BIG
+
+
+@app.get("/small")
+def small():
+    return {"ok": True}
+
+
+@app.get("/versioned")
+def versioned():
+    return Response(content=b"x" * 2000, media_type="text/plain", headers={"ETag": '"v42"'})
+
+
+@app.get("/stream")
+def stream():
+    return StreamingResponse(iter([b"data: 1\n\n", b"data: 2\n\n"]), media_type="text/event-stream")
+
+
+client = TestClient(app)
+
+
+def test_large_json_is_gzipped_with_encoding_specific_etag():
+    resp = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert resp.status_code == 200
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.headers["etag"].endswith('-gz"')
+    assert "Accept-Encoding" in resp.headers["vary"]
+    assert resp.headers["cache-control"] == "no-cache"
+    assert resp.json() == BIG
+    assert int(resp.headers["content-length"]) < len(resp.content) / 3
+
+
+def test_signed_in_responses_are_private():
+    resp = client.get("/small", headers={"Cookie": "theme=dark; uct_session=abc"})
+    assert resp.headers["cache-control"] == "private, no-cache"
+    resp = client.get("/small", headers={"Authorization": "Bearer abc"})
+    assert resp.headers["cache-control"] == "private, no-cache"
+    assert client.get("/small").headers["cache-control"] == "no-cache"
+
+
+def test_small_and_unaccepted_responses_are_not_compressed():
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    resp = client.get("/big", headers={"Accept-Encoding": "identity, gzip;q=0"})
+    assert "content-encoding" not in resp.headers
+    assert not resp.headers["etag"].endswith('-gz"')
+
+
+def test_if_none_match_returns_empty_304_for_any_representation():
+    gz = client.get("/big", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    plain = client.get("/big", headers={"Accept-Encoding": "identity"}).headers["etag"]
+    for tag in (gz, plain, f"W/{plain}"):
+        resp = client.get("/big", headers={"If-None-Match": tag, "Accept-Encoding": "gzip"})
+        assert resp.status_code == 304
+        assert resp.content == b""
+        assert resp.headers["etag"] == plain
+    assert client.get("/big", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_handler_etag_is_used_and_streams_pass_through():
+    resp = client.get("/versioned", headers={"If-None-Match": '"v42"'})
+    assert resp.status_code == 304
+    resp = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert resp.text == "data: 1\n\ndata: 2\n\n"
+    assert "etag" not in resp.headers and "content-encoding" not in resp.headers
+    assert etag_matches("*", '"anything"')
+
+
+def test_full_app_middleware_stack(monkeypatch):
+    from api import main
+    from api.services import price_stream
+    from api.services.cache import cache
+
+    tickers = [f"T{i}" for i in range(40)]
+    for t in tickers:
+        cache.invalidate(f"live_price_{t}")
+    monkeypatch.setattr(
+        price_stream, "fetch_quotes",
+        lambda ts: {t: {"price": 100.0, "change_pct": 1.25, "change": 1.25, "volume": 1000} for t in ts},
+    )
+    app_client = TestClient(main.app)
+    resp = app_client.get(f"/api/live-prices?tickers={','.join(tickers)}", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.headers["cache-control"] == "no-cache"
+    assert app_client.get(
+        f"/api/live-prices?tickers={','.join(tickers)}", headers={"If-None-Match": resp.headers["etag"]}
+    ).status_code == 304
+
+    monkeypatch.setattr(main, "_MAINTENANCE_MODE", True)
+    assert app_client.get("/api/live-prices?tickers=AAPL").status_code == 503
+    assert app_client.get("/api/maintenance").json() == {"maintenance": True}
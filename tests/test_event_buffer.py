@@ -0,0 +1,85 @@
+from api.services import auth_service, event_buffer
+from api.services.auth_db import get_connection
+
+
+def _user(email="events@example.com"):
+    return auth_service.create_user(email, "password123")
+
+
+def _count(sql, *params):
+    conn = get_connection()
+    try:
+        return conn.execute(sql, params).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_activity_is_buffered_until_flush(tmp_auth_db):
+    user = _user()
+    auth_service.log_activity(user["id"], "login", ip_address="1.2.3.4")
+    assert _count("SELECT COUNT(*) FROM activity_log") == 0
+    auth_service.flush_pending_writes()
+    history = auth_service.get_login_history(user["id"])
+    assert history[0]["ip_address"] == "1.2.3.4"
+
+
+def test_activity_for_deleted_user_does_not_block_batch(tmp_auth_db):
+    keep = _user("keep@example.com")
+    auth_service.log_activity("deleted-user-id", "login")
+    auth_service.log_activity(keep["id"], "login")
+    auth_service.flush_pending_writes()
+    assert _count("SELECT COUNT(*) FROM activity_log") == 1
+    assert event_buffer.get_stats()["buffered_activity"] == 0
+
+
+def test_buffer_full_drops_and_counts(tmp_auth_db, monkeypatch):
+    monkeypatch.setattr(event_buffer, "MAX_BUFFERED", 3)
+    monkeypatch.setattr(event_buffer, "FLUSH_HIGH_WATER", 100)
+    user = _user()
+    for i in range(5):
+        auth_service.log_page_view(user["id"], f"/page-{i}")
+    stats = event_buffer.get_stats()
+    assert stats["buffered_page_views"] == 3
+    assert stats["page_views_dropped"] == 2
+
+
+def test_high_water_flushes_inline(tmp_auth_db, monkeypatch):
+    monkeypatch.setattr(event_buffer, "FLUSH_HIGH_WATER", 3)
+    user = _user()
+    for i in range(3):
+        auth_service.log_page_view(user["id"], f"/page-{i}")
+    assert event_buffer.get_stats()["buffered_page_views"] == 0
+    assert _count("SELECT COUNT(*) FROM page_views") == 3
+
+
+def test_analytics_read_daily_rollup(tmp_auth_db):
+    a, b = _user("a@example.com"), _user("b@example.com")
+    auth_service.log_page_view(a["id"], "/dashboard")
+    auth_service.log_page_view(b["id"], "/dashboard")
+    auth_service.log_page_view(a["id"], "/journal")
+    auth_service.flush_pending_writes()
+
+    pages = {p["page"]: p for p in auth_service.get_page_analytics(days=7)}
+    assert pages["/dashboard"]["views"] == 2
+    assert pages["/dashboard"]["unique_users"] == 2
+    assert pages["/journal"]["views"] == 1
+
+    engagement = auth_service.get_user_engagement(a["id"])
+    assert engagement["total_page_views"] == 2
+    assert engagement["unique_pages"] == 2
+
+
+def test_rollup_rebuild_matches_incremental(tmp_auth_db):
+    user = _user()
+    for page in ("/a", "/b", "/c"):
+        auth_service.log_page_view(user["id"], page)
+    auth_service.flush_pending_writes()
+    before = auth_service.get_page_analytics(days=7)
+
+    conn = get_connection()
+    try:
+        event_buffer.rebuild_page_view_rollup(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    assert auth_service.get_page_analytics(days=7) == before
@@ -0,0 +1,133 @@
+"""Finnhub client against a local fake API: persistent cache, coalescing, token bucket, 429s, batches."""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from api.services import finnhub, insider
+
+
+class _FakeFinnhub:
+    """Answers GETs from `routes` (path → body); `replies` queues (status, headers) overrides."""
+
+    def __init__(self):
+        self.calls = []
+        self.routes = {}
+        self.replies = []
+        self.delay = 0.0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                path = url.path.removeprefix("/api/v1")
+                fake.calls.append((path, {k: v[0] for k, v in parse_qs(url.query).items()}))
+                time.sleep(fake.delay)
+                status, headers = fake.replies.pop(0) if fake.replies else (200, {})
+                data = json.dumps(fake.routes.get(path, {}) if status == 200 else {"error": "x"}).encode()
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    fake = _FakeFinnhub()
+    monkeypatch.setenv("FINNHUB_API_KEY", "test-key")
+    monkeypatch.setattr(finnhub, "BASE_URL", fake.url)
+    monkeypatch.setattr(finnhub, "DB_PATH", str(tmp_path / "finnhub_cache.db"))
+    monkeypatch.setattr(finnhub, "_bucket", finnhub._TokenBucket(per_minute=6000, burst=50))
+    monkeypatch.setattr(finnhub, "_stats", dict.fromkeys(finnhub._stats, 0))
+    yield fake
+    fake.server.shutdown()
+    fake.server.server_close()
+
+
+def test_concurrent_requests_share_one_call_and_cache_persists(api):
+    api.routes["/stock/recommendation"] = [{"buy": 10, "period": "2026-10-01"}]
+    api.delay = 0.2
+    with ThreadPoolExecutor(5) as pool:
+        results = list(pool.map(lambda _: finnhub.get("/stock/recommendation", {"symbol": "nvda"}), range(5)))
+    assert all(r == [{"buy": 10, "period": "2026-10-01"}] for r in results)
+    assert len(api.calls) == 1 and api.calls[0][1] == {"symbol": "NVDA", "token": "test-key"}
+    assert finnhub.stats()["coalesced"] == 4
+
+    # Later calls are served from the cache file: still no upstream call
+    finnhub.get("/stock/recommendation", {"symbol": "NVDA"})
+    assert len(api.calls) == 1 and finnhub.stats()["entries"] == 1
+
+
+def test_token_bucket_paces_batches_and_429_pauses(api, monkeypatch):
+    monkeypatch.setattr(finnhub, "_bucket", finnhub._TokenBucket(per_minute=600, burst=2))  # 10/s
+    api.routes["/stock/insider-transactions"] = {"data": []}
+    api.replies = [(429, {"Retry-After": "0.3"})]
+
+    started = time.monotonic()
+    results = finnhub.get_many([("/stock/insider-transactions", {"symbol": s}) for s in "ABCDE"])
+    elapsed = time.monotonic() - started
+    assert results == [{"data": []}] * 5
+    assert len(api.calls) == 6 and finnhub.stats()["throttled"] == 1
+    # 2 burst tokens, a 0.3s pause, then 10/s for the remaining 4 calls
+    assert elapsed >= 0.3 + 0.3
+
+
+def test_ttls_misses_and_stale_fallback(api):
+    period = (datetime.utcnow() - timedelta(days=100)).strftime("%Y-%m-%d")
+    api.routes["/stock/earnings"] = [{"period": period, "actual": 1.2, "estimate": 1.0}]
+    finnhub.get("/stock/earnings", {"symbol": "AAPL", "limit": 4})
+    # Kept until the next report is due (~116 days after the period), not a fixed TTL
+    assert 15 * 86400 < finnhub._earnings_ttl(api.routes["/stock/earnings"]) < 17 * 86400
+
+    api.replies = [(403, {})]
+    assert finnhub.get("/stock/price-target", {"symbol": "AAPL"}) is None
+    assert finnhub.get("/stock/price-target", {"symbol": "AAPL"}) is None   # miss cached
+    assert len(api.calls) == 2
+
+    # Expired response + upstream down → the stale response is served
+    finnhub.get("/company-news", {"symbol": "AAPL"}, ttl=0)
+    api.replies = [(500, {})] * (finnhub.MAX_RETRIES + 1)
+    assert finnhub.get("/company-news", {"symbol": "AAPL"}) == {}
+    assert finnhub.stats()["stale_served"] == 1
+
+    assert finnhub.invalidate("/stock/earnings", "aapl") == 1
+    finnhub.get("/stock/earnings", {"symbol": "AAPL", "limit": 4})
+    assert [c[0] for c in api.calls].count("/stock/earnings") == 2
+
+
+def test_insider_feed_scans_watchlist_as_one_batch(api, monkeypatch):
+    from api.services.cache import cache
+
+    cache.invalidate("insider_feed")
+    today = datetime.utcnow().strftime("%Y-%m-%d")
+    api.routes["/stock/insider-transactions"] = {"data": [
+        {"name": "CEO", "transactionCode": "P", "share": 1000, "transactionPrice": 50.0,
+         "transactionDate": today, "filingDate": today},
+        {"name": "CFO", "transactionCode": "A", "share": 500, "transactionPrice": 0, "transactionDate": today},
+    ]}
+    monkeypatch.setattr(insider, "_get_feed_tickers", lambda: ["AAA", "BBB", "CCC"])
+    for t in ("AAA", "BBB", "CCC"):
+        cache.invalidate(f"insider_{t}")
+
+    feed = insider.get_recent_insider_buys()
+    assert sorted(b["symbol"] for b in feed) == ["AAA", "BBB", "CCC"]
+    assert feed[0]["amount"] == 50000.0
+    assert insider.get_insider_activity("AAA")[0]["type"] == "buy"
+    assert len(api.calls) == 3
+    cache.invalidate("insider_feed")
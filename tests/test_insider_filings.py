@@ -0,0 +1,188 @@
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+
+FIXTURES = Path(__file__).parent / "fixtures" / "form4"
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    from api.services import insider_filings
+    from api.services.cache import cache
+
+    monkeypatch.setattr(insider_filings, "DB_PATH", str(tmp_path / "insider.db"))
+    monkeypatch.setattr(insider_filings, "_SEC_MIN_INTERVAL", 0)
+    yield insider_filings
+    cache.invalidate("wire_data")
+
+
+def test_parse_form4_fixtures(store):
+    doc = store.parse_form4((FIXTURES / "officer_buy.xml").read_text())
+    assert (doc["ticker"], doc["issuer_cik"]) == ("ACME", "1234567")
+    assert doc["owners"][0]["title"] == "Chief Executive Officer"
+    assert doc["owners"][0]["is_officer"] and not doc["owners"][0]["is_director"]
+    # Only the non-derivative table: the purchase plus the option exercise
+    assert [(t["code"], t["shares"], t["value"]) for t in doc["transactions"]] == [
+        ("P", 10000, 245000.0), ("M", 5000, 40000.0),
+    ]
+
+    # Full submission text: the XML is extracted from the SGML wrapper
+    doc = store.parse_form4((FIXTURES / "director_buy_submission.txt").read_text())
+    assert [o["cik"] for o in doc["owners"]] == ["1900002", "1900003"]
+    assert doc["owners"][0]["title"] == "Director"
+    first, second = doc["transactions"]
+    assert first["shares"] == 2000 and first["value"] == 50200.0 and not first["direct"]
+    assert second["price"] is None and second["value"] is None   # footnote-only price
+
+    doc = store.parse_form4((FIXTURES / "ten_pct_sale.xml").read_text())
+    owner, txn = doc["owners"][0], doc["transactions"][0]
+    assert owner["is_ten_pct"] and not owner["is_officer"] and owner["title"] == "10% Owner"
+    assert (txn["date"], txn["code"], txn["acquired"]) == ("2026-10-09", "S", False)
+
+    assert store.parse_form4("<html>not a filing</html>") is None
+
+
+def _feed(*entries):
+    body = "".join(
+        f"""<entry>
+          <title>4 - {name} ({cik:010d}) (Issuer)</title>
+          <link rel="alternate" href="https://www.sec.gov/Archives/edgar/data/{cik}/x-index.htm"/>
+          <updated>2026-10-15T16:05:12-04:00</updated>
+          <id>urn:tag:sec.gov,2008:accession-number={acc}</id>
+        </entry>
+        <entry>
+          <title>4 - Some Owner ({cik + 1:010d}) (Reporting)</title>
+          <id>urn:tag:sec.gov,2008:accession-number={acc}</id>
+        </entry>"""
+        for name, cik, acc in entries
+    )
+    return f'<?xml version="1.0"?><feed xmlns="http://www.w3.org/2005/Atom">{body}</feed>'
+
+
+def test_update_from_feed_is_incremental(store, monkeypatch):
+    from api.services import edgar
+    from api.services.cache import cache
+
+    cache.set("wire_data", {"cap_universe": ["ACME"]}, 3600)
+    monkeypatch.setattr(edgar, "_fetch_cik_ticker_map", lambda: {"1234567": "ACME", "765432": "BETA"})
+    pages = {
+        0: _feed(("Acme Robotics", 1234567, "0001900002-26-000031"),
+                 ("Beta Materials", 765432, "0001800009-26-000004")),
+        100: _feed(),
+    }
+    filing = (FIXTURES / "director_buy_submission.txt").read_text()
+    fetched = []
+
+    def fake_get(url):
+        fetched.append(url)
+        if "browse-edgar" in url:
+            return pages[int(url.split("start=")[1].split("&")[0])]
+        return filing
+
+    monkeypatch.setattr(store, "_sec_get", fake_get)
+
+    counts = store.update_from_feed()
+    assert counts["stored"] == 1 and counts["skipped"] == 1   # BETA isn't in the universe
+    archive = [u for u in fetched if "Archives" in u]
+    assert archive == [
+        "https://www.sec.gov/Archives/edgar/data/1234567/000190000226000031/0001900002-26-000031.txt",
+    ]
+    conn = store.get_connection()
+    rows = conn.execute("SELECT ticker, owner_name, code, shares FROM insider_transactions ORDER BY seq").fetchall()
+    conn.close()
+    assert [tuple(r) for r in rows] == [("ACME", "Smith Robert", "P", 2000), ("ACME", "Smith Robert", "P", 1000)]
+
+    # Second run: the page is all known filings — no archive fetches, no second page
+    fetched.clear()
+    counts = store.update_from_feed()
+    assert counts["stored"] == 0 and counts["seen"] == 2
+    assert len(fetched) == 1
+
+
+def test_failed_fetches_are_retried_with_backoff(store, monkeypatch):
+    from api.services import edgar
+    from api.services.cache import cache
+
+    cache.set("wire_data", {"cap_universe": ["ACME"]}, 3600)
+    monkeypatch.setattr(edgar, "_fetch_cik_ticker_map", lambda: {"1234567": "ACME"})
+    feed = _feed(("Acme Robotics", 1234567, "0001900002-26-000031"))
+    filing = (FIXTURES / "director_buy_submission.txt").read_text()
+    archive_up = False
+
+    def fake_get(url):
+        if "browse-edgar" in url:
+            return feed if "start=0&" in url else _feed()
+        if not archive_up:
+            raise RuntimeError("503 Service Unavailable")
+        return filing
+
+    monkeypatch.setattr(store, "_sec_get", fake_get)
+    assert store.update_from_feed()["errors"] == 1
+    conn = store.get_connection()
+    row = conn.execute("SELECT status, attempts, next_attempt_at FROM form4_filings").fetchone()
+    assert (row["status"], row["attempts"]) == ("error", 1) and row["next_attempt_at"] > time.time()
+
+    archive_up = True
+    assert store.update_from_feed()["stored"] == 0      # still backing off
+    conn.execute("UPDATE form4_filings SET next_attempt_at = 0")
+    assert store.update_from_feed()["stored"] == 1      # due: retried although the page is all known
+    row = conn.execute("SELECT status, next_attempt_at FROM form4_filings").fetchone()
+    assert (row["status"], row["next_attempt_at"]) == ("stored", None)
+
+    archive_up = False
+    conn.execute("UPDATE form4_filings SET status = 'error', attempts = ?, next_attempt_at = 0",
+                 (store.MAX_ATTEMPTS - 1,))
+    store.update_from_feed()
+    assert conn.execute("SELECT next_attempt_at FROM form4_filings").fetchone()[0] is None   # given up
+    conn.close()
+
+
+def _buy(owner_cik, name, days_ago, value, officer=False):
+    return {
+        "issuer_cik": "1", "owners": [{
+            "cik": owner_cik, "name": name, "is_director": not officer, "is_officer": officer,
+            "is_ten_pct": False, "title": "CFO" if officer else "Director",
+        }],
+        "transactions": [{
+            "date": (date.today() - timedelta(days=days_ago)).isoformat(), "code": "P", "acquired": True,
+            "shares": value / 10, "price": 10.0, "value": value, "shares_after": None,
+        }],
+    }
+
+
+def test_scan_ranks_clusters_then_size_vs_market_cap(store, monkeypatch):
+    conn = store.get_connection()
+    docs = [
+        ("ACME", _buy("a1", "Ann", 3, 100_000, officer=True)),
+        ("ACME", _buy("a2", "Bob", 5, 50_000)),
+        ("ACME", _buy("a3", "Cy", 8, 20_000)),
+        ("ACME", _buy("a1", "Ann", 9, 10_000, officer=True)),   # same insider again
+        ("BIG", _buy("b1", "Dee", 2, 5_000_000)),
+        ("SMALL", _buy("s1", "Eve", 4, 400_000)),
+        # Two insiders (below the cluster threshold) in a mega cap: ranks on size alone
+        ("PAIR", _buy("q1", "Hal", 2, 10_000)),
+        ("PAIR", _buy("q2", "Ida", 3, 10_000)),
+        # Two insiders, 19 days apart: never together in a 10-day window; no market cap
+        ("SPREAD", _buy("p1", "F", 1, 10_000)),
+        ("SPREAD", _buy("p2", "G", 20, 10_000)),
+    ]
+    for i, (ticker, doc) in enumerate(docs):
+        store.store_filing(conn, f"acc-{i}", doc, ticker, None)
+    store.store_filing(conn, "old", _buy("o1", "Old", 60, 1_000_000), "OLD", None)
+    conn.close()
+    monkeypatch.setattr(store, "_market_caps", lambda tickers: {
+        "ACME": 1e9, "BIG": 1e12, "SMALL": 2e8, "PAIR": 1e12,
+    })
+
+    ranked = store.scan(lookback_days=30)
+    assert [r["symbol"] for r in ranked] == ["ACME", "SMALL", "BIG", "PAIR", "SPREAD"]
+    acme = ranked[0]
+    assert acme["cluster"] and acme["cluster_insiders"] == 3 and acme["insiders"] == 3
+    assert acme["total_value"] == 180_000 and acme["pct_of_market_cap"] == 0.018
+    assert acme["officers"] == ["CFO"] and acme["names"] == ["Ann", "Bob", "Cy"]
+    assert ranked[1]["pct_of_market_cap"] == 0.2
+    assert not ranked[3]["cluster"] and ranked[3]["cluster_insiders"] == 2
+    assert not ranked[4]["cluster"] and ranked[4]["cluster_insiders"] == 1
+    assert ranked[4]["pct_of_market_cap"] is None
@@ -0,0 +1,136 @@
+"""Background AI summaries/digests: queued on close, input-hash invalidation, token budgets."""
+
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from api.services import auth_service, journal_ai, journal_service
+
+
+class _FakeClient:
+    def __init__(self):
+        self.prompts = []
+        self.messages = self
+
+    def create(self, model, max_tokens, messages):
+        self.prompts.append(messages[0]["content"])
+        return SimpleNamespace(
+            content=[SimpleNamespace(text=f"**Recap:** call {len(self.prompts)}")],
+            usage=SimpleNamespace(input_tokens=400, output_tokens=100),
+        )
+
+
+@pytest.fixture
+def ai(monkeypatch, request):
+    monkeypatch.setattr(journal_ai, "DEBOUNCE_SECONDS", 0)   # baked into the triggers at install
+    request.getfixturevalue("tmp_auth_db")
+    client = _FakeClient()
+    monkeypatch.setattr(journal_ai, "_get_client", lambda: client)
+    user = auth_service.create_user("ai@example.com", "password123")
+    return SimpleNamespace(client=client, uid=user["id"])
+
+
+def _close(uid, sym="NVDA", days_ago=1, **extra):
+    day = (date.today() - timedelta(days=days_ago)).isoformat()
+    return journal_service.create_entry(uid, {
+        "sym": sym, "entry_price": 100, "exit_price": 110, "status": "closed",
+        "entry_date": day, "exit_date": day, **extra,
+    })
+
+
+def test_closed_trade_summary_generated_in_background_and_invalidated_by_edits(ai):
+    trade = _close(ai.uid)
+    _close(ai.uid, "OLD", days_ago=60)   # historical trades aren't summarized unasked
+    assert journal_ai.get_trade_summary(ai.uid, trade["id"])["status"] == "pending"
+
+    assert journal_ai.process_due() == {"generated": 1}
+    assert journal_service.get_entry(ai.uid, trade["id"])["ai_summary"] == "**Recap:** call 1"
+    assert journal_ai.generate_trade_summary(ai.uid, trade["id"]) == {
+        "summary": "**Recap:** call 1", "cached": True, "status": "ready",
+    }
+
+    journal_service.update_entry(ai.uid, trade["id"], {"notes": "Sold into strength"})
+    stale = journal_ai.get_trade_summary(ai.uid, trade["id"])
+    assert stale["status"] == "pending" and stale["summary"] == "**Recap:** call 1"
+    assert journal_ai.process_due() == {"generated": 1}
+    assert "Sold into strength" in ai.client.prompts[-1]
+
+    # An edit that leaves the prompt unchanged requeues but costs no call
+    journal_service.update_entry(ai.uid, trade["id"], {"notes": "Sold into strength"})
+    assert journal_ai.process_due() == {"unchanged": 1}
+    assert len(ai.client.prompts) == 2
+
+
+def test_request_never_calls_the_model(ai):
+    trade = journal_service.create_entry(ai.uid, {"sym": "AMD", "entry_price": 100})
+    assert journal_ai.get_trade_summary(ai.uid, trade["id"])["status"] == "missing"
+    assert journal_ai.generate_trade_summary(ai.uid, trade["id"])["status"] == "pending"
+    assert ai.client.prompts == []
+    journal_ai.process_due()
+    assert journal_ai.get_trade_summary(ai.uid, trade["id"])["status"] == "ready"
+
+    journal_ai.generate_trade_summary(ai.uid, trade["id"], force=True)
+    assert journal_ai.process_due() == {"generated": 1}
+    assert journal_ai.generate_trade_summary(ai.uid, "missing") == {"error": "Trade not found"}
+
+
+def test_token_budget_defers_jobs_to_next_day(ai, monkeypatch):
+    monkeypatch.setattr(journal_ai, "USER_DAILY_TOKENS", 900)
+    first, second = _close(ai.uid, "NVDA"), _close(ai.uid, "AMD")
+
+    assert journal_ai.process_due() == {"generated": 1, "deferred": 1}
+    usage = journal_ai.get_usage(ai.uid)
+    assert usage["tokens"] == 500 and usage["calls"] == 1   # reservation settled to real usage
+    states = {journal_ai.get_trade_summary(ai.uid, t["id"])["status"] for t in (first, second)}
+    assert states == {"ready", "deferred"}
+    assert journal_ai.process_due() == {}   # nothing due until tomorrow
+
+
+def test_weekly_digest_queued_for_active_users_and_refreshed_when_week_changes(ai):
+    today = date.today()
+    week = today - timedelta(days=today.weekday() + 7)
+    for sym in ("NVDA", "AMD"):
+        journal_service.create_entry(ai.uid, {
+            "sym": sym, "entry_price": 100, "exit_price": 95, "status": "closed",
+            "entry_date": week.isoformat(), "exit_date": week.isoformat(),
+        })
+    assert journal_ai.enqueue_weekly_digests() == 1
+    journal_ai.process_due()
+
+    digest = journal_ai.get_weekly_digest(ai.uid, week.isoformat())
+    assert digest["status"] == "ready" and digest["trade_count"] == 2 and digest["losses"] == 2
+
+    journal_service.create_entry(ai.uid, {
+        "sym": "TSLA", "entry_price": 100, "exit_price": 120, "status": "closed",
+        "entry_date": week.isoformat(), "exit_date": week.isoformat(),
+    })
+    stale = journal_ai.get_weekly_digest(ai.uid, week.isoformat())
+    assert stale["status"] == "pending" and stale["stale"] and stale["digest"] == digest["digest"]
+    journal_ai.process_due()
+    assert journal_ai.get_weekly_digest(ai.uid, week.isoformat())["wins"] == 1
+    assert "error" in journal_ai.get_weekly_digest(ai.uid, "last week")
+
+
+def test_failed_digest_is_not_requeued_on_every_read(ai, monkeypatch):
+    today = date.today()
+    week = (today - timedelta(days=today.weekday() + 7)).isoformat()
+    journal_service.create_entry(ai.uid, {
+        "sym": "NVDA", "entry_price": 100, "exit_price": 95, "status": "closed",
+        "entry_date": week, "exit_date": week,
+    })
+
+    def boom(**kwargs):
+        raise RuntimeError("overloaded")
+
+    monkeypatch.setattr(ai.client, "create", boom)
+    monkeypatch.setattr(journal_ai, "MAX_ATTEMPTS", 1)
+    journal_ai.enqueue("weekly_digest", ai.uid, week)
+    assert journal_ai.process_due() == {"failed": 2}   # the digest and the trade's own summary
+
+    for _ in range(3):
+        assert journal_ai.get_weekly_digest(ai.uid, week)["status"] == "failed"
+    assert journal_ai.process_due() == {}
+
+    monkeypatch.setattr(journal_ai, "FAILED_RETRY_SECONDS", 0)
+    assert journal_ai.get_weekly_digest(ai.uid, week)["status"] == "pending"
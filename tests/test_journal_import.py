@@ -0,0 +1,78 @@
+from api.services import auth_service, journal_import, journal_rollups, journal_service, playbook_service
+
+_CSV = """Symbol,Side,Price,Qty,Date
+NVDA,Buy,100.00,10,2025-03-03
+NVDA,Buy,100.50,10,2025-03-03
+NVDA,Buy,120.00,10,2025-03-03
+NVDA,Sell,100.00,10,2025-03-03
+AMD,Buy,50.00,5,2025-03-04
+"""
+_MAPPING = {"sym": "Symbol", "direction": "Side", "entry_price": "Price", "shares": "Qty", "entry_date": "Date"}
+
+
+def _user(email="import@example.com"):
+    return auth_service.create_user(email, "password123")["id"]
+
+
+def _rows():
+    rows, _ = journal_import.parse_csv(_CSV, _MAPPING)
+    return rows
+
+
+def test_diff_classifies_new_duplicate_and_conflicting(tmp_auth_db):
+    uid = _user()
+    existing = journal_service.create_entry(uid, {
+        "sym": "NVDA", "direction": "long", "entry_price": 100, "shares": 10, "entry_date": "2025-03-03",
+    })
+    diff = journal_import.diff_import(uid, _rows())
+    assert [d["index"] for d in diff["duplicate"]] == [0, 1]
+    assert diff["duplicate"][0]["existing_id"] == existing["id"]
+    assert [c["index"] for c in diff["conflicting"]] == [2]
+    assert set(diff["conflicting"][0]["diffs"]) == {"entry_price"}
+    # Opposite side and a different symbol are new.
+    assert diff["new"] == [3, 4]
+    assert journal_import.find_duplicates(uid, _rows()) == [0, 1]
+
+
+def test_bulk_import_writes_once_and_keeps_derived_tables_in_sync(tmp_auth_db):
+    uid = _user()
+    rows = _rows()
+    result = journal_import.import_trades(uid, rows, skip_indices={1}, filename="t.csv")
+    assert result["imported"] == 4 and result["duplicates"] == 1
+    assert journal_service.list_entries(uid)["total"] == 4
+    assert journal_service.get_stats(uid)["total_trades"] == 4
+    assert journal_rollups.check_user(uid)["ok"]
+    assert journal_import.get_import_history(uid)[0]["imported_count"] == 4
+
+    # A second batch dated before the first re-walks the equity series.
+    journal_import.import_trades(uid, [dict(r, entry_date="2025-03-01", exit_price=r["entry_price"] * 1.1) for r in rows[:2]])
+    assert journal_rollups.check_user(uid)["ok"]
+
+    # Re-importing the same file finds every row already present.
+    assert len(journal_import.diff_import(uid, rows)["duplicate"]) == 5
+
+
+def test_playbook_stats_recomputed_once_per_playbook(tmp_auth_db, monkeypatch):
+    uid = _user()
+    pb = playbook_service.create_playbook(uid, {"name": "Gap"})
+    calls = []
+    real = playbook_service.recompute_playbook_stats
+    monkeypatch.setattr(playbook_service, "recompute_playbook_stats",
+                        lambda u, p: calls.append(p) or real(u, p))
+    rows = [dict(r, playbook_id=pb["id"]) for r in _rows()]
+    journal_import.import_trades(uid, rows)
+    assert calls == [pb["id"]]
+    assert playbook_service.get_playbook(uid, pb["id"])["trade_count"] == 5
+
+
+def test_failed_insert_rolls_back_whole_batch(tmp_auth_db, monkeypatch):
+    uid = _user()
+
+    def boom(conn, user_id, entries):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(journal_rollups, "add_many", boom)
+    result = journal_import.import_trades(uid, _rows())
+    assert result["imported"] == 0
+    assert "nothing was saved" in result["errors"][-1]
+    assert journal_service.list_entries(uid)["total"] == 0
@@ -0,0 +1,81 @@
+import time
+
+from api.services import auth_service, journal_insights, journal_service, playbook_service
+from api.services.auth_db import get_connection
+
+
+def _user(email="insights@example.com"):
+    return auth_service.create_user(email, "password123")["id"]
+
+
+def _trade(uid, exit_, setup, day, **extra):
+    return journal_service.create_entry(uid, {
+        "sym": "NVDA", "entry_price": 100, "exit_price": exit_, "status": "closed",
+        "setup": setup, "entry_date": day, "exit_date": day, **extra,
+    })
+
+
+def _seed(uid):
+    pb = playbook_service.create_playbook(uid, {"name": "Flags"})
+    for i in range(3):
+        _trade(uid, 106, "Breakout", f"2025-03-0{3 + i}", playbook_id=pb["id"])
+        _trade(uid, 98, "Chase", f"2025-03-0{3 + i}", mistake_tags="chased")
+    return pb
+
+
+def test_insights_from_rollups(tmp_auth_db):
+    uid = _user()
+    _seed(uid)
+    by_id = {i["id"]: i for i in journal_insights.get_insights(uid)}
+
+    assert by_id["setup_comparison"]["statement"] == "Breakout averages +6.0% per trade vs Chase at -2.0%."
+    assert by_id["setup_comparison"]["evidence"] == "3 Breakout trades, 3 Chase trades."
+    assert by_id["mistake_correlation"]["evidence"] == "3 trades had mistakes tagged, 3 did not."
+    assert by_id["playbook_performance"]["statement"] == "Playbook trades average +6.0% vs -2.0% without."
+    # Mon/Tue/Wed each have one winner and one loser, so no day stands out.
+    assert "day_of_week" not in by_id
+
+
+def test_too_few_trades_yields_nothing(tmp_auth_db):
+    uid = _user()
+    for _ in range(4):
+        _trade(uid, 110, "Breakout", "2025-03-03")
+    assert journal_insights.get_insights(uid) == []
+
+
+def test_stored_result_served_until_refresh(tmp_auth_db, monkeypatch):
+    uid = _user()
+    _seed(uid)
+    first = journal_insights.get_insights(uid)
+    state = journal_insights.get_state(uid)
+    assert state["version"] == state["data_version"]
+
+    _trade(uid, 150, "Chase", "2025-03-06")
+    state = journal_insights.get_state(uid)
+    assert state["version"] < state["data_version"]
+    assert journal_insights.get_insights(uid) == first  # stale result, no inline recompute
+
+    # Still inside the debounce window.
+    assert journal_insights.refresh_due() == 0
+    monkeypatch.setattr(journal_insights, "DEBOUNCE_SECONDS", 0)
+    assert journal_insights.refresh_due() == 1
+    assert journal_insights.get_insights(uid) != first
+    state = journal_insights.get_state(uid)
+    assert state["version"] == state["data_version"]
+
+
+def test_claimed_user_is_skipped_by_other_workers(tmp_auth_db, monkeypatch):
+    uid = _user()
+    _seed(uid)
+    monkeypatch.setattr(journal_insights, "DEBOUNCE_SECONDS", 0)
+    conn = get_connection()
+    try:
+        conn.execute(
+            "UPDATE journal_insights_state SET claimed_at = ? WHERE user_id = ?", (time.time(), uid)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    assert journal_insights.refresh_due() == 0
+    monkeypatch.setattr(journal_insights, "CLAIM_TTL", -1)
+    assert journal_insights.refresh_due() == 1
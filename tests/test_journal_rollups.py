@@ -0,0 +1,131 @@
+import random
+
+from api.services import auth_db, auth_service, journal_rollups, journal_service, playbook_service
+from api.services.journal_analytics import get_analytics
+
+
+def _user(email="rollups@example.com"):
+    return auth_service.create_user(email, "password123")["id"]
+
+
+def _trade(uid, sym, entry, exit_, day, **extra):
+    return journal_service.create_entry(uid, {
+        "sym": sym, "entry_price": entry, "exit_price": exit_, "status": "closed",
+        "entry_date": day, "exit_date": day, **extra,
+    })
+
+
+def test_stats_match_closed_trades(tmp_auth_db):
+    uid = _user()
+    _trade(uid, "NVDA", 100, 110, "2025-03-03", setup="Breakout")
+    _trade(uid, "AMD", 100, 95, "2025-03-04", setup="Breakout")
+    _trade(uid, "TSLA", 100, 120, "2025-03-05", setup="EP")
+    journal_service.create_entry(uid, {"sym": "META", "entry_price": 100, "entry_date": "2025-03-05"})
+
+    stats = journal_service.get_stats(uid)
+    assert stats["total_trades"] == 3
+    assert stats["open_trades"] == 1
+    assert stats["wins"] == 2 and stats["losses"] == 1
+    assert stats["total_pnl_pct"] == 25.0
+    assert stats["profit_factor"] == 6.0
+    assert stats["best_trade"]["sym"] == "TSLA"
+    assert stats["worst_trade"]["sym"] == "AMD"
+    assert [s["setup"] for s in stats["top_setups"]] == ["Breakout"]
+
+    march_4 = journal_service.get_stats(uid, date_from="2025-03-04", date_to="2025-03-04")
+    assert march_4["total_trades"] == 1 and march_4["total_pnl_pct"] == -5.0
+
+
+def test_update_and_delete_keep_rollups_consistent(tmp_auth_db):
+    uid = _user()
+    best = _trade(uid, "NVDA", 100, 130, "2025-03-03", setup="Breakout")
+    other = _trade(uid, "AMD", 100, 105, "2025-03-03", setup="Breakout")
+
+    journal_service.update_entry(uid, best["id"], {"setup": "EP"})
+    buckets = {b["key"]: b for b in get_analytics(uid, "setup")["buckets"]}
+    assert buckets["EP"]["trade_count"] == 1
+    assert buckets["Breakout"]["best_trade"]["sym"] == "AMD"
+
+    journal_service.delete_entry(uid, best["id"])
+    assert journal_service.get_stats(uid)["best_trade"]["id"] == other["id"]
+    journal_service.update_entry(uid, other["id"], {"status": "open"})
+    assert journal_service.get_stats(uid)["total_trades"] == 0
+    assert journal_rollups.check_user(uid)["ok"]
+
+
+def test_equity_curve_inserts_out_of_order(tmp_auth_db):
+    uid = _user()
+    _trade(uid, "C", 100, 103, "2025-03-05")
+    _trade(uid, "A", 100, 101, "2025-03-01")
+    _trade(uid, "B", 100, 102, "2025-03-03")
+
+    curve = get_analytics(uid, "symbol")["equity_curve"]
+    assert [(p["sym"], p["cum_pnl"]) for p in curve] == [("A", 1.0), ("B", 3.0), ("C", 6.0)]
+    ranged = get_analytics(uid, "symbol", date_from="2025-03-02")["equity_curve"]
+    assert [p["cum_pnl"] for p in ranged] == [2.0, 5.0]
+
+
+def test_playbook_delete_moves_trades_to_no_playbook(tmp_auth_db):
+    uid = _user()
+    pb = playbook_service.create_playbook(uid, {"name": "Flags"})
+    _trade(uid, "NVDA", 100, 110, "2025-03-03", playbook_id=pb["id"])
+    playbook_service.delete_playbook(uid, pb["id"])
+    keys = [b["key"] for b in get_analytics(uid, "playbook")["buckets"]]
+    assert keys == ["No Playbook"]
+    assert journal_rollups.check_user(uid)["ok"]
+
+
+def test_random_edits_match_recompute(tmp_auth_db):
+    rng = random.Random(7)
+    uid = _user()
+    ids = []
+    for i in range(40):
+        op = rng.random()
+        if op < 0.6 or not ids:
+            t = _trade(
+                uid, rng.choice(["NVDA", "AMD", "TSLA"]), 100, round(rng.uniform(90, 115), 2),
+                f"2025-03-{rng.randint(1, 28):02d}", setup=rng.choice(["Breakout", "EP", ""]),
+                mistake_tags=rng.choice(["", "chased", "chased,early exit"]),
+                stop_price=95, ps_setup=rng.randint(0, 20),
+            )
+            ids.append(t["id"])
+        elif op < 0.85:
+            journal_service.update_entry(uid, rng.choice(ids), {
+                "exit_price": round(rng.uniform(90, 115), 2),
+                "entry_date": f"2025-03-{rng.randint(1, 28):02d}",
+            })
+        else:
+            journal_service.delete_entry(uid, ids.pop(rng.randrange(len(ids))))
+
+    report = journal_rollups.check_user(uid)
+    assert report["ok"], report
+
+
+def test_checker_detects_drift_and_rebuild_fixes_it(tmp_auth_db):
+    uid = _user()
+    _trade(uid, "NVDA", 100, 110, "2025-03-03")
+    conn = auth_db.get_connection()
+    try:
+        conn.execute("UPDATE journal_rollups SET pnl_sum = pnl_sum + 1 WHERE user_id = ? AND dimension = 'ALL'", (uid,))
+        conn.commit()
+        assert not journal_rollups.check_user(uid)["ok"]
+        journal_rollups.rebuild_user(conn, uid)
+        conn.commit()
+    finally:
+        conn.close()
+    assert journal_rollups.check_user(uid)["ok"]
+
+
+def test_init_db_backfills_existing_trades(tmp_auth_db):
+    uid = _user()
+    _trade(uid, "NVDA", 100, 110, "2025-03-03")
+    conn = auth_db.get_connection()
+    try:
+        conn.execute("DELETE FROM journal_rollups")
+        conn.execute("DELETE FROM journal_equity")
+        conn.commit()
+    finally:
+        conn.close()
+    auth_db.init_db()
+    assert journal_service.get_stats(uid)["total_trades"] == 1
+    assert journal_rollups.check_user(uid)["ok"]
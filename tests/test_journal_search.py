@@ -0,0 +1,95 @@
+from api.services import auth_db, auth_service, daily_journal_service, journal_search, journal_service, playbook_service
+
+
+def _user(email="search@example.com"):
+    return auth_service.create_user(email, "password123")["id"]
+
+
+def test_search_ranks_and_highlights_across_kinds(tmp_auth_db):
+    uid = _user()
+    t = journal_service.create_entry(uid, {
+        "sym": "NVDA", "setup": "Breakout", "entry_date": "2025-03-03",
+        "notes": "Bought the volatility contraction breakout on heavy volume",
+    })
+    daily_journal_service.update_daily(uid, "2025-03-03", {"learned": "Contraction setups need patience"})
+    playbook_service.create_playbook(uid, {"name": "VCP", "description": "Volatility contraction pattern"})
+
+    res = journal_search.search(uid, "contraction")
+    assert res["total"] == 3
+    assert {r["kind"] for r in res["results"]} == {"trade", "daily", "playbook"}
+    trade = next(r for r in res["results"] if r["kind"] == "trade")
+    assert trade["id"] == t["id"]
+    assert "<mark>contraction</mark>" in trade["snippet"]
+
+
+def test_prefix_matching_and_owner_isolation(tmp_auth_db):
+    uid = _user()
+    other = _user("other@example.com")
+    journal_service.create_entry(uid, {"sym": "AMD", "notes": "earnings gap held"})
+    journal_service.create_entry(other, {"sym": "AMD", "notes": "earnings gap failed"})
+
+    assert journal_search.search(uid, "earn")["total"] == 1
+    assert journal_search.search(uid, "gap fail")["total"] == 0
+    # The owner id is indexed but must never match user query terms.
+    assert journal_search.search(uid, uid[:4])["total"] == 0
+
+
+def test_index_follows_updates_and_deletes(tmp_auth_db):
+    uid = _user()
+    t = journal_service.create_entry(uid, {"sym": "TSLA", "notes": "chased the open"})
+    journal_service.update_entry(uid, t["id"], {"notes": "waited for the pullback"})
+    assert journal_search.search(uid, "chased")["total"] == 0
+    assert journal_search.search(uid, "pullback")["total"] == 1
+    journal_service.delete_entry(uid, t["id"])
+    assert journal_search.search(uid, "pullback")["total"] == 0
+
+
+def test_search_combines_structured_filters(tmp_auth_db):
+    uid = _user()
+    journal_service.create_entry(uid, {"sym": "NVDA", "notes": "clean base", "entry_date": "2025-03-03"})
+    journal_service.create_entry(uid, {"sym": "AMD", "notes": "clean base", "entry_date": "2025-04-03"})
+    playbook_service.create_playbook(uid, {"name": "Base", "description": "clean base"})
+
+    res = journal_search.search(uid, "clean", filters={"symbol": "nvda"})
+    assert [r["kind"] for r in res["results"]] == ["trade"]
+    listed = journal_service.list_entries(uid, {"q": "clean", "date_from": "2025-04-01"})
+    assert [t["sym"] for t in listed["trades"]] == ["AMD"]
+
+
+def test_user_input_cannot_inject_fts_syntax(tmp_auth_db):
+    uid = _user()
+    journal_service.create_entry(uid, {"sym": "META", "notes": "owner: NEAR( test"})
+    assert journal_search.search(uid, 'owner: "NEAR(')["total"] == 1
+    assert journal_search.search(uid, '***')["total"] == 0
+
+
+def test_tag_filters_match_normalized_tags_exactly(tmp_auth_db):
+    uid = _user()
+    a = journal_service.create_entry(uid, {"sym": "A", "tags": " Swing , earnings", "mistake_tags": "chased"})
+    journal_service.create_entry(uid, {"sym": "B", "tags": "swingtrade"})
+
+    listed = journal_service.list_entries(uid, {"tag": "SWING"})
+    assert [t["id"] for t in listed["trades"]] == [a["id"]]
+    assert journal_service.list_entries(uid, {"mistake_tag": "chase"})["total"] == 0
+
+    journal_service.update_entry(uid, a["id"], {"tags": "earnings"})
+    assert journal_service.list_entries(uid, {"tag": "swing"})["total"] == 0
+    tags = {t["tag"]: t["count"] for t in journal_search.list_tags(uid)}
+    assert tags == {"earnings": 1, "swingtrade": 1}
+
+
+def test_rebuild_index_backfills_existing_rows(tmp_auth_db):
+    uid = _user()
+    journal_service.create_entry(uid, {"sym": "NFLX", "notes": "subscriber beat", "tags": "Earnings"})
+    conn = auth_db.get_connection()
+    try:
+        conn.execute("DELETE FROM journal_search")
+        conn.execute("DELETE FROM journal_search_docs")
+        conn.execute("DELETE FROM journal_entry_tags")
+        conn.commit()
+        journal_search.rebuild_index(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    assert journal_search.search(uid, "subscriber")["total"] == 1
+    assert journal_service.list_entries(uid, {"tag": "earnings"})["total"] == 1
@@ -0,0 +1,113 @@
+"""Outbox delivery against a local fake Discord webhook: batching, dedup, 429s, backoff, dead letters."""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from api.services import outbox
+
+
+class _FakeWebhook:
+    """Records POST bodies; replies with queued (status, body, headers) or 204."""
+
+    def __init__(self):
+        self.posts = []
+        self.replies = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                fake.posts.append(json.loads(body))
+                status, reply, headers = fake.replies.pop(0) if fake.replies else (204, None, {})
+                data = json.dumps(reply).encode() if reply is not None else b""
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api/webhooks/1/token"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def webhook(tmp_auth_db, monkeypatch):
+    monkeypatch.setattr(outbox, "MIN_INTERVAL", {"discord": 0.0, "email": 0.0})
+    fake = _FakeWebhook()
+    yield fake
+    fake.server.shutdown()
+    fake.server.server_close()
+
+
+def _embed(n):
+    return {"title": f"Alert {n}", "description": "x"}
+
+
+def test_batches_embeds_and_drops_duplicates(webhook, monkeypatch):
+    monkeypatch.setattr(outbox, "MAX_EMBEDS", 2)
+    assert outbox.enqueue_discord(webhook.url, _embed(1), dedup_key="a1")
+    assert outbox.enqueue_discord(webhook.url, _embed(1), dedup_key="a1") is None
+    outbox.enqueue_discord(webhook.url, _embed(2))
+    outbox.enqueue_discord(webhook.url, _embed(3))
+
+    assert outbox.dispatch_pending()["sent"] == 2
+    assert outbox.dispatch_pending()["sent"] == 1
+    assert [[e["title"] for e in p["embeds"]] for p in webhook.posts] == [
+        ["Alert 1", "Alert 2"], ["Alert 3"],
+    ]
+    assert outbox.stats()["counts"]["sent"] == 3
+
+
+def test_rate_limit_blocks_destination_without_spending_attempts(webhook):
+    webhook.replies.append((429, {"retry_after": 0.3, "global": False}, {}))
+    outbox.enqueue_discord(webhook.url, _embed(1))
+
+    assert outbox.dispatch_pending()["retry"] == 1
+    outbox.enqueue_discord(webhook.url, _embed(2))
+    assert outbox.dispatch_pending()["sent"] == 0  # destination still blocked
+    assert len(webhook.posts) == 1
+
+    time.sleep(0.35)
+    assert outbox.dispatch_pending()["sent"] == 2
+    assert [e["title"] for e in webhook.posts[-1]["embeds"]] == ["Alert 1", "Alert 2"]
+    assert outbox.list_messages("sent")[-1]["attempts"] == 0
+
+
+def test_server_errors_back_off_then_dead_letter(webhook, monkeypatch):
+    monkeypatch.setattr(outbox, "MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(outbox, "BACKOFF_BASE", 0.0)
+    webhook.replies += [(500, {"message": "oops"}, {})] * 2
+    outbox.enqueue_discord(webhook.url, _embed(1))
+
+    assert outbox.dispatch_pending()["retry"] == 1
+    assert outbox.dispatch_pending()["dead"] == 1
+    dead = outbox.list_messages("dead")
+    assert dead[0]["attempts"] == 2 and "500" in dead[0]["last_error"]
+    assert dead[0]["destination"].endswith("/api/webhooks/1/…")
+
+    assert outbox.retry(dead[0]["id"])
+    assert outbox.dispatch_pending()["sent"] == 1
+    assert outbox.list_messages("dead") == []
+
+
+def test_rejected_batch_is_split_before_dead_lettering(webhook):
+    webhook.replies += [(400, {"message": "Invalid Form Body"}, {}), (204, None, {}),
+                        (400, {"message": "Invalid Form Body"}, {})]
+    outbox.enqueue_discord(webhook.url, _embed(1))
+    outbox.enqueue_discord(webhook.url, _embed(2))
+
+    assert outbox.dispatch_pending()["split"] == 2
+    assert outbox.dispatch_pending()["sent"] == 1
+    assert outbox.dispatch_pending()["dead"] == 1
+    assert [len(p["embeds"]) for p in webhook.posts] == [2, 1, 1]
+    assert outbox.list_messages("dead")[0]["payload"]["embeds"][0]["title"] == "Alert 2"
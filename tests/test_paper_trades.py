@@ -0,0 +1,183 @@
+"""Paper trades: per-user lifecycle and P&L, concurrent writes, stop/target exits, legacy import."""
+
+import json
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.services import alerts, auth_service
+
+
+@pytest.fixture
+def paper(tmp_path, monkeypatch):
+    from api.services import paper_trades
+
+    legacy = tmp_path / "trades.json"
+    legacy.write_text(json.dumps([
+        {"sym": "NVDA", "entry": 850.0, "stop": 820.0, "target": 920.0, "size_pct": 15.0,
+         "notes": "VCP breakout", "setup": "VCP", "date": "2026-03-19", "id": "45d860fc", "status": "open"},
+        {"sym": "AMD", "entry": 100.0, "stop": 95.0, "target": 120.0, "size_pct": 10.0, "date": "2026-03-02",
+         "id": "c10sed00", "status": "closed", "exit": 110.0},
+        {"sym": "BAD"},
+    ]))
+    monkeypatch.setattr(paper_trades, "LEGACY_FILE", str(legacy))
+    return paper_trades
+
+
+def test_lifecycle_scales_and_realizes_pnl(paper, tmp_auth_db):
+    t = paper.open_trade("a", "anet", 100.0, 95.0, 120.0, 10.0, setup="VCP")
+    assert (t["sym"], t["status"], t["open_pct"], t["avg_entry"]) == ("ANET", "open", 10.0, 100.0)
+
+    t = paper.apply_fill("a", t["id"], "add", 110.0, 10.0)
+    assert (t["open_pct"], t["avg_entry"]) == (20.0, 105.0)
+    t = paper.apply_fill("a", t["id"], "reduce", 115.5, 5.0)
+    assert t["status"] == "open" and t["open_pct"] == 15.0
+    assert t["realized_pnl_pct"] == pytest.approx(0.5)          # 5% of book, +10%
+
+    assert paper.apply_fill("b", t["id"], "close", 120.0) is None   # not b's trade
+    with pytest.raises(ValueError):
+        paper.apply_fill("a", t["id"], "reduce", 120.0, 50.0)
+
+    t = paper.apply_fill("a", t["id"], "close", 94.5)
+    assert t["status"] == "closed" and t["exit_reason"] == "manual" and t["open_pct"] == 0
+    assert t["realized_pnl_pct"] == pytest.approx(0.5 - 1.5)    # then 15% of book, -10%
+    assert [f["action"] for f in paper.get_trade("a", t["id"])["fills"]] == ["open", "add", "reduce", "close"]
+    with pytest.raises(ValueError):
+        paper.apply_fill("a", t["id"], "close", 100.0)
+
+    with pytest.raises(ValueError):
+        paper.open_trade("a", "ANET", 100.0, 105.0, 120.0, 10.0)   # stop above a long entry
+
+    stats = paper.get_stats("a")
+    assert (stats["closed"], stats["losses"], stats["total_pnl_pct"]) == (1, 1, pytest.approx(-1.0))
+    assert stats["by_setup"][0]["setup"] == "VCP"
+    assert paper.list_trades("b") == []
+
+
+def test_adding_after_a_partial_exit_keeps_realized_pnl(paper, tmp_auth_db):
+    t = paper.open_trade("a", "ANET", 100.0, 95.0, 130.0, 10.0)
+    t = paper.apply_fill("a", t["id"], "reduce", 110.0, 5.0)
+    assert t["realized_pnl_pct"] == pytest.approx(0.5)
+    t = paper.apply_fill("a", t["id"], "add", 120.0, 5.0)
+    assert t["realized_pnl_pct"] == pytest.approx(0.5)           # already banked
+    assert (t["open_pct"], t["avg_entry"]) == (10.0, 110.0)       # 5%@100 left + 5%@120
+    t = paper.apply_fill("a", t["id"], "close", 120.0)
+    assert t["realized_pnl_pct"] == pytest.approx(0.5 + 10 * 10 / 110, abs=1e-4)
+    assert t["return_pct"] == pytest.approx(t["realized_pnl_pct"] / 15 * 100, abs=0.01)
+
+
+def test_concurrent_opens_and_fills_lose_nothing(paper, tmp_auth_db):
+    base = paper.open_trade("a", "MSFT", 100.0, 90.0, 150.0, 1.0)
+    errors = []
+
+    def work(i):
+        try:
+            paper.open_trade("a", f"T{i}", 50.0, 45.0, 60.0, 1.0)
+            paper.apply_fill("a", base["id"], "add", 100.0, 1.0)
+        except Exception as e:   # pragma: no cover - surfaced by the assertion below
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert len(paper.list_trades("a")) == 17
+    assert paper.get_trade("a", base["id"])["open_pct"] == 17.0
+
+
+def test_monitor_closes_at_stop_and_target(paper, tmp_auth_db):
+    user = auth_service.create_user("paper@example.com", "password123")["id"]
+    long_ = paper.open_trade(user, "SMCI", 100.0, 95.0, 110.0, 10.0)
+    short = paper.open_trade(user, "TSLA", 200.0, 210.0, 180.0, 5.0, direction="short")
+    untouched = paper.open_trade(user, "AMD", 50.0, 45.0, 60.0, 5.0)
+
+    assert paper.check_levels({"SMCI": 94.0, "TSLA": 179.0, "AMD": 52.0}) == 2
+    stopped = paper.get_trade(user, long_["id"])
+    assert (stopped["status"], stopped["exit_reason"], stopped["r_multiple"]) == ("closed", "stop", -1.2)
+    won = paper.get_trade(user, short["id"])
+    assert (won["exit_reason"], won["return_pct"]) == ("target", 10.5)
+    assert paper.get_trade(user, untouched["id"])["status"] == "open"
+
+    feed = alerts.get_alerts(user_id=user)
+    assert sorted(a["type"] for a in feed) == ["paper_exit", "paper_exit"]
+    assert paper.check_levels({"SMCI": 90.0}) == 0   # already closed: no second exit
+
+
+def test_tick_only_applies_exits_in_the_regular_session(paper, tmp_auth_db, monkeypatch):
+    from api.services import massive, portfolio_risk
+
+    trade = paper.open_trade("a", "SMCI", 100.0, 95.0, 110.0, 10.0)
+    monkeypatch.setattr(portfolio_risk, "get_marks", lambda symbols: ({"SMCI": 90.0}, None))
+    monkeypatch.setattr(massive, "_detect_session", lambda: "pre_market")
+    assert paper.tick() == 0 and paper.get_trade("a", trade["id"])["status"] == "open"
+    monkeypatch.setattr(massive, "_detect_session", lambda: "regular")
+    assert paper.tick() == 1
+
+
+def test_legacy_book_is_a_one_time_frozen_import(paper, tmp_auth_db):
+    from api.main import app
+    from api.services import auth_db
+
+    assert paper.list_trades(paper.MODEL_BOOK) == []   # fresh database: nothing to migrate
+    auth_service.create_user("existing@example.com", "password123")
+    conn = auth_db.get_connection()
+    conn.executescript("DROP TABLE paper_trades; DROP TABLE paper_fills;")
+    conn.close()
+    auth_db.init_db()   # first start of an existing database after the table was added
+
+    shared = TestClient(app).get("/api/trades").json()
+    assert [(t["id"], t["sym"], t["status"]) for t in shared] == [
+        ("c10sed00", "AMD", "closed"), ("45d860fc", "NVDA", "open"),
+    ]
+    assert shared[0]["realized_pnl_pct"] == pytest.approx(1.0)
+    assert paper.check_levels({"NVDA": 800.0}) == 0    # the model book is frozen
+    auth_db.init_db()
+    assert len(paper.list_trades(paper.MODEL_BOOK)) == 2
+
+
+def test_endpoints_scope_to_user(paper, tmp_auth_db):
+    from api.main import app
+
+    client = TestClient(app)
+    assert client.get("/api/trades").json() == []
+
+    owner = auth_service.create_user("owner@example.com", "password123")
+    client.cookies.set("uct_session", auth_service.create_session(owner["id"]))
+    assert client.get("/api/trades").json() == []
+    trade = client.post("/api/trades", json={"sym": "CRWD", "entry": 300, "stop": 290, "target": 330,
+                                             "size_pct": 10}).json()
+    assert client.post(f"/api/trades/{trade['id']}/fills",
+                       json={"action": "reduce", "price": 310, "qty_pct": 20}).status_code == 400
+    assert client.patch(f"/api/trades/{trade['id']}", json={"stop": 300}).json()["stop"] == 300
+    closed = client.post(f"/api/trades/{trade['id']}/close", json={"price": 320}).json()
+    assert closed["status"] == "closed" and closed["realized_pnl_pct"] == pytest.approx(0.6667, abs=1e-4)
+    assert client.get("/api/trades/stats").json()["win_rate"] == 100.0
+
+    client.cookies.set("uct_session", auth_service.create_session(
+        auth_service.create_user("other@example.com", "password123")["id"]))
+    assert client.get(f"/api/trades/{trade['id']}").status_code == 404
+    assert client.delete(f"/api/trades/{trade['id']}").status_code == 404
+
+
+def test_export_and_admin_delete_cover_paper_trades(paper, tmp_auth_db):
+    from api.routers import auth as auth_router
+    from api.services import auth_db
+
+    owner = auth_service.create_user("owner@example.com", "password123")
+    t = paper.open_trade(owner["id"], "CRWD", 300.0, 290.0, 330.0, 10.0)
+    paper.apply_fill(owner["id"], t["id"], "reduce", 310.0, 5.0)
+
+    export = json.loads(auth_router.export_user_data(user=owner).body)
+    assert [x["sym"] for x in export["trades"]] == ["CRWD"]
+    assert [f["action"] for f in export["trades"][0]["fills"]] == ["open", "reduce"]
+
+    auth_router.admin_delete_user_by_id(owner["id"], user={"id": "admin", "role": "admin"})
+    conn = auth_db.get_connection()
+    try:
+        for table in ("paper_trades", "paper_fills"):
+            assert conn.execute(f"SELECT COUNT(*) FROM {table} WHERE user_id = ?", (owner["id"],)).fetchone()[0] == 0
+    finally:
+        conn.close()
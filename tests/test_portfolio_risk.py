@@ -0,0 +1,104 @@
+"""Live portfolio risk: batched marks, per-position P&L/R/stop distance, heat, concentration, stop alerts."""
+
+import pytest
+
+from api.services import alerts, auth_service, engine, journal_service, massive, portfolio_risk, trading_accounts
+from api.services.cache import cache
+
+
+@pytest.fixture
+def book(tmp_auth_db, monkeypatch):
+    cache.invalidate(portfolio_risk.MARKS_KEY)
+    cache.invalidate("wire_data")
+    fetches = []
+
+    def fake_fetch(symbols):
+        fetches.append(sorted(symbols))
+        return {s: p for s, p in {"NVDA": 110.0, "ANET": 94.0, "TSLA": 190.0}.items() if s in symbols}
+
+    monkeypatch.setattr(portfolio_risk, "_fetch_marks", fake_fetch)
+    monkeypatch.setattr(massive, "_detect_session", lambda: "regular")
+    monkeypatch.setattr(engine, "_load_wire_data", lambda: cache.get("wire_data"))
+    a = auth_service.create_user("a@example.com", "password123")
+    b = auth_service.create_user("b@example.com", "password123")
+    trading_accounts.create_account(a["id"], {"name": "Main", "balance": 100000, "max_risk_pct": 1.0})
+    journal_service.create_entry(a["id"], {"sym": "NVDA", "entry_price": 100, "stop_price": 95, "shares": 100})
+    journal_service.create_entry(a["id"], {"sym": "ANET", "entry_price": 100, "stop_price": 95, "shares": 50})
+    journal_service.create_entry(a["id"], {"sym": "TSLA", "direction": "short", "entry_price": 200,
+                                            "stop_price": 210, "shares": 20})
+    journal_service.create_entry(b["id"], {"sym": "NVDA", "entry_price": 90, "stop_price": 85, "shares": 10})
+    yield {"a": a, "b": b, "fetches": fetches}
+    cache.invalidate(portfolio_risk.MARKS_KEY)
+
+
+def test_tick_fetches_each_symbol_once_and_alerts_breached_stops(book):
+    assert portfolio_risk.tick() == {"symbols": 3, "breaches": 1}
+    assert book["fetches"] == [["ANET", "NVDA", "TSLA"]]
+
+    feed = alerts.get_alerts(user_id=book["a"]["id"])
+    assert [(x["type"], x["data"]["sym"]) for x in feed] == [("stop_breach", "ANET")]
+    assert alerts.get_alerts(user_id=book["b"]["id"]) == []
+
+    # Same trade and stop on the next tick: no duplicate alert
+    assert portfolio_risk.tick()["breaches"] == 0
+
+
+def test_tick_skips_pre_and_post_market(book, monkeypatch):
+    from api.services import alert_rules
+
+    fed = []
+    monkeypatch.setattr(alert_rules, "on_prices", fed.append)
+    for session in ("pre_market", "post_market"):
+        monkeypatch.setattr(massive, "_detect_session", lambda: session)
+        assert portfolio_risk.tick() == {"symbols": 0, "breaches": 0}
+    assert book["fetches"] == [] and fed == []
+    assert alerts.get_alerts(user_id=book["a"]["id"]) == []
+
+
+def test_theme_map_loads_wire_data_after_a_restart(book, monkeypatch):
+    wire = {"themes": {"SMH": {"name": "Semis", "holdings": [{"sym": "NVDA"}]}}}
+    monkeypatch.setattr(engine, "_load_wire_data", lambda: wire)   # cache empty, volume copy on disk
+    assert portfolio_risk._theme_map() == {"NVDA": ["Semis"]}
+
+
+def test_live_risk_marks_positions_and_computes_heat(book):
+    portfolio_risk.tick()
+    risk = portfolio_risk.get_live_risk(book["a"]["id"], with_correlation=False)
+    assert len(book["fetches"]) == 1  # served from the tick's marks
+
+    by_sym = {p["sym"]: p for p in risk["positions"]}
+    nvda, anet, tsla = by_sym["NVDA"], by_sym["ANET"], by_sym["TSLA"]
+    assert (nvda["unrealized_pnl"], nvda["r_multiple"], nvda["open_risk"]) == (1000.0, 2.0, 1500.0)
+    assert nvda["distance_to_stop_pct"] == pytest.approx(13.64)
+    assert anet["stop_breached"] and anet["open_risk"] == 0.0 and anet["r_multiple"] == -1.2
+    assert (tsla["unrealized_pnl"], tsla["r_multiple"], tsla["open_risk"]) == (200.0, 1.0, 400.0)
+
+    account = risk["accounts"][0]
+    assert account["account"] == "Main" and account["heat_pct"] == 1.9
+    assert nvda["over_risk_limit"] and not tsla["over_risk_limit"]
+    assert risk["summary"]["stops_breached"] == ["ANET"]
+
+
+def test_concentration_and_correlation_weighted_exposure(book, monkeypatch):
+    cache.set("wire_data", {"themes": {
+        "SMH": {"name": "Semis", "holdings": [{"sym": "NVDA"}, {"sym": "ANET"}]},
+        "AIQ": {"name": "AI", "holdings": [{"sym": "NVDA"}]},
+    }}, ttl=60)
+    from api.services import correlation
+    monkeypatch.setattr(correlation, "compute_correlation_matrix", lambda tickers: {
+        "tickers": ["ANET", "NVDA", "TSLA"],
+        "matrix": [[1.0, 1.0, 0.0], [1.0, 1.0, 0.0], [0.0, 0.0, 1.0]],
+        "high_correlations": [{"pair": ["ANET", "NVDA"], "correlation": 1.0}],
+    })
+    risk = portfolio_risk.get_live_risk(book["a"]["id"])
+
+    themes = {t["theme"]: t for t in risk["concentration"]["themes"]}
+    assert themes["Semis"]["market_value"] == 15700.0 and sorted(themes["Semis"]["symbols"]) == ["ANET", "NVDA"]
+    assert themes["AI"]["market_value"] == 11000.0
+    assert themes["Unthemed"]["symbols"] == ["TSLA"]
+
+    corr = risk["correlation"]
+    # NVDA+ANET move as one 15,700 long; the 3,800 TSLA short is uncorrelated
+    assert corr["gross_exposure"] == 19500.0 and corr["net_exposure"] == 11900.0
+    assert corr["correlated_exposure"] == pytest.approx((15700 ** 2 + 3800 ** 2) ** 0.5, abs=0.01)
+    assert corr["matrix_available"] and corr["correlated_heat_pct"] is not None
@@ -0,0 +1,192 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.services import price_stream
+
+
+class _Upstream:
+    def __init__(self):
+        self.prices = {}
+        self.calls = []
+
+    def __call__(self, tickers):
+        self.calls.append(list(tickers))
+        return {t: {"price": self.prices.get(t, 100.0)} for t in tickers}
+
+
+class _Channels:
+    def __init__(self):
+        self.data = {"snapshot": {"etfs": {"SPY": {"price": "580.00"}}}, "movers": {"ripping": [], "drilling": []}}
+        self.calls = []
+
+    def __call__(self, name):
+        self.calls.append(name)
+        return self.data[name]
+
+
+def _hub(channels=None):
+    upstream = _Upstream()
+    return price_stream.PriceHub(fetch=upstream, fetch_channel=channels or _Channels()), upstream
+
+
+def test_union_is_fetched_once_regardless_of_connections(monkeypatch):
+    monkeypatch.setattr(price_stream, "CHUNK_SIZE", 2)
+    hub, upstream = _hub()
+    subs = [hub.subscribe("AAPL,nvda") for _ in range(20)] + [hub.subscribe(["NVDA", "TSLA"])]
+    hub.poll_once()
+    assert upstream.calls == [["AAPL", "NVDA", "TSLA"]]
+    assert hub.stats["upstream_calls"] == 2  # three tickers, two per chunk
+
+    for s in subs[:20]:
+        s.close()
+    assert hub.tickers() == ["NVDA", "TSLA"]
+
+
+def test_only_changed_prices_are_pushed(monkeypatch):
+    monkeypatch.setattr(price_stream, "MIN_PUSH_INTERVAL", 0)
+    hub, upstream = _hub()
+    sub = hub.subscribe("AAPL,NVDA")
+    hub.poll_once()
+    assert set(sub.next_message()["prices"]) == {"AAPL", "NVDA"}
+    assert sub.next_message() is None
+
+    upstream.prices["NVDA"] = 101.0
+    hub.poll_once()
+    hub.poll_once()  # unchanged tick does not advance the sequence
+    msg = sub.next_message()
+    assert msg["prices"] == {"NVDA": {"price": 101.0}}
+    assert msg["id"] == f"{hub.epoch}-2"
+
+
+def test_reconnect_replays_missed_changes_or_full_state(monkeypatch):
+    monkeypatch.setattr(price_stream, "MIN_PUSH_INTERVAL", 0)
+    hub, upstream = _hub()
+    keep = hub.subscribe("AAPL,NVDA")  # keeps the union alive while the client is away
+    first = hub.subscribe("AAPL,NVDA")
+    hub.poll_once()
+    last_id = first.next_message()["id"]
+    first.close()
+
+    upstream.prices["AAPL"] = 99.0
+    hub.poll_once()
+    resumed = hub.subscribe("AAPL,NVDA", last_event_id=last_id)
+    assert set(resumed.next_message()["prices"]) == {"AAPL"}
+
+    # An id from another process (or garbage) falls back to the full last state.
+    fresh = hub.subscribe("AAPL,NVDA", last_event_id="deadbeef-7")
+    assert set(fresh.next_message()["prices"]) == {"AAPL", "NVDA"}
+    keep.close()
+
+
+def test_push_rate_cap_coalesces_changes(monkeypatch):
+    monkeypatch.setattr(price_stream, "MIN_PUSH_INTERVAL", 5)
+    hub, upstream = _hub()
+    sub = hub.subscribe("AAPL")
+    hub.poll_once()
+    assert sub.next_message(now=100.0) is not None
+    upstream.prices["AAPL"] = 1.0
+    hub.poll_once()
+    upstream.prices["AAPL"] = 2.0
+    hub.poll_once()
+    assert sub.next_message(now=102.0) is None
+    assert sub.next_message(now=105.0)["prices"] == {"AAPL": {"price": 2.0}}
+
+
+def test_channels_are_fetched_while_subscribed_and_pushed_on_change(monkeypatch):
+    monkeypatch.setattr(price_stream, "MIN_PUSH_INTERVAL", 0)
+    channels = _Channels()
+    hub, upstream = _hub(channels)
+    prices = hub.subscribe("AAPL")
+    hub.poll_once()
+    assert channels.calls == []   # nobody wants the strip: not fetched
+
+    strip = hub.subscribe([], channels="snapshot,movers")
+    assert strip.tickers == [] and hub.tickers() == ["AAPL"]
+    hub.poll_once()
+    msg = strip.next_message()
+    assert msg["prices"] == {} and msg["snapshot"] == channels.data["snapshot"] and "movers" in msg
+    assert set(prices.next_message()) == {"type", "id", "prices"}
+
+    hub.poll_once()
+    assert strip.next_message() is None   # unchanged
+    channels.data["movers"] = {"ripping": [{"sym": "RNG", "pct": "+34.40%"}], "drilling": []}
+    hub.poll_once()
+    assert set(strip.next_message()) == {"type", "id", "prices", "movers"}
+
+    strip.close()
+    channels.calls.clear()
+    hub.poll_once()
+    assert channels.calls == [] and hub.channels() == []
+    with pytest.raises(ValueError):
+        hub.subscribe("AAPL", channels="bogus")
+    assert hub.tickers() == ["AAPL"]
+
+
+def test_ticker_cap():
+    hub, _ = _hub()
+    sub = hub.subscribe("AAPL")
+    with pytest.raises(ValueError):
+        sub.add([f"T{i}" for i in range(price_stream.MAX_TICKERS)])
+    assert sub.tickers == ["AAPL"]
+
+
+async def test_messages_stream_ticks_and_heartbeats(monkeypatch):
+    monkeypatch.setattr(price_stream, "TICK_SECONDS", 0.05)
+    monkeypatch.setattr(price_stream, "MIN_POLL_GAP", 0.01)
+    monkeypatch.setattr(price_stream, "MIN_PUSH_INTERVAL", 0)
+    monkeypatch.setattr(price_stream, "HEARTBEAT_SECONDS", 0.1)
+    hub, _ = _hub()
+    sub = hub.subscribe("AAPL")
+    stream = sub.messages()
+    first = await asyncio.wait_for(stream.__anext__(), 1)
+    assert first["type"] == "prices"
+    second = await asyncio.wait_for(stream.__anext__(), 1)
+    assert second["type"] == "heartbeat"
+    sub.close()
+    await stream.aclose()
+
+
+def test_websocket_subscribe_and_unsubscribe(monkeypatch):
+    from api.main import app
+
+    monkeypatch.setattr(price_stream, "MIN_PUSH_INTERVAL", 0)
+    hub, upstream = _hub()
+    monkeypatch.setattr(price_stream, "hub", hub)
+    client = TestClient(app)
+    with client.websocket_connect("/api/live-prices/ws?tickers=AAPL") as ws:
+        assert set(ws.receive_json()["prices"]) == {"AAPL"}
+        ws.send_json({"action": "subscribe", "tickers": ["msft"]})
+        assert set(ws.receive_json()["prices"]) == {"MSFT"}
+        ws.send_json({"action": "unsubscribe", "tickers": ["AAPL"]})
+        ws.send_json({"action": "bogus"})
+        assert ws.receive_json() == {"type": "error", "error": "Unknown action"}
+        assert hub.tickers() == ["MSFT"]
+
+
+def test_sse_rejects_bad_requests_without_subscribing(monkeypatch):
+    from api.main import app
+
+    hub, _ = _hub()
+    monkeypatch.setattr(price_stream, "hub", hub)
+    client = TestClient(app)
+    assert client.get("/api/live-prices/stream").status_code == 400
+    too_many = ",".join(f"T{i}" for i in range(price_stream.MAX_TICKERS + 1))
+    assert client.get(f"/api/live-prices/stream?tickers={too_many}").status_code == 400
+    assert client.get("/api/live-prices/stream?channels=snapshot,bogus").status_code == 400
+    assert hub.stats["subscriptions"] == 0 and hub.tickers() == []
+
+
+def test_rest_endpoint_caches_per_ticker(monkeypatch):
+    from api.main import app
+    from api.services.cache import cache
+
+    upstream = _Upstream()
+    monkeypatch.setattr(price_stream, "fetch_quotes", upstream)
+    for t in ("AAPL", "NVDA", "TSLA"):
+        cache.invalidate(f"live_price_{t}")
+    client = TestClient(app)
+    assert set(client.get("/api/live-prices?tickers=AAPL,NVDA").json()) == {"AAPL", "NVDA"}
+    assert set(client.get("/api/live-prices?tickers=nvda,TSLA").json()) == {"NVDA", "TSLA"}
+    assert upstream.calls == [["AAPL", "NVDA"], ["TSLA"]]
@@ -0,0 +1,115 @@
+"""Request profiler: per-route percentiles, dependency spans and the slowest-N heap."""
+
+import sqlite3
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.middleware.profiling import ProfilingMiddleware
+from api.services import profiler
+
+
+def _massive(request):
+    time.sleep(0.02)
+    return httpx.Response(200, json={"ok": True})
+
+
+app = FastAPI()
+app.add_middleware(ProfilingMiddleware)
+
+
+@app.get("/api/thing/{sym}")
+def thing(sym: str):
+    with httpx.Client(transport=httpx.MockTransport(_massive)) as client:
+        client.get(f"https://api.massive.com/v2/snapshot/{sym}")
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("CREATE TABLE t (x)")
+        conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(10)])
+        conn.execute("SELECT SUM(x) FROM t").fetchone()
+    finally:
+        conn.close()
+    return {"sym": sym}
+
+
+@app.get("/api/fast")
+def fast():
+    return {}
+
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def fresh(monkeypatch):
+    profiler.reset()
+    monkeypatch.setattr(profiler, "SAMPLE_RATE", 1.0)
+    profiler.install()
+    yield
+    profiler.reset()
+
+
+def test_sampled_request_breaks_time_down_by_dependency():
+    client.get("/api/thing/NVDA")
+    [trace] = profiler.get_slowest()
+    assert trace["route"] == "GET /api/thing/{sym}"
+    assert trace["path"] == "/api/thing/NVDA"
+    breakdown = trace["breakdown"]
+    assert breakdown["massive"]["count"] == 1
+    assert breakdown["massive"]["ms"] >= 20
+    assert breakdown["sqlite"]["count"] == 3
+    assert "app" in breakdown
+    assert trace["top_spans"][0]["detail"] == "GET api.massive.com/v2/snapshot/NVDA"
+
+
+def test_route_percentiles_are_recorded_without_sampling(monkeypatch):
+    monkeypatch.setattr(profiler, "SAMPLE_RATE", 0.0)
+    for _ in range(20):
+        client.get("/api/fast")
+    client.get("/api/thing/AMD")
+    client.get("/nope")
+    rows = {r["route"]: r for r in profiler.get_route_stats()}
+    assert rows["GET /api/fast"]["count"] == 20
+    assert rows["GET /api/fast"]["p50_ms"] <= rows["GET /api/fast"]["p99_ms"]
+    assert rows["GET /api/thing/{sym}"]["p99_ms"] >= 20
+    assert "GET unmatched" in rows
+    assert profiler.get_route_stats()[0]["route"] == "GET /api/thing/{sym}"
+    assert profiler.get_slowest() == []
+
+
+def test_slowest_keeps_only_the_top_n(monkeypatch):
+    monkeypatch.setattr(profiler, "SLOWEST_N", 3)
+    for ms in (5, 50, 1, 30, 40, 2):
+        token = profiler.start_trace("GET", f"/x/{ms}")
+        profiler.end_trace(token, "GET /x/{n}", 200, float(ms))
+    assert [t["duration_ms"] for t in profiler.get_slowest()] == [50.0, 40.0, 30.0]
+
+
+def test_spans_outside_a_request_are_not_recorded():
+    with profiler.span("sqlite", "SELECT 1"):
+        pass
+    conn = sqlite3.connect(":memory:")
+    conn.execute("SELECT 1")
+    conn.close()
+    assert profiler.get_slowest() == []
+
+
+def test_pooled_auth_db_queries_are_traced(tmp_auth_db):
+    from api.services import auth_db
+
+    token = profiler.start_trace("GET", "/api/auth/me")
+    conn = auth_db.get_connection()
+    try:
+        conn.execute("SELECT COUNT(*) FROM users").fetchone()
+        conn.commit()
+    finally:
+        conn.close()
+    profiler.end_trace(token, "GET /api/auth/me", 200, 5.0)
+
+    [trace] = profiler.get_slowest()
+    assert trace["breakdown"]["sqlite"]["count"] == 2
+    assert "SELECT COUNT(*) FROM users" in [s["detail"] for s in trace["top_spans"]]
+    assert isinstance(conn, auth_db._PooledConnection) and conn in auth_db._pool._idle
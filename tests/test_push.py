@@ -7,6 +7,8 @@ from api.main import app
 
 client = TestClient(app)
 
+pytestmark = pytest.mark.usefixtures("tmp_wire_store")
+
 SAMPLE_PAYLOAD = {
     "date": "2026-02-22",
     "rundown_html": "<p>Test rundown</p>",
@@ -47,3 +49,47 @@ def test_push_data_stored_in_cache():
     stored = cache.get("wire_data")
     assert stored is not None
     assert stored.get("date") == "2026-02-22"
+
+
+AUTH = {"Authorization": "Bearer test-secret-123"}
+
+
+def test_push_sections_invalidates_only_dependent_keys():
+    from api.services.cache import cache
+    client.post("/api/push", json=SAMPLE_PAYLOAD, headers=AUTH)
+    cache.set("rundown", {"html": "old"}, ttl=60)
+    cache.set("leadership", ["old"], ttl=60)
+
+    resp = client.post("/api/push/sections", headers=AUTH,
+                       json={"sections": {"leadership": [{"sym": "AMD"}]}})
+    body = resp.json()
+    assert body["changed"] == ["leadership"]
+    assert cache.get("leadership") is None
+    assert cache.get("rundown") == {"html": "old"}
+    assert cache.get("wire_data")["leadership"] == [{"sym": "AMD"}]
+
+
+def test_push_patch_conflict_and_rollback():
+    from api.services.cache import cache
+    v1 = client.post("/api/push", json=SAMPLE_PAYLOAD, headers=AUTH).json()["version"]
+    resp = client.post("/api/push/patch", headers=AUTH, json={
+        "patch": [{"op": "replace", "path": "/themes/XLK/1W", "value": 9.9}],
+        "base_version": v1,
+    })
+    assert resp.json()["changed"] == ["themes"]
+    assert cache.get("wire_data")["themes"]["XLK"]["1W"] == 9.9
+
+    stale = client.post("/api/push/patch", headers=AUTH, json={
+        "patch": [{"op": "remove", "path": "/earnings"}], "base_version": v1,
+    })
+    assert stale.status_code == 409
+
+    bad = client.post("/api/push/patch", headers=AUTH, json={
+        "patch": [{"op": "test", "path": "/date", "value": "1999-01-01"}],
+    })
+    assert bad.status_code == 422
+
+    resp = client.post(f"/api/push/rollback/{v1}", headers=AUTH)
+    assert resp.json()["changed"] == ["themes"]
+    assert cache.get("wire_data")["themes"]["XLK"]["1W"] == 2.5
+    assert client.post("/api/push/rollback/999", headers=AUTH).status_code == 404
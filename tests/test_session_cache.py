@@ -0,0 +1,96 @@
+from api.services import auth_service
+from api.services.auth_db import get_connection
+
+
+def _user_and_token():
+    user = auth_service.create_user("cache@example.com", "password123")
+    return user, auth_service.create_session(user["id"])
+
+
+def _count_writes(monkeypatch):
+    """Track SQL statements that write, across every pooled connection."""
+    writes = []
+    real = get_connection
+
+    def tracking():
+        conn = real()
+        conn.set_trace_callback(
+            lambda sql: writes.append(sql) if sql.split()[0].upper() in ("INSERT", "UPDATE", "DELETE") else None
+        )
+        return conn
+
+    monkeypatch.setattr(auth_service, "get_connection", tracking)
+    return writes
+
+
+def test_validate_session_returns_user(tmp_auth_db):
+    user, token = _user_and_token()
+    result = auth_service.validate_session(token)
+    assert result["id"] == user["id"]
+    assert result["email"] == "cache@example.com"
+
+
+def test_validate_session_does_not_write(tmp_auth_db, monkeypatch):
+    _, token = _user_and_token()
+    writes = _count_writes(monkeypatch)
+    for _ in range(5):
+        assert auth_service.validate_session(token)
+    assert writes == []
+
+
+def test_cached_session_skips_query(tmp_auth_db, monkeypatch):
+    _, token = _user_and_token()
+    auth_service.validate_session(token)
+    monkeypatch.setattr(auth_service, "get_connection", lambda: (_ for _ in ()).throw(AssertionError("DB hit")))
+    assert auth_service.validate_session(token) is not None
+    monkeypatch.undo()
+
+
+def test_returned_user_is_a_copy(tmp_auth_db):
+    _, token = _user_and_token()
+    auth_service.validate_session(token)["plan"] = "pro"
+    assert "plan" not in auth_service.validate_session(token)
+
+
+def test_logout_invalidates_cache(tmp_auth_db):
+    _, token = _user_and_token()
+    assert auth_service.validate_session(token)
+    auth_service.delete_session(token)
+    assert auth_service.validate_session(token) is None
+
+
+def test_plan_change_invalidates_cache(tmp_auth_db):
+    user, _ = _user_and_token()
+    assert auth_service.get_user_plan(user["id"]) == "free"
+    auth_service.upsert_subscription(user["id"], "cus_1", "sub_1", "pro", "active")
+    assert auth_service.get_user_plan(user["id"]) == "pro"
+
+
+def test_password_change_invalidates_cache(tmp_auth_db):
+    user, token = _user_and_token()
+    auth_service.validate_session(token)
+    assert token in auth_service._session_cache
+    assert auth_service.change_password(user["id"], "password123", "newpassword1")
+    assert token not in auth_service._session_cache
+
+
+def test_last_login_written_on_flush(tmp_auth_db):
+    user, token = _user_and_token()
+    auth_service.validate_session(token)
+    auth_service.flush_pending_writes()
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT last_login_at FROM users WHERE id = ?", (user["id"],)).fetchone()
+    finally:
+        conn.close()
+    assert row["last_login_at"] is not None
+
+
+def test_page_views_batched_and_deduped(tmp_auth_db):
+    user, _ = _user_and_token()
+    for _ in range(3):
+        auth_service.log_page_view(user["id"], "/dashboard")
+    auth_service.log_page_view(user["id"], "/journal")
+    assert auth_service.flush_pending_writes() == 3  # 2 views + 1 last-login touch
+    engagement = auth_service.get_user_engagement(user["id"])
+    assert engagement["total_page_views"] == 2
@@ -0,0 +1,139 @@
+"""Stripe webhook ledger: ack-on-record, dedup, per-customer ordering, stale skips, replay."""
+
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+import stripe
+from fastapi.testclient import TestClient
+
+from api.services import auth_service, stripe_events, stripe_service
+
+SECRET = "whsec_test"
+
+
+@pytest.fixture
+def user(tmp_auth_db, monkeypatch):
+    monkeypatch.setattr(stripe_service, "STRIPE_WEBHOOK_SECRET", SECRET)
+    monkeypatch.setattr(stripe_events, "BACKOFF_BASE", 0.0)
+    return auth_service.create_user("payer@example.com", "password123")
+
+
+def _event(event_id, event_type, created, obj):
+    return {"id": event_id, "object": "event", "type": event_type, "created": created, "data": {"object": obj}}
+
+
+def _sub_event(event_id, created, status, event_type="customer.subscription.updated"):
+    return _event(event_id, event_type, created,
+                  {"id": "sub_1", "object": "subscription", "customer": "cus_1", "status": status})
+
+
+def _checkout_event(event_id, created, user_id):
+    return _event(event_id, "checkout.session.completed", created, {
+        "id": "cs_1", "customer": "cus_1", "subscription": "sub_1", "metadata": {"user_id": user_id},
+    })
+
+
+def _post(client, event):
+    payload = json.dumps(event)
+    t = int(time.time())
+    sig = stripe.WebhookSignature._compute_signature(f"{t}.{payload}", SECRET)
+    return client.post("/api/webhooks/stripe", content=payload,
+                       headers={"stripe-signature": f"t={t},v1={sig}"})
+
+
+def _status(user_id):
+    return auth_service.get_subscription(user_id)["status"]
+
+
+def _expire_leases():
+    from api.services import auth_db
+
+    conn = auth_db.get_connection()
+    try:
+        conn.execute("UPDATE stripe_events SET lease_until = ? WHERE status = 'processing'", (time.time() - 1,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_webhook_acks_once_and_rejects_bad_signatures(user):
+    from api.main import app
+
+    client = TestClient(app)
+    event = _sub_event("evt_1", 100, "active")
+    assert _post(client, event).json() == {"received": True, "event_id": "evt_1", "duplicate": False}
+    assert _post(client, event).json()["duplicate"] is True
+    bad = client.post("/api/webhooks/stripe", content=json.dumps(event), headers={"stripe-signature": "t=1,v1=x"})
+    assert bad.status_code == 400
+    assert stripe_events.stats()["pending"] == 1
+
+
+def test_out_of_order_delivery_converges_on_newest_state(user):
+    auth_service.upsert_subscription(user["id"], "cus_1", "sub_1", "pro", "active")
+    stripe_events.record(_sub_event("evt_new", 200, "canceled", "customer.subscription.deleted"))
+    assert stripe_events.process_pending()["processed"] == 1
+    assert _status(user["id"]) == "canceled"
+
+    # An older update delivered late (or redelivered) must not resurrect the subscription
+    stripe_events.record(_sub_event("evt_old", 150, "active"))
+    stripe_events.record(_event("evt_fail", "invoice.payment_failed", 120, {"customer": "cus_1"}))
+    assert stripe_events.process_pending()["skipped"] == 2
+    assert _status(user["id"]) == "canceled"
+
+
+def test_subscription_event_waits_for_checkout_to_link_customer(user, monkeypatch):
+    monkeypatch.setattr(stripe.Subscription, "retrieve",
+                        lambda sub_id: SimpleNamespace(status="active", current_period_end=None))
+    stripe_events.record(_sub_event("evt_sub", 100, "incomplete", "customer.subscription.created"))
+    assert stripe_events.process_pending()["waiting"] == 1
+    assert auth_service.get_subscription(user["id"]) is None
+
+    stripe_events.record(_checkout_event("evt_checkout", 101, user["id"]))
+    counts = stripe_events.process_pending()
+    assert counts["processed"] == 1 and counts["skipped"] == 1  # the waiting event predates the live fetch
+    assert _status(user["id"]) == "active"
+    assert {e["event_id"]: e["status"] for e in stripe_events.list_events()} == {
+        "evt_checkout": "processed", "evt_sub": "skipped",
+    }
+
+
+def test_failed_event_can_be_replayed(user, monkeypatch):
+    auth_service.upsert_subscription(user["id"], "cus_1", "sub_1", "pro", "active")
+    monkeypatch.setattr(stripe_events, "MAX_ATTEMPTS", 2)
+    real_apply = stripe_service.apply_event
+    monkeypatch.setattr(stripe_service, "apply_event", lambda event: 1 / 0)
+    stripe_events.record(_sub_event("evt_1", 100, "past_due"))
+
+    counts = stripe_events.process_pending()
+    assert counts["retry"] == 1 and counts["failed"] == 1
+    failed = stripe_events.list_events("failed")
+    assert failed[0]["attempts"] == 2 and "ZeroDivisionError" in failed[0]["last_error"]
+
+    monkeypatch.setattr(stripe_service, "apply_event", real_apply)
+    assert stripe_events.replay("evt_1")["previous_status"] == "failed"
+    assert stripe_events.process_pending()["processed"] == 1
+    assert _status(user["id"]) == "past_due"
+    with pytest.raises(LookupError):
+        stripe_events.replay("evt_missing")
+
+
+def test_event_stuck_in_processing_is_reclaimed_after_its_lease(user):
+    auth_service.upsert_subscription(user["id"], "cus_1", "sub_1", "pro", "active")
+    stripe_events.record(_sub_event("evt_stuck", 100, "past_due"))
+    assert [r["event_id"] for r in stripe_events._claim()] == ["evt_stuck"]   # worker dies here
+    stripe_events.record(_sub_event("evt_later", 200, "canceled", "customer.subscription.deleted"))
+
+    assert stripe_events.process_pending()["processed"] == 0    # lease still live: customer blocked
+    with pytest.raises(ValueError):
+        stripe_events.replay("evt_stuck")
+
+    _expire_leases()
+    assert stripe_events.process_pending()["processed"] == 2
+    assert _status(user["id"]) == "canceled"                   # applied in order, later one wins
+
+    stripe_events.record(_sub_event("evt_stuck2", 300, "active"))
+    stripe_events._claim()
+    _expire_leases()
+    assert stripe_events.replay("evt_stuck2")["previous_status"] == "processing"
@@ -0,0 +1,102 @@
+"""Trader watchlists: registry history, vectorized NAV/RS/hit rate, admin-only edits."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.services import auth_service, trader_watchlists
+
+DAYS = ["2026-10-05", "2026-10-06", "2026-10-07", "2026-10-08", "2026-10-09", "2026-10-12"]
+CLOSES = {
+    "SPY": [100, 101, 102, 103, 104, 105],
+    "AAA": [10, 11, 11, 12.1, 12.1, 12.1],
+    "BBB": [20, 20, 20, 18, 18, 18],
+}
+
+
+@pytest.fixture
+def bars(monkeypatch):
+    from api.services import bar_store, uct20_nav
+
+    def fake_series(ticker, tf, n):
+        c = CLOSES.get(ticker)
+        return {"t": DAYS if c else [], "c": c or []}
+
+    monkeypatch.setattr(bar_store, "get_series", fake_series)
+    monkeypatch.setattr(uct20_nav, "_load_compositions", lambda: [
+        {"date": DAYS[0], "holdings": ["BBB"]},
+        {"date": DAYS[3], "holdings": ["AAA"]},
+    ])
+
+
+def test_registry_is_seeded_and_keeps_membership_history(tmp_auth_db):
+    traders = trader_watchlists.list_traders()
+    assert [t["id"] for t in traders] == ["tsdr", "bracco", "qullamaggie", "manrav"]
+    assert traders[0]["tickers"][:3] == ["NVDA", "META", "GOOGL"]
+
+    trader_watchlists.update_trader("tsdr", {"tickers": ["NVDA", "PLTR"]})
+    trader_watchlists.remove_ticker("tsdr", "PLTR")
+    t = trader_watchlists.add_ticker("tsdr", "pltr")
+    assert t["tickers"] == ["NVDA", "PLTR"]
+    pltr = [h for h in t["history"] if h["ticker"] == "PLTR"]
+    assert len(pltr) == 2 and pltr[0]["removed_on"] and pltr[1]["removed_on"] is None
+    assert sum(1 for h in t["history"] if h["removed_on"]) == 10   # 9 dropped + first PLTR
+
+    with pytest.raises(ValueError):
+        trader_watchlists.update_trader("tsdr", {"tickers": ["not a ticker"]})
+    with pytest.raises(ValueError):
+        trader_watchlists.create_trader("tsdr", "Dup")
+    assert trader_watchlists.delete_trader("manrav")
+    assert "manrav" not in [t["id"] for t in trader_watchlists.list_traders()]
+    assert trader_watchlists.get_trader("manrav") is None
+
+
+def test_performance_nav_rs_and_hit_rate(bars):
+    perf = trader_watchlists.compute_performance([
+        {"ticker": "AAA", "added_on": DAYS[0], "removed_on": None},
+        {"ticker": "BBB", "added_on": DAYS[2], "removed_on": DAYS[4]},
+    ], with_series=True)
+    # Day 1: AAA +10%; day 3: AAA +10%, BBB -10% → 0; everything else flat
+    assert perf["nav"] == 110.0 and perf["inception"] == DAYS[0]
+    assert perf["spy_return_pct"] == 5.0
+    assert perf["rs_vs_spy"] == pytest.approx(4.76)
+    # UCT20 composite: BBB until DAYS[3] (-10%), then AAA (flat) → 90
+    assert perf["rs_vs_uct20"] == pytest.approx(22.22)
+    assert (perf["hit_rate"], perf["beat_spy_rate"]) == (50.0, 50.0)
+    assert [t["return_pct"] for t in perf["tickers"]] == [21.0, -10.0]
+    assert perf["tickers"][1]["vs_spy"] == pytest.approx(-10 - (104 / 102 - 1) * 100, abs=0.01)
+    assert [p["date"] for p in perf["series"]] == DAYS[1:]
+    assert perf["series"][-1]["uct20"] == 90.0
+
+
+def test_added_today_has_no_performance_yet(bars):
+    perf = trader_watchlists.compute_performance([{"ticker": "AAA", "added_on": DAYS[-1], "removed_on": None}])
+    assert perf["nav"] is None and perf["hit_rate"] is None
+
+
+def test_edits_are_admin_only_and_show_in_performance(tmp_auth_db, bars):
+    from api.main import app
+    from api.services.auth_db import get_connection
+
+    client = TestClient(app)
+    member = auth_service.create_user("member@example.com", "password123")
+    admin = auth_service.create_user("admin@example.com", "password123")
+    conn = get_connection()
+    conn.execute("UPDATE users SET role = 'admin' WHERE id = ?", (admin["id"],))
+    conn.commit()
+    conn.close()
+
+    body = {"id": "newbie", "name": "Newbie", "color": "#123456", "tickers": ["AAA", "BBB"]}
+    assert client.post("/api/traders", json=body).status_code == 401
+    client.cookies.set("uct_session", auth_service.create_session(member["id"]))
+    assert client.post("/api/traders", json=body).status_code == 403
+    client.cookies.set("uct_session", auth_service.create_session(admin["id"]))
+    assert client.post("/api/traders", json=body).json()["tickers"] == ["AAA", "BBB"]
+    assert client.post("/api/traders", json={**body, "color": "red"}).status_code == 400
+
+    assert client.delete("/api/traders/newbie/tickers/BBB").json()["tickers"] == ["AAA"]
+    assert client.delete("/api/traders/newbie/tickers/BBB").status_code == 400
+    assert client.get("/api/traders").json()[-1]["id"] == "newbie"
+    assert client.get("/api/traders/nobody/performance").status_code == 404
+    perf = client.get("/api/traders/newbie/performance").json()
+    assert [t["ticker"] for t in perf["tickers"]] == ["AAA", "BBB"]
+    assert any(p["id"] == "newbie" for p in client.get("/api/traders/performance").json())
@@ -0,0 +1,114 @@
+import pytest
+
+from api import uw_flow_ingest
+
+
+def _alert(n, ticker="NVDA", kind="call", prem=100_000, sweep=False, day="2026-03-16"):
+    return {
+        "id": f"a{n}", "ticker": ticker, "type": kind, "total_premium": str(prem),
+        "has_sweep": sweep, "strike": "100", "expiry": "2026-04-17",
+        "created_at": f"{day}T15:{n // 60:02d}:{n % 60:02d}Z", "total_size": 10,
+    }
+
+
+class _Feed:
+    """Fake flow-alerts endpoint: newest first, honours limit and before_id."""
+
+    def __init__(self):
+        self.alerts = []
+        self.requests = []
+
+    def add(self, *alerts):
+        self.alerts = list(reversed(alerts)) + self.alerts
+
+    def __call__(self, params):
+        self.requests.append(dict(params))
+        alerts = self.alerts
+        if "before_id" in params:
+            ids = [a["id"] for a in alerts]
+            alerts = alerts[ids.index(params["before_id"]) + 1:]
+        return alerts[:params["limit"]]
+
+
+@pytest.fixture
+def feed(tmp_path, monkeypatch):
+    monkeypatch.setattr(uw_flow_ingest, "DB_PATH", str(tmp_path / "uw_flow.db"))
+    uw_flow_ingest.reset()
+    f = _Feed()
+    monkeypatch.setattr(uw_flow_ingest, "_fetch_page", f)
+    yield f
+    uw_flow_ingest.reset()
+
+
+def test_poll_appends_only_new_alerts_and_serves_deltas(feed):
+    feed.add(_alert(1), _alert(2, "AMD", "put"))
+    assert uw_flow_ingest.poll_once() == 2
+    first = uw_flow_ingest.get_flow_since(None)
+    assert [r["symbol"] for r in first["rows"]] == ["NVDA", "AMD"]
+
+    feed.add(_alert(3, "TSLA"))
+    assert uw_flow_ingest.poll_once() == 1
+    assert feed.requests[-1]["newer_than"] == "2026-03-16T15:00:02Z"
+    delta = uw_flow_ingest.get_flow_since(first["cursor"])
+    assert [r["symbol"] for r in delta["rows"]] == ["TSLA"]
+    assert uw_flow_ingest.get_flow_since(delta["cursor"])["rows"] == []
+    # Re-polling the same feed stores nothing twice.
+    assert uw_flow_ingest.poll_once() == 0
+
+
+def test_burst_larger_than_a_page_is_paged_back(feed, monkeypatch):
+    monkeypatch.setattr(uw_flow_ingest, "PAGE_SIZE", 2)
+    feed.add(*[_alert(i) for i in range(5)])
+    assert uw_flow_ingest.poll_once() == 5
+    rows = uw_flow_ingest.get_flow_since(0)["rows"]
+    assert [r["id"] for r in rows] == [1, 2, 3, 4, 5]
+
+
+def test_aggregates_update_incrementally_and_match_archive(feed):
+    feed.add(_alert(1, "NVDA", "call", 200_000, sweep=True), _alert(2, "NVDA", "put", 50_000),
+             _alert(3, "AMD", "call", 100_000))
+    uw_flow_ingest.poll_once()
+    live = uw_flow_ingest.get_aggregates()
+    assert live["session"] == "2026-03-16"
+    assert (live["calls"], live["puts"], live["sweeps"]) == (2, 1, 1)
+    assert live["call_put_ratio"] == 2.0
+    assert live["top_tickers"][0] == {
+        "ticker": "NVDA", "premium": 250_000.0, "call_premium": 200_000.0,
+        "put_premium": 50_000.0, "alerts": 2, "sweeps": 1,
+    }
+    # A cold start rebuilds the same numbers from the archive.
+    uw_flow_ingest.reset()
+    assert uw_flow_ingest.get_aggregates() == live
+
+
+def test_ring_overflow_falls_back_to_archive_and_history(feed, monkeypatch):
+    monkeypatch.setattr(uw_flow_ingest, "RING_SIZE", 2)
+    feed.add(_alert(1, day="2026-03-13"), _alert(2, "AMD", day="2026-03-13"))
+    uw_flow_ingest.poll_once()
+    feed.add(_alert(3), _alert(4), _alert(5))
+    uw_flow_ingest.poll_once()
+
+    assert uw_flow_ingest.get_stats()["ring_size"] == 2
+    assert [r["id"] for r in uw_flow_ingest.get_flow_since(1)["rows"]] == [2, 3, 4, 5]
+    page = uw_flow_ingest.get_flow_since(0, limit=2)
+    assert [r["id"] for r in page["rows"]] == [1, 2] and page["more"] and page["cursor"] == 2
+
+    # The live aggregate rolled over to the new session; the old one is still queryable.
+    assert uw_flow_ingest.get_aggregates()["alerts"] == 3
+    assert uw_flow_ingest.get_aggregates("2026-03-13")["alerts"] == 2
+    past = uw_flow_ingest.get_session("2026-03-13", ticker="amd")
+    assert past["total"] == 1 and past["rows"][0]["symbol"] == "AMD"
+    assert [s["session"] for s in uw_flow_ingest.list_sessions()] == ["2026-03-16", "2026-03-13"]
+
+
+def test_fetch_failure_keeps_state(feed, monkeypatch):
+    feed.add(_alert(1))
+    uw_flow_ingest.poll_once()
+
+    def down(params):
+        raise RuntimeError("502")
+
+    monkeypatch.setattr(uw_flow_ingest, "_fetch_page", down)
+    assert uw_flow_ingest.poll_once() == 0
+    assert uw_flow_ingest.get_stats()["errors"] == 1
+    assert len(uw_flow_ingest.get_flow_since(None)["rows"]) == 1
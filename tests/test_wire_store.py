@@ -0,0 +1,94 @@
+"""Versioned wire_data store: section diffs, patches, history rebuild and pruning."""
+
+import pytest
+
+from api.services.cache import cache
+
+
+@pytest.fixture
+def store(tmp_wire_store):
+    return tmp_wire_store
+
+
+DOC = {
+    "date": "2026-03-02",
+    "breadth": {"pct_above_50": 61},
+    "leadership": [{"sym": "NVDA"}, {"sym": "AVGO"}],
+    "themes": {"XLK": {"1W": 1.0}},
+}
+
+
+def test_full_push_only_reports_changed_sections(store):
+    first = store.put(DOC)
+    assert first["version"] == 1
+    assert first["changed"] == sorted(DOC)
+
+    cache.set("breadth", {"cached": True}, ttl=60)
+    cache.set("rundown", {"cached": True}, ttl=60)
+    second = store.put({**DOC, "date": "2026-03-03"})
+    assert second["version"] == 2
+    assert second["changed"] == ["date"]
+    assert second["invalidated"] == ["rundown"]
+    assert cache.get("rundown") is None
+    assert cache.get("breadth") == {"cached": True}
+
+    # Identical push: no new version
+    assert store.put({**DOC, "date": "2026-03-03"}) == {"version": 2, "changed": [], "invalidated": []}
+
+
+def test_recomputes_follow_sections(store, monkeypatch):
+    calls = []
+    monkeypatch.setattr(store, "SECTION_RECOMPUTES", {
+        "leadership": [lambda doc: calls.append(("leadership", len(doc["leadership"])))],
+        "themes": [lambda doc: calls.append(("themes",))],
+    })
+    store.put(DOC)
+    calls.clear()
+    store.update_sections({"breadth": {"pct_above_50": 40}})
+    assert calls == []
+    store.apply_patch([{"op": "add", "path": "/leadership/-", "value": {"sym": "ANET"}}])
+    assert calls == [("leadership", 3)]
+
+
+def test_patch_is_atomic_and_does_not_mutate_previous_version(store):
+    store.put(DOC)
+    before = cache.get("wire_data")
+    with pytest.raises(ValueError):
+        store.apply_patch([
+            {"op": "replace", "path": "/themes/XLK/1W", "value": 5.0},
+            {"op": "remove", "path": "/themes/XLE"},
+        ])
+    assert store.get_version() == 1
+    assert before["themes"]["XLK"]["1W"] == 1.0
+
+    store.apply_patch([
+        {"op": "copy", "from": "/leadership/0", "path": "/leadership/0"},
+        {"op": "move", "from": "/themes/XLK", "path": "/themes/SMH"},
+    ])
+    assert before["themes"] == {"XLK": {"1W": 1.0}}
+    assert store.get_document(1) == DOC
+    assert store.get_document(2)["themes"] == {"SMH": {"1W": 1.0}}
+    assert store.get_document(2)["leadership"][:2] == [{"sym": "NVDA"}, {"sym": "NVDA"}]
+
+
+def test_history_rebuilds_from_snapshot_and_prunes(store, monkeypatch):
+    monkeypatch.setattr(store, "HISTORY_LIMIT", 5)
+    store.put(DOC)
+    for i in range(12):
+        store.update_sections({"breadth": {"pct_above_50": i}}, remove=["themes"] if i == 0 else None)
+
+    versions = store.list_versions()
+    assert versions[0]["version"] == 13
+    kept = [v["version"] for v in versions]
+    assert min(kept) <= 13 - 5 + 1
+    assert len(kept) < 13
+    # Every kept version rebuilds, including from a periodic snapshot
+    assert any(v["snapshot"] for v in versions if v["kind"] == "sections")
+    assert store.get_document(13)["breadth"] == {"pct_above_50": 11}
+    assert "themes" not in store.get_document(13)
+
+    store.rollback(10)
+    assert cache.get("wire_data")["breadth"] == {"pct_above_50": 8}
+    assert store.list_versions()[0]["restored"] == 10
+    with pytest.raises(LookupError):
+        store.rollback(1)